@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Benchmark suite for HDB, BDB, FDB, TDB and ADB.
+
+Measures the throughput and the latency percentiles of put, get, out,
+iterate, range and query operations, for the Simple and the full
+classes, raw and pickled values, several value sizes, record counts
+and thread counts.  The results are written as JSON, to be compared
+with regress.py.
+
+Run every benchmark with the default matrix:
+
+  python bench/bench.py
+
+Or a subset of it:
+
+  python bench/bench.py -t hdb,bdb --tiers simple -s 16 -n 100000 -j 1,4
+
+"""
+
+import json
+import optparse
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from tcdb import adb
+from tcdb import bdb
+from tcdb import fdb
+from tcdb import hdb
+from tcdb import stats
+from tcdb import tc
+from tcdb import tdb
+
+
+TYPES = ('hdb', 'bdb', 'fdb', 'tdb', 'adb')
+TIERS = ('simple', 'full')
+MODES = ('raw', 'pickle')
+OPS = ('put', 'get', 'iterate', 'range', 'query', 'out')
+
+CLASSES = {
+    ('hdb', 'simple'): hdb.HDBSimple, ('hdb', 'full'): hdb.HDB,
+    ('bdb', 'simple'): bdb.BDBSimple, ('bdb', 'full'): bdb.BDB,
+    ('fdb', 'simple'): fdb.FDBSimple, ('fdb', 'full'): fdb.FDB,
+    ('tdb', 'full'): tdb.TDB,
+    ('adb', 'simple'): adb.ADBSimple, ('adb', 'full'): adb.ADB,
+    }
+
+# Records read in every range operation.
+RANGESIZ = 100
+
+
+class Target(object):
+    """A database object with a uniform interface for the benchmarks.
+    Methods are None if the operation is not supported."""
+    def __init__(self, type_, tier, mode, path, size, records, threads):
+        self.type = type_
+        self.db = db = CLASSES[(type_, tier)]()
+        if threads > 1:
+            db.setmutex()
+        if type_ == 'fdb':
+            width = max(size + 16, 255)
+            db.open(path, width=width, limsiz=(records + 1) * (width + 4) +
+                    1024 * 1024)
+        elif type_ == 'adb':
+            db.open(path + '.tch')
+        else:
+            db.open(path)
+
+        raw = mode == 'raw'
+        self.data = 'x' * size
+        self.range = self.query = None
+        if type_ == 'fdb':
+            self.key = str if tier == 'simple' else int
+        else:
+            self.key = lambda i: '%010d' % i
+
+        if tier == 'simple':
+            self.put, self.get, self.out = db.put, db.get, db.out
+        elif type_ == 'tdb':
+            self.put = lambda key, cols: db.put(key, cols, raw_key=True,
+                                                raw_cols=raw)
+            self.get = lambda key: db.get(key, raw_key=True)
+            self.out = lambda key: db.out(key, as_raw=True)
+        elif type_ == 'fdb':
+            self.put = lambda key, value: db.put(key, value, as_raw=raw)
+            self.get = lambda key: db.get(key, as_type=str if raw else None)
+            self.out = db.out
+        else:
+            self.put = lambda key, value: db.put(key, value, raw_key=True,
+                                                 raw_value=raw)
+            self.get = lambda key: db.get(key, raw_key=True,
+                                          value_type=str if raw else None)
+            self.out = lambda key: db.out(key, as_raw=True)
+        self.iterate = db.iteritems
+
+        if type_ == 'bdb':
+            self.range = lambda i: db.range(self.key(i), True,
+                                            self.key(i + RANGESIZ), False)
+        elif type_ == 'fdb':
+            # FDBSimple takes the IDs as decimal strings.
+            self.range = lambda i: db.range(self.key(i + 1),
+                                            self.key(i + RANGESIZ))
+        elif type_ == 'tdb' and raw:
+            # Pickled columns never match a condition on their string.
+            self.query = self._query
+
+    def value(self, i):
+        """Get the value of the i-th record.  Table records have a num
+        column with 100 different values."""
+        if self.type == 'tdb':
+            return {'value': self.data, 'num': str(i % 100)}
+        return self.data
+
+    def _query(self, i):
+        """Search the records with a value of the num column."""
+        query = self.db.query()
+        query.addcond('num', tdb.QCSTREQ, str(i))
+        return query.search()
+
+    def close(self):
+        """Close the database object."""
+        self.db.close()
+
+
+def merge(histograms):
+    """Merge a list of histograms."""
+    merged = stats.Histogram()
+    for histogram in histograms:
+        for index, count in histogram.counts.iteritems():
+            merged.counts[index] = merged.counts.get(index, 0) + count
+        merged.count += histogram.count
+        merged.max = max(merged.max, histogram.max)
+    return merged
+
+
+def measure(func, args, threads=1):
+    """Call func for every element of args, splitting them among
+    threads.  Return the elapsed time and the latency histogram."""
+    histograms = [stats.Histogram() for _ in range(threads)]
+
+    def work(histogram, args):
+        clock = time.time
+        for arg in args:
+            start = clock()
+            func(*arg)
+            histogram.record((clock() - start) * 1000000)
+
+    start = time.time()
+    if threads == 1:
+        work(histograms[0], args)
+    else:
+        workers = [threading.Thread(target=work,
+                                    args=(histograms[n], args[n::threads]))
+                   for n in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    return time.time() - start, merge(histograms)
+
+
+def measure_iter(iterator):
+    """Measure every step of an iterator."""
+    histogram = stats.Histogram()
+    clock = time.time
+    start = begin = clock()
+    for _ in iterator:
+        now = clock()
+        histogram.record((now - start) * 1000000)
+        start = now
+    return clock() - begin, histogram
+
+
+def result(config, op, elapsed, histogram):
+    """Build the result of a benchmark."""
+    res = dict(config)
+    res.update({
+        'name': '%(type)s.%(tier)s.%(mode)s.%(size)d.%(records)d.'
+                '%(threads)d.' % config + op,
+        'op': op,
+        'ops': histogram.count,
+        'seconds': elapsed,
+        'ops_per_sec': histogram.count / elapsed if elapsed else 0.0,
+        'p50': histogram.percentile(50),
+        'p90': histogram.percentile(90),
+        'p99': histogram.percentile(99),
+        'max': histogram.max,
+        })
+    return res
+
+
+def run_one(config, ops=OPS, directory=None):
+    """Run the benchmarks of a configuration (a dictionary with type,
+    tier, mode, size, records and threads).  Return a list of
+    results."""
+    created = directory is None
+    if created:
+        directory = tempfile.mkdtemp(prefix='tcdb-bench-')
+    path = os.path.join(directory, 'bench')
+    threads, records = config['threads'], config['records']
+    target = Target(config['type'], config['tier'], config['mode'], path,
+                    config['size'], records, threads)
+    results = []
+    try:
+        rand = random.Random(0)
+        keys = [target.key(i) for i in xrange(1, records + 1)]
+        shuffled = list(keys)
+        rand.shuffle(shuffled)
+
+        args = [(key, target.value(i)) for i, key in enumerate(keys)]
+        elapsed, histogram = measure(target.put, args, threads)
+        if 'put' in ops:
+            results.append(result(config, 'put', elapsed, histogram))
+        if 'get' in ops:
+            args = [(key,) for key in shuffled]
+            elapsed, histogram = measure(target.get, args, threads)
+            results.append(result(config, 'get', elapsed, histogram))
+        if 'iterate' in ops:
+            elapsed, histogram = measure_iter(target.iterate())
+            results.append(result(config, 'iterate', elapsed, histogram))
+        if 'range' in ops and target.range:
+            args = [(i,) for i in xrange(0, records, RANGESIZ)]
+            elapsed, histogram = measure(target.range, args)
+            results.append(result(config, 'range', elapsed, histogram))
+        if 'query' in ops and target.query:
+            args = [(i,) for i in xrange(min(records, 100))]
+            elapsed, histogram = measure(target.query, args)
+            results.append(result(config, 'query', elapsed, histogram))
+            target.db.setindex('num', tdb.ITLEXICAL)
+            elapsed, histogram = measure(target.query, args)
+            results.append(result(config, 'query_index', elapsed,
+                                  histogram))
+        if 'out' in ops:
+            args = [(key,) for key in shuffled]
+            elapsed, histogram = measure(target.out, args, threads)
+            results.append(result(config, 'out', elapsed, histogram))
+    finally:
+        target.close()
+        if created:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def configs(types=TYPES, tiers=TIERS, modes=MODES, sizes=(16,),
+            records=(10000,), threads=(1,)):
+    """Generate the matrix of configurations.  Combinations that do not
+    exist (TDB has not a Simple class, Simple classes only store
+    strings, ADB is not thread safe) are skipped."""
+    for type_ in types:
+        for tier in tiers:
+            if (type_, tier) not in CLASSES:
+                continue
+            for mode in modes:
+                if tier == 'simple' and mode != 'raw':
+                    continue
+                for size in sizes:
+                    for num in records:
+                        for nthreads in threads:
+                            if type_ == 'adb' and nthreads > 1:
+                                continue
+                            yield {'type': type_, 'tier': tier,
+                                   'mode': mode, 'size': size,
+                                   'records': num, 'threads': nthreads}
+
+
+def meta():
+    """Get the description of the environment of the benchmarks."""
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'tokyocabinet': tc.__version__,
+        }
+
+
+def run(matrix, ops=OPS, out=None):
+    """Run the benchmarks of every configuration of the matrix,
+    printing a line per result in out."""
+    results = []
+    for config in matrix:
+        for res in run_one(config, ops):
+            if out:
+                out.write('%-40s %12.0f ops/s  p50 %6d  p99 %6d us\n' %
+                          (res['name'], res['ops_per_sec'], res['p50'],
+                           res['p99']))
+                out.flush()
+            results.append(res)
+    return results
+
+
+def _split(option, type_=str):
+    """Split a comma separated option."""
+    return tuple(type_(value) for value in option.split(',') if value)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-t', '--types', default=','.join(TYPES),
+                      help='database types [%default]')
+    parser.add_option('--tiers', default=','.join(TIERS),
+                      help='API tiers [%default]')
+    parser.add_option('-m', '--modes', default=','.join(MODES),
+                      help='value modes [%default]')
+    parser.add_option('-s', '--sizes', default='16,1024',
+                      help='value sizes in bytes [%default]')
+    parser.add_option('-n', '--records', default='10000',
+                      help='record counts [%default]')
+    parser.add_option('-j', '--threads', default='1,4',
+                      help='thread counts [%default]')
+    parser.add_option('--ops', default=','.join(OPS),
+                      help='operations [%default]')
+    parser.add_option('-o', '--output', default='bench-results.json',
+                      help='JSON output file [%default]')
+    options, _ = parser.parse_args(argv)
+
+    matrix = configs(_split(options.types), _split(options.tiers),
+                     _split(options.modes), _split(options.sizes, int),
+                     _split(options.records, int),
+                     _split(options.threads, int))
+    results = run(matrix, _split(options.ops), sys.stdout)
+    with open(options.output, 'w') as output:
+        json.dump({'meta': meta(), 'results': results}, output, indent=1,
+                  sort_keys=True)
+    print 'Results written in %s' % options.output
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Compression codec benchmark.
+
+Stores the same records in hash databases compressed with the native
+options (TDEFLATE, TBZIP, TTCBS) and with the custom codecs of
+tcdb.codec (TEXCODEC), and reports the file size ratio and the put and
+get throughput of each one.
+
+  python bench/codec_bench.py -n 20000 -s 400
+
+"""
+
+import optparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from tcdb import codec
+from tcdb import hdb
+
+
+WORDS = ('tokyo cabinet is a library of routines for managing a database '
+         'the database is a simple data file containing records each is a '
+         'pair of a key and a value every key and value is serial bytes '
+         'with variable length').split()
+
+CONFIGS = [
+    ('none', 0, None),
+    ('TDEFLATE', hdb.TDEFLATE, None),
+    ('TBZIP', hdb.TBZIP, None),
+    ('TTCBS', hdb.TTCBS, None),
+    ('zlib-1', hdb.TEXCODEC, codec.ZlibCodec(level=1)),
+    ('zlib-6', hdb.TEXCODEC, codec.ZlibCodec(level=6)),
+    ]
+if codec.liblz4:
+    CONFIGS.append(('lz4', hdb.TEXCODEC, codec.LZ4Codec()))
+
+
+def corpus(num, size, seed=0):
+    """Build num deterministic text records of about size bytes."""
+    rnd = random.Random(seed)
+    records = []
+    for i in xrange(num):
+        words = []
+        length = 0
+        while length < size:
+            word = rnd.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        records.append(('%08d' % i, ' '.join(words)))
+    return records
+
+
+def measure(path, opts, codec_, records):
+    """Store and read back records.  Return the file size, and the put
+    and get times."""
+    db = hdb.HDB()
+    if codec_ is not None:
+        db.setcodec(codec_)
+    db.open(path, omode=hdb.OWRITER | hdb.OCREAT | hdb.OTRUNC, opts=opts)
+    start = time.time()
+    for key, value in records:
+        db.put(key, value, raw_key=True, raw_value=True)
+    db.sync()
+    put_time = time.time() - start
+    start = time.time()
+    for key, _ in records:
+        db.get_str(key, as_raw=True)
+    get_time = time.time() - start
+    db.close()
+    return os.path.getsize(path), put_time, get_time
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-n', '--num', type='int', default=10000,
+                      help='number of records [%default]')
+    parser.add_option('-s', '--size', type='int', default=400,
+                      help='size of the records in bytes [%default]')
+    options, _ = parser.parse_args(argv)
+
+    records = corpus(options.num, options.size)
+    path = os.path.abspath('codec-bench.tch')
+    print '%-10s %10s %7s %12s %12s' % ('codec', 'size (KB)', 'ratio',
+                                        'put (rec/s)', 'get (rec/s)')
+    try:
+        base = None
+        for name, opts, codec_ in CONFIGS:
+            size, put_time, get_time = measure(path, opts, codec_, records)
+            if base is None:
+                base = size
+            print '%-10s %10d %6.0f%% %12.0f %12.0f' % \
+                (name, size // 1024, size * 100.0 / base,
+                 options.num / put_time, options.num / get_time)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Import time benchmark.
+
+Measures, in fresh interpreters, the time of 'import tcdb' and of the
+first use of a hash database, with the lazy bindings (the default) and
+with every binding built at import (TCDB_LAZY=0).
+
+  python bench/import_time.py -r 20
+
+"""
+
+import optparse
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+SCRIPTS = {
+    'import': 'import tcdb',
+    'first_use': 'import tcdb\n'
+                 'db = tcdb.hdb.HDB()\n'
+                 'db.open("%(path)s")\n'
+                 'db.put("key", "value")\n'
+                 'db.close()\n',
+    }
+
+TIMER = '''import time
+start = time.time()
+%s
+print time.time() - start
+'''
+
+
+def measure(script, lazy, repeat):
+    """Run script in repeat fresh interpreters.  Return the sorted
+    list of times."""
+    env = dict(os.environ, TCDB_LAZY='1' if lazy else '0')
+    env['PYTHONPATH'] = os.pathsep.join([ROOT, env.get('PYTHONPATH', '')])
+    times = []
+    for _ in range(repeat):
+        output = subprocess.Popen([sys.executable, '-c', TIMER % script],
+                                  stdout=subprocess.PIPE,
+                                  env=env).communicate()[0]
+        times.append(float(output))
+    return sorted(times)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-r', '--repeat', type='int', default=10,
+                      help='interpreters per measure [%default]')
+    options, _ = parser.parse_args(argv)
+
+    path = os.path.abspath('import-time-bench.tch')
+    print '%-10s %12s %12s %9s' % ('benchmark', 'eager (ms)', 'lazy (ms)',
+                                   'reduction')
+    try:
+        for name in sorted(SCRIPTS):
+            script = SCRIPTS[name] % {'path': path}
+            eager = measure(script, False, options.repeat)
+            lazy = measure(script, True, options.repeat)
+            eager, lazy = eager[len(eager) // 2], lazy[len(lazy) // 2]
+            print '%-10s %12.1f %12.1f %8.0f%%' % \
+                (name, eager * 1000, lazy * 1000,
+                 (eager - lazy) * 100 / eager if eager else 0.0)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Performance regression harness.
+
+Runs a selection of the benchmarks of bench.py several times, and
+stores the throughput samples as a JSON baseline, or compares them with
+a stored baseline.  A benchmark regresses if its median throughput
+drops more than the configured percentage and more than the noise of
+the samples.  The exit status is 1 if any benchmark regresses.
+
+Record a baseline:
+
+  python bench/regress.py record -b baseline.json
+
+Compare the working tree with it, failing on a 10% slowdown:
+
+  python bench/regress.py compare -b baseline.json --max-regression 10
+
+"""
+
+import json
+import optparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench
+
+
+# Selected benchmarks: name -> (configuration, operation).
+BENCHMARKS = {
+    'hdb_put_small': ({'type': 'hdb', 'tier': 'full', 'mode': 'raw',
+                       'size': 16, 'records': 1000000, 'threads': 1}, 'put'),
+    'hdb_get_small': ({'type': 'hdb', 'tier': 'full', 'mode': 'raw',
+                       'size': 16, 'records': 1000000, 'threads': 1}, 'get'),
+    'hdb_put_pickle': ({'type': 'hdb', 'tier': 'full', 'mode': 'pickle',
+                        'size': 256, 'records': 100000, 'threads': 1},
+                       'put'),
+    'hdbsimple_put': ({'type': 'hdb', 'tier': 'simple', 'mode': 'raw',
+                       'size': 16, 'records': 1000000, 'threads': 1}, 'put'),
+    'bdb_iterate': ({'type': 'bdb', 'tier': 'full', 'mode': 'raw',
+                     'size': 64, 'records': 100000, 'threads': 1},
+                    'iterate'),
+    'bdb_range': ({'type': 'bdb', 'tier': 'full', 'mode': 'raw',
+                   'size': 64, 'records': 100000, 'threads': 1}, 'range'),
+    'tdb_query_index': ({'type': 'tdb', 'tier': 'full', 'mode': 'raw',
+                         'size': 64, 'records': 100000, 'threads': 1},
+                        'query_index'),
+    }
+
+
+def median(values):
+    """Get the median of a list of values."""
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def noise(values):
+    """Get the relative noise of a list of samples, as the median
+    absolute deviation divided by the median."""
+    center = median(values)
+    if not center or len(values) < 2:
+        return 0.0
+    return median([abs(value - center) for value in values]) / float(center)
+
+
+def run(names, repeat=5, scale=1.0, out=None):
+    """Run the selected benchmarks repeat times.  Return a dictionary
+    name -> list of throughput samples.  scale multiplies the number
+    of records."""
+    samples = dict((name, []) for name in names)
+    # Benchmarks that share a configuration are run together.
+    groups = {}
+    for name in names:
+        config, op = BENCHMARKS[name]
+        config = dict(config, records=max(1, int(config['records'] * scale)))
+        key = tuple(sorted(config.items()))
+        groups.setdefault(key, (config, []))[1].append((name, op))
+    for _ in range(repeat):
+        for config, benchmarks in groups.itervalues():
+            ops = [op for _, op in benchmarks]
+            if 'query_index' in ops:
+                ops.append('query')
+            results = dict((res['op'], res)
+                           for res in bench.run_one(config, ops))
+            for name, op in benchmarks:
+                samples[name].append(results[op]['ops_per_sec'])
+                if out:
+                    out.write('%-20s %12.0f ops/s\n' %
+                              (name, results[op]['ops_per_sec']))
+                    out.flush()
+    return samples
+
+
+def compare(baseline, current, max_regression=5.0, sigmas=3.0):
+    """Compare the samples of every benchmark.  A benchmark regresses
+    if the median drops more than max_regression percent and more than
+    sigmas times the noise.  Return a list of (name, baseline median,
+    current median, change percent, noise percent, status)."""
+    report = []
+    for name in sorted(current):
+        if name not in baseline:
+            report.append((name, None, median(current[name]), None, None,
+                           'new'))
+            continue
+        before, after = median(baseline[name]), median(current[name])
+        change = (after - before) * 100.0 / before if before else 0.0
+        level = max(noise(baseline[name]), noise(current[name])) * 100.0
+        threshold = max(max_regression, sigmas * level)
+        if change < -threshold:
+            status = 'REGRESSION'
+        elif change > threshold:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        report.append((name, before, after, change, level, status))
+    return report
+
+
+def format_report(report):
+    """Format a comparison report as a table."""
+    lines = ['%-20s %12s %12s %9s %7s  %s' %
+             ('benchmark', 'baseline', 'current', 'change', 'noise',
+              'status')]
+    for name, before, after, change, level, status in report:
+        if before is None:
+            lines.append('%-20s %12s %12.0f %9s %7s  %s' %
+                         (name, '-', after, '-', '-', status))
+        else:
+            lines.append('%-20s %12.0f %12.0f %+8.1f%% %6.1f%%  %s' %
+                         (name, before, after, change, level, status))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog record|compare [options]')
+    parser.add_option('-b', '--baseline', default='bench-baseline.json',
+                      help='JSON baseline file [%default]')
+    parser.add_option('-s', '--select', default=','.join(sorted(BENCHMARKS)),
+                      help='benchmarks to run [%default]')
+    parser.add_option('-r', '--repeat', type='int', default=5,
+                      help='samples of every benchmark [%default]')
+    parser.add_option('--scale', type='float', default=1.0,
+                      help='factor of the number of records [%default]')
+    parser.add_option('--max-regression', type='float', default=5.0,
+                      help='allowed slowdown in percent [%default]')
+    parser.add_option('--sigmas', type='float', default=3.0,
+                      help='noise multiplier of the threshold [%default]')
+    options, args = parser.parse_args(argv)
+    if len(args) != 1 or args[0] not in ('record', 'compare'):
+        parser.error('record or compare expected')
+
+    names = [name for name in options.select.split(',') if name]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error('unknown benchmarks: %s' % ', '.join(unknown))
+
+    samples = run(names, options.repeat, options.scale, sys.stdout)
+    if args[0] == 'record':
+        with open(options.baseline, 'w') as output:
+            json.dump({'meta': bench.meta(), 'scale': options.scale,
+                       'samples': samples}, output, indent=1,
+                      sort_keys=True)
+        print 'Baseline written in %s' % options.baseline
+        return 0
+
+    with open(options.baseline) as input_:
+        baseline = json.load(input_)
+    if baseline.get('scale', 1.0) != options.scale:
+        parser.error('the baseline was recorded with --scale %s' %
+                     baseline.get('scale', 1.0))
+    report = compare(baseline['samples'], samples, options.max_regression,
+                     options.sigmas)
+    print
+    print format_report(report)
+    regressions = [row[0] for row in report if row[-1] == 'REGRESSION']
+    if regressions:
+        print
+        print 'Throughput regressed more than %.1f%%: %s' % \
+            (options.max_regression, ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,28 @@
 # -*- coding: utf-8 -*-
 # Tokyo Cabinet Python ctypes binding.
 
-import hdb
-import bdb
-import fdb
-import tdb
-import adb
+import sys
+import types
+
 from tc import __version__
 
 
+# Submodules imported on demand, to reduce the import time.
+_SUBMODULES = ('hdb', 'bdb', 'fdb', 'tdb', 'adb', 'mdb', 'ndb', 'dumper')
+
+
+class _Package(types.ModuleType):
+    """The tcdb package, that imports a submodule on the first access
+    to it.  Python 2 modules have no module-level __getattr__."""
+    def __getattr__(self, name):
+        if name not in _SUBMODULES:
+            raise AttributeError(name)
+        fullname = '%s.%s' % (self.__name__, name)
+        __import__(fullname)
+        # The import sets the real module in the package namespace.
+        return sys.modules[fullname]
+
+
 # enumeration for error codes
 ESUCCESS = 0                    # success
 ETHREAD  = 1                    # threading error
@@ -38,54 +52,81 @@ EMISC    = 9999                 # miscellaneous error
 
 def adbopen(path, **kwargs):
     """Simple ADB class constructor."""
+    import adb
     db = adb.ADB()
     db.open(path, **kwargs)
     return db
 
 def adbsimpleopen(path, **kwargs):
     """Simple ADBSimple class constructor."""
+    import adb
     db = adb.ADBSimple()
     db.open(path, **kwargs)
     return db
 
 def hdbopen(path, **kwargs):
     """Simple HDB class constructor."""
+    import hdb
     db = hdb.HDB()
     db.open(path, **kwargs)
     return db
 
 def hdbsimpleopen(path, **kwargs):
     """Simple HDBSimple class constructor."""
+    import hdb
     db = hdb.HDBSimple()
     db.open(path, **kwargs)
     return db
 
 def bdbopen(path, **kwargs):
     """Simple BDB class constructor."""
+    import bdb
     db = bdb.BDB()
     db.open(path, **kwargs)
     return db
 
 def bdbsimpleopen(path, **kwargs):
     """Simple BDBSimple class constructor."""
+    import bdb
     db = bdb.BDBSimple()
     db.open(path, **kwargs)
     return db
 
 def fdbopen(path, **kwargs):
     """Simple FDB class constructor."""
+    import fdb
     db = fdb.FDB()
     db.open(path, **kwargs)
     return db
 
 def fdbsimpleopen(path, **kwargs):
     """Simple FDB class constructor."""
+    import fdb
     db = fdb.FDBSimple()
     db.open(path, **kwargs)
     return db
 
 def tdbopen(path, **kwargs):
     """Simple TDB class constructor."""
+    import tdb
     db = tdb.TDB()
     db.open(path, **kwargs)
     return db
+
+def dump(db, fileobj, **kwargs):
+    """Write the records of a database object into a file object."""
+    import dumper
+    return dumper.dump(db, fileobj, **kwargs)
+
+def restore(fileobj, db, **kwargs):
+    """Store the records of a dump into a database object."""
+    import dumper
+    return dumper.restore(fileobj, db, **kwargs)
+
+
+# The package is replaced by a _Package with the same namespace.  The
+# original module is kept, it holds the globals of the functions.
+_package = _Package(__name__, __doc__)
+_package.__dict__.update(globals())
+_package._module = sys.modules[__name__]
+sys.modules[__name__] = _package
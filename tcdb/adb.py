@@ -28,6 +28,8 @@ True
 
 import ctypes
 
+import forksafe
+import layout
 import tc
 import util
 
@@ -43,6 +45,34 @@ OTDB  = 6                     # table database
 OSKEL = 7                     # skeleton database
 
 
+def _notrunc(name):
+    """Remove the truncation flag from the mode of a database name."""
+    params = name.split('#')
+    for i, param in enumerate(params[1:], 1):
+        if param.startswith('mode='):
+            params[i] = param.replace('t', '')
+    return '#'.join(params)
+
+
+def _child_name(name, mode=None):
+    """Get the name of a database in a child process: the mode letters
+    are replaced by mode if it is not None, and the lock does not
+    block."""
+    params = name.split('#')
+    for i, param in enumerate(params[1:], 1):
+        if param.startswith('mode='):
+            if mode is None:
+                mode = param[len('mode='):]
+            del params[i]
+            break
+    if mode is None:
+        mode = 'wc'
+    if 'e' not in mode and 'f' not in mode:
+        mode += 'f'
+    params.append('mode=' + mode)
+    return '#'.join(params)
+
+
 class ADBSimple(object):
     def __init__(self):
         """Create an abstract database object."""
@@ -50,20 +80,37 @@ class ADBSimple(object):
 
     def __del__(self):
         """Delete an abstract database object."""
-        tc.adb_del(self.db)
+        if not forksafe.is_stale(self):
+            tc.adb_del(self.db)
 
     def open(self, name):
         """Open an abstract database."""
         if not tc.adb_open(self.db, name):
             self._raise('Error opening abstract database [%s]'%name)
+        if not name.startswith(('*', '+')):
+            # On-memory databases are copied by the fork.
+            self._open_args = (_notrunc(name),)
+            forksafe.register(self)
 
     def close(self):
         """Close an abstract database object."""
+        if forksafe.forget(self):
+            # Opened before a fork, the parent process owns it.
+            self.db = tc.adb_new()
+            return True
         result = tc.adb_close(self.db)
         if not result:
             self._raise('Error closing abstract database')
         return result
 
+    def _reopen(self):
+        """Open an abstract database object again in a forked child
+        process, with the name of its open() call and a non-blocking
+        lock."""
+        self.db = tc.adb_new()
+        self.open(_child_name(self._open_args[0],
+                              getattr(self, '_child_omode', None)))
+
     def __setitem__(self, key, value):
         """Store any Python object into an abstract database object."""
         return self.put(key, value)
@@ -279,15 +326,101 @@ class ADBSimple(object):
                             'abstract database object.')
         return result
 
-    def misc(self, name, args):
-        """"Call a versatile function for miscellaneous operations of
-        an abstract database object."""
-        tclist_objs = tc.adb_misc(self.db, name, args)
+    def _misc(self, name, tclist_args):
+        """Call a versatile function with a TCLIST of arguments.
+        Return the TCLIST of the result."""
+        tclist_objs = tc.adb_misc(self.db, name, tclist_args)
         if not tclist_objs:
             self._raise('Error calling a versatile function for ' \
                             'miscellaneous operations of an abstract ' \
                             'database object.')
-        return util.deserialize_objs(tclist_objs)
+        return tclist_objs
+
+    def misc(self, name, args=()):
+        """Call a versatile function for miscellaneous operations of
+        an abstract database object.  args is a sequence of strings,
+        and the result is a list of strings."""
+        tclist_args = util.serialize_tclist(list(args), as_raw=True)
+        return util.deserialize_tclist(self._misc(name, tclist_args), str)
+
+    def putlist(self, pairs):
+        """Store string records, a mapping or a sequence of key /
+        value pairs, into an abstract database object."""
+        if hasattr(pairs, 'iteritems'):
+            pairs = pairs.iteritems()
+        args = []
+        for key, value in pairs:
+            args.append(key)
+            args.append(value)
+        self.misc('putlist', args)
+        return True
+
+    def outlist(self, keys):
+        """Remove string records of an abstract database object.
+        Missing keys are ignored."""
+        self.misc('outlist', keys)
+        return True
+
+    def getlist(self, keys):
+        """Retrieve string records in an abstract database object.
+        Return a dictionary without the missing keys."""
+        result = self.misc('getlist', keys)
+        return dict(zip(result[::2], result[1::2]))
+
+    def _tdbmisc(self, name, args):
+        """Call a versatile function of the table database behind an
+        abstract database object."""
+        if self.omode() != OTDB:
+            raise tc.TCException('%s needs a table database' % name)
+        return self.misc(name, args)
+
+    def setindex(self, name, type_):
+        """Set a column index of the table database of an abstract
+        database object.  type_ is one of the IT* constants of tdb."""
+        self._tdbmisc('setindex', [name, str(type_)])
+        return True
+
+    def _query(self, conds, order=None, limit=-1, skip=0):
+        """Build the arguments of a search of a table database."""
+        args = ['addcond\0%s\0%d\0%s' % cond for cond in conds]
+        if order is not None:
+            args.append('setorder\0%s\0%d' % order)
+        if limit >= 0 or skip:
+            args.append('setlimit\0%d\0%d' % (limit, skip))
+        return args
+
+    def search(self, conds=(), order=None, limit=-1, skip=0, columns=None):
+        """Search the table database of an abstract database object.
+        conds is a sequence of (column, op, expr) conditions with the
+        QC* operators of tdb, and order is a (column, type) pair with a
+        QO* type.  Return the list of primary keys or, if columns is
+        True or a list of column names, a list of (primary key,
+        columns) pairs."""
+        args = self._query(conds, order, limit, skip)
+        if not columns:
+            return self._tdbmisc('search', args)
+        names = [] if columns is True else list(columns)
+        args.append('\0'.join(['get'] + names))
+        result = []
+        for row in self._tdbmisc('search', args):
+            # A row is '\0pkey\0name\0value...', the primary key in
+            # the column of empty name.
+            tokens = row.split('\0')
+            cols = dict(zip(tokens[2::2], tokens[3::2]))
+            result.append((tokens[1], cols))
+        return result
+
+    def searchout(self, conds=()):
+        """Remove the records of the table database of an abstract
+        database object that meet the conditions."""
+        self._tdbmisc('search', self._query(conds) + ['out'])
+        return True
+
+    def searchcount(self, conds=()):
+        """Get the number of records of the table database of an
+        abstract database object that meet the conditions."""
+        return int(self._tdbmisc('search', self._query(conds) +
+                                 ['count'])[0])
 
     def omode(self):
         """Get the open mode of an abstract database object."""
@@ -298,6 +431,24 @@ class ADBSimple(object):
         object."""
         return tc.adb_reveal(self.db)
 
+    def metrics(self, sample=64):
+        """Get a snapshot of the layout metrics of the concrete
+        database object of an abstract database object.  On-memory
+        databases only report rnum and size."""
+        mode = self.omode()
+        if mode == OHDB:
+            metrics = layout.hdb_metrics(self.reveal(), sample)
+        elif mode == OBDB:
+            metrics = layout.bdb_metrics(self.reveal(), sample)
+        elif mode == OFDB:
+            metrics = layout.fdb_metrics(self.reveal(), sample)
+        elif mode == OTDB:
+            metrics = layout.tdb_metrics(self.reveal(), sample)
+        else:
+            metrics = {'rnum': tc.adb_rnum(self.db)}
+        metrics['size'] = tc.adb_size(self.db)
+        return metrics
+
     # def putproc(self, key, value, proc, op):
     #     """Store a record into an abstract database object with a
     #     duplication handler."""
@@ -325,11 +476,13 @@ class ADBSimple(object):
 
     def has_key(self, key):
         """Return True if abstract database object has the key."""
-        result = False
-        value = tc.adb_get2(self.db, key)
-        if value:
-            result = True
-        return result
+        return tc.adb_vsiz2(self.db, key) != -1
+
+    def contains_many(self, keys):
+        """Return a bitmap with the bit i set if abstract database
+        object has the i-th key."""
+        vsiz2, db = tc.adb_vsiz2, self.db
+        return util.bitmap(vsiz2(db, key) != -1 for key in keys)
 
     def _raise(self, msg=None):
         """Raise an exception based on the internal database object."""
@@ -591,9 +744,51 @@ class ADB(ADBSimple):
 
     def has_key(self, key, raw_key=False):
         """Return True if abstract database object has the key."""
-        result = False
         (c_key, c_key_len) = util.serialize(key, raw_key)
-        (c_value, _) = tc.adb_get(self.db, c_key, c_key_len)
-        if c_value:
-            result = True
+        return tc.adb_vsiz(self.db, c_key, c_key_len) != -1
+
+    def contains_many(self, keys, raw_key=False):
+        """Return a bitmap with the bit i set if abstract database
+        object has the i-th key."""
+        serialize, vsiz, db = util.serialize, tc.adb_vsiz, self.db
+        return util.bitmap(vsiz(db, *serialize(key, raw_key)) != -1
+                           for key in keys)
+
+    def putlist(self, pairs, raw_key=False, raw_value=False):
+        """Store Python objects, a mapping or a sequence of key / value
+        pairs, into an abstract database object."""
+        if hasattr(pairs, 'iteritems'):
+            pairs = pairs.iteritems()
+        tclist_args = tc.tclistnew()
+        for key, value in pairs:
+            tc.tclistpush(tclist_args, *util.serialize(key, raw_key))
+            tc.tclistpush(tclist_args, *util.serialize(value, raw_value))
+        self._misc('putlist', tclist_args)
+        return True
+
+    def outlist(self, keys, as_raw=False):
+        """Remove Python objects of an abstract database object.
+        Missing keys are ignored."""
+        tclist_args = tc.tclistnew()
+        for key in keys:
+            tc.tclistpush(tclist_args, *util.serialize(key, as_raw))
+        self._misc('outlist', tclist_args)
+        return True
+
+    def getlist(self, keys, raw_key=False, value_type=None):
+        """Retrieve Python objects in an abstract database object.
+        Return a dictionary without the missing keys."""
+        tclist_args = tc.tclistnew()
+        serialized = {}
+        for key in keys:
+            (c_key, c_key_len) = util.serialize(key, raw_key)
+            tc.tclistpush(tclist_args, c_key, c_key_len)
+            serialized[ctypes.string_at(c_key, c_key_len)] = key
+        tclist_objs = self._misc('getlist', tclist_args)
+        result = {}
+        for index in xrange(0, tc.tclistnum(tclist_objs) - 1, 2):
+            (c_key, c_key_len) = tc.tclistval(tclist_objs, index)
+            (c_value, c_value_len) = tc.tclistval(tclist_objs, index + 1)
+            key = serialized[ctypes.string_at(c_key, c_key_len)]
+            result[key] = util.deserialize(c_value, c_value_len, value_type)
         return result
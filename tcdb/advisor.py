@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Tuning advisor for hash, B+ tree and table database objects.
+
+The advisor samples an existing database (number of records, size of
+keys and values, file size and, if the object is instrumented with the
+stats module, the access pattern) and proposes the parameters of
+open() that minimize the bucket collisions and the page cache misses.
+
+The layout parameters (bnum, apow, fpow, opts, and lmemb and nmemb for
+B+ tree databases) can be applied at once with optimize().  The
+caching parameters (rcnum, lcnum, ncnum, xmsiz) are only used when the
+database is opened, so they are returned for the next open().
+
+>>> from tcdb import hdb
+>>> from tcdb import advisor
+
+>>> db = hdb.HDB()
+>>> db.open('casket.tch')
+>>> db.put("foo", "hop")
+True
+
+>>> params = advisor.advise(db)
+>>> report = advisor.apply_params(db, params)
+>>> report['after']['gets_per_sec'] > 0
+True
+
+>>> db.close()
+>>> db.open('casket.tch', **advisor.open_params(params))
+
+"""
+
+import math
+import os
+import random
+import time
+
+import bdb
+import hdb
+import tc
+import tdb
+import util
+
+
+# Sizes used by the advisor, in bytes.
+MEGA = 1 << 20
+LARGEFSIZ = 1 << 31           # files bigger than that need TLARGE
+PAGESIZ = 1 << 15             # target size of a B+ tree leaf node
+RECHEADSIZ = 16               # approximate size of a record header
+DEFMEMORY = 1 << 30           # memory budget if the system hides it
+
+# Parameters applied with optimize, the rest are used in open.
+LAYOUT = ('lmemb', 'nmemb', 'bnum', 'apow', 'fpow', 'opts')
+
+
+def _functions(db):
+    """Get the fwmkeys, vsiz and get functions of a database
+    object."""
+    if isinstance(db, hdb.HDBSimple):
+        return tc.hdb_fwmkeys2, tc.hdb_vsiz, tc.hdb_get
+    elif isinstance(db, bdb.BDBSimple):
+        return tc.bdb_fwmkeys2, tc.bdb_vsiz, tc.bdb_get
+    elif isinstance(db, tdb.TDB):
+        return tc.tdb_fwmkeys2, tc.tdb_vsiz, tc.tdb_get
+    raise tc.TCException('Advisor only supports HDB, BDB and TDB objects.')
+
+
+def _percentile(values, percent):
+    """Get a percentile of a sorted list of values."""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def _pow2(value):
+    """Get the exponent of the power of 2 nearest to value."""
+    return int(round(math.log(max(value, 1), 2)))
+
+
+def memory():
+    """Get the size of the physical memory of the system."""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return DEFMEMORY
+
+
+def sample(db, size=1000):
+    """Get the raw keys of the first size records and the
+    distribution of the sizes of the keys and values."""
+    fwmkeys, vsiz, _ = _functions(db)
+    keys = util.deserialize_tclist(fwmkeys(db.db, '', size), str)
+    ksizes = sorted(len(key) for key in keys)
+    vsizes = sorted(size for size in (vsiz(db.db, key, len(key))
+                                      for key in keys) if size >= 0)
+    distribution = {'count': len(keys)}
+    for name, sizes in (('key', ksizes), ('value', vsizes)):
+        distribution[name] = {
+            'avg': float(sum(sizes)) / len(sizes) if sizes else 0.0,
+            'p50': _percentile(sizes, 50),
+            'p90': _percentile(sizes, 90),
+            'max': sizes[-1] if sizes else 0,
+            }
+    return keys, distribution
+
+
+def _read_ratio(report):
+    """Get the ratio of reads in a report of the stats module."""
+    if not report:
+        return 0.5
+    calls = dict((name, op['calls']) for name, op in report.items())
+    reads = sum(calls.get(name, 0) for name in ('get', 'getdup', 'vsiz',
+                                                'has_key', 'range'))
+    total = sum(calls.values())
+    return float(reads) / total if total else 0.5
+
+
+def advise(db, growth=2.0, memory_budget=None, report=None):
+    """Propose the tuning parameters of a database object.  growth is
+    the expected growth factor of the number of records, and
+    memory_budget the bytes that can be used for caches and the mapped
+    region (half of the physical memory by default).  report is a
+    report of the stats module; if not given and the database object
+    is instrumented, db.stats() is used."""
+    if memory_budget is None:
+        memory_budget = memory() // 2
+    if report is None and hasattr(db, 'stats'):
+        report = db.stats()
+    _, distribution = sample(db)
+    metrics = db.metrics()
+
+    rnum = max(metrics['rnum'], 1)
+    expected = int(rnum * growth)
+    record_size = distribution['key']['avg'] + \
+        distribution['value']['avg'] + RECHEADSIZ
+    # Expected size of the file.
+    fsiz = int(max(metrics['fsiz'] * growth, expected * record_size))
+    read_ratio = _read_ratio(report)
+
+    params = {}
+    params['opts'] = db.opts()
+    if fsiz >= LARGEFSIZ:
+        params['opts'] |= hdb.TLARGE
+    # The mapped region should cover the whole file if possible.
+    # Rounded up to a megabyte, but within half of the budget.
+    xmsiz = int(min(fsiz, memory_budget // 2))
+    xmsiz = (xmsiz + MEGA - 1) // MEGA * MEGA
+    params['xmsiz'] = int(min(xmsiz, memory_budget // 2))
+    cache = memory_budget - params['xmsiz']
+
+    if isinstance(db, bdb.BDBSimple):
+        # Leaf nodes of about PAGESIZ bytes.
+        lmemb = int(PAGESIZ / record_size)
+        params['lmemb'] = max(32, min(lmemb, 1024))
+        params['nmemb'] = max(128, min(params['lmemb'] * 2, 2048))
+        leaves = expected // params['lmemb'] + 1
+        params['bnum'] = max(leaves * 2, 32749)
+        params['apow'] = 8
+        params['fpow'] = 10
+        params['lcnum'] = int(max(1024, min(leaves, cache // PAGESIZ)))
+        params['ncnum'] = int(max(512, params['lcnum'] // 2))
+    else:
+        # Between 1 and 2 records per bucket.
+        params['bnum'] = max(int(expected * 2), 131071)
+        # Padding is at most a quarter of the record.
+        params['apow'] = max(2, min(_pow2(record_size / 4.0), 10))
+        # Updates and removals fill the free block pool.
+        fragmentation = metrics.get('fragmentation', 1.0)
+        params['fpow'] = 12 if read_ratio < 0.5 or fragmentation > 1.5 \
+            else 10
+        # The record cache only pays with read heavy workloads.
+        if read_ratio >= 0.5:
+            params['rcnum'] = int(min(expected, cache // 2 // record_size))
+        else:
+            params['rcnum'] = 0
+        if isinstance(db, tdb.TDB):
+            params['lcnum'] = 4096
+            params['ncnum'] = 512
+
+    params['_sample'] = distribution
+    params['_metrics'] = metrics
+    params['_read_ratio'] = read_ratio
+    return params
+
+
+def open_params(params):
+    """Get the keyword arguments of open() from the proposed
+    parameters."""
+    return dict((name, value) for name, value in params.iteritems()
+                if not name.startswith('_'))
+
+
+def benchmark(db, keys, num=10000):
+    """Measure random reads of a list of raw keys."""
+    _, _, get = _functions(db)
+    if not keys:
+        return {'gets': 0, 'gets_per_sec': 0.0, 'avg_latency': 0.0}
+    rand = random.Random(0)
+    picks = [rand.choice(keys) for _ in xrange(num)]
+    start = time.time()
+    for key in picks:
+        get(db.db, key, len(key))
+    elapsed = time.time() - start
+    return {
+        'gets': num,
+        'gets_per_sec': num / elapsed if elapsed else 0.0,
+        'avg_latency': elapsed / num,
+        }
+
+
+def apply_params(db, params, num=10000):
+    """Apply the layout parameters with optimize() and return a
+    report with the benchmark and the metrics before and after."""
+    keys, _ = sample(db)
+    before = benchmark(db, keys, num)
+    before_metrics = db.metrics()
+
+    kwargs = dict((name, params[name]) for name in LAYOUT if name in params)
+    start = time.time()
+    db.optimize(**kwargs)
+    elapsed = time.time() - start
+
+    after = benchmark(db, keys, num)
+    after_metrics = db.metrics()
+    return {
+        'params': kwargs,
+        'optimize_time': elapsed,
+        'before': before,
+        'after': after,
+        'fsiz_before': before_metrics['fsiz'],
+        'fsiz_after': after_metrics['fsiz'],
+        'metrics_before': before_metrics,
+        'metrics_after': after_metrics,
+        }
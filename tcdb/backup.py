@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Online backup of hash, B+ tree, fixed-length and table database
+objects, while other threads keep writing.
+
+HDB.copy, BDB.copy and TDB.copy block the writers during the whole
+copy of the file.  backup() copies the records instead, through the
+iterator of the database, into a new file with the same tuning, in
+transactions of about chunk bytes and at most rate bytes per second.
+The writes made meanwhile are captured by an update log (see
+tcdb.changelog), the one already attached to the database object or a
+temporary journal, and replayed into the copy.  The writers are only
+paused during the last replay, so the copy is a consistent snapshot.
+
+The copy is verified at the end: its number of records must be the one
+of the database at the snapshot, and its records must match the
+checksum computed while they were written.
+
+>>> from tcdb import backup
+>>> from tcdb import hdb
+
+>>> db = hdb.HDB()
+>>> db.setmutex()
+True
+>>> db.open('casket.tch')
+>>> report = backup.backup(db, 'casket.tch.bak', rate=50 << 20)
+>>> report['records']
+3
+
+"""
+
+import ctypes
+import os
+import struct
+import time
+import zlib
+
+import changelog
+import codec
+import dumper
+import hdb
+import tc
+
+
+def _crc(key, value):
+    """Get the checksum of a record."""
+    return zlib.crc32(value, zlib.crc32(struct.pack('>I', len(key)) + key)) \
+        & 0xffffffff
+
+
+def checksum(db):
+    """Get the number of records of a database object and the sum of
+    the CRC-32 checksums of the records, that does not depend on their
+    order.  The duplicated values of a B+ tree key are records."""
+    (dbtype, _) = dumper._dbtype(db)
+    count = total = 0
+    for _, key, value in dumper.RECORDS[dbtype](db):
+        count += 1
+        total += _crc(key, value)
+    return (count, total & 0xffffffffffffffff)
+
+
+def _values(dbtype, db, key):
+    """Get the values of the records of a key, as written in a dump."""
+    if dbtype == dumper.TYPEBDB:
+        tclist_values = tc.bdb_get4(db.db, key, len(key))
+        if not tclist_values:
+            return []
+        values = []
+        for index in xrange(tc.tclistnum(tclist_values)):
+            (c_value, c_value_len) = tc.tclistval(tclist_values, index)
+            values.append(ctypes.string_at(c_value, c_value_len))
+        return values
+    elif dbtype == dumper.TYPETDB:
+        cols = tc.tdb_get(db.db, key, len(key))
+        if not cols:
+            return []
+        (c_data, c_data_len) = tc.tcmapdump(cols)
+        return [ctypes.string_at(c_data, c_data_len)]
+    elif dbtype == dumper.TYPEFDB:
+        (c_value, c_value_len) = tc.fdb_get(db.db, int(key))
+    else:
+        (c_value, c_value_len) = tc.hdb_get(db.db, key, len(key))
+    if not c_value:
+        return []
+    return [ctypes.string_at(c_value, c_value_len)]
+
+
+def _create(db, path, omode):
+    """Open a database file like a database object: same class,
+    tuning, comparison function and codec.  The open modes are the
+    same for every database type."""
+    args = getattr(db, '_open_args', None)
+    if args is None:
+        raise tc.TCException('The database object is not open')
+    (_, prefix) = dumper._dbtype(db)
+    copy = type(db)()
+    if getattr(db, '_cmpfunc', None):
+        copy._cmpfunc = db._cmpfunc
+        tc.bdb_setcmpfunc(copy.db, *db._cmpfunc)
+    if getattr(db, '_codec', None):
+        copy.setcodec(db._codec)
+    elif getattr(db, '_codecfunc', None):
+        copy._codecfunc = db._codecfunc
+        getattr(tc, prefix + '_setcodecfunc')(copy.db, *db._codecfunc)
+    copy.open(path, omode, *args[2:])
+    return copy
+
+
+class _Backup(object):
+    """Copy of a database object being written."""
+    def __init__(self, db, copy, log, rate, chunk, progress):
+        (self.dbtype, prefix) = dumper._dbtype(db)
+        for name in ('tranbegin', 'trancommit', 'tranabort', 'rnum',
+                     'errmsg', 'ecode'):
+            setattr(self, name, getattr(tc, '%s_%s' % (prefix, name)))
+        self.db = db
+        self.copy = copy
+        self.log = log
+        self.rate = rate
+        self.chunk = chunk
+        self.progress = progress
+        self.count = 0
+        self.checksum = 0
+        self.size = 0
+        self.seq = log.seq
+        self.offset = None
+        self.start = time.time()
+
+    def _check(self, result):
+        """Raise the last error of the copy if result is false."""
+        if not result:
+            raise tc.TCException(self.errmsg(self.ecode(self.copy.db)))
+
+    def _commit(self):
+        """Commit the running transaction of the copy, and wait if it
+        goes faster than the rate."""
+        self._check(self.trancommit(self.copy.db))
+        if self.rate:
+            delay = self.size / float(self.rate) - (time.time() - self.start)
+            if delay > 0:
+                time.sleep(delay)
+
+    def copy_records(self):
+        """Copy the records of the database, in transactions of chunk
+        bytes."""
+        total = self.rnum(self.db.db)
+        size, last_key = 0, None
+        self._check(self.tranbegin(self.copy.db))
+        try:
+            for kind, key, value in dumper.RECORDS[self.dbtype](self.db):
+                self._check(dumper._put(self.dbtype, self.copy, kind, key,
+                                        value, last_key))
+                last_key = key
+                self.count += 1
+                self.checksum += _crc(key, value)
+                size += dumper.RECORD.size + len(key) + len(value)
+                if size >= self.chunk:
+                    self.size += size
+                    size = 0
+                    self._commit()
+                    if self.progress:
+                        self.progress(self.count, total)
+                    self._check(self.tranbegin(self.copy.db))
+            self.size += size
+            self._commit()
+        except:
+            self.tranabort(self.copy.db)
+            raise
+        if self.progress:
+            self.progress(self.count, total)
+
+    def replay(self):
+        """Apply the entries of the update log written since the
+        copy began.  Return the number of entries applied."""
+        applied = 0
+        if self.offset is None:
+            self.offset = self.log._offset(self.seq)
+        self._check(self.tranbegin(self.copy.db))
+        try:
+            for end, entry in self.log._entries(self.offset):
+                (seq, op, kind, key, value) = entry
+                self.offset = end
+                if seq <= self.seq:
+                    continue
+                if op == changelog.OPVANISH:
+                    self.count = self.checksum = 0
+                else:
+                    for old in _values(self.dbtype, self.copy, key):
+                        self.count -= 1
+                        self.checksum -= _crc(key, old)
+                self._check(changelog._apply(self.dbtype, self.copy, op,
+                                             kind, key, value))
+                if op != changelog.OPVANISH:
+                    for new in _values(self.dbtype, self.copy, key):
+                        self.count += 1
+                        self.checksum += _crc(key, new)
+                self.seq = seq
+                applied += 1
+            self._check(self.trancommit(self.copy.db))
+        except:
+            self.tranabort(self.copy.db)
+            raise
+        return applied
+
+
+def backup(db, path, rate=None, chunk=1 << 20, progress=None, verify=True,
+           lag=100):
+    """Copy a database object into the file path while it is written.
+    rate limits the copy to a number of bytes per second, chunk is the
+    size of the transactions of the copy, and progress is an optional
+    function that gets the number of records copied and the number of
+    records of the database.  The changes are replayed until less than
+    lag remain, then the writers are blocked for the last ones.  If
+    verify is True, the copy is read again and checked.  Return a
+    dictionary with the number of records, their checksum, the last
+    sequence number of the update log replayed and the elapsed time."""
+    logger = getattr(db, '_changelog', None)
+    if logger:
+        journal = None
+    else:
+        journal = path + '.journal'
+        changelog.attach(db, changelog.ChangeLog(journal))
+        logger = db._changelog
+    log = logger.log
+
+    try:
+        copy = _create(db, path, hdb.OWRITER | hdb.OCREAT | hdb.OTRUNC)
+        state = _Backup(db, copy, log, rate, chunk, progress)
+        state.copy_records()
+        while state.replay() >= lag:
+            pass
+
+        # The snapshot: the gate waits for the running transactions
+        # and pauses the writers.  A transaction of the database would
+        # take the writes of every thread, so none is opened.
+        with logger.gate:
+            rnum = state.rnum(db.db)
+            state.replay()
+        if isinstance(getattr(db, '_codec', None), codec.DictCodec):
+            copy._savedict()
+        copy.close()
+    finally:
+        if journal:
+            changelog.detach(db)
+            log.close()
+            os.remove(journal)
+
+    report = {
+        'records': state.count,
+        'checksum': state.checksum & 0xffffffffffffffff,
+        'seq': state.seq,
+        'elapsed': time.time() - state.start,
+        }
+    if verify:
+        copy = _create(db, path, hdb.OREADER)
+        try:
+            if state.rnum(copy.db) != rnum:
+                raise tc.TCException('Backup has %d records instead of %d'
+                                     % (state.rnum(copy.db), rnum))
+            if checksum(copy) != (report['records'], report['checksum']):
+                raise tc.TCException('Invalid checksum in backup')
+        finally:
+            copy.close()
+    return report
+
@@ -29,6 +29,9 @@ True
 import ctypes
 import datetime
 
+import codec
+import forksafe
+import layout
 import tc
 import util
 
@@ -254,11 +257,13 @@ class BDBSimple(object):
 
     def __del__(self):
         """Delete a B+ tree database object."""
-        tc.bdb_del(self.db)
+        if not forksafe.is_stale(self):
+            tc.bdb_del(self.db)
 
     def setmutex(self):
         """Set mutual exclusion control of a B+ tree database object
         for threading."""
+        self._mutex = True
         return tc.bdb_setmutex(self.db)
 
     def setcmpfunc(self, cmp_, cmpop):
@@ -281,9 +286,10 @@ class BDBSimple(object):
             'tccmpint64': tc.tccmpint64
             }
         if cmp_ in native:
-            result = tc.bdb_setcmpfunc(self.db, native[cmp_], cmpop)
+            self._cmpfunc = (native[cmp_], cmpop)
         else:
-            result = tc.bdb_setcmpfunc(self.db, tc.TCCMP(cmp_wraper), cmpop)
+            self._cmpfunc = (tc.TCCMP(cmp_wraper), cmpop)
+        result = tc.bdb_setcmpfunc(self.db, *self._cmpfunc)
         if not result:
             raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.db)))
         return result
@@ -307,7 +313,8 @@ class BDBSimple(object):
         database object."""
         result = tc.bdb_setxmsiz(self.db, xmsiz)
         if not result:
-            raise tc.TCException(tc.tdb_errmsg(tc.tdb_ecode(self.db)))
+            raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.db)))
+        self._xmsiz = xmsiz
         return result
 
     def setdfunit(self, dfunit=0):
@@ -332,14 +339,34 @@ class BDBSimple(object):
 
         if not tc.bdb_open(self.db, path, omode):
             raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.db)))
+        self._open_args = (path, omode & ~OTRUNC, lmemb, nmemb, bnum, apow,
+                           fpow, opts, lcnum, ncnum, xmsiz, dfunit)
+        forksafe.register(self)
 
     def close(self):
         """Close a B+ tree database object."""
+        if forksafe.forget(self):
+            # Opened before a fork, the parent process owns it.
+            self.db = tc.bdb_new()
+            return True
         result = tc.bdb_close(self.db)
         if not result:
             raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.db)))
         return result
 
+    def _reopen(self):
+        """Open a B+ tree database object again in a forked child
+        process, with the parameters of its open() call and a
+        non-blocking lock."""
+        self.db = tc.bdb_new()
+        if getattr(self, '_mutex', False):
+            tc.bdb_setmutex(self.db)
+        if getattr(self, '_cmpfunc', None):
+            tc.bdb_setcmpfunc(self.db, *self._cmpfunc)
+        if getattr(self, '_codecfunc', None):
+            tc.bdb_setcodecfunc(self.db, *self._codecfunc)
+        self.open(*forksafe.child_args(self))
+
     def __setitem__(self, key, value):
         """Store any Python object into a B+ tree database object."""
         return self.put(key, value)
@@ -381,6 +408,29 @@ class BDBSimple(object):
             raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.db)))
         return result
 
+    def _putdup_many(self, items, raw_key, raw_value):
+        """Store the values of many keys, in the order of the raw keys
+        for the locality of the leaves."""
+        if isinstance(items, dict):
+            items = items.iteritems()
+        records = []
+        for key, values in items:
+            (c_key, c_key_len) = util.serialize(key, raw_key)
+            records.append((ctypes.string_at(c_key, c_key_len), values))
+        if not getattr(self, '_cmpfunc', None):
+            records.sort(key=lambda record: record[0])
+        for key, values in records:
+            tclist_vals = util.serialize_tclist(values, raw_value)
+            if not tc.bdb_putdup3(self.db, key, len(key), tclist_vals):
+                raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.db)))
+        return len(records)
+
+    def putdup_many(self, items):
+        """Store the values of many keys into a B+ tree database object
+        with allowing duplication of keys.  items is a dictionary or a
+        sequence of (key, values) pairs.  Return the number of keys."""
+        return self._putdup_many(items, True, True)
+
     def __delitem__(self, key):
         """Remove a string record of a B+ tree database object."""
         return self.out(key)
@@ -419,9 +469,17 @@ class BDBSimple(object):
             value = default
         return value
 
-    def getdup(self, key, default=None):
-        """Retrieve Python objects in a B+ tree database object."""
+    def getdup(self, key, default=None, offset=0, limit=None):
+        """Retrieve Python objects in a B+ tree database object.  With
+        offset or limit, only a page of limit values from offset is
+        read, with a cursor."""
         (c_key, c_key_len) = util.serialize(key, True)
+        if offset or limit is not None:
+            if not tc.bdb_vnum(self.db, c_key, c_key_len):
+                return default
+            return [ctypes.string_at(c_value, c_value_len)
+                    for c_value, c_value_len
+                    in self._iterdup(c_key, c_key_len, offset, limit)]
         tclist_objs = tc.bdb_get4(self.db, c_key, c_key_len)
         if tclist_objs:
             value = util.deserialize_tclist(tclist_objs, str)
@@ -429,6 +487,41 @@ class BDBSimple(object):
             value = default
         return value
 
+    def _iterdup(self, c_key, c_key_len, offset=0, limit=None):
+        """Iterate for the values (region and size) of a serialized key
+        in a B+ tree database object, with a cursor."""
+        if limit is not None and limit <= 0:
+            return
+        if offset and offset >= tc.bdb_vnum(self.db, c_key, c_key_len):
+            return
+        key = ctypes.string_at(c_key, c_key_len)
+        cur = tc.bdb_curnew(self.db)
+        try:
+            moved = tc.bdb_curjump(cur, c_key, c_key_len)
+            # The skipped values are not read.
+            for _ in xrange(offset):
+                if not moved:
+                    return
+                moved = tc.bdb_curnext(cur)
+            count = 0
+            while moved and (limit is None or count < limit):
+                (c_cur_key, c_cur_key_len) = tc.bdb_curkey3(cur)
+                if not c_cur_key or \
+                        ctypes.string_at(c_cur_key, c_cur_key_len) != key:
+                    return
+                yield tc.bdb_curval(cur)
+                count += 1
+                moved = tc.bdb_curnext(cur)
+        finally:
+            tc.bdb_curdel(cur)
+
+    def iterdup(self, key):
+        """Iterate for the string values of a key in a B+ tree database
+        object, reading them one by one."""
+        (c_key, c_key_len) = util.serialize(key, True)
+        for c_value, c_value_len in self._iterdup(c_key, c_key_len):
+            yield ctypes.string_at(c_value, c_value_len)
+
     def vnum(self, key):
         """Get the number of records corresponding a key in a B+ tree
         database object."""
@@ -695,6 +788,18 @@ class BDBSimple(object):
         tree database object."""
         return tc.bdb_bnumused(self.db)
 
+    def nmemb(self):
+        """Get the maximum number of cached non-leaf nodes of a B+
+        tree database object."""
+        return tc.bdb_nmemb(self.db)
+
+    def metrics(self, sample=64):
+        """Get a snapshot of the layout metrics of a B+ tree database
+        object.  The average record size is estimated from the first
+        sample records."""
+        return layout.bdb_metrics(self.db, sample,
+                                  getattr(self, '_xmsiz', 0))
+
     def setlsmax(self, lsmax):
         """Set the maximum size of each leaf node."""
         result = tc.bdb_setlsmax(self.db, lsmax)
@@ -709,14 +814,23 @@ class BDBSimple(object):
             raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.db)))
         return result
 
-    # def setcodecfunc(self, enc, encop, dec, decop):
-    #     """Set the custom codec functions of a B+ tree database
-    #     object."""
-    #     result = tc.bdb_setcodecfunc(self.db, TCCODEC(enc), encop,
-    #                                  TCCODEC(dec), decop)
-    #     if not result:
-    #         raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.db)))
-    #     return result
+    def setcodecfunc(self, enc, encop, dec, decop):
+        """Set the custom codec functions of a B+ tree database object.
+        enc and dec get a string and encop or decop, and return a
+        string."""
+        self._codecfunc = (codec.tccodec(enc), encop, codec.tccodec(dec),
+                           decop)
+        result = tc.bdb_setcodecfunc(self.db, *self._codecfunc)
+        if not result:
+            raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.db)))
+        return result
+
+    def setcodec(self, codec_='zlib', **kwargs):
+        """Set a codec object, or the name of a registered codec, as
+        the custom codec of a B+ tree database object.  The default is
+        zlib at level 1, the fastest."""
+        codec_ = codec.get(codec_, **kwargs)
+        return self.setcodecfunc(codec_.encode, None, codec_.decode, None)
 
     def dfunit(self):
         """Get the unit step number of auto defragmentation of a B+
@@ -772,18 +886,13 @@ class BDBSimple(object):
 
     def has_key(self, key):
         """Return True if B+ tree database object has the key."""
-        cursor = CursorSimple(self.db)
-        result = False
-        try:
-            cursor.jump(key)
-        except KeyError:
-            pass
-        else:
-            if cursor.key() == key:
-                result = True
-        finally:
-            cursor.close()
-        return result
+        return tc.bdb_vnum2(self.db, key) > 0
+
+    def contains_many(self, keys):
+        """Return a bitmap with the bit i set if B+ tree database
+        object has the i-th key."""
+        vnum2, db = tc.bdb_vnum2, self.db
+        return util.bitmap(vnum2(db, key) > 0 for key in keys)
 
     def cursor(self):
         """Create a cursor object associated with the B+ tree database
@@ -816,9 +925,10 @@ class BDB(BDBSimple):
             'tccmpint64': tc.tccmpint64
             }
         if cmp_ in native:
-            result = tc.bdb_setcmpfunc(self.db, native[cmp_], cmpop)
+            self._cmpfunc = (native[cmp_], cmpop)
         else:
-            result = tc.bdb_setcmpfunc(self.db, tc.TCCMP(cmp_wraper), cmpop)
+            self._cmpfunc = (tc.TCCMP(cmp_wraper), cmpop)
+        result = tc.bdb_setcmpfunc(self.db, *self._cmpfunc)
         if not result:
             raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.db)))
         return result
@@ -976,6 +1086,12 @@ class BDB(BDBSimple):
             'Value is not a float'
         return self.putdup_iter(key, values, as_raw, True)
 
+    def putdup_many(self, items, raw_key=False, raw_value=False):
+        """Store the values of many keys into a B+ tree database object
+        with allowing duplication of keys.  items is a dictionary or a
+        sequence of (key, values) pairs.  Return the number of keys."""
+        return self._putdup_many(items, raw_key, raw_value)
+
     def out(self, key, as_raw=False):
         """Remove a Python object of a B+ tree database object."""
         (c_key, c_key_len) = util.serialize(key, as_raw)
@@ -1034,14 +1150,31 @@ class BDB(BDBSimple):
             raise KeyError(key)
         return util.deserialize_tclist(tclist_objs, value_type)
 
-    def getdup(self, key, default=None, raw_key=False, value_type=None):
-        """Retrieve Python objects in a B+ tree database object."""
+    def getdup(self, key, default=None, raw_key=False, value_type=None,
+               offset=0, limit=None):
+        """Retrieve Python objects in a B+ tree database object.  With
+        offset or limit, only a page of limit values from offset is
+        read, with a cursor."""
+        if offset or limit is not None:
+            (c_key, c_key_len) = util.serialize(key, raw_key)
+            if not tc.bdb_vnum(self.db, c_key, c_key_len):
+                return default
+            return [util.deserialize(c_value, c_value_len, value_type)
+                    for c_value, c_value_len
+                    in self._iterdup(c_key, c_key_len, offset, limit)]
         try:
             value = self._getdup(key, raw_key, value_type)
         except KeyError:
             value = default
         return value
 
+    def iterdup(self, key, raw_key=False, value_type=None):
+        """Iterate for the values of a key in a B+ tree database
+        object, reading them one by one."""
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        for c_value, c_value_len in self._iterdup(c_key, c_key_len):
+            yield util.deserialize(c_value, c_value_len, value_type)
+
     def getdup_str(self, key, default=None, as_raw=False):
         """Retrieve a string record in a B+ tree database object."""
         return self.getdup(key, default, as_raw, str)
@@ -1221,18 +1354,15 @@ class BDB(BDBSimple):
 
     def has_key(self, key, raw_key=False):
         """Return True if B+ tree database object has the key."""
-        cursor = Cursor(self.db)
-        result = False
-        try:
-            cursor.jump(key, raw_key)
-        except KeyError:
-            pass
-        else:
-            if cursor.key(util.get_type(key, raw_key)) == key:
-                result = True
-        finally:
-            cursor.close()
-        return result
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        return tc.bdb_vnum(self.db, c_key, c_key_len) > 0
+
+    def contains_many(self, keys, raw_key=False):
+        """Return a bitmap with the bit i set if B+ tree database
+        object has the i-th key."""
+        serialize, vnum, db = util.serialize, tc.bdb_vnum, self.db
+        return util.bitmap(vnum(db, *serialize(key, raw_key)) > 0
+                           for key in keys)
 
     def cursor(self):
         """Create a cursor object associated with the B+ tree database
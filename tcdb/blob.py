@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+BlobStore keeps large objects in a B+ tree database, split in chunks
+of a fixed size, read and written as file-like objects.  Only one
+chunk is kept in memory at a time.
+
+Every object has a meta record, with its size, the size of its chunks
+and a generation number, and its chunks are stored under ordered keys
+made of its name, its generation and the chunk index.  A write stores
+a new generation and replaces the meta record at the end, so readers
+never see a half-written object.  The chunks of the previous
+generation, and the chunks left by a crash, are orphans removed by
+gc().  A reader opened before an object is replaced fails when it
+reaches a chunk removed since.
+
+>>> from tcdb.blob import BlobStore
+
+>>> store = BlobStore('blobs.tcb')
+>>> with store.open('video', 'w') as fileobj:
+...     fileobj.write('x' * 10000000)
+>>> store.size('video')
+10000000
+
+>>> fileobj = store.open('video')
+>>> fileobj.seek(5000000)
+>>> fileobj.read(3)
+'xxx'
+>>> fileobj.close()
+
+>>> store.close()
+
+"""
+
+import ctypes
+import os
+import struct
+import threading
+
+import bdb
+import tc
+
+
+NAME = struct.Struct('>I')    # size of the name
+CHUNK = struct.Struct('>QQ')  # generation, chunk index
+META = struct.Struct('>QQI')  # generation, size of the object and of
+                              # its chunks
+
+# Prefixes of the keys.
+PMETA = 'm'                   # name, to the meta record
+PCHUNK = 'c'                  # name, generation and index, to a chunk
+GENKEY = 'g'                  # last generation number
+
+
+def _chunk_prefix(name, gen=None):
+    """Get the prefix of the keys of the chunks of an object."""
+    prefix = PCHUNK + NAME.pack(len(name)) + name
+    if gen is not None:
+        prefix += struct.pack('>Q', gen)
+    return prefix
+
+
+def _chunk_key(name, gen, index):
+    """Get the key of a chunk."""
+    return PCHUNK + NAME.pack(len(name)) + name + CHUNK.pack(gen, index)
+
+
+def _parse_chunk_key(key):
+    """Get the name, the generation and the index of a chunk key."""
+    (size,) = NAME.unpack_from(key, len(PCHUNK))
+    pos = len(PCHUNK) + NAME.size
+    name = key[pos:pos + size]
+    (gen, index) = CHUNK.unpack_from(key, pos + size)
+    return (name, gen, index)
+
+
+class BlobStore(object):
+    def __init__(self, db, chunk=1 << 20):
+        """Create a blob store in a B+ tree database object, or the path
+        of its file.  New objects are split in chunks of chunk
+        bytes."""
+        self.own_db = isinstance(db, basestring)
+        if self.own_db:
+            path = db
+            db = bdb.BDBSimple()
+            db.open(path)
+        self.db = db
+        self.chunk = chunk
+        self.lock = threading.Lock()
+        self.writing = set()
+
+    def _error(self):
+        """Raise the last error of the database."""
+        raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.db.db)))
+
+    def _get(self, key):
+        """Get a raw record, or None."""
+        (c_value, c_value_len) = tc.bdb_get(self.db.db, key, len(key))
+        if not c_value:
+            return None
+        return ctypes.string_at(c_value, c_value_len)
+
+    def _put(self, key, value):
+        """Store a raw record."""
+        if not tc.bdb_put(self.db.db, key, len(key), value, len(value)):
+            self._error()
+
+    def _meta(self, name):
+        """Get the meta record (generation, size, chunk size) of an
+        object.  Raise KeyError if it does not exist."""
+        value = self._get(PMETA + name)
+        if value is None:
+            raise KeyError(name)
+        return META.unpack(value)
+
+    def _out_chunks(self, prefix):
+        """Remove the chunks whose keys start with prefix.  Return the
+        number of chunks removed."""
+        count = 0
+        cur = tc.bdb_curnew(self.db.db)
+        try:
+            moved = tc.bdb_curjump(cur, prefix, len(prefix))
+            while moved:
+                (c_key, c_key_len) = tc.bdb_curkey(cur)
+                if not ctypes.string_at(c_key, c_key_len).startswith(prefix):
+                    break
+                # Removing moves the cursor to the next record.
+                moved = tc.bdb_curout(cur)
+                count += 1
+        finally:
+            tc.bdb_curdel(cur)
+        return count
+
+    def open(self, name, mode='r'):
+        """Open an object for reading (mode 'r') or to replace it
+        (mode 'w').  Return a file-like object."""
+        if mode == 'r':
+            return BlobReader(self, name)
+        elif mode == 'w':
+            return BlobWriter(self, name)
+        raise ValueError('Invalid mode: %r' % mode)
+
+    def size(self, name):
+        """Get the size of an object."""
+        return self._meta(name)[1]
+
+    def __contains__(self, name):
+        """Return True if an object exists."""
+        return self.exists(name)
+
+    def exists(self, name):
+        """Return True if an object exists."""
+        return self._get(PMETA + name) is not None
+
+    def names(self, prefix=''):
+        """Get the names of the objects, that start with prefix."""
+        tclist_keys = tc.bdb_fwmkeys(self.db.db, PMETA + prefix,
+                                     len(PMETA + prefix), -1)
+        names = []
+        for index in xrange(tc.tclistnum(tclist_keys)):
+            (c_key, c_key_len) = tc.tclistval(tclist_keys, index)
+            names.append(ctypes.string_at(c_key, c_key_len)[len(PMETA):])
+        return names
+
+    def __iter__(self):
+        """Iterate for every object name."""
+        return iter(self.names())
+
+    def __delitem__(self, name):
+        """Remove an object and its chunks."""
+        self.remove(name)
+
+    def remove(self, name):
+        """Remove an object and its chunks."""
+        with self.lock:
+            (gen, _, _) = self._meta(name)
+            key = PMETA + name
+            if not tc.bdb_out(self.db.db, key, len(key)):
+                self._error()
+        self._out_chunks(_chunk_prefix(name, gen))
+
+    def gc(self):
+        """Remove the orphaned chunks: the chunks of old generations,
+        of removed objects and of interrupted writes.  Return the
+        number of chunks removed."""
+        count = 0
+        metas = {}
+        cur = tc.bdb_curnew(self.db.db)
+        try:
+            moved = tc.bdb_curjump(cur, PCHUNK, len(PCHUNK))
+            while moved:
+                (c_key, c_key_len) = tc.bdb_curkey(cur)
+                key = ctypes.string_at(c_key, c_key_len)
+                if not key.startswith(PCHUNK):
+                    break
+                (name, gen, _) = _parse_chunk_key(key)
+                live = gen == metas.get(name)
+                if not live:
+                    # A writer may have replaced the object meanwhile.
+                    with self.lock:
+                        try:
+                            metas[name] = self._meta(name)[0]
+                        except KeyError:
+                            metas[name] = None
+                        live = gen == metas[name] or \
+                            (name, gen) in self.writing
+                if live:
+                    moved = tc.bdb_curnext(cur)
+                else:
+                    moved = tc.bdb_curout(cur)
+                    count += 1
+        finally:
+            tc.bdb_curdel(cur)
+        return count
+
+    def close(self):
+        """Close the database if the blob store opened it."""
+        if self.own_db:
+            self.db.close()
+
+    def __enter__(self):
+        """Enter in the 'with' statement."""
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """Exit from 'with' statement and close the blob store."""
+        self.close()
+
+
+class BlobWriter(object):
+    def __init__(self, store, name):
+        """Create a writer of a new generation of an object."""
+        self.store = store
+        self.name = name
+        self.chunk = store.chunk
+        self.size = 0
+        self.index = 0
+        self.buf = []
+        self.buf_size = 0
+        self.closed = False
+        with store.lock:
+            self.gen = tc.bdb_addint(store.db.db, GENKEY, len(GENKEY), 1)
+            store.writing.add((name, self.gen))
+
+    def write(self, data):
+        """Write a string at the end of the object."""
+        if self.closed:
+            raise ValueError('I/O operation on closed blob')
+        self.buf.append(data)
+        self.buf_size += len(data)
+        self.size += len(data)
+        if self.buf_size >= self.chunk:
+            data = ''.join(self.buf)
+            pos = 0
+            while len(data) - pos >= self.chunk:
+                self._flush(data[pos:pos + self.chunk])
+                pos += self.chunk
+            self.buf = [data[pos:]]
+            self.buf_size = len(data) - pos
+
+    def writelines(self, lines):
+        """Write a sequence of strings."""
+        for line in lines:
+            self.write(line)
+
+    def _flush(self, data):
+        """Store the next chunk."""
+        key = _chunk_key(self.name, self.gen, self.index)
+        self.store._put(key, data)
+        self.index += 1
+
+    def tell(self):
+        """Get the size written."""
+        return self.size
+
+    def close(self):
+        """Store the last chunk and make the object visible.  The
+        chunks of the previous generation are removed."""
+        if self.closed:
+            return
+        self.closed = True
+        store = self.store
+        try:
+            if self.buf_size:
+                self._flush(''.join(self.buf))
+            self.buf = []
+            with store.lock:
+                try:
+                    old = store._meta(self.name)[0]
+                except KeyError:
+                    old = None
+                store._put(PMETA + self.name,
+                           META.pack(self.gen, self.size, self.chunk))
+        finally:
+            with store.lock:
+                store.writing.discard((self.name, self.gen))
+        if old is not None:
+            store._out_chunks(_chunk_prefix(self.name, old))
+
+    def abort(self):
+        """Forget the object written, leaving the previous one."""
+        if self.closed:
+            return
+        self.closed = True
+        with self.store.lock:
+            self.store.writing.discard((self.name, self.gen))
+        self.store._out_chunks(_chunk_prefix(self.name, self.gen))
+
+    def __enter__(self):
+        """Enter in the 'with' statement."""
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """Exit from 'with' statement: keep the object written, or
+        forget it if there was an exception."""
+        if type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class BlobReader(object):
+    def __init__(self, store, name):
+        """Create a reader of the current generation of an object."""
+        self.closed = True
+        self.store = store
+        self.name = name
+        (self.gen, self.size, self.chunk) = store._meta(name)
+        self.pos = 0
+        self.data = None
+        self.index = None
+        self.cur = tc.bdb_curnew(store.db.db)
+        self.closed = False
+
+    def _at(self, key):
+        """Tell if the cursor is on a key."""
+        (c_key, c_key_len) = tc.bdb_curkey(self.cur)
+        return bool(c_key) and ctypes.string_at(c_key, c_key_len) == key
+
+    def _load(self, index):
+        """Load a chunk, moving the cursor forward or jumping to it."""
+        key = _chunk_key(self.name, self.gen, index)
+        moved = False
+        if self.index is not None and index == self.index + 1:
+            moved = tc.bdb_curnext(self.cur) and self._at(key)
+        if not moved:
+            # Concurrent writes can split the leaf of the cursor and
+            # move it, so jump before giving up.
+            moved = tc.bdb_curjump(self.cur, key, len(key)) and self._at(key)
+        if not moved:
+            raise tc.TCException('Missing chunk %d of blob %r'
+                                 % (index, self.name))
+        (c_value, c_value_len) = tc.bdb_curval(self.cur)
+        self.data = ctypes.string_at(c_value, c_value_len)
+        self.index = index
+
+    def read(self, size=-1):
+        """Read at most size bytes, or up to the end if size is
+        negative."""
+        if self.closed:
+            raise ValueError('I/O operation on closed blob')
+        if size < 0 or self.pos + size > self.size:
+            size = self.size - self.pos
+        result = []
+        while size > 0:
+            (index, offset) = divmod(self.pos, self.chunk)
+            if index != self.index:
+                self._load(index)
+            data = self.data[offset:offset + size]
+            result.append(data)
+            self.pos += len(data)
+            size -= len(data)
+        return ''.join(result)
+
+    def __iter__(self):
+        """Iterate for every chunk of data up to the end."""
+        while True:
+            data = self.read(self.chunk - self.pos % self.chunk)
+            if not data:
+                break
+            yield data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """Set the position of the next read."""
+        if whence == os.SEEK_CUR:
+            offset += self.pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise IOError('Invalid negative position')
+        self.pos = offset
+
+    def tell(self):
+        """Get the position of the next read."""
+        return self.pos
+
+    def close(self):
+        """Close the reader."""
+        if not self.closed:
+            self.closed = True
+            tc.bdb_curdel(self.cur)
+            self.data = None
+
+    def __del__(self):
+        """Delete the cursor of the reader."""
+        self.close()
+
+    def __enter__(self):
+        """Enter in the 'with' statement."""
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """Exit from 'with' statement and close the reader."""
+        self.close()
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+WriteBuffer is a write-behind buffer with group commit for HDB, BDB
+and TDB database objects.
+
+Puts and outs are accumulated in memory (repeated writes to the same
+key, as the database object serializes it, are coalesced) and flushed
+as a single transaction when the size or the time threshold is
+reached, or when flush() is called.  Reads of pending keys are served
+from the buffer.
+
+>>> from tcdb.hdb import HDB
+>>> from tcdb.buffer import WriteBuffer
+
+>>> db = HDB()
+>>> db.open('casket.tch')
+
+>>> buf = WriteBuffer(db, max_records=1000, max_delay=0.5)
+>>> buf.put("foo", "hop")
+True
+>>> buf.get("foo")
+'hop'
+>>> buf.flush()
+1
+
+>>> buf.close()
+>>> db.close()
+
+"""
+
+import ctypes
+import threading
+import time
+
+import bdb
+import hdb
+import tc
+import tdb
+import util
+
+
+# enumeration for pending operations
+OPPUT = 0                     # store the record
+OPOUT = 1                     # remove the record
+
+
+class WriteBuffer(object):
+    def __init__(self, db, max_records=1000, max_delay=1.0, autoflush=False):
+        """Create a write buffer over a database object.  The buffer
+        is flushed when it holds max_records keys or when its oldest
+        pending write is max_delay seconds old.  If autoflush is True,
+        a background thread checks the time threshold, so the
+        durability window is bounded even without new writes (the
+        database object must be opened with setmutex in that case)."""
+        self.db = db
+        self.max_records = max_records
+        self.max_delay = max_delay
+        self.pending = {}
+        self.since = None
+        self.lock = threading.RLock()
+
+        self.flushes = 0
+        self.flushed_records = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+        self.thread = None
+        self.stop = threading.Event()
+        if autoflush and max_delay:
+            self.thread = threading.Thread(target=self._autoflush)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _autoflush(self):
+        """Flush the write buffer when the time threshold is reached."""
+        while not self.stop.wait(self.max_delay / 2.0):
+            with self.lock:
+                self._check()
+
+    def _check(self):
+        """Flush the write buffer if a threshold is reached.  The lock
+        must be held."""
+        if len(self.pending) >= self.max_records:
+            self.flush()
+        elif self.since is not None and \
+                time.time() - self.since >= self.max_delay:
+            self.flush()
+
+    def _raw_key(self, key, kwargs):
+        """Get the raw key of a record, as the database object stores
+        it.  The raw_key or as_raw keyword argument tells if the key
+        is raw."""
+        if not isinstance(self.db, (hdb.HDB, bdb.BDB, tdb.TDB)):
+            # Simple classes only store strings.
+            return key
+        as_raw = kwargs.get('raw_key', kwargs.get('as_raw', False))
+        (c_key, c_key_len) = util.serialize(key, as_raw)
+        return ctypes.string_at(c_key, c_key_len)
+
+    def _pending(self, key, kwargs):
+        """Get the pending (operation, key, value, keyword arguments) of
+        a key, or None."""
+        return self.pending.get(self._raw_key(key, kwargs))
+
+    def _add(self, key, op, value, kwargs):
+        """Add a pending operation to the write buffer."""
+        raw_key = self._raw_key(key, kwargs)
+        with self.lock:
+            if self.since is None:
+                self.since = time.time()
+            self.pending[raw_key] = (op, key, value, kwargs)
+            self._check()
+        return True
+
+    def __setitem__(self, key, value):
+        """Store any Python object into the write buffer."""
+        return self.put(key, value)
+
+    def put(self, key, value, **kwargs):
+        """Store a record into the write buffer.  Extra keyword
+        arguments (raw_key, raw_value, ...) are given to the put
+        method of the database object."""
+        return self._add(key, OPPUT, value, kwargs)
+
+    def __delitem__(self, key):
+        """Remove a record through the write buffer."""
+        return self.out(key)
+
+    def out(self, key, **kwargs):
+        """Remove a record through the write buffer.  Extra keyword
+        arguments (as_raw, ...) are given to the out method of the
+        database object."""
+        return self._add(key, OPOUT, None, kwargs)
+
+    def __getitem__(self, key):
+        """Retrieve a record, looking first in the write buffer."""
+        with self.lock:
+            pending = self._pending(key, {})
+            if pending:
+                (op, _, value, _) = pending
+                if op == OPOUT:
+                    raise KeyError(key)
+                return value
+        return self.db[key]
+
+    def get(self, key, default=None, **kwargs):
+        """Retrieve a record, looking first in the write buffer."""
+        with self.lock:
+            pending = self._pending(key, kwargs)
+            if pending:
+                (op, _, value, _) = pending
+                return value if op == OPPUT else default
+        return self.db.get(key, default, **kwargs)
+
+    def __contains__(self, key):
+        """Return True if the record exists after the pending writes."""
+        return self.has_key(key)
+
+    def has_key(self, key, **kwargs):
+        """Return True if the record exists after the pending writes."""
+        with self.lock:
+            pending = self._pending(key, kwargs)
+            if pending:
+                return pending[0] == OPPUT
+        return self.db.has_key(key, **kwargs)
+
+    def __len__(self):
+        """Get the number of pending keys of the write buffer."""
+        return len(self.pending)
+
+    def _out(self, key, kwargs):
+        """Remove a record of the database object, ignoring records
+        that never reached the file."""
+        try:
+            self.db.out(key, **kwargs)
+        except tc.TCException:
+            # has_key names the out as_raw argument raw_key.
+            has_kwargs = {}
+            if 'as_raw' in kwargs:
+                has_kwargs['raw_key'] = kwargs['as_raw']
+            if self.db.has_key(key, **has_kwargs):
+                raise
+
+    def flush(self):
+        """Write every pending operation in a single transaction.
+        Return the number of records written."""
+        with self.lock:
+            if not self.pending:
+                return 0
+            start = time.time()
+            self.db.tranbegin()
+            try:
+                for op, key, value, kwargs in self.pending.itervalues():
+                    if op == OPPUT:
+                        self.db.put(key, value, **kwargs)
+                    else:
+                        self._out(key, kwargs)
+            except:
+                self.db.tranabort()
+                raise
+            self.db.trancommit()
+            latency = time.time() - start
+
+            num = len(self.pending)
+            self.pending = {}
+            self.since = None
+            self.flushes += 1
+            self.flushed_records += num
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self.total_latency += latency
+        return num
+
+    def discard(self):
+        """Forget every pending operation of the write buffer."""
+        with self.lock:
+            self.pending = {}
+            self.since = None
+
+    def stats(self):
+        """Get the flush metrics of the write buffer."""
+        with self.lock:
+            return {
+                'pending': len(self.pending),
+                'flushes': self.flushes,
+                'flushed_records': self.flushed_records,
+                'last_latency': self.last_latency,
+                'max_latency': self.max_latency,
+                'avg_latency': self.total_latency / self.flushes \
+                    if self.flushes else 0.0,
+                }
+
+    def close(self):
+        """Stop the background thread and flush the write buffer."""
+        if self.thread:
+            self.stop.set()
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+    def __enter__(self):
+        """Enter in the 'with' statement."""
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """Exit from 'with' statement and flush the write buffer."""
+        if type is None:
+            self.close()
+        else:
+            self.discard()
+            self.close()
@@ -0,0 +1,491 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Update log of hash, B+ tree, fixed-length and table database objects,
+for incremental replication.
+
+Once a ChangeLog is attached to a database object, every successful
+write (put, putkeep, putcat, putasync, putdup, putdup_iter, putdup_many,
+putdupback, out, outdup, add_int, add_float and vanish) appends an
+entry with a sequence number to the log file, one for every key of
+putdup_many.  An entry holds the state of the record after the write,
+read back from the database: the raw value, all the duplicated values
+of a B+ tree key, or the columns of a table record.  Applying an entry
+twice is harmless, so a replica only needs to remember the last
+sequence number it applied.
+
+The writes made in a transaction are logged when it is committed, and
+forgotten if it is aborted.  Writes made with the tc module directly
+are not logged.
+
+>>> from tcdb import changelog
+>>> from tcdb import hdb
+
+>>> db = hdb.HDB()
+>>> db.open('casket.tch')
+>>> log = changelog.ChangeLog('casket.log')
+>>> changelog.attach(db, log)
+>>> db.put('foo', 'hop')
+True
+>>> [seq for seq, op, kind, key, value in log.changes_since(0)]
+[1]
+
+>>> replica = hdb.HDB()
+>>> replica.open('replica.tch')
+>>> changelog.Replica(log, replica).apply()
+1
+
+"""
+
+import bisect
+import ctypes
+import inspect
+import os
+import struct
+import threading
+import zlib
+
+import dumper
+import fdb
+import tc
+import util
+
+
+MAGIC = 'TCLOG'
+VERSION = 1
+
+HEADER = struct.Struct('>B')        # version
+ENTRY = struct.Struct('>IQBBII')    # CRC-32 checksum, sequence number,
+                                    # operation, kind, key and value size
+STATE = struct.Struct('>QQ')        # sequence number, offset in the log
+
+# enumeration for operations
+OPPUT = 0                     # store the record
+OPOUT = 1                     # remove the record
+OPVANISH = 2                  # remove all the records
+
+# enumeration for value kinds
+KRAW = dumper.KRAW            # raw value
+KMAP = dumper.KMAP            # columns of a table record, as a TCMAP dump
+KLIST = 2                     # values of a B+ tree key, as a TCLIST dump
+
+# Write methods logged, and the position and the name of their argument
+# that tells if the key is raw (None for vanish).
+WRITES = {
+    'put': (2, 'raw_key'),
+    'putkeep': (2, 'raw_key'),
+    'putcat': (2, 'raw_key'),
+    'putasync': (2, 'raw_key'),
+    'putdup': (2, 'raw_key'),
+    'putdup_iter': (2, 'raw_key'),
+    'putdup_many': (1, 'raw_key'),
+    'putdupback': (2, 'raw_key'),
+    'out': (1, 'as_raw'),
+    'outdup': (1, 'as_raw'),
+    'add_int': (2, 'as_raw'),
+    'add_float': (2, 'as_raw'),
+    'vanish': None,
+    }
+
+# Special keys of fixed-length databases.
+FDBKEYS = {
+    'min': fdb.IDMIN,
+    'prev': fdb.IDPREV,
+    'max': fdb.IDMAX,
+    'next': fdb.IDNEXT,
+    }
+
+# Entries between two offsets of the sparse index of a log.
+INDEXSTEP = 1024
+
+# error code of a missing record
+ENOREC = 22
+
+
+class ChangeLog(object):
+    def __init__(self, path, sync=False, readonly=False):
+        """Open or create the update log file path.  If sync is True,
+        the file is synchronized with the device after every append.
+        If readonly is True, the existing file is only read, while
+        another process may append to it."""
+        self.path = path
+        self.sync = sync
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.index = [(0, len(MAGIC) + HEADER.size)]
+        self.file = open(path, 'rb' if readonly else 'a+b')
+        self.file.seek(0, os.SEEK_END)
+        if not self.file.tell() and not readonly:
+            self.file.write(MAGIC + HEADER.pack(VERSION))
+            self.file.flush()
+        end = self.index[0][1]
+        for end, entry in self._entries(self.index[0][1]):
+            self._indexed(entry[0], end)
+        if not readonly:
+            # Drop an entry torn by a crash.  A reader must not, the
+            # writer may be appending it.
+            self.file.truncate(end)
+
+    def _indexed(self, seq, end):
+        """Record the last sequence number and its end offset."""
+        self.seq = seq
+        if seq % INDEXSTEP == 0:
+            self.index.append((seq, end))
+
+    def close(self):
+        """Close the update log file."""
+        self.file.close()
+
+    def append(self, entries):
+        """Append a list of (operation, kind, key, value) entries.
+        Return the sequence number of the last one."""
+        if self.readonly:
+            raise tc.TCException('Update log opened as read-only: %s'
+                                 % self.path)
+        if not entries:
+            return self.seq
+        with self.lock:
+            data = []
+            seq = self.seq
+            self.file.seek(0, os.SEEK_END)
+            end = self.file.tell()
+            for op, kind, key, value in entries:
+                seq += 1
+                body = ENTRY.pack(0, seq, op, kind, len(key),
+                                  len(value))[4:] + key + value
+                crc = zlib.crc32(body) & 0xffffffff
+                data.append(struct.pack('>I', crc) + body)
+                end += ENTRY.size + len(key) + len(value)
+                if seq % INDEXSTEP == 0:
+                    self.index.append((seq, end))
+            self.file.write(''.join(data))
+            self.file.flush()
+            if self.sync:
+                os.fsync(self.file.fileno())
+            self.seq = seq
+        return seq
+
+    def _entries(self, offset):
+        """Iterate for every (end offset, entry) of the log from an
+        offset.  An incomplete entry at the end, that is being
+        written, stops the iteration."""
+        with open(self.path, 'rb') as fileobj:
+            if fileobj.read(len(MAGIC)) != MAGIC:
+                raise tc.TCException('Invalid update log: %s' % self.path)
+            (version,) = HEADER.unpack(fileobj.read(HEADER.size))
+            if version > VERSION:
+                raise tc.TCException('Unsupported update log version: %d'
+                                     % version)
+            fileobj.seek(offset)
+            while True:
+                header = fileobj.read(ENTRY.size)
+                if len(header) < ENTRY.size:
+                    return
+                (crc, seq, op, kind, key_len, value_len) = \
+                    ENTRY.unpack(header)
+                data = fileobj.read(key_len + value_len)
+                if len(data) < key_len + value_len:
+                    return
+                if zlib.crc32(header[4:] + data) & 0xffffffff != crc:
+                    if fileobj.read(1):
+                        raise tc.TCException('Invalid checksum in update '
+                                             'log entry %d' % seq)
+                    return
+                offset += ENTRY.size + key_len + value_len
+                yield (offset, (seq, op, kind, data[:key_len],
+                                data[key_len:]))
+
+    def _offset(self, seq):
+        """Get an offset in the log at or before the entry following the
+        sequence number seq."""
+        pos = bisect.bisect_right(self.index, (seq, float('inf'))) - 1
+        return self.index[pos][1]
+
+    def changes_since(self, seq, offset=None):
+        """Iterate for every entry (sequence number, operation, kind,
+        key, value) after the sequence number seq.  offset is an
+        optional position in the log at or before the entry following
+        seq."""
+        if offset is None:
+            offset = self._offset(seq)
+        for _, entry in self._entries(offset):
+            if entry[0] > seq:
+                yield entry
+
+
+def _raw_key(db, name, args, kwargs):
+    """Get the raw key of a logged write, as the method serializes it.
+    Called before the write: the special IDs of a fixed-length database
+    are resolved with the records before the write."""
+    key = args[0]
+    if isinstance(db, fdb.FDBSimple):
+        try:
+            id_ = int(key)
+        except ValueError:
+            id_ = FDBKEYS[key]
+        if id_ == fdb.IDMAX:
+            id_ = tc.fdb_max(db.db)
+        elif id_ == fdb.IDNEXT:
+            id_ = tc.fdb_max(db.db) + 1
+        elif id_ == fdb.IDMIN:
+            id_ = tc.fdb_min(db.db)
+        elif id_ == fdb.IDPREV:
+            id_ = tc.fdb_min(db.db) - 1
+        return id_
+    (pos, flag) = WRITES[name]
+    if flag not in inspect.getargspec(getattr(type(db), name)).args:
+        # Simple classes only store strings.
+        return key
+    as_raw = args[pos] if len(args) > pos else kwargs.get(flag, False)
+    (c_key, c_key_len) = util.serialize(key, as_raw)
+    return ctypes.string_at(c_key, c_key_len)
+
+
+def _raw(func, *args):
+    """Call a function returning a region and its size, and get it as
+    a string."""
+    (c_obj, c_obj_len) = func(*args)
+    if not c_obj:
+        return None
+    return ctypes.string_at(c_obj, c_obj_len)
+
+
+def _state(db, dbtype, key):
+    """Get the entry (operation, kind, key, value) of the current
+    state of a record."""
+    if dbtype == dumper.TYPEHDB:
+        (kind, value) = (KRAW, _raw(tc.hdb_get, db.db, key, len(key)))
+    elif dbtype == dumper.TYPEBDB:
+        (kind, value) = (KLIST, None)
+        tclist_values = tc.bdb_get4(db.db, key, len(key))
+        if tclist_values:
+            value = _raw(tc.tclistdump, tclist_values)
+    elif dbtype == dumper.TYPEFDB:
+        (kind, value) = (KRAW, _raw(tc.fdb_get, db.db, key))
+        key = str(key)
+    else:
+        (kind, value) = (KMAP, None)
+        cols = tc.tdb_get(db.db, key, len(key))
+        if cols:
+            value = _raw(tc.tcmapdump, cols)
+    if value is None:
+        return (OPOUT, kind, key, '')
+    return (OPPUT, kind, key, value)
+
+
+class _Logger(object):
+    """Hooks of a database object with an attached update log."""
+    def __init__(self, db, log):
+        (self.dbtype, _) = dumper._dbtype(db)
+        self.log = log
+        self.pending = None
+        self.saved = {}
+        # Held during a logged write, so the writers can be paused.
+        self.gate = threading.RLock()
+
+    def record(self, entries):
+        """Log entries, or keep them until the running transaction is
+        committed."""
+        if self.pending is None:
+            self.log.append(entries)
+        else:
+            self.pending.extend(entries)
+
+    def wrap(self, db, name, method):
+        """Log the successful calls of a write method."""
+        def call(*args, **kwargs):
+            with self.gate:
+                if name == 'putdup_many':
+                    # The items are read twice, for the keys and the
+                    # write.
+                    items = args[0]
+                    if isinstance(items, dict):
+                        items = items.iteritems()
+                    args = (list(items),) + args[1:]
+                    keys = [_raw_key(db, name, (key,) + args[1:], kwargs)
+                            for key, _ in args[0]]
+                elif name != 'vanish':
+                    keys = [_raw_key(db, name, args, kwargs)]
+                result = method(*args, **kwargs)
+                if result:
+                    if name == 'vanish':
+                        self.record([(OPVANISH, KRAW, '', '')])
+                    else:
+                        self.record([_state(db, self.dbtype, key)
+                                     for key in keys])
+            return result
+        call.__name__ = method.__name__
+        call.__doc__ = method.__doc__
+        return call
+
+    def wrap_tran(self, name, method):
+        """Keep the entries of a transaction until it ends.  The gate
+        is held from the beginning to the end of the transaction."""
+        def call(*args, **kwargs):
+            if name == 'tranbegin':
+                self.gate.acquire()
+                result = False
+                try:
+                    result = method(*args, **kwargs)
+                finally:
+                    if not result:
+                        self.gate.release()
+                if result:
+                    self.pending = []
+                return result
+            try:
+                result = method(*args, **kwargs)
+                if self.pending is not None:
+                    pending, self.pending = self.pending, None
+                    if name == 'trancommit':
+                        self.log.append(pending)
+            finally:
+                try:
+                    self.gate.release()
+                except RuntimeError:
+                    # No transaction was begun by this thread.
+                    pass
+            return result
+        call.__name__ = method.__name__
+        call.__doc__ = method.__doc__
+        return call
+
+
+def attach(db, log):
+    """Log the writes of a database object into a ChangeLog."""
+    if getattr(db, '_changelog', None):
+        raise tc.TCException('An update log is already attached')
+    logger = _Logger(db, log)
+    for name in WRITES.keys() + ['tranbegin', 'trancommit', 'tranabort']:
+        method = getattr(db, name, None)
+        if method is None:
+            continue
+        logger.saved[name] = db.__dict__.get(name)
+        if name in WRITES:
+            setattr(db, name, logger.wrap(db, name, method))
+        else:
+            setattr(db, name, logger.wrap_tran(name, method))
+    db._changelog = logger
+
+
+def detach(db):
+    """Stop logging the writes of a database object."""
+    logger = db.__dict__.pop('_changelog', None)
+    if not logger:
+        return
+    for name, saved in logger.saved.iteritems():
+        if saved is None:
+            db.__dict__.pop(name, None)
+        else:
+            setattr(db, name, saved)
+
+
+def _apply(dbtype, db, op, kind, key, value):
+    """Apply an entry of an update log to a database object."""
+    (_, prefix) = dumper._dbtype(db)
+    if op == OPVANISH:
+        return getattr(tc, prefix + '_vanish')(db.db)
+    if dbtype == dumper.TYPEFDB:
+        key = int(key)
+    if op == OPOUT:
+        if dbtype == dumper.TYPEFDB:
+            result = tc.fdb_out(db.db, key)
+        elif dbtype == dumper.TYPEBDB:
+            result = tc.bdb_out3(db.db, key, len(key))
+        else:
+            result = getattr(tc, prefix + '_out')(db.db, key, len(key))
+        return result or getattr(tc, prefix + '_ecode')(db.db) == ENOREC
+    if dbtype == dumper.TYPEHDB:
+        return tc.hdb_put(db.db, key, len(key), value, len(value))
+    elif dbtype == dumper.TYPEBDB:
+        tc.bdb_out3(db.db, key, len(key))
+        return tc.bdb_putdup3(db.db, key, len(key),
+                              tc.tclistload(value, len(value)))
+    elif dbtype == dumper.TYPEFDB:
+        return tc.fdb_put(db.db, key, value, len(value))
+    return tc.tdb_put(db.db, key, len(key), tc.tcmapload(value, len(value)))
+
+
+class Replica(object):
+    def __init__(self, log, db, state=None, batch=1000):
+        """Create a replica applier, that tails an update log (a
+        ChangeLog, or the path of its file opened read-only) into a
+        database object of the same type, in transactions of batch
+        entries.  The last sequence number applied is kept in the file
+        state (the path of the database with a '.seq' suffix by
+        default)."""
+        if isinstance(log, basestring):
+            log = ChangeLog(log, readonly=True)
+        self.log = log
+        self.db = db
+        (self.dbtype, self.prefix) = dumper._dbtype(db)
+        if state is None:
+            state = getattr(tc, self.prefix + '_path')(db.db) + '.seq'
+        self.state = state
+        self.batch = batch
+        self.seq = 0
+        self.offset = None
+        if os.path.exists(state):
+            with open(state, 'rb') as fileobj:
+                (self.seq, self.offset) = STATE.unpack(fileobj.read())
+
+    def _save(self):
+        """Store the last sequence number applied, atomically."""
+        path = self.state + '.tmp'
+        with open(path, 'wb') as fileobj:
+            fileobj.write(STATE.pack(self.seq, self.offset or 0))
+        os.rename(path, self.state)
+
+    def apply(self):
+        """Apply the new entries of the update log.  Return the number
+        of entries applied."""
+        prefix = self.prefix
+        tranbegin = getattr(tc, prefix + '_tranbegin')
+        trancommit = getattr(tc, prefix + '_trancommit')
+        tranabort = getattr(tc, prefix + '_tranabort')
+        errmsg = getattr(tc, prefix + '_errmsg')
+        ecode = getattr(tc, prefix + '_ecode')
+        db = self.db
+
+        count = 0
+        in_tran = False
+        offset = self.offset or self.log.index[0][1]
+        try:
+            for end, entry in self.log._entries(offset):
+                (seq, op, kind, key, value) = entry
+                offset = end
+                if seq <= self.seq:
+                    continue
+                if not in_tran:
+                    if not tranbegin(db.db):
+                        raise tc.TCException(errmsg(ecode(db.db)))
+                    in_tran = True
+                if not _apply(self.dbtype, db, op, kind, key, value):
+                    raise tc.TCException(errmsg(ecode(db.db)))
+                count += 1
+                if count % self.batch == 0:
+                    in_tran = False
+                    if not trancommit(db.db):
+                        raise tc.TCException(errmsg(ecode(db.db)))
+                    (self.seq, self.offset) = (seq, offset)
+                    self._save()
+            if in_tran:
+                in_tran = False
+                if not trancommit(db.db):
+                    raise tc.TCException(errmsg(ecode(db.db)))
+                (self.seq, self.offset) = (seq, offset)
+                self._save()
+        finally:
+            if in_tran:
+                tranabort(db.db)
+        return count
+
+    def follow(self, interval=1.0, stop=None):
+        """Apply the update log as it grows, every interval seconds,
+        until the threading.Event stop is set."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            self.apply()
+            stop.wait(interval)
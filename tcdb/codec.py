@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Custom codecs for the records of hash, B+ tree and table database
+objects (the TEXCODEC option).
+
+A codec is an object with encode and decode methods, that get a string
+and return a string.  Two codecs are included: zlib, with a chosen
+compression level (1, the fastest, by default), and lz4, bound to the
+native LZ4 library if it is installed, faster than zlib.  New codecs
+can be registered with register().
+
+Small records share little data with themselves but much with each
+other.  The dict codec compresses them with a dictionary trained from
+sample records (see HDB.train and HDB.retrain), stored in a reserved
+record of the database.
+
+The database object must be tuned or opened with the TEXCODEC option,
+and the codec must be set every time before it is opened.
+
+>>> from tcdb import hdb
+>>> from tcdb import codec
+
+>>> db = hdb.HDB()
+>>> db.setcodec(codec.ZlibCodec(level=1))
+True
+>>> db.open('casket.tch', opts=hdb.TEXCODEC)
+>>> db.put('foo', 'hop' * 100)
+True
+>>> db.close()
+
+"""
+
+import abc
+import ctypes
+import struct
+import zlib
+from ctypes.util import find_library
+
+import tc
+
+
+class Codec(object):
+    """Abstract base class of the codecs.  A codec implements encode
+    and decode, that get the string to encode or decode and the
+    optional opaque object given to setcodecfunc, and return a string;
+    they raise an exception (e.g. ValueError) on invalid data.  name is
+    the name used by register() and get()."""
+    __metaclass__ = abc.ABCMeta
+    name = None
+
+    @abc.abstractmethod
+    def encode(self, data, op=None):
+        """Encode a string."""
+
+    @abc.abstractmethod
+    def decode(self, data, op=None):
+        """Decode a string made by encode."""
+
+
+class ZlibCodec(Codec):
+    name = 'zlib'
+
+    def __init__(self, level=1):
+        """Create a zlib codec with a compression level from 1
+        (fastest, the default) to 9 (smallest)."""
+        self.level = level
+
+    def encode(self, data, op=None):
+        """Compress a string with zlib."""
+        return zlib.compress(data, self.level)
+
+    def decode(self, data, op=None):
+        """Decompress a string with zlib."""
+        return zlib.decompress(data)
+
+
+# LZ4 library, optional: the lz4 codec needs it.
+_lz4_path = find_library('lz4')
+liblz4 = ctypes.CDLL(_lz4_path) if _lz4_path else None
+
+if liblz4:
+    liblz4.LZ4_compressBound.argtypes = [ctypes.c_int]
+    liblz4.LZ4_compressBound.restype = ctypes.c_int
+    liblz4.LZ4_compress_default.argtypes = [
+        ctypes.c_char_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+    liblz4.LZ4_compress_default.restype = ctypes.c_int
+    liblz4.LZ4_decompress_safe.argtypes = [
+        ctypes.c_char_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+    liblz4.LZ4_decompress_safe.restype = ctypes.c_int
+    liblz4.LZ4_createStream.argtypes = []
+    liblz4.LZ4_createStream.restype = ctypes.c_void_p
+    liblz4.LZ4_freeStream.argtypes = [ctypes.c_void_p]
+    liblz4.LZ4_freeStream.restype = ctypes.c_int
+    liblz4.LZ4_loadDict.argtypes = [
+        ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+    liblz4.LZ4_loadDict.restype = ctypes.c_int
+    liblz4.LZ4_compress_fast_continue.argtypes = [
+        ctypes.c_void_p, ctypes.c_char_p, ctypes.c_void_p, ctypes.c_int,
+        ctypes.c_int, ctypes.c_int]
+    liblz4.LZ4_compress_fast_continue.restype = ctypes.c_int
+    liblz4.LZ4_decompress_safe_usingDict.argtypes = [
+        ctypes.c_char_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+        ctypes.c_char_p, ctypes.c_int]
+    liblz4.LZ4_decompress_safe_usingDict.restype = ctypes.c_int
+
+LZ4SIZE = struct.Struct('>I')   # size of the data, before the block
+MAXDICT = 1 << 16               # dictionary, the window of LZ4
+MAXPHRASE = 256                 # phrase of a trained dictionary
+
+
+class LZ4Codec(Codec):
+    name = 'lz4'
+
+    def __init__(self, dictionary=''):
+        """Create a LZ4 codec, bound to the native LZ4 library.
+        dictionary is an optional string with data common to the
+        records, that back references can point to (see train())."""
+        if not liblz4:
+            raise tc.TCException('The LZ4 library is not available')
+        self.dictionary = dictionary[-MAXDICT:]
+
+    def encode(self, data, op=None):
+        """Compress a string in a LZ4 block, after its size."""
+        size = len(data)
+        bound = liblz4.LZ4_compressBound(size)
+        buf = ctypes.create_string_buffer(bound)
+        if self.dictionary:
+            stream = liblz4.LZ4_createStream()
+            if not stream:
+                raise MemoryError
+            try:
+                liblz4.LZ4_loadDict(stream, self.dictionary,
+                                    len(self.dictionary))
+                length = liblz4.LZ4_compress_fast_continue(
+                    stream, data, buf, size, bound, 1)
+            finally:
+                liblz4.LZ4_freeStream(stream)
+        else:
+            length = liblz4.LZ4_compress_default(data, buf, size, bound)
+        if length <= 0:
+            raise ValueError('LZ4 compression failed')
+        return LZ4SIZE.pack(size) + buf.raw[:length]
+
+    def decode(self, data, op=None):
+        """Decompress a string made by encode."""
+        if len(data) < LZ4SIZE.size:
+            raise ValueError('Invalid LZ4 data')
+        (size,) = LZ4SIZE.unpack_from(data)
+        block = data[LZ4SIZE.size:]
+        buf = ctypes.create_string_buffer(size)
+        if self.dictionary:
+            length = liblz4.LZ4_decompress_safe_usingDict(
+                block, buf, len(block), size, self.dictionary,
+                len(self.dictionary))
+        else:
+            length = liblz4.LZ4_decompress_safe(block, buf, len(block), size)
+        if length != size:
+            raise ValueError('Invalid LZ4 data')
+        return buf.raw[:size]
+
+
+def train(samples, size=4096, segment=8):
+    """Build a dictionary of at most size bytes from a sequence of
+    sample strings.  The segments of segment bytes found in most of the
+    samples are joined into phrases, and the most common phrases are
+    placed at the end of the dictionary, closer to the records."""
+    size = min(size, MAXDICT)
+    counts = {}
+    for sample in samples:
+        grams = set(sample[pos:pos + segment]
+                    for pos in xrange(len(sample) - segment + 1))
+        for gram in grams:
+            counts[gram] = counts.get(gram, 0) + 1
+    following = {}
+    for gram, count in counts.iteritems():
+        if count > 1:
+            following.setdefault(gram[:-1], []).append(gram)
+
+    phrases = []
+    total = 0
+    common = sorted((gram for gram in counts if counts[gram] > 1),
+                    key=lambda gram: (-counts[gram], gram))
+    for gram in common:
+        if total >= size:
+            break
+        count = counts[gram]
+        if not count:
+            continue
+        # Extend the phrase to the right with the most common segment
+        # that overlaps it, while it is found in half of the samples.
+        phrase = gram
+        counts[gram] = 0
+        while len(phrase) < MAXPHRASE:
+            nexts = following.get(phrase[1 - segment:], ())
+            best = max(nexts, key=counts.get) if nexts else None
+            if best is None or counts[best] * 2 < count:
+                break
+            phrase += best[-1]
+            counts[best] = 0
+        phrases.append(phrase)
+        total += len(phrase)
+    return ''.join(reversed(phrases))[-size:]
+
+
+# Marker of the record that stores the dictionaries of a DictCodec.
+DICTMAGIC = 'TCDBDICT'
+
+
+class DictCodec(Codec):
+    """LZ4 codec with trained dictionaries.  Each encoded record starts
+    with the version of its dictionary (0 for none), so the records
+    written before a retraining can be decoded until they are
+    rewritten."""
+    name = 'dict'
+
+    def __init__(self):
+        """Create a dictionary codec without dictionaries."""
+        self.codecs = {0: LZ4Codec()}
+        self.version = 0
+
+    def encode(self, data, op=None):
+        """Compress a string with the current dictionary."""
+        version = self.version
+        if data.find(DICTMAGIC, 0, 16) != -1:
+            # The dictionaries themselves must be readable without them.
+            version = 0
+        return chr(version) + self.codecs[version].encode(data)
+
+    def decode(self, data, op=None):
+        """Decompress a string with the dictionary it was encoded
+        with."""
+        try:
+            codec = self.codecs[ord(data[0])]
+        except (IndexError, KeyError):
+            raise ValueError('Unknown dictionary')
+        return codec.decode(data[1:])
+
+    def add(self, dictionary):
+        """Add a dictionary and use it for the new records.  Return its
+        version."""
+        for version in xrange(1, 256):
+            if version not in self.codecs:
+                break
+        else:
+            raise tc.TCException('Too many dictionaries')
+        self.codecs[version] = LZ4Codec(dictionary)
+        self.version = version
+        return version
+
+    def drop(self):
+        """Remove every dictionary but the current one."""
+        for version in self.codecs.keys():
+            if version and version != self.version:
+                del self.codecs[version]
+
+    def dump(self):
+        """Serialize the dictionaries into a string."""
+        data = [DICTMAGIC, chr(self.version)]
+        for version, codec in sorted(self.codecs.iteritems()):
+            if version:
+                data.append(struct.pack('>BI', version,
+                                        len(codec.dictionary)))
+                data.append(codec.dictionary)
+        return ''.join(data)
+
+    def load(self, data):
+        """Load the dictionaries of a string made by dump()."""
+        if not data.startswith(DICTMAGIC):
+            raise tc.TCException('Invalid dictionaries')
+        codecs = {0: LZ4Codec()}
+        pos = len(DICTMAGIC) + 1
+        while pos < len(data):
+            version, length = struct.unpack_from('>BI', data, pos)
+            pos += struct.calcsize('>BI')
+            codecs[version] = LZ4Codec(data[pos:pos + length])
+            pos += length
+        self.codecs = codecs
+        self.version = ord(data[len(DICTMAGIC)])
+
+
+CODECS = {
+    ZlibCodec.name: ZlibCodec,
+    LZ4Codec.name: LZ4Codec,
+    DictCodec.name: DictCodec,
+    }
+
+
+def register(name, codec_class):
+    """Register a codec class with a name."""
+    CODECS[name] = codec_class
+
+
+def get(codec, **kwargs):
+    """Get a codec object from a codec object or the name of a
+    registered codec."""
+    if isinstance(codec, basestring):
+        try:
+            return CODECS[codec](**kwargs)
+        except KeyError:
+            raise tc.TCException('Unknown codec: %s' % codec)
+    return codec
+
+
+def tccodec(func):
+    """Wrap a Python codec function into a TCCODEC function.  The
+    result is copied in a region allocated with tcmalloc, that Tokyo
+    Cabinet frees."""
+    def codec_wraper(c_ptr, c_size, c_sp, c_op):
+        try:
+            op = ctypes.cast(c_op, ctypes.c_char_p).value if c_op else None
+            result = func(ctypes.string_at(c_ptr, c_size), op)
+        except Exception:
+            # Tokyo Cabinet sets a miscellaneous error.
+            return None
+        size = len(result)
+        # With a zero code at the end, as the native codecs do.
+        buf = tc.tcmalloc(size + 1)
+        ctypes.memmove(buf, result, size)
+        ctypes.memset(buf + size, 0, 1)
+        c_sp[0] = size
+        return buf
+
+    return tc.TCCODEC(codec_wraper)
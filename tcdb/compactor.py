@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Compactor is a background defragmentation scheduler for HDB, BDB and
+TDB database objects.
+
+A thread runs incremental defrag steps when the database is idle, that
+is, when the write rate is under a budget.  If the fragmentation
+estimate of metrics() grows past a threshold relative to its baseline,
+a full optimize is done.  The estimate includes headers and padding,
+so the baseline is the fragmentation measured after the last optimize
+(or at the first check), and it is never compared with an absolute
+ratio.
+
+Every step and optimize is a pause for the writers, and the pause
+times are reported.
+
+The database object must be opened with setmutex, because it is used
+from the background thread.
+
+>>> from tcdb.hdb import HDB
+>>> from tcdb.compactor import Compactor
+
+>>> db = HDB()
+>>> db.setmutex()
+True
+>>> db.open('casket.tch')
+
+>>> compactor = Compactor(db, step=100, interval=5.0, write_budget=1000)
+>>> compactor.start()
+>>> compactor.stats()['steps'] >= 0
+True
+
+>>> compactor.stop()
+>>> db.close()
+
+"""
+
+import threading
+import time
+
+import stats
+
+
+# Operations of the stats module that write records.
+WRITES = ('put', 'putkeep', 'putcat', 'putasync', 'putdup', 'putdup_iter',
+          'putdup_many', 'putdupback', 'out', 'outdup', 'add_int',
+          'add_float')
+
+
+class Compactor(object):
+    def __init__(self, db, step=100, interval=1.0, write_budget=100,
+                 threshold=2.0, check_every=10):
+        """Create a compactor for a database object.  Every interval
+        seconds, if less than write_budget writes per second were
+        done, a defrag of step steps is run.  Every check_every
+        cycles, the fragmentation is checked and if it is greater than
+        threshold times the baseline the file is optimized (None
+        disables it).  The fragmentation after the optimize is the new
+        baseline, so a file that does not shrink is not optimized
+        again until it grows past the threshold again."""
+        self.db = db
+        self.step = step
+        self.interval = interval
+        self.write_budget = write_budget
+        self.threshold = threshold
+        self.check_every = check_every
+
+        self.cycles = 0
+        self.steps = 0
+        self.skipped = 0
+        self.optimizes = 0
+        self.fragmentation = None
+        self.baseline = None
+        self.pauses = stats.Histogram()
+        self.optimize_pauses = stats.Histogram()
+
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopped = threading.Event()
+        self.last = (time.time(), self._writes())
+
+    def _writes(self):
+        """Get a counter of the writes of the database object.  If it
+        is instrumented, the stats report is used; if not, the number
+        of records and the file size are a lower bound."""
+        if hasattr(self.db, 'stats'):
+            report = self.db.stats()
+            return sum(report[name]['calls'] for name in WRITES
+                       if name in report)
+        return len(self.db) + self.db.fsiz()
+
+    def write_rate(self):
+        """Get the writes per second since the last call."""
+        now, writes = time.time(), self._writes()
+        then, before = self.last
+        self.last = (now, writes)
+        return abs(writes - before) / (now - then) if now > then else 0.0
+
+    def _pause(self, histogram, func, *args):
+        """Run a function, recording the time as a pause."""
+        start = time.time()
+        try:
+            return func(*args)
+        finally:
+            histogram.record((time.time() - start) * 1000000)
+
+    def run_once(self):
+        """Run a cycle of the compactor.  Return True if a defrag step
+        or an optimize was done."""
+        with self.lock:
+            self.cycles += 1
+            done = False
+            if self.write_budget is None or \
+                    self.write_rate() < self.write_budget:
+                self._pause(self.pauses, self.db.defrag, self.step)
+                self.steps += 1
+                done = True
+            else:
+                self.skipped += 1
+
+            if self.threshold and not self.cycles % self.check_every:
+                self.fragmentation = self.db.metrics()['fragmentation']
+                if not self.baseline:
+                    # Unknown, or an empty database.
+                    self.baseline = self.fragmentation
+                elif self.fragmentation > self.baseline * self.threshold:
+                    self._pause(self.optimize_pauses, self.db.optimize)
+                    self.optimizes += 1
+                    self.fragmentation = self.db.metrics()['fragmentation']
+                    # Even if it did not shrink, wait for it to grow again.
+                    self.baseline = self.fragmentation
+                    done = True
+                else:
+                    # Defrag steps can lower it too.
+                    self.baseline = min(self.baseline, self.fragmentation)
+            # Our own writes do not count for the budget.
+            self.last = (time.time(), self._writes())
+        return done
+
+    def _run(self):
+        """Run the cycles of the compactor until it is stopped."""
+        while not self.stopped.wait(self.interval):
+            self.run_once()
+
+    def start(self):
+        """Start the background thread."""
+        if self.thread is None:
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+
+    def stats(self):
+        """Get the counters and the pause times (in microseconds) of
+        the compactor."""
+        with self.lock:
+            return {
+                'cycles': self.cycles,
+                'steps': self.steps,
+                'skipped': self.skipped,
+                'optimizes': self.optimizes,
+                'fragmentation': self.fragmentation,
+                'baseline': self.baseline,
+                'pause_p50': self.pauses.percentile(50),
+                'pause_p99': self.pauses.percentile(99),
+                'pause_max': self.pauses.max,
+                'optimize_pause_max': self.optimize_pauses.max,
+                }
+
+    def __enter__(self):
+        """Enter in the 'with' statement and start the background
+        thread."""
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """Exit from 'with' statement and stop the background
+        thread."""
+        self.stop()
@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Map and List are containers of byte strings built on the TCMAP and
+TCLIST objects of Tokyo Cabinet.  Keys, values and elements are stored
+off the Python heap, so millions of small entries do not pay the
+overhead of Python objects and are not traversed by the garbage
+collector.
+
+Map follows the mapping protocol and keeps the insertion order.  With
+move() and cutfront() it can be used as a LRU cache.  List follows the
+sequence protocol.  Both are serialized with dump() and load(), and can
+be pickled.
+
+>>> from tcdb.containers import Map, List
+
+>>> m = Map({'foo': 'hop'})
+>>> m['bar'] = 'step'
+>>> m.keys()
+['foo', 'bar']
+>>> m.cutfront(1)
+>>> m.items()
+[('bar', 'step')]
+
+>>> l = List(['a', 'b'])
+>>> l.append('c')
+>>> l[-1]
+'c'
+>>> Map.load(m.dump()) == m
+True
+
+"""
+
+import ctypes
+import itertools
+
+import tc
+
+
+def _bytes(obj):
+    """Check that an object is a byte string."""
+    if not isinstance(obj, str):
+        raise TypeError('Expected a string, got %s' % type(obj).__name__)
+    return obj
+
+
+def _load_map(data):
+    """Unpickle a map object."""
+    return Map.load(data)
+
+
+def _load_list(data):
+    """Unpickle a list object."""
+    return List.load(data)
+
+
+class Map(object):
+    def __init__(self, data=None, bnum=0):
+        """Create a map object.  bnum is the number of buckets (0 for
+        the default).  data is an optional mapping or sequence of
+        pairs to add."""
+        self.map = tc.tcmapnew2(bnum) if bnum > 0 else tc.tcmapnew()
+        if data is not None:
+            self.update(data)
+
+    @classmethod
+    def load(cls, data):
+        """Create a map object from a string made by dump()."""
+        map_ = cls.__new__(cls)
+        map_.map = tc.tcmapload(_bytes(data), len(data))
+        return map_
+
+    def dump(self):
+        """Serialize a map object into a string."""
+        (c_data, c_data_len) = tc.tcmapdump(self.map)
+        return ctypes.string_at(c_data, c_data_len)
+
+    def __reduce__(self):
+        """Pickle a map object as its dump."""
+        return (_load_map, (self.dump(),))
+
+    def __len__(self):
+        """Get the number of records of a map object."""
+        return tc.tcmaprnum(self.map)
+
+    def msiz(self):
+        """Get the total size of memory used in a map object."""
+        return tc.tcmapmsiz(self.map)
+
+    def __setitem__(self, key, value):
+        """Store a record into a map object."""
+        tc.tcmapput(self.map, _bytes(key), len(key), _bytes(value),
+                    len(value))
+
+    def putkeep(self, key, value):
+        """Store a new record into a map object.  Return False if the
+        key exists."""
+        return tc.tcmapputkeep(self.map, _bytes(key), len(key),
+                               _bytes(value), len(value))
+
+    def putcat(self, key, value):
+        """Concatenate a value at the end of the existing record in a
+        map object."""
+        tc.tcmapputcat(self.map, _bytes(key), len(key), _bytes(value),
+                       len(value))
+
+    def __getitem__(self, key):
+        """Retrieve a record in a map object."""
+        (c_value, c_value_len) = tc.tcmapget(self.map, _bytes(key),
+                                             len(key))
+        if not c_value:
+            raise KeyError(key)
+        return ctypes.string_at(c_value, c_value_len)
+
+    def get(self, key, default=None):
+        """Retrieve a record in a map object."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __delitem__(self, key):
+        """Remove a record of a map object."""
+        if not tc.tcmapout(self.map, _bytes(key), len(key)):
+            raise KeyError(key)
+
+    def pop(self, key, *default):
+        """Remove a record of a map object and return its value."""
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[key]
+        return value
+
+    def setdefault(self, key, default=''):
+        """Retrieve a record in a map object, storing default if it
+        does not exist."""
+        self.putkeep(key, default)
+        return self[key]
+
+    def __contains__(self, key):
+        """Return True if map object has the key."""
+        (c_value, _) = tc.tcmapget(self.map, _bytes(key), len(key))
+        return bool(c_value)
+
+    def has_key(self, key):
+        """Return True if map object has the key."""
+        return key in self
+
+    def move(self, key, head=False):
+        """Move a record to the head or to the tail of a map object.
+        Moving the records used to the tail keeps the least recently
+        used ones in front, ready for cutfront()."""
+        if not tc.tcmapmove(self.map, _bytes(key), len(key), head):
+            raise KeyError(key)
+
+    def cutfront(self, num):
+        """Remove the num front (oldest) records of a map object."""
+        tc.tcmapcutfront(self.map, num)
+
+    def add_int(self, key, num):
+        """Add an integer to a record in a map object."""
+        return tc.tcmapaddint(self.map, _bytes(key), len(key), num)
+
+    def add_float(self, key, num):
+        """Add a real number to a record in a map object."""
+        return tc.tcmapadddouble(self.map, _bytes(key), len(key), num)
+
+    def clear(self):
+        """Remove all records of a map object."""
+        tc.tcmapclear(self.map)
+
+    def update(self, data=(), **kwargs):
+        """Store the records of a mapping or a sequence of pairs."""
+        if hasattr(data, 'iteritems'):
+            data = data.iteritems()
+        elif hasattr(data, 'keys'):
+            data = ((key, data[key]) for key in data.keys())
+        for key, value in data:
+            self[key] = value
+        for key, value in kwargs.iteritems():
+            self[key] = value
+
+    def iteritems(self):
+        """Iterate for every key / value in a map object.  The map
+        object has a single iterator, so iterations can not be
+        nested."""
+        tc.tcmapiterinit(self.map)
+        while True:
+            c_key, c_key_len = tc.tcmapiternext(self.map)
+            if not c_key:
+                break
+            c_value, c_value_len = tc.tcmapiterval(c_key)
+            yield (ctypes.string_at(c_key, c_key_len),
+                   ctypes.string_at(c_value, c_value_len))
+
+    def iterkeys(self):
+        """Iterate for every key in a map object."""
+        tc.tcmapiterinit(self.map)
+        while True:
+            c_key, c_key_len = tc.tcmapiternext(self.map)
+            if not c_key:
+                break
+            yield ctypes.string_at(c_key, c_key_len)
+
+    def itervalues(self):
+        """Iterate for every value in a map object."""
+        for _, value in self.iteritems():
+            yield value
+
+    def __iter__(self):
+        """Iterate for every key in a map object."""
+        return self.iterkeys()
+
+    def keys(self):
+        """Get all the keys of a map object."""
+        return list(self.iterkeys())
+
+    def values(self):
+        """Get all the values of a map object."""
+        return list(self.itervalues())
+
+    def items(self):
+        """Get all the items of a map object."""
+        return list(self.iteritems())
+
+    def __eq__(self, other):
+        """Compare the records of a map object with a mapping,
+        ignoring the order."""
+        if not isinstance(other, (Map, dict)):
+            return NotImplemented
+        return len(self) == len(other) and \
+            all(other.get(key) == value for key, value in self.iteritems())
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return 'Map(%r)' % self.items()
+
+
+class List(object):
+    def __init__(self, data=None, anum=0):
+        """Create a list object.  anum is the number of elements
+        expected (0 for the default).  data is an optional sequence
+        of elements to add."""
+        self.list = tc.tclistnew2(anum) if anum > 0 else tc.tclistnew()
+        if data is not None:
+            self.extend(data)
+
+    @classmethod
+    def load(cls, data):
+        """Create a list object from a string made by dump()."""
+        list_ = cls.__new__(cls)
+        list_.list = tc.tclistload(_bytes(data), len(data))
+        return list_
+
+    def dump(self):
+        """Serialize a list object into a string."""
+        (c_data, c_data_len) = tc.tclistdump(self.list)
+        return ctypes.string_at(c_data, c_data_len)
+
+    def __reduce__(self):
+        """Pickle a list object as its dump."""
+        return (_load_list, (self.dump(),))
+
+    def __len__(self):
+        """Get the number of elements of a list object."""
+        return tc.tclistnum(self.list)
+
+    def _index(self, index):
+        """Normalize an index of a list object."""
+        num = tc.tclistnum(self.list)
+        if index < 0:
+            index += num
+        if not 0 <= index < num:
+            raise IndexError('list index out of range')
+        return index
+
+    def __getitem__(self, index):
+        """Get an element, or a list of elements with a slice, of a
+        list object."""
+        if isinstance(index, slice):
+            return [self[i] for i in xrange(*index.indices(len(self)))]
+        (c_value, c_value_len) = tc.tclistval(self.list,
+                                              self._index(index))
+        return ctypes.string_at(c_value, c_value_len)
+
+    def __setitem__(self, index, value):
+        """Overwrite an element of a list object."""
+        tc.tclistover(self.list, self._index(index), _bytes(value),
+                      len(value))
+
+    def __delitem__(self, index):
+        """Remove an element of a list object."""
+        tc.tclistremove(self.list, self._index(index))
+
+    def append(self, value):
+        """Add an element at the end of a list object."""
+        tc.tclistpush(self.list, _bytes(value), len(value))
+
+    def appendleft(self, value):
+        """Add an element at the top of a list object."""
+        tc.tclistunshift(self.list, _bytes(value), len(value))
+
+    def extend(self, values):
+        """Add the elements of a sequence at the end of a list
+        object."""
+        push, list_ = tc.tclistpush, self.list
+        for value in values:
+            push(list_, _bytes(value), len(value))
+
+    def insert(self, index, value):
+        """Add an element before index in a list object."""
+        num = tc.tclistnum(self.list)
+        if index < 0:
+            index = max(index + num, 0)
+        tc.tclistinsert(self.list, min(index, num), _bytes(value),
+                        len(value))
+
+    def pop(self, index=-1):
+        """Remove an element of a list object and return it."""
+        index = self._index(index)
+        if index == tc.tclistnum(self.list) - 1:
+            (c_value, c_value_len) = tc.tclistpop(self.list)
+        elif index == 0:
+            (c_value, c_value_len) = tc.tclistshift(self.list)
+        else:
+            (c_value, c_value_len) = tc.tclistremove(self.list, index)
+        return ctypes.string_at(c_value, c_value_len)
+
+    def popleft(self):
+        """Remove the first element of a list object and return it."""
+        return self.pop(0)
+
+    def cutfront(self, num):
+        """Remove the num first elements of a list object."""
+        shift, list_ = tc.tclistshift, self.list
+        for _ in xrange(min(num, tc.tclistnum(list_))):
+            shift(list_)
+
+    def index(self, value):
+        """Get the index of the first element equal to value."""
+        index = tc.tclistlsearch(self.list, _bytes(value), len(value))
+        if index < 0:
+            raise ValueError('%r is not in list' % value)
+        return index
+
+    def __contains__(self, value):
+        """Return True if list object has the element."""
+        return tc.tclistlsearch(self.list, _bytes(value), len(value)) >= 0
+
+    def sort(self):
+        """Sort the elements of a list object in lexical order."""
+        tc.tclistsort(self.list)
+
+    def clear(self):
+        """Remove all elements of a list object."""
+        tc.tclistclear(self.list)
+
+    def __iter__(self):
+        """Iterate for every element of a list object."""
+        val, list_ = tc.tclistval, self.list
+        index = 0
+        while index < tc.tclistnum(list_):
+            (c_value, c_value_len) = val(list_, index)
+            yield ctypes.string_at(c_value, c_value_len)
+            index += 1
+
+    def __eq__(self, other):
+        """Compare the elements of a list object with a sequence."""
+        if not isinstance(other, (List, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and \
+            all(a == b for a, b in itertools.izip(self, other))
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return 'List(%r)' % list(self)
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Streaming dump and restore of hash, B+ tree, fixed-length and table
+database objects.
+
+A dump is a portable binary stream: a header, the records in chunks,
+and a trailer with the number of records.  Every chunk is stored with
+its size and a CRC-32 checksum, and can be compressed with zlib.  A
+record is a key and a value prefixed by their sizes, and its kind: a
+raw value or the columns of a table record.  The duplicated values of
+a B+ tree database are consecutive records with the same key, and the
+keys of a fixed-length database are decimal IDs.
+
+A dump can be restored into a database object of any type or with
+other tuning parameters.  Records are stored in transactions of batch
+records.
+
+>>> import tcdb
+>>> from tcdb import bdb
+>>> from tcdb import hdb
+
+>>> db = hdb.HDB()
+>>> db.open('casket.tch')
+>>> with open('casket.dump', 'wb') as fileobj:
+...     tcdb.dump(db, fileobj, compress=True)
+3
+>>> db.close()
+
+>>> db = bdb.BDB()
+>>> db.open('casket.tcb')
+>>> with open('casket.dump', 'rb') as fileobj:
+...     tcdb.restore(fileobj, db)
+3
+>>> db.close()
+
+"""
+
+import ctypes
+import struct
+import zlib
+
+import bdb
+import fdb
+import hdb
+import tc
+import tdb
+
+
+MAGIC = 'TCDUMP'
+VERSION = 1
+
+HEADER = struct.Struct('>BBB')  # version, database type, flags
+CHUNK = struct.Struct('>II')    # size, CRC-32 checksum
+RECORD = struct.Struct('>BII')  # kind, key size, value size
+TRAILER = struct.Struct('>Q')   # number of records
+
+# enumeration for database types
+TYPEHDB = 1                   # hash database
+TYPEBDB = 2                   # B+ tree database
+TYPEFDB = 3                   # fixed-length database
+TYPETDB = 4                   # table database
+
+# enumeration for flags
+FCOMPRESS = 1 << 0            # chunks compressed with zlib
+
+# enumeration for record kinds
+KRAW = 0                      # raw value
+KMAP = 1                      # columns of a table record, as a TCMAP dump
+
+
+def _dbtype(db):
+    """Get the type and the prefix of the tc functions of a database
+    object."""
+    if isinstance(db, hdb.HDBSimple):
+        return (TYPEHDB, 'hdb')
+    elif isinstance(db, bdb.BDBSimple):
+        return (TYPEBDB, 'bdb')
+    elif isinstance(db, fdb.FDBSimple):
+        return (TYPEFDB, 'fdb')
+    elif isinstance(db, tdb.TDB):
+        return (TYPETDB, 'tdb')
+    raise tc.TCException('Dump only supports HDB, BDB, FDB and TDB objects.')
+
+
+def _xstr(xstr):
+    """Get the content of an extensible string object."""
+    return ctypes.string_at(tc.tcxstrptr(xstr), tc.tcxstrsize(xstr))
+
+
+def _hdb_records(db):
+    """Iterate for every record of a hash database object, but the
+    dictionaries of the dictionary codec."""
+    skip = db._dictkey()
+    if not tc.hdb_iterinit(db.db):
+        raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(db.db)))
+    xstr_key = tc.tcxstrnew()
+    xstr_value = tc.tcxstrnew()
+    while tc.hdb_iternext3(db.db, xstr_key, xstr_value):
+        key = _xstr(xstr_key)
+        if key != skip:
+            yield (KRAW, key, _xstr(xstr_value))
+
+
+def _bdb_records(db):
+    """Iterate for every record of a B+ tree database object, with its
+    duplicated values."""
+    cur = tc.bdb_curnew(db.db)
+    try:
+        xstr_key = tc.tcxstrnew()
+        xstr_value = tc.tcxstrnew()
+        moved = tc.bdb_curfirst(cur)
+        while moved and tc.bdb_currec(cur, xstr_key, xstr_value):
+            yield (KRAW, _xstr(xstr_key), _xstr(xstr_value))
+            moved = tc.bdb_curnext(cur)
+    finally:
+        tc.bdb_curdel(cur)
+
+
+def _fdb_records(db):
+    """Iterate for every record of a fixed-length database object."""
+    if not tc.fdb_iterinit(db.db):
+        raise tc.TCException(tc.fdb_errmsg(tc.fdb_ecode(db.db)))
+    while True:
+        id_ = tc.fdb_iternext(db.db)
+        if not id_:
+            break
+        (c_value, c_value_len) = tc.fdb_get(db.db, id_)
+        if c_value:
+            yield (KRAW, str(id_), ctypes.string_at(c_value, c_value_len))
+
+
+def _tdb_records(db):
+    """Iterate for every record of a table database object."""
+    if not tc.tdb_iterinit(db.db):
+        raise tc.TCException(tc.tdb_errmsg(tc.tdb_ecode(db.db)))
+    while True:
+        (c_pkey, c_pkey_len) = tc.tdb_iternext(db.db)
+        if not c_pkey:
+            break
+        pkey = ctypes.string_at(c_pkey, c_pkey_len)
+        cols = tc.tdb_get(db.db, pkey, len(pkey))
+        if cols:
+            (c_data, c_data_len) = tc.tcmapdump(cols)
+            yield (KMAP, pkey, ctypes.string_at(c_data, c_data_len))
+
+
+RECORDS = {
+    TYPEHDB: _hdb_records,
+    TYPEBDB: _bdb_records,
+    TYPEFDB: _fdb_records,
+    TYPETDB: _tdb_records,
+    }
+
+
+def dump(db, fileobj, compress=False, level=1, chunk=1 << 20):
+    """Write the records of a database object into a file object.
+    Records are grouped in chunks of about chunk bytes, compressed
+    with zlib at level if compress is True.  Return the number of
+    records."""
+    (dbtype, _) = _dbtype(db)
+    flags = FCOMPRESS if compress else 0
+    fileobj.write(MAGIC + HEADER.pack(VERSION, dbtype, flags))
+
+    def write_chunk(data):
+        data = ''.join(data)
+        if compress:
+            data = zlib.compress(data, level)
+        fileobj.write(CHUNK.pack(len(data), zlib.crc32(data) & 0xffffffff))
+        fileobj.write(data)
+
+    count = 0
+    data, size = [], 0
+    for kind, key, value in RECORDS[dbtype](db):
+        data.append(RECORD.pack(kind, len(key), len(value)))
+        data.append(key)
+        data.append(value)
+        size += RECORD.size + len(key) + len(value)
+        count += 1
+        if size >= chunk:
+            write_chunk(data)
+            data, size = [], 0
+    if data:
+        write_chunk(data)
+    fileobj.write(CHUNK.pack(0, 0) + TRAILER.pack(count))
+    return count
+
+
+def _read(fileobj, size):
+    """Read exactly size bytes of a file object."""
+    data = fileobj.read(size)
+    if len(data) != size:
+        raise tc.TCException('Truncated dump')
+    return data
+
+
+def records(fileobj):
+    """Iterate for every record (kind, key, value) of a dump, checking
+    the checksums."""
+    if _read(fileobj, len(MAGIC)) != MAGIC:
+        raise tc.TCException('Invalid dump')
+    (version, _, flags) = HEADER.unpack(_read(fileobj, HEADER.size))
+    if version > VERSION:
+        raise tc.TCException('Unsupported dump version: %d' % version)
+
+    count = 0
+    while True:
+        (size, crc) = CHUNK.unpack(_read(fileobj, CHUNK.size))
+        if not size:
+            break
+        data = _read(fileobj, size)
+        if zlib.crc32(data) & 0xffffffff != crc:
+            raise tc.TCException('Invalid checksum in dump chunk')
+        if flags & FCOMPRESS:
+            data = zlib.decompress(data)
+        pos = 0
+        while pos < len(data):
+            (kind, key_len, value_len) = RECORD.unpack_from(data, pos)
+            pos += RECORD.size
+            key = data[pos:pos + key_len]
+            pos += key_len
+            value = data[pos:pos + value_len]
+            pos += value_len
+            count += 1
+            yield (kind, key, value)
+    (total,) = TRAILER.unpack(_read(fileobj, TRAILER.size))
+    if total != count:
+        raise tc.TCException('Invalid number of records in dump')
+
+
+def _put(dbtype, db, kind, key, value, last_key):
+    """Store a record of a dump into a database object."""
+    if dbtype == TYPEHDB:
+        return tc.hdb_put(db.db, key, len(key), value, len(value))
+    elif dbtype == TYPEBDB:
+        if key == last_key:
+            return tc.bdb_putdup(db.db, key, len(key), value, len(value))
+        return tc.bdb_put(db.db, key, len(key), value, len(value))
+    elif dbtype == TYPEFDB:
+        try:
+            id_ = int(key)
+        except ValueError:
+            raise tc.TCException('Invalid fixed-length database key: %r'
+                                 % key)
+        return tc.fdb_put(db.db, id_, value, len(value))
+    if kind != KMAP:
+        raise tc.TCException('Raw values can not be restored into a '
+                             'table database')
+    return tc.tdb_put(db.db, key, len(key), tc.tcmapload(value, len(value)))
+
+
+def restore(fileobj, db, batch=1000):
+    """Store the records of a dump into a database object, in
+    transactions of batch records.  The columns of table records are
+    stored as TCMAP dumps in other database types.  Return the number
+    of records."""
+    (dbtype, prefix) = _dbtype(db)
+    tranbegin = getattr(tc, prefix + '_tranbegin')
+    trancommit = getattr(tc, prefix + '_trancommit')
+    tranabort = getattr(tc, prefix + '_tranabort')
+    errmsg = getattr(tc, prefix + '_errmsg')
+    ecode = getattr(tc, prefix + '_ecode')
+
+    count = 0
+    last_key = None
+    in_tran = False
+    try:
+        for kind, key, value in records(fileobj):
+            if not in_tran:
+                if not tranbegin(db.db):
+                    raise tc.TCException(errmsg(ecode(db.db)))
+                in_tran = True
+            if not _put(dbtype, db, kind, key, value, last_key):
+                raise tc.TCException(errmsg(ecode(db.db)))
+            last_key = key
+            count += 1
+            if count % batch == 0:
+                in_tran = False
+                if not trancommit(db.db):
+                    raise tc.TCException(errmsg(ecode(db.db)))
+        if in_tran:
+            in_tran = False
+            if not trancommit(db.db):
+                raise tc.TCException(errmsg(ecode(db.db)))
+    finally:
+        if in_tran:
+            tranabort(db.db)
+    return count
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+ExpiringStore gives a time to live to the records of HDB, BDB and TDB
+database objects.
+
+The expiration time of every key is kept in a companion B+ tree
+database, twice: under a key made of the time, big-endian, and the raw
+key, so the index is ordered by time; and under the raw key alone, to
+find the time of a key.  Expired keys are missing for get, and they
+are removed by expire(), that walks the index from the oldest entry
+and stops at the first one in the future.  The cost of an expiration
+is proportional to the number of expired records, not to the size of
+the database.
+
+>>> from tcdb.hdb import HDB
+>>> from tcdb.expiry import ExpiringStore
+
+>>> db = HDB()
+>>> db.open('sessions.tch')
+
+>>> store = ExpiringStore(db, 'sessions.tcb', ttl=3600)
+>>> store.put('session-1', {'user': 'foo'})
+True
+>>> store.get('session-1')
+{'user': 'foo'}
+>>> store.expire()
+0
+
+>>> store.close()
+>>> db.close()
+
+"""
+
+import ctypes
+import struct
+import threading
+import time
+
+import bdb
+import dumper
+import hdb
+import tc
+import tdb
+import util
+
+
+TIME = struct.Struct('>Q')    # expiration time, in milliseconds
+
+# Prefixes of the keys of the index.
+PTIME = 'e'                   # time and raw key, ordered by time
+PKEY = 'k'                    # raw key, to the time
+
+# Default of the ttl arguments: the ttl of the store.  None is forever.
+DEFAULT = object()
+
+
+class ExpiringStore(object):
+    def __init__(self, db, index, ttl=None, clock=time.time):
+        """Create an expiring store over a database object.  index is
+        the companion B+ tree database object, or the path of its file.
+        ttl is the default time to live, in seconds (None to keep the
+        records forever), and clock gives the current time."""
+        (dbtype, self.prefix) = dumper._dbtype(db)
+        if dbtype == dumper.TYPEFDB:
+            raise tc.TCException('Expiration only supports HDB, BDB and '
+                                 'TDB objects.')
+        self.db = db
+        self.own_index = isinstance(index, basestring)
+        if self.own_index:
+            path = index
+            index = bdb.BDBSimple()
+            index.open(path)
+        self.index = index
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.RLock()
+
+    def _raw_key(self, key, as_raw):
+        """Get the raw key of a record, as the database object stores
+        it."""
+        if not isinstance(self.db, (hdb.HDB, bdb.BDB, tdb.TDB)):
+            # Simple classes only store strings.
+            return key
+        (c_key, c_key_len) = util.serialize(key, as_raw)
+        return ctypes.string_at(c_key, c_key_len)
+
+    def _now(self):
+        """Get the current time, in milliseconds."""
+        return int(self.clock() * 1000)
+
+    def _expires(self, raw_key):
+        """Get the expiration time of a raw key, or None."""
+        c_key = PKEY + raw_key
+        (c_value, c_value_len) = tc.bdb_get(self.index.db, c_key, len(c_key))
+        if not c_value:
+            return None
+        return TIME.unpack(ctypes.string_at(c_value, c_value_len))[0]
+
+    def _index_put(self, raw_key, expires):
+        """Store the expiration time of a raw key in the index."""
+        self._index_out(raw_key)
+        if expires is None:
+            return
+        c_time = TIME.pack(expires)
+        for c_key, c_value in ((PTIME + c_time + raw_key, ''),
+                               (PKEY + raw_key, c_time)):
+            if not tc.bdb_put(self.index.db, c_key, len(c_key), c_value,
+                              len(c_value)):
+                raise tc.TCException(tc.bdb_errmsg(
+                        tc.bdb_ecode(self.index.db)))
+
+    def _index_out(self, raw_key):
+        """Remove the expiration time of a raw key from the index."""
+        expires = self._expires(raw_key)
+        if expires is None:
+            return
+        for c_key in (PTIME + TIME.pack(expires) + raw_key, PKEY + raw_key):
+            tc.bdb_out(self.index.db, c_key, len(c_key))
+
+    def _is_expired(self, raw_key, now=None):
+        """Return True if a raw key has expired."""
+        expires = self._expires(raw_key)
+        if now is None:
+            now = self._now()
+        return expires is not None and expires <= now
+
+    def __setitem__(self, key, value):
+        """Store a record with the default time to live."""
+        return self.put(key, value)
+
+    def put(self, key, value, ttl=DEFAULT, **kwargs):
+        """Store a record that expires after ttl seconds (the default
+        time to live if not given, never if None).  Extra keyword
+        arguments (raw_key, raw_value, ...) are given to the put
+        method of the database object."""
+        if ttl is DEFAULT:
+            ttl = self.ttl
+        raw_key = self._raw_key(key, kwargs.get('raw_key', False))
+        expires = None if ttl is None else self._now() + int(ttl * 1000)
+        with self.lock:
+            # The index goes first: an entry without record is harmless.
+            self._index_put(raw_key, expires)
+            return self.db.put(key, value, **kwargs)
+
+    def touch(self, key, ttl=DEFAULT, as_raw=False):
+        """Set the time to live of an existing record (the default time
+        to live if not given, never if None).  Return False if it is
+        missing."""
+        if ttl is DEFAULT:
+            ttl = self.ttl
+        raw_key = self._raw_key(key, as_raw)
+        with self.lock:
+            if not self._has_key(raw_key):
+                return False
+            expires = None if ttl is None else self._now() + int(ttl * 1000)
+            self._index_put(raw_key, expires)
+        return True
+
+    def ttl_of(self, key, as_raw=False):
+        """Get the remaining time to live of a record in seconds, or
+        None if it never expires.  Raise KeyError if it is missing."""
+        raw_key = self._raw_key(key, as_raw)
+        now = self._now()
+        expires = self._expires(raw_key)
+        if (expires is not None and expires <= now) or \
+                not self._has_key(raw_key):
+            raise KeyError(key)
+        return None if expires is None else (expires - now) / 1000.0
+
+    def __delitem__(self, key):
+        """Remove a record and its expiration time."""
+        return self.out(key)
+
+    def out(self, key, **kwargs):
+        """Remove a record and its expiration time.  Extra keyword
+        arguments (as_raw, ...) are given to the out method of the
+        database object."""
+        raw_key = self._raw_key(key, kwargs.get('as_raw', False))
+        with self.lock:
+            if self._is_expired(raw_key):
+                raise KeyError(key)
+            result = self.db.out(key, **kwargs)
+            self._index_out(raw_key)
+        return result
+
+    def __getitem__(self, key):
+        """Retrieve a record that has not expired."""
+        if self._is_expired(self._raw_key(key, False)):
+            raise KeyError(key)
+        return self.db[key]
+
+    def get(self, key, default=None, **kwargs):
+        """Retrieve a record that has not expired.  Extra keyword
+        arguments (raw_key, value_type, ...) are given to the get
+        method of the database object."""
+        if self._is_expired(self._raw_key(key, kwargs.get('raw_key', False))):
+            return default
+        return self.db.get(key, default, **kwargs)
+
+    def _has_key(self, raw_key):
+        """Return True if the database object has a raw key."""
+        vsiz = getattr(tc, self.prefix + '_vsiz')
+        return vsiz(self.db.db, raw_key, len(raw_key)) >= 0
+
+    def __contains__(self, key):
+        """Return True if a record exists and has not expired."""
+        return self.has_key(key)
+
+    def has_key(self, key, as_raw=False):
+        """Return True if a record exists and has not expired."""
+        raw_key = self._raw_key(key, as_raw)
+        return not self._is_expired(raw_key) and self._has_key(raw_key)
+
+    def expire(self, limit=None):
+        """Remove the expired records, at most limit of them if it is
+        not None.  Return the number of expired keys."""
+        now = self._now()
+        count = 0
+        while limit is None or count < limit:
+            batch = 1000 if limit is None else min(1000, limit - count)
+            with self.lock:
+                expired = self._oldest(now, batch)
+                for raw_key, c_key in expired:
+                    self._remove(raw_key, c_key)
+            count += len(expired)
+            if len(expired) < batch:
+                break
+        return count
+
+    def _oldest(self, now, max_):
+        """Get at most max_ (raw key, index key) pairs of the index
+        that expired at now, from the oldest."""
+        expired = []
+        cur = tc.bdb_curnew(self.index.db)
+        try:
+            moved = tc.bdb_curjump(cur, PTIME, len(PTIME))
+            while moved and len(expired) < max_:
+                (c_key, c_key_len) = tc.bdb_curkey(cur)
+                c_key = ctypes.string_at(c_key, c_key_len)
+                if not c_key.startswith(PTIME):
+                    break
+                pos = len(PTIME) + TIME.size
+                if TIME.unpack(c_key[len(PTIME):pos])[0] > now:
+                    break
+                expired.append((c_key[pos:], c_key))
+                moved = tc.bdb_curnext(cur)
+        finally:
+            tc.bdb_curdel(cur)
+        return expired
+
+    def _remove(self, raw_key, c_key):
+        """Remove an expired record, then its index entries."""
+        if self.prefix == 'bdb':
+            tc.bdb_out3(self.db.db, raw_key, len(raw_key))
+        else:
+            getattr(tc, self.prefix + '_out')(self.db.db, raw_key,
+                                              len(raw_key))
+        tc.bdb_out(self.index.db, c_key, len(c_key))
+        c_key = PKEY + raw_key
+        tc.bdb_out(self.index.db, c_key, len(c_key))
+
+    def close(self):
+        """Close the index if the expiring store opened it."""
+        if self.own_index:
+            self.index.close()
+
+    def __enter__(self):
+        """Enter in the 'with' statement."""
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """Exit from 'with' statement and close the expiring store."""
+        self.close()
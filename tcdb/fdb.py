@@ -29,6 +29,8 @@ True
 import ctypes
 import datetime
 
+import layout
+import forksafe
 import tc
 import util
 
@@ -60,11 +62,13 @@ class FDBSimple(object):
 
     def __del__(self):
         """Delete a fixed-length database object."""
-        tc.fdb_del(self.db)
+        if not forksafe.is_stale(self):
+            tc.fdb_del(self.db)
 
     def setmutex(self):
         """Set mutual exclusion control of a fixed-length database
         object for threading."""
+        self._mutex = True
         return tc.fdb_setmutex(self.db)
 
     def tune(self, width=0, limsiz=0):
@@ -82,14 +86,29 @@ class FDBSimple(object):
 
         if not tc.fdb_open(self.db, path, omode):
             raise tc.TCException(tc.fdb_errmsg(tc.fdb_ecode(self.db)))
+        self._open_args = (path, omode & ~OTRUNC, width, limsiz)
+        forksafe.register(self)
 
     def close(self):
         """Close a fixed-length database object."""
+        if forksafe.forget(self):
+            # Opened before a fork, the parent process owns it.
+            self.db = tc.fdb_new()
+            return True
         result = tc.fdb_close(self.db)
         if not result:
             raise tc.TCException(tc.fdb_errmsg(tc.fdb_ecode(self.db)))
         return result
 
+    def _reopen(self):
+        """Open a fixed-length database object again in a forked child
+        process, with the parameters of its open() call and a
+        non-blocking lock."""
+        self.db = tc.fdb_new()
+        if getattr(self, '_mutex', False):
+            tc.fdb_setmutex(self.db)
+        self.open(*forksafe.child_args(self))
+
     def __setitem__(self, key, value):
         """Store any Python object into a fixed-length database
         object."""
@@ -335,6 +354,12 @@ class FDBSimple(object):
         """Get the limit ID number of a fixed-length database object."""
         return tc.fdb_limid(self.db)
 
+    def metrics(self, sample=64):
+        """Get a snapshot of the layout metrics of a fixed-length
+        database object.  The average record size is estimated from
+        the first sample records."""
+        return layout.fdb_metrics(self.db, sample)
+
     def inode(self):
         """Get the inode number of the database file of a fixed-length
         database object."""
@@ -390,6 +415,12 @@ class FDBSimple(object):
         """Return True if fixed-length database object has the key."""
         return tc.fdb_iterinit4(self.db, key)
 
+    def contains_many(self, keys):
+        """Return a bitmap with the bit i set if fixed-length database
+        object has the i-th key."""
+        iterinit4, db = tc.fdb_iterinit4, self.db
+        return util.bitmap(iterinit4(db, key) for key in keys)
+
 
 class FDB(FDBSimple):
     def __init__(self):
@@ -635,3 +666,9 @@ class FDB(FDBSimple):
     def has_key(self, key):
         """Return True if fixed-length database object has the key."""
         return tc.fdb_iterinit2(self.db, key)
+
+    def contains_many(self, keys):
+        """Return a bitmap with the bit i set if fixed-length database
+        object has the i-th key."""
+        iterinit2, db = tc.fdb_iterinit2, self.db
+        return util.bitmap(iterinit2(db, key) for key in keys)
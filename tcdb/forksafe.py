@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Fork safety of database objects, for pre-fork servers.
+
+A database object opened before a fork must not be used nor closed by
+the child process: its locks, caches and mapped regions belong to the
+parent.  After a fork, the handle of every open database object is
+replaced in the child by a stale handle.  The first time a stale
+handle is passed to Tokyo Cabinet, the database object is opened
+again with the parameters of its open() call (without OTRUNC), and
+the parent's handle is left untouched.  Closing or deleting a
+database object with a stale handle does not touch the file.
+
+The fork is detected with os.register_at_fork when available, or by
+wrapping os.fork, that is used by multiprocessing and most pre-fork
+servers.  Servers forking from C code must call after_fork() in the
+child process.
+
+Tokyo Cabinet locks the file with fcntl, and a child process does
+not inherit the locks of its parent: while the parent holds the file
+as a writer, the child cannot open it, and while the parent holds it
+as a reader, the child cannot open it as a writer.  So the child opens
+it with a non-blocking lock (OLCKNB, or the 'f' mode letter of an
+abstract database) and raises TCException if it is locked, instead of
+waiting forever.  Close the database object in the parent before the
+fork, or open it as a reader in every process; set_child_mode() sets
+the open mode of the children, for instance a reader without locking
+(ONOLCK) if the parent writes.
+
+"""
+
+import os
+import threading
+import weakref
+
+import tc
+
+
+# Open modes of hash, B+ tree, fixed-length and table databases.
+ONOLCK = 1 << 4               # open without locking
+OLCKNB = 1 << 5               # lock without blocking
+
+
+# Open database objects of this process.
+_objects = weakref.WeakSet()
+_lock = threading.RLock()
+
+
+class Stale(object):
+    """Handle of a database object opened before a fork, in the child
+    process."""
+    def __init__(self, obj):
+        self.ref = weakref.ref(obj)
+
+    @property
+    def _as_parameter_(self):
+        """Open the database object again and get its new handle."""
+        obj = self.ref()
+        with _lock:
+            if obj.db is self:
+                try:
+                    obj._reopen()
+                except tc.TCException, e:
+                    # Try again on the next use.
+                    obj.db = self
+                    raise tc.TCException('Cannot open %s again in the '
+                                         'child process, it may be locked '
+                                         'by the parent: %s'
+                                         % (obj._open_args[0], e))
+        return obj.db
+
+    def __repr__(self):
+        return '<stale handle of %r>' % self.ref()
+
+
+def register(obj):
+    """Register an open database object."""
+    _objects.add(obj)
+
+
+def forget(obj):
+    """Unregister a database object that is being closed.  Return True
+    if its handle is stale, and so it must not be closed."""
+    _objects.discard(obj)
+    return isinstance(obj.db, Stale)
+
+
+def set_child_mode(obj, omode):
+    """Set the open mode of a database object in the child processes:
+    the omode of a hash, B+ tree, fixed-length or table database
+    object, or the mode letters of an abstract database object."""
+    obj._child_omode = omode
+
+
+def child_args(obj):
+    """Get the parameters of the open() call of a database object in a
+    child process, with a non-blocking lock."""
+    args = list(obj._open_args)
+    omode = getattr(obj, '_child_omode', None)
+    if omode is not None:
+        args[1] = omode
+    if not args[1] & ONOLCK:
+        args[1] |= OLCKNB
+    return args
+
+
+def is_stale(obj):
+    """Return True if a database object was opened before a fork and
+    not used since."""
+    return isinstance(obj.db, Stale)
+
+
+def after_fork():
+    """Replace the handles of the open database objects with stale
+    handles.  Called in the child process after a fork."""
+    for obj in list(_objects):
+        obj.db = Stale(obj)
+
+
+def _install():
+    """Call after_fork in the child processes."""
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=after_fork)
+        return
+    fork = os.fork
+    if getattr(fork, 'after_fork', None) is after_fork:
+        return
+
+    def fork_wrapper():
+        pid = fork()
+        if not pid:
+            after_fork()
+        return pid
+
+    fork_wrapper.__doc__ = fork.__doc__
+    fork_wrapper.after_fork = after_fork
+    os.fork = fork_wrapper
+
+
+_install()
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+FullTextIndex gives keyword search to the records of HDB, BDB and TDB
+database objects, with an inverted index kept in a companion B+ tree
+database.
+
+Every document gets an increasing number, and every term of the index
+keeps the sorted numbers of its documents as duplicate values of its
+key: chunks of numbers, each one encoded as the difference with the
+previous one, in a variable length format.  Documents are added in
+memory and the chunks are written in batches.  A removed or replaced
+document only loses its number, and optimize() drops the dead numbers
+and merges the small chunks.
+
+Queries are made of words, that must all be found, of "quoted phrases",
+whose words must be found in sequence, and of OR between groups of
+them.  The posting lists are intersected from the shortest, with a
+galloping search in the longer ones.
+
+>>> from tcdb.hdb import HDB
+>>> from tcdb.fts import FullTextIndex
+
+>>> db = HDB()
+>>> db.open('docs.tch')
+
+>>> index = FullTextIndex(db, 'docs.tcb')
+>>> index.put('doc1', u'Tokyo Cabinet is a library of routines')
+True
+>>> index.search(u'"tokyo cabinet" OR kyoto')
+['doc1']
+
+>>> index.close()
+>>> db.close()
+
+"""
+
+import bisect
+import ctypes
+import re
+import struct
+import threading
+
+import bdb
+import dumper
+import hdb
+import tc
+import tdb
+import util
+
+
+ID = struct.Struct('>Q')      # number of a document
+CHUNK = 128                   # numbers in a chunk of a posting list
+
+# Prefixes of the keys of the index.
+PDOC = 'd'                    # raw key, to the number of the document
+PKEY = 'k'                    # number, to the type and the raw key
+PTERMS = 'f'                  # number, to the terms of the document
+PTERM = 't'                   # term, to the chunks of its posting list
+COUNTER = 'n'                 # last number of a document
+
+# Tags of the types of the keys.
+KEYTYPES = {None: 'p', str: 's', unicode: 'u', int: 'i', float: 'f'}
+TAGTYPES = dict((tag, type_) for type_, tag in KEYTYPES.iteritems())
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+QUERY = re.compile(r'"([^"]*)"|(\S+)', re.UNICODE)
+
+
+def tokenize(text):
+    """Split a text in lower case terms, encoded in UTF-8."""
+    if isinstance(text, str):
+        text = text.decode('utf-8', 'replace')
+    return [term.lower().encode('utf-8') for term in TOKEN.findall(text)]
+
+
+def _text(value):
+    """Get the text of a value: a string, or the string columns of a
+    dictionary."""
+    if isinstance(value, basestring):
+        return value
+    if isinstance(value, dict):
+        return u' '.join(col if isinstance(col, unicode)
+                         else col.decode('utf-8', 'replace')
+                         for _, col in sorted(value.items())
+                         if isinstance(col, basestring))
+    return u''
+
+
+def _encode(ids):
+    """Encode sorted numbers as a chunk: the differences with the
+    previous number, in a variable length format."""
+    buf = []
+    last = 0
+    for id_ in ids:
+        (num, last) = (id_ - last, id_)
+        while num >= 0x80:
+            buf.append(chr(num & 0x7f | 0x80))
+            num >>= 7
+        buf.append(chr(num))
+    return ''.join(buf)
+
+
+def _decode(chunk, ids):
+    """Decode the numbers of a chunk at the end of ids."""
+    (num, shift, last) = (0, 0, 0)
+    for char in chunk:
+        byte = ord(char)
+        num |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            last += num
+            ids.append(last)
+            (num, shift) = (0, 0)
+    return ids
+
+
+def _chunks(ids):
+    """Split sorted numbers in encoded chunks."""
+    return [_encode(ids[pos:pos + CHUNK])
+            for pos in xrange(0, len(ids), CHUNK)]
+
+
+def _gallop(ids, value, lo):
+    """Get the position of the first number not lower than value in
+    sorted ids, from lo, probing with steps doubling in size."""
+    (size, step, hi) = (len(ids), 1, lo)
+    while hi < size and ids[hi] < value:
+        lo = hi + 1
+        hi += step
+        step *= 2
+    return bisect.bisect_left(ids, value, lo, min(hi + 1, size))
+
+
+def intersect(lists):
+    """Get the numbers found in every sorted list."""
+    lists = sorted(lists, key=len)
+    result = lists[0] if lists else []
+    for ids in lists[1:]:
+        if not result:
+            break
+        found = []
+        pos = 0
+        for id_ in result:
+            pos = _gallop(ids, id_, pos)
+            if pos == len(ids):
+                break
+            if ids[pos] == id_:
+                found.append(id_)
+        result = found
+    return result
+
+
+def union(lists):
+    """Get the numbers found in any sorted list."""
+    return sorted(set().union(*lists))
+
+
+class FullTextIndex(object):
+    def __init__(self, db, index, text=_text, buffer=1000):
+        """Create a full text index over a database object.  index is
+        the companion B+ tree database object, or the path of its file;
+        its records are always raw, whatever its class.
+        text gets the text of a value, and the postings of buffer
+        documents are kept in memory before they are written."""
+        (dbtype, self.prefix) = dumper._dbtype(db)
+        if dbtype == dumper.TYPEFDB:
+            raise tc.TCException('Full text index only supports HDB, BDB '
+                                 'and TDB objects.')
+        self.db = db
+        self.own_index = isinstance(index, basestring)
+        if self.own_index:
+            path = index
+            index = bdb.BDBSimple()
+            index.open(path)
+        self.index = index
+        self.text = text
+        self.buffer = buffer
+        self.pending = {}
+        self.pending_docs = 0
+        self.lock = threading.RLock()
+
+    def _raw_key(self, key, as_raw):
+        """Get the raw key of a record, as the database object stores
+        it, and the tag of its type."""
+        if not isinstance(self.db, (hdb.HDB, bdb.BDB, tdb.TDB)):
+            # Simple classes only store strings.
+            return (key, KEYTYPES[str])
+        (c_key, c_key_len) = util.serialize(key, as_raw)
+        return (ctypes.string_at(c_key, c_key_len),
+                KEYTYPES[util.get_type(key, as_raw)])
+
+    def _get(self, key):
+        """Get a raw record of the index, or None."""
+        (c_value, c_value_len) = tc.bdb_get(self.index.db, key, len(key))
+        if not c_value:
+            return None
+        return ctypes.string_at(c_value, c_value_len)
+
+    def _put(self, key, value):
+        """Store a raw record in the index."""
+        if not tc.bdb_put(self.index.db, key, len(key), value, len(value)):
+            raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.index.db)))
+
+    def _putdup(self, key, values):
+        """Store raw duplicate records in the index."""
+        tclist_values = util.serialize_tclist(values, True)
+        if not tc.bdb_putdup3(self.index.db, key, len(key), tclist_values):
+            raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(self.index.db)))
+
+    def __setitem__(self, key, value):
+        """Store and index a record."""
+        return self.put(key, value)
+
+    def put(self, key, value, **kwargs):
+        """Store and index a record.  Extra keyword arguments (raw_key,
+        raw_value, ...) are given to the put method of the database
+        object."""
+        with self.lock:
+            self.add(key, self.text(value), kwargs.get('raw_key', False))
+            return self.db.put(key, value, **kwargs)
+
+    def __delitem__(self, key):
+        """Remove a record and its document."""
+        return self.out(key)
+
+    def out(self, key, **kwargs):
+        """Remove a record and its document.  Extra keyword arguments
+        (as_raw, ...) are given to the out method of the database
+        object."""
+        with self.lock:
+            result = self.db.out(key, **kwargs)
+            self.remove(key, kwargs.get('as_raw', False))
+        return result
+
+    def add(self, key, text, as_raw=False):
+        """Index the text of the document of a key, replacing its
+        previous text."""
+        (raw_key, tag) = self._raw_key(key, as_raw)
+        terms = tokenize(text)
+        with self.lock:
+            self._remove(raw_key)
+            id_ = tc.bdb_addint(self.index.db, COUNTER, len(COUNTER), 1)
+            c_id = ID.pack(id_)
+            self._put(PDOC + raw_key, c_id)
+            self._put(PKEY + c_id, tag + raw_key)
+            self._put(PTERMS + c_id, ' '.join(terms))
+            # Numbers only grow, so the posting lists stay sorted.
+            for term in set(terms):
+                self.pending.setdefault(term, []).append(id_)
+            self.pending_docs += 1
+            if self.pending_docs >= self.buffer:
+                self.flush()
+
+    def remove(self, key, as_raw=False):
+        """Remove the document of a key from the index.  Return False
+        if it is missing."""
+        (raw_key, _) = self._raw_key(key, as_raw)
+        with self.lock:
+            return self._remove(raw_key)
+
+    def _remove(self, raw_key):
+        """Remove the document of a raw key.  Its number is left in the
+        posting lists until optimize()."""
+        c_id = self._get(PDOC + raw_key)
+        if c_id is None:
+            return False
+        for c_key in (PDOC + raw_key, PKEY + c_id, PTERMS + c_id):
+            tc.bdb_out(self.index.db, c_key, len(c_key))
+        return True
+
+    def flush(self):
+        """Write the postings kept in memory."""
+        with self.lock:
+            # In the order of the keys, for the locality of the leaves.
+            for term, ids in sorted(self.pending.iteritems()):
+                self._putdup(PTERM + term, _chunks(ids))
+            self.pending = {}
+            self.pending_docs = 0
+
+    def _postings(self, term):
+        """Get the sorted numbers of the documents of a term."""
+        ids = []
+        key = PTERM + term
+        tclist_chunks = tc.bdb_get4(self.index.db, key, len(key))
+        if not tclist_chunks:
+            return ids
+        for index in xrange(tc.tclistnum(tclist_chunks)):
+            (c_chunk, c_chunk_len) = tc.tclistval(tclist_chunks, index)
+            _decode(ctypes.string_at(c_chunk, c_chunk_len), ids)
+        return ids
+
+    def _match(self, clauses):
+        """Get the numbers of the documents matching all the clauses,
+        lists of terms found in sequence."""
+        terms = set(term for clause in clauses for term in clause)
+        ids = intersect([self._postings(term) for term in terms])
+        phrases = [' %s ' % ' '.join(clause)
+                   for clause in clauses if len(clause) > 1]
+        if phrases:
+            found = []
+            for id_ in ids:
+                c_terms = self._get(PTERMS + ID.pack(id_))
+                if c_terms is None:
+                    continue
+                c_terms = ' %s ' % c_terms
+                if all(phrase in c_terms for phrase in phrases):
+                    found.append(id_)
+            ids = found
+        return ids
+
+    def _keys(self, ids, limit):
+        """Get the keys of the live documents among numbers."""
+        keys = []
+        for id_ in ids:
+            if limit is not None and len(keys) >= limit:
+                break
+            value = self._get(PKEY + ID.pack(id_))
+            if value is None:
+                continue
+            (tag, raw_key) = (value[0], value[1:])
+            if tag == KEYTYPES[str]:
+                keys.append(raw_key)
+            else:
+                keys.append(util.deserialize(ctypes.c_char_p(raw_key),
+                                             len(raw_key), TAGTYPES[tag]))
+        return keys
+
+    def search(self, query, limit=None):
+        """Get the keys of the documents matching a query, at most limit
+        of them if it is not None, in the order they were indexed.
+        Words must all be found, "quoted phrases" must be found in
+        sequence, and OR separates alternative groups."""
+        groups = [[]]
+        for phrase, word in QUERY.findall(query):
+            if word == 'OR':
+                groups.append([])
+                continue
+            terms = tokenize(phrase or word)
+            if terms:
+                groups[-1].append(terms)
+        with self.lock:
+            self.flush()
+            ids = union([self._match(clauses)
+                         for clauses in groups if clauses])
+            return self._keys(ids, limit)
+
+    def optimize(self):
+        """Drop the numbers of removed documents from the posting lists
+        and merge their chunks.  Return the number of numbers
+        dropped."""
+        count = 0
+        with self.lock:
+            self.flush()
+            tclist_keys = tc.bdb_fwmkeys(self.index.db, PTERM, len(PTERM),
+                                         -1)
+            for index in xrange(tc.tclistnum(tclist_keys)):
+                (c_key, c_key_len) = tc.tclistval(tclist_keys, index)
+                key = ctypes.string_at(c_key, c_key_len)
+                ids = self._postings(key[len(PTERM):])
+                live = [id_ for id_ in ids
+                        if self._get(PKEY + ID.pack(id_)) is not None]
+                count += len(ids) - len(live)
+                tc.bdb_out3(self.index.db, key, len(key))
+                if live:
+                    self._putdup(key, _chunks(live))
+        return count
+
+    def close(self):
+        """Write the postings kept in memory, and close the index if the
+        full text index opened it."""
+        self.flush()
+        if self.own_index:
+            self.index.close()
+
+    def __enter__(self):
+        """Enter in the 'with' statement."""
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """Exit from 'with' statement and close the full text index."""
+        self.close()
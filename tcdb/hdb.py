@@ -28,7 +28,11 @@ True
 
 import ctypes
 import datetime
+import threading
 
+import codec
+import forksafe
+import layout
 import tc
 import util
 
@@ -53,6 +57,12 @@ ONOLCK   = 1 << 4             # open without locking
 OLCKNB   = 1 << 5             # lock without blocking
 OTSYNC   = 1 << 6             # synchronize every transaction
 
+# Raw key of the record with the dictionaries of the dictionary codec,
+# so they stay in the database file.  It is neither UTF-8 nor a pickle,
+# only a raw string key could clash with it, and it is hidden from
+# len(), the iterations and fwmkeys.
+DICTKEY = '\xff\xfetcdb:dict'
+
 
 class HDBSimple(object):
     def __init__(self):
@@ -61,11 +71,13 @@ class HDBSimple(object):
 
     def __del__(self):
         """Delete a hash database object."""
-        tc.hdb_del(self.db)
+        if not forksafe.is_stale(self):
+            tc.hdb_del(self.db)
 
     def setmutex(self):
         """Set mutual exclusion control of a hash database object for
         threading."""
+        self._mutex = True
         return tc.hdb_setmutex(self.db)
 
     def tune(self, bnum=0, apow=-1, fpow=-1, opts=0):
@@ -112,14 +124,34 @@ class HDBSimple(object):
 
         if not tc.hdb_open(self.db, path, omode):
             raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
+        self._open_args = (path, omode & ~OTRUNC, bnum, apow, fpow, opts,
+                           rcnum, xmsiz, dfunit)
+        forksafe.register(self)
+        if isinstance(getattr(self, '_codec', None), codec.DictCodec):
+            self._loaddict()
 
     def close(self):
         """Close a hash database object."""
+        if forksafe.forget(self):
+            # Opened before a fork, the parent process owns it.
+            self.db = tc.hdb_new()
+            return True
         result = tc.hdb_close(self.db)
         if not result:
             raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
         return result
 
+    def _reopen(self):
+        """Open a hash database object again in a forked child
+        process, with the parameters of its open() call and a
+        non-blocking lock."""
+        self.db = tc.hdb_new()
+        if getattr(self, '_mutex', False):
+            tc.hdb_setmutex(self.db)
+        if getattr(self, '_codecfunc', None):
+            tc.hdb_setcodecfunc(self.db, *self._codecfunc)
+        self.open(*forksafe.child_args(self))
+
     def __setitem__(self, key, value):
         """Store any Python object into a hash database object."""
         return self.put(key, value)
@@ -205,12 +237,15 @@ class HDBSimple(object):
 
     def iterkeys(self):
         """Iterate for every key in a hash database object."""
+        skip = self._dictkey()
         if not tc.hdb_iterinit(self.db):
             raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
         while True:
             key = tc.hdb_iternext2(self.db)
             if not key:
                 break
+            if key.value == skip:
+                continue
             yield key.value
 
     def values(self):
@@ -219,12 +254,15 @@ class HDBSimple(object):
 
     def itervalues(self):
         """Iterate for every value in a hash database object."""
+        skip = self._dictkey()
         if not tc.hdb_iterinit(self.db):
             raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
         while True:
             key = tc.hdb_iternext2(self.db)
             if not key:
                 break
+            if key.value == skip:
+                continue
             value = tc.hdb_get2(self.db, key)
             yield value.value
 
@@ -234,12 +272,15 @@ class HDBSimple(object):
 
     def iteritems(self):
         """Iterate for every key / value in a hash database object."""
+        skip = self._dictkey()
         if not tc.hdb_iterinit(self.db):
             raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
         while True:
             key = tc.hdb_iternext2(self.db)
             if not key:
                 break
+            if key.value == skip:
+                continue
             value = tc.hdb_get2(self.db, key)
             yield key.value, value.value
 
@@ -252,7 +293,9 @@ class HDBSimple(object):
         tclist_objs = tc.hdb_fwmkeys2(self.db, prefix, max_)
         if not tclist_objs:
             raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
-        return util.deserialize_tclist(tclist_objs, str)
+        skip = self._dictkey()
+        return [key for key in util.deserialize_tclist(tclist_objs, str)
+                if key != skip]
 
     def sync(self):
         """Synchronize updated contents of a hash database object with
@@ -274,10 +317,13 @@ class HDBSimple(object):
         return result
 
     def vanish(self):
-        """Remove all records of a hash database object."""
+        """Remove all records of a hash database object, but the
+        dictionaries of the dictionary codec."""
         result = tc.hdb_vanish(self.db)
         if not result:
             raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
+        if self._dictkey():
+            self._savedict()
         return result
 
     def copy(self, path):
@@ -329,7 +375,11 @@ class HDBSimple(object):
 
     def __len__(self):
         """Get the number of records of a hash database object."""
-        return tc.hdb_rnum(self.db)
+        rnum = tc.hdb_rnum(self.db)
+        if rnum and self._dictkey() and \
+                tc.hdb_vsiz(self.db, DICTKEY, len(DICTKEY)) >= 0:
+            rnum -= 1
+        return rnum
 
     def fsiz(self):
         """Get the size of the database file of a hash database
@@ -430,14 +480,120 @@ class HDBSimple(object):
         hash database object."""
         return tc.hdb_bnumused(self.db)
 
-    # def setcodecfunc(self, enc, encop, dec, decop):
-    #     """Set the custom codec functions of a hash database
-    #     object."""
-    #     result = tc.hdb_setcodecfunc(self.db, TCCODEC(enc), encop,
-    #                                  TCCODEC(dec), decop)
-    #     if not result:
-    #         raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
-    #     return result
+    def metrics(self, sample=64):
+        """Get a snapshot of the layout metrics of a hash database
+        object.  The average record size is estimated from the first
+        sample records."""
+        return layout.hdb_metrics(self.db, sample)
+
+    def setcodecfunc(self, enc, encop, dec, decop):
+        """Set the custom codec functions of a hash database object.
+        enc and dec get a string and encop or decop, and return a
+        string."""
+        self._codecfunc = (codec.tccodec(enc), encop, codec.tccodec(dec),
+                           decop)
+        result = tc.hdb_setcodecfunc(self.db, *self._codecfunc)
+        if not result:
+            raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
+        return result
+
+    def setcodec(self, codec_='zlib', **kwargs):
+        """Set a codec object, or the name of a registered codec, as
+        the custom codec of a hash database object.  The default is
+        zlib at level 1, the fastest."""
+        self._codec = codec.get(codec_, **kwargs)
+        return self.setcodecfunc(self._codec.encode, None,
+                                 self._codec.decode, None)
+
+    def _dictcodec(self):
+        """Get the dictionary codec of a hash database object."""
+        codec_ = getattr(self, '_codec', None)
+        if not isinstance(codec_, codec.DictCodec):
+            raise tc.TCException('The dictionary codec is not set')
+        return codec_
+
+    def _dictkey(self):
+        """Get the raw key of the record of the dictionaries, if the
+        dictionary codec is set, or None."""
+        if isinstance(getattr(self, '_codec', None), codec.DictCodec):
+            return DICTKEY
+        return None
+
+    def _loaddict(self):
+        """Load the dictionaries of a hash database object, from their
+        record."""
+        (c_value, c_value_len) = tc.hdb_get(self.db, DICTKEY, len(DICTKEY))
+        if c_value:
+            self._codec.load(ctypes.string_at(c_value, c_value_len))
+
+    def _savedict(self):
+        """Store the dictionaries of a hash database object in their
+        record."""
+        value = self._codec.dump()
+        if not tc.hdb_put(self.db, DICTKEY, len(DICTKEY), value, len(value)):
+            raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
+
+    def _rawkeys(self, max_=-1):
+        """Get the raw keys of a hash database object, without the
+        record of the dictionaries and without using its iterator."""
+        tclist_keys = tc.hdb_fwmkeys(self.db, '', 0, max_)
+        for index in xrange(tc.tclistnum(tclist_keys)):
+            (c_key, c_key_len) = tc.tclistval(tclist_keys, index)
+            key = ctypes.string_at(c_key, c_key_len)
+            if key != DICTKEY:
+                yield key
+
+    def train(self, sample=1000, size=4096):
+        """Train a compression dictionary with the values of sample
+        records of a hash database object, and compress the new
+        records with it.  The dictionary codec must be set.  Return the
+        version of the dictionary."""
+        codec_ = self._dictcodec()
+        samples = []
+        for key in self._rawkeys(sample):
+            (c_value, c_value_len) = tc.hdb_get(self.db, key, len(key))
+            if c_value:
+                samples.append(ctypes.string_at(c_value, c_value_len))
+        version = codec_.add(codec.train(samples, size))
+        self._savedict()
+        return version
+
+    def retrain(self, sample=1000, size=4096, batch=1000, background=False):
+        """Train a new compression dictionary and rewrite every record
+        of a hash database object with it, in transactions of batch
+        records.  The old dictionaries are removed at the end.  If
+        background is True, the records are rewritten in a thread, that
+        is returned (setmutex must be called before open)."""
+        self.train(sample, size)
+        if background:
+            thread = threading.Thread(target=self._rewrite, args=(batch,))
+            thread.daemon = True
+            thread.start()
+            return thread
+        return self._rewrite(batch)
+
+    def _rewrite(self, batch):
+        """Rewrite every record of a hash database object with the
+        current dictionary.  Return the number of records."""
+        codec_ = self._dictcodec()
+        keys = list(self._rawkeys())
+        for start in xrange(0, len(keys), batch):
+            if not tc.hdb_tranbegin(self.db):
+                raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
+            for key in keys[start:start + batch]:
+                (c_value, c_value_len) = tc.hdb_get(self.db, key, len(key))
+                if not c_value:
+                    continue
+                value = ctypes.string_at(c_value, c_value_len)
+                if not tc.hdb_put(self.db, key, len(key), value, len(value)):
+                    ecode = tc.hdb_ecode(self.db)
+                    tc.hdb_tranabort(self.db)
+                    raise tc.TCException(tc.hdb_errmsg(ecode))
+            if not tc.hdb_trancommit(self.db):
+                raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
+        codec_.drop()
+        self._savedict()
+        return len(keys)
 
     # def codecfunc(self):
     #     """Get the custom codec functions of a hash database
@@ -465,9 +621,13 @@ class HDBSimple(object):
     def foreach(self, proc, op):
         """Process each record atomically of a hash database
         object."""
+        skip = self._dictkey()
+
         def proc_wraper(c_key, c_key_len, c_value, c_value_len, op):
             key = util.deserialize(ctypes.cast(c_key, ctypes.c_void_p),
                                    c_key_len, str)
+            if key == skip:
+                return True
             value = util.deserialize(ctypes.cast(c_value, ctypes.c_void_p),
                                      c_value_len, str)
             return proc(key, value, ctypes.cast(op, ctypes.c_char_p).value)
@@ -492,6 +652,12 @@ class HDBSimple(object):
         """Return True if hash database object has the key."""
         return tc.hdb_iterinit3(self.db, key)
 
+    def contains_many(self, keys):
+        """Return a bitmap with the bit i set if hash database object
+        has the i-th key."""
+        iterinit3, db = tc.hdb_iterinit3, self.db
+        return util.bitmap(iterinit3(db, key) for key in keys)
+
 
 class HDB(HDBSimple):
     def __init__(self):
@@ -670,12 +836,15 @@ class HDB(HDBSimple):
 
     def iterkeys(self, as_type=None):
         """Iterate for every key in a hash database object."""
+        skip = self._dictkey()
         if not tc.hdb_iterinit(self.db):
             raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
         while True:
             c_key, c_key_len = tc.hdb_iternext(self.db)
             if not c_key:
                 break
+            if skip and ctypes.string_at(c_key, c_key_len) == skip:
+                continue
             key = util.deserialize(c_key, c_key_len, as_type)
             yield key
 
@@ -685,12 +854,15 @@ class HDB(HDBSimple):
 
     def itervalues(self, as_type=None):
         """Iterate for every value in a hash database object."""
+        skip = self._dictkey()
         if not tc.hdb_iterinit(self.db):
             raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
         while True:
             c_key, c_key_len = tc.hdb_iternext(self.db)
             if not c_key:
                 break
+            if skip and ctypes.string_at(c_key, c_key_len) == skip:
+                continue
             (c_value, c_value_len) = tc.hdb_get(self.db, c_key, c_key_len)
             value = util.deserialize(c_value, c_value_len, as_type)
             yield value
@@ -701,6 +873,7 @@ class HDB(HDBSimple):
 
     def iteritems(self, key_type=None, value_type=None):
         """Iterate for every key / value in a hash database object."""
+        skip = self._dictkey()
         if not tc.hdb_iterinit(self.db):
             raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
         while True:
@@ -709,6 +882,8 @@ class HDB(HDBSimple):
             result = tc.hdb_iternext3(self.db, xstr_key, xstr_value)
             if not result:
                 break
+            if skip and util.deserialize_xstr(xstr_key, str) == skip:
+                continue
             key = util.deserialize_xstr(xstr_key, key_type)
             value = util.deserialize_xstr(xstr_value, value_type)
             yield (key, value)
@@ -720,7 +895,14 @@ class HDB(HDBSimple):
         if not tclist_objs:
             raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(self.db)))
         as_type = util.get_type(prefix, as_raw)
-        return util.deserialize_tclist(tclist_objs, as_type)
+        skip = self._dictkey()
+        keys = []
+        for index in xrange(tc.tclistnum(tclist_objs)):
+            (c_key, c_key_len) = tc.tclistval(tclist_objs, index)
+            if skip and ctypes.string_at(c_key, c_key_len) == skip:
+                continue
+            keys.append(util.deserialize(c_key, c_key_len, as_type))
+        return keys
 
     def add_int(self, key, num, as_raw=False):
         """Add an integer to a record in a hash database object."""
@@ -743,7 +925,11 @@ class HDB(HDBSimple):
     def foreach(self, proc, op, key_type=None, value_type=None):
         """Process each record atomically of a hash database
         object."""
+        skip = self._dictkey()
+
         def proc_wraper(c_key, c_key_len, c_value, c_value_len, op):
+            if skip and ctypes.string_at(c_key, c_key_len) == skip:
+                return True
             key = util.deserialize(ctypes.cast(c_key, ctypes.c_void_p),
                                    c_key_len, key_type)
             value = util.deserialize(ctypes.cast(c_value, ctypes.c_void_p),
@@ -759,3 +945,10 @@ class HDB(HDBSimple):
         """Return True if hash database object has the key."""
         (c_key, c_key_len) = util.serialize(key, raw_key)
         return tc.hdb_iterinit2(self.db, c_key, c_key_len)
+
+    def contains_many(self, keys, raw_key=False):
+        """Return a bitmap with the bit i set if hash database object
+        has the i-th key."""
+        serialize, iterinit2, db = util.serialize, tc.hdb_iterinit2, self.db
+        return util.bitmap(iterinit2(db, *serialize(key, raw_key))
+                           for key in keys)
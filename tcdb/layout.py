@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Layout metrics of hash, B+ tree, fixed-length and table database
+objects, used by the metrics() methods.
+
+Every function gets the C database object and returns a dictionary
+with the raw figures reported by Tokyo Cabinet, and the derived
+ones:
+
+load_factor      -- records per element of the bucket array.
+bucket_usage     -- ratio of used elements of the bucket array.
+record_size      -- average size (key + value) of the records,
+                    estimated from the first records of the database.
+data_size        -- estimated size of the records (rnum * record_size).
+fragmentation    -- size of the record region of the file divided by
+                    data_size.  Values far from 1.0 mean wasted space
+                    (free blocks, padding or record headers).
+map_coverage     -- ratio of the file covered by the mapped region.
+
+All the figures are cheap to compute and can be polled frequently.
+
+"""
+
+import tc
+import util
+
+
+HEADSIZ = 256                 # size of the header of a database file
+TLARGE = 1 << 0               # option of 64-bit bucket array
+FBPALWRAT = 2                 # allowance ratio of the free block pool
+
+
+def _ratio(a, b):
+    """Divide two numbers, returning 0.0 if the divisor is zero."""
+    return float(a) / b if b else 0.0
+
+
+def _record_size(db, fwmkeys, vsiz, sample):
+    """Estimate the average size of the records from the first sample
+    keys.  The key order does not use the iterator of the database
+    object."""
+    if not sample:
+        return 0.0
+    keys = util.deserialize_tclist(fwmkeys(db, '', sample), str)
+    sizes = [len(key) + vsiz(db, key, len(key)) for key in keys]
+    sizes = [size for size in sizes if size >= 0]
+    return _ratio(sum(sizes), len(sizes))
+
+
+def _derive(metrics):
+    """Add the derived figures to a metrics dictionary."""
+    fsiz, rnum = metrics['fsiz'], metrics['rnum']
+    overhead = metrics['overhead']
+    data_size = rnum * metrics['record_size']
+    metrics['data_size'] = data_size
+    metrics['fragmentation'] = _ratio(max(fsiz - overhead, 0), data_size)
+    if 'bnum' in metrics:
+        metrics['load_factor'] = _ratio(rnum, metrics['bnum'])
+        metrics['bucket_usage'] = _ratio(metrics['bnumused'],
+                                         metrics['bnum'])
+    if 'xmsiz' in metrics:
+        metrics['map_coverage'] = min(1.0, _ratio(overhead +
+                                                  metrics['xmsiz'], fsiz))
+    return metrics
+
+
+def _overhead(bnum, fbpmax, large):
+    """Get the size of the header, the bucket array and the free block
+    pool of a hash database file."""
+    return HEADSIZ + bnum * (8 if large else 4) + fbpmax * FBPALWRAT
+
+
+def hdb_metrics(db, sample=64):
+    """Get the layout metrics of a hash database object."""
+    bnum, fbpmax = tc.hdb_bnum(db), tc.hdb_fbpmax(db)
+    return _derive({
+        'rnum': tc.hdb_rnum(db),
+        'fsiz': tc.hdb_fsiz(db),
+        'bnum': bnum,
+        'bnumused': tc.hdb_bnumused(db),
+        'align': tc.hdb_align(db),
+        'fbpmax': fbpmax,
+        'xmsiz': tc.hdb_xmsiz(db),
+        'dfunit': tc.hdb_dfunit(db),
+        'overhead': _overhead(bnum, fbpmax, tc.hdb_opts(db) & TLARGE),
+        'record_size': _record_size(db, tc.hdb_fwmkeys2, tc.hdb_vsiz,
+                                    sample),
+        })
+
+
+def bdb_metrics(db, sample=64, xmsiz=0):
+    """Get the layout metrics of a B+ tree database object.  Tokyo
+    Cabinet has not a getter for xmsiz, so it is given by the
+    caller."""
+    bnum, fbpmax = tc.bdb_bnum(db), tc.bdb_fbpmax(db)
+    rnum, lnum, nnum = tc.bdb_rnum(db), tc.bdb_lnum(db), tc.bdb_nnum(db)
+    lmemb = tc.bdb_lmemb(db)
+    return _derive({
+        'rnum': rnum,
+        'fsiz': tc.bdb_fsiz(db),
+        'bnum': bnum,
+        'bnumused': tc.bdb_bnumused(db),
+        'align': tc.bdb_align(db),
+        'fbpmax': fbpmax,
+        'xmsiz': xmsiz,
+        'dfunit': tc.bdb_dfunit(db),
+        'lmemb': lmemb,
+        'nmemb': tc.bdb_nmemb(db),
+        'lnum': lnum,
+        'nnum': nnum,
+        # Records per leaf node, and how full are the leaves.
+        'leaf_records': _ratio(rnum, lnum),
+        'leaf_fill': _ratio(rnum, lnum * lmemb),
+        # Every node but the root is the child of a non-leaf node.
+        'fanout': _ratio(lnum + nnum - 1, nnum),
+        'overhead': _overhead(bnum, fbpmax, tc.bdb_opts(db) & TLARGE),
+        'record_size': _record_size(db, tc.bdb_fwmkeys2, tc.bdb_vsiz,
+                                    sample),
+        })
+
+
+def fdb_metrics(db, sample=64):
+    """Get the layout metrics of a fixed-length database object.  The
+    whole file is mapped, so map_coverage is always 1.0."""
+    width = tc.fdb_width(db)
+    rnum, min_, max_ = tc.fdb_rnum(db), tc.fdb_min(db), tc.fdb_max(db)
+    # Every record has a prefix with the size of the value.
+    rsiz = width + (1 if width <= 0xff else 2 if width <= 0xffff else 4)
+    sizes = [tc.fdb_vsiz(db, id_)
+             for id_ in xrange(min_, min(min_ + sample, max_ + 1))]
+    sizes = [size for size in sizes if size >= 0]
+    metrics = _derive({
+        'rnum': rnum,
+        'fsiz': tc.fdb_fsiz(db),
+        'width': width,
+        'limsiz': tc.fdb_limsiz(db),
+        'limid': tc.fdb_limid(db),
+        'min': min_,
+        'max': max_,
+        'overhead': HEADSIZ,
+        'record_size': _ratio(sum(sizes), len(sizes)),
+        })
+    # Holes in the ID space are the fragmentation of a fixed-length
+    # database, so it is measured in record slots.
+    metrics['fragmentation'] = _ratio(max(metrics['fsiz'] - HEADSIZ, 0),
+                                      rnum * rsiz)
+    metrics['id_usage'] = _ratio(rnum, max_)
+    metrics['map_coverage'] = 1.0
+    return metrics
+
+
+def tdb_metrics(db, sample=64, xmsiz=67108864):
+    """Get the layout metrics of a table database object.  Tokyo
+    Cabinet has not a getter for xmsiz, so it is given by the
+    caller."""
+    bnum, fbpmax = tc.tdb_bnum(db), tc.tdb_fbpmax(db)
+    return _derive({
+        'rnum': tc.tdb_rnum(db),
+        'fsiz': tc.tdb_fsiz(db),
+        'bnum': bnum,
+        'bnumused': tc.tdb_bnumused(db),
+        'align': tc.tdb_align(db),
+        'fbpmax': fbpmax,
+        'xmsiz': xmsiz,
+        'dfunit': tc.tdb_dfunit(db),
+        'inum': tc.tdb_inum(db),
+        'overhead': _overhead(bnum, fbpmax, tc.tdb_opts(db) & TLARGE),
+        'record_size': _record_size(db, tc.tdb_fwmkeys2, tc.tdb_vsiz,
+                                    sample),
+        })
@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+MDB is an implementation of bsddb-like API for Tokyo Cabinet on-memory
+hash database.
+
+An on-memory hash database lives in the process, is thread safe, and
+keeps the records in insertion order.  With capnum or capsiz it can be
+used as a bounded cache: when a limit is exceeded, the oldest records
+are removed.
+
+>>> from tcdb.mdb import MDB
+
+>>> db = MDB(capnum=1000)  # Keep up to 1000 records
+
+>>> db.put("foo", "hop")
+True
+>>> db.put("bar", "step")
+True
+>>> db.put("baz", "jump")
+True
+
+>>> db.get("foo")
+'hop'
+
+"""
+
+import ctypes
+
+import tc
+import util
+
+
+class MDBSimple(object):
+    def __init__(self, bnum=0, capnum=0, capsiz=0):
+        """Create an on-memory hash database object.  bnum is the
+        number of buckets (0 for the default).  If capnum or capsiz
+        are greater than 0, they limit the number of records and the
+        memory usage; the oldest records are removed when they are
+        exceeded."""
+        self.db = tc.mdb_new2(bnum) if bnum > 0 else tc.mdb_new()
+        self.capnum = capnum
+        self.capsiz = capsiz
+
+    def __del__(self):
+        """Delete an on-memory hash database object."""
+        tc.mdb_del(self.db)
+
+    def _limit(self):
+        """Remove the oldest records while the limits are exceeded."""
+        if self.capnum > 0:
+            excess = tc.mdb_rnum(self.db) - self.capnum
+            if excess > 0:
+                tc.mdb_cutfront(self.db, excess)
+        if self.capsiz > 0:
+            # As the ADB does, cut a fraction of the records at a time.
+            while tc.mdb_msiz(self.db) > self.capsiz:
+                rnum = tc.mdb_rnum(self.db)
+                if not rnum:
+                    break
+                tc.mdb_cutfront(self.db, rnum // 256 + 1)
+
+    def __setitem__(self, key, value):
+        """Store any Python object into an on-memory hash database
+        object."""
+        return self.put(key, value)
+
+    def put(self, key, value):
+        """Store a string record into an on-memory hash database
+        object."""
+        tc.mdb_put2(self.db, key, value)
+        self._limit()
+        return True
+
+    def putkeep(self, key, value):
+        """Store a new string record into an on-memory hash database
+        object."""
+        result = tc.mdb_putkeep2(self.db, key, value)
+        if result:
+            self._limit()
+        return result
+
+    def putcat(self, key, value):
+        """Concatenate a string value at the end of the existing
+        record in an on-memory hash database object."""
+        tc.mdb_putcat2(self.db, key, value)
+        self._limit()
+        return True
+
+    def __delitem__(self, key):
+        """Remove a string record of an on-memory hash database
+        object."""
+        return self.out(key)
+
+    def out(self, key):
+        """Remove a string record of an on-memory hash database
+        object."""
+        result = tc.mdb_out2(self.db, key)
+        if not result:
+            raise KeyError(key)
+        return result
+
+    def __getitem__(self, key):
+        """Retrieve a Python object in an on-memory hash database
+        object."""
+        return self._getitem(key)
+
+    def _getitem(self, key):
+        """Retrieve a Python object in an on-memory hash database
+        object."""
+        value = tc.mdb_get2(self.db, key)
+        if not value:
+            raise KeyError(key)
+        return value.value
+
+    def get(self, key, default=None):
+        """Retrieve a Python object in an on-memory hash database
+        object."""
+        try:
+            value = self._getitem(key)
+        except KeyError:
+            value = default
+        return value
+
+    def vsiz(self, key):
+        """Get the size of the value of a Python object in an
+        on-memory hash database object."""
+        result = tc.mdb_vsiz2(self.db, key)
+        if result == -1:
+            raise KeyError(key)
+        return result
+
+    def keys(self):
+        """Get all the keys of an on-memory hash database object."""
+        return list(self.iterkeys())
+
+    def iterkeys(self):
+        """Iterate for every key in an on-memory hash database
+        object."""
+        tc.mdb_iterinit(self.db)
+        while True:
+            key = tc.mdb_iternext2(self.db)
+            if not key:
+                break
+            yield key.value
+
+    def values(self):
+        """Get all the values of an on-memory hash database object."""
+        return list(self.itervalues())
+
+    def itervalues(self):
+        """Iterate for every value in an on-memory hash database
+        object."""
+        for _, value in self.iteritems():
+            yield value
+
+    def items(self):
+        """Get all the items of an on-memory hash database object."""
+        return list(self.iteritems())
+
+    def iteritems(self):
+        """Iterate for every key / value in an on-memory hash database
+        object."""
+        tc.mdb_iterinit(self.db)
+        while True:
+            key = tc.mdb_iternext2(self.db)
+            if not key:
+                break
+            value = tc.mdb_get2(self.db, key)
+            # The record can be removed by another thread.
+            if value:
+                yield key.value, value.value
+
+    def __iter__(self):
+        """Iterate for every key in an on-memory hash database
+        object."""
+        return self.iterkeys()
+
+    def fwmkeys(self, prefix, max_=-1):
+        """Get forward matching string keys in an on-memory hash
+        database object."""
+        tclist_objs = tc.mdb_fwmkeys2(self.db, prefix, max_)
+        return util.deserialize_tclist(tclist_objs, str)
+
+    def vanish(self):
+        """Remove all records of an on-memory hash database object."""
+        tc.mdb_vanish(self.db)
+        return True
+
+    def cutfront(self, num):
+        """Remove the num oldest records of an on-memory hash database
+        object."""
+        tc.mdb_cutfront(self.db, num)
+        return True
+
+    def __len__(self):
+        """Get the number of records of an on-memory hash database
+        object."""
+        return tc.mdb_rnum(self.db)
+
+    def msiz(self):
+        """Get the total size of memory used in an on-memory hash
+        database object."""
+        return tc.mdb_msiz(self.db)
+
+    def foreach(self, proc, op):
+        """Process each record atomically of an on-memory hash
+        database object.  The database object can not be used inside
+        proc."""
+        def proc_wraper(c_key, c_key_len, c_value, c_value_len, op):
+            key = util.deserialize(ctypes.cast(c_key, ctypes.c_void_p),
+                                   c_key_len, str)
+            value = util.deserialize(ctypes.cast(c_value, ctypes.c_void_p),
+                                     c_value_len, str)
+            return proc(key, value, ctypes.cast(op, ctypes.c_char_p).value)
+
+        tc.mdb_foreach(self.db, tc.TCITER(proc_wraper), op)
+        return True
+
+    def __contains__(self, key):
+        """Return True if on-memory hash database object has the
+        key."""
+        return self.has_key(key)
+
+    def has_key(self, key):
+        """Return True if on-memory hash database object has the
+        key."""
+        return tc.mdb_vsiz2(self.db, key) != -1
+
+    def contains_many(self, keys):
+        """Return a bitmap with the bit i set if on-memory hash
+        database object has the i-th key."""
+        vsiz2, db = tc.mdb_vsiz2, self.db
+        return util.bitmap(vsiz2(db, key) != -1 for key in keys)
+
+
+class MDB(MDBSimple):
+    def __init__(self, bnum=0, capnum=0, capsiz=0):
+        """Create an on-memory hash database object."""
+        MDBSimple.__init__(self, bnum, capnum, capsiz)
+
+    def put(self, key, value, raw_key=False, raw_value=False):
+        """Store any Python object into an on-memory hash database
+        object."""
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        (c_value, c_value_len) = util.serialize(value, raw_value)
+        tc.mdb_put(self.db, c_key, c_key_len, c_value, c_value_len)
+        self._limit()
+        return True
+
+    def put_str(self, key, value, as_raw=False):
+        """Store a string record into an on-memory hash database
+        object."""
+        assert isinstance(value, str), 'Value is not a string'
+        return self.put(key, value, as_raw, True)
+
+    def put_unicode(self, key, value, as_raw=False):
+        """Store an unicode string record into an on-memory hash
+        database object."""
+        assert isinstance(value, unicode), 'Value is not an unicode string'
+        return self.put(key, value, as_raw, True)
+
+    def put_int(self, key, value, as_raw=False):
+        """Store an integer record into an on-memory hash database
+        object."""
+        assert isinstance(value, int), 'Value is not an integer'
+        return self.put(key, value, as_raw, True)
+
+    def put_float(self, key, value, as_raw=False):
+        """Store a double precision record into an on-memory hash
+        database object."""
+        assert isinstance(value, float), 'Value is not a float'
+        return self.put(key, value, as_raw, True)
+
+    def putkeep(self, key, value, raw_key=False, raw_value=False):
+        """Store a new Python object into an on-memory hash database
+        object."""
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        (c_value, c_value_len) = util.serialize(value, raw_value)
+        result = tc.mdb_putkeep(self.db, c_key, c_key_len, c_value,
+                                c_value_len)
+        if result:
+            self._limit()
+        return result
+
+    def putkeep_str(self, key, value, as_raw=False):
+        """Store a new string record into an on-memory hash database
+        object."""
+        assert isinstance(value, str), 'Value is not a string'
+        return self.putkeep(key, value, as_raw, True)
+
+    def putkeep_unicode(self, key, value, as_raw=False):
+        """Store a new unicode string record into an on-memory hash
+        database object."""
+        assert isinstance(value, unicode), 'Value is not an unicode string'
+        return self.putkeep(key, value, as_raw, True)
+
+    def putkeep_int(self, key, value, as_raw=False):
+        """Store a new integer record into an on-memory hash database
+        object."""
+        assert isinstance(value, int), 'Value is not an integer'
+        return self.putkeep(key, value, as_raw, True)
+
+    def putkeep_float(self, key, value, as_raw=False):
+        """Store a new double precision record into an on-memory hash
+        database object."""
+        assert isinstance(value, float), 'Value is not a float'
+        return self.putkeep(key, value, as_raw, True)
+
+    def putcat(self, key, value, raw_key=False, raw_value=False):
+        """Concatenate an object value at the end of the existing
+        record in an on-memory hash database object."""
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        (c_value, c_value_len) = util.serialize(value, raw_value)
+        tc.mdb_putcat(self.db, c_key, c_key_len, c_value, c_value_len)
+        self._limit()
+        return True
+
+    def putcat_str(self, key, value, as_raw=False):
+        """Concatenate a string value at the end of the existing
+        record in an on-memory hash database object."""
+        assert isinstance(value, str), 'Value is not a string'
+        return self.putcat(key, value, as_raw, True)
+
+    def putcat_unicode(self, key, value, as_raw=False):
+        """Concatenate an unicode string value at the end of the
+        existing record in an on-memory hash database object."""
+        assert isinstance(value, unicode), 'Value is not an unicode string'
+        return self.putcat(key, value, as_raw, True)
+
+    def out(self, key, as_raw=False):
+        """Remove a Python object of an on-memory hash database
+        object."""
+        (c_key, c_key_len) = util.serialize(key, as_raw)
+        result = tc.mdb_out(self.db, c_key, c_key_len)
+        if not result:
+            raise KeyError(key)
+        return result
+
+    def _getitem(self, key, raw_key=False, value_type=None):
+        """Retrieve a Python object in an on-memory hash database
+        object."""
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        (c_value, c_value_len) = tc.mdb_get(self.db, c_key, c_key_len)
+        if not c_value:
+            raise KeyError(key)
+        return util.deserialize(c_value, c_value_len, value_type)
+
+    def get(self, key, default=None, raw_key=False, value_type=None):
+        """Retrieve a Python object in an on-memory hash database
+        object."""
+        try:
+            value = self._getitem(key, raw_key, value_type)
+        except KeyError:
+            value = default
+        return value
+
+    def get_str(self, key, default=None, as_raw=False):
+        """Retrieve a string record in an on-memory hash database
+        object."""
+        return self.get(key, default, as_raw, str)
+
+    def get_unicode(self, key, default=None, as_raw=False):
+        """Retrieve an unicode string record in an on-memory hash
+        database object."""
+        return self.get(key, default, as_raw, unicode)
+
+    def get_int(self, key, default=None, as_raw=False):
+        """Retrieve an integer record in an on-memory hash database
+        object."""
+        return self.get(key, default, as_raw, int)
+
+    def get_float(self, key, default=None, as_raw=False):
+        """Retrieve a double precision record in an on-memory hash
+        database object."""
+        return self.get(key, default, as_raw, float)
+
+    def vsiz(self, key, as_raw=False):
+        """Get the size of the value of a Python object in an
+        on-memory hash database object."""
+        (c_key, c_key_len) = util.serialize(key, as_raw)
+        result = tc.mdb_vsiz(self.db, c_key, c_key_len)
+        if result == -1:
+            raise KeyError(key)
+        return result
+
+    def keys(self, as_type=None):
+        """Get all the keys of an on-memory hash database object."""
+        return list(self.iterkeys(as_type))
+
+    def iterkeys(self, as_type=None):
+        """Iterate for every key in an on-memory hash database
+        object."""
+        tc.mdb_iterinit(self.db)
+        while True:
+            c_key, c_key_len = tc.mdb_iternext(self.db)
+            if not c_key:
+                break
+            key = util.deserialize(c_key, c_key_len, as_type)
+            yield key
+
+    def values(self, as_type=None):
+        """Get all the values of an on-memory hash database object."""
+        return list(self.itervalues(as_type))
+
+    def itervalues(self, as_type=None):
+        """Iterate for every value in an on-memory hash database
+        object."""
+        for _, value in self.iteritems(str, as_type):
+            yield value
+
+    def items(self, key_type=None, value_type=None):
+        """Get all the items of an on-memory hash database object."""
+        return list(self.iteritems(key_type, value_type))
+
+    def iteritems(self, key_type=None, value_type=None):
+        """Iterate for every key / value in an on-memory hash database
+        object."""
+        tc.mdb_iterinit(self.db)
+        while True:
+            c_key, c_key_len = tc.mdb_iternext(self.db)
+            if not c_key:
+                break
+            (c_value, c_value_len) = tc.mdb_get(self.db, c_key, c_key_len)
+            # The record can be removed by another thread.
+            if not c_value:
+                continue
+            key = util.deserialize(c_key, c_key_len, key_type)
+            value = util.deserialize(c_value, c_value_len, value_type)
+            yield (key, value)
+
+    def fwmkeys(self, prefix, max_=-1, as_raw=True):
+        """Get forward matching string keys in an on-memory hash
+        database object."""
+        (c_prefix, c_prefix_len) = util.serialize(prefix, as_raw)
+        tclist_objs = tc.mdb_fwmkeys(self.db, c_prefix, c_prefix_len, max_)
+        as_type = util.get_type(prefix, as_raw)
+        return util.deserialize_tclist(tclist_objs, as_type)
+
+    def add_int(self, key, num, as_raw=False):
+        """Add an integer to a record in an on-memory hash database
+        object."""
+        assert isinstance(num, int), 'Value is not an integer'
+        (c_key, c_key_len) = util.serialize(key, as_raw)
+        result = tc.mdb_addint(self.db, c_key, c_key_len, num)
+        if result == tc.INT_MIN:
+            raise tc.TCException('The record is not an integer')
+        self._limit()
+        return result
+
+    def add_float(self, key, num, as_raw=False):
+        """Add a real number to a record in an on-memory hash database
+        object."""
+        assert isinstance(num, float), 'Value is not a float'
+        (c_key, c_key_len) = util.serialize(key, as_raw)
+        result = tc.mdb_adddouble(self.db, c_key, c_key_len, num)
+        self._limit()
+        return result
+
+    def foreach(self, proc, op, key_type=None, value_type=None):
+        """Process each record atomically of an on-memory hash
+        database object.  The database object can not be used inside
+        proc."""
+        def proc_wraper(c_key, c_key_len, c_value, c_value_len, op):
+            key = util.deserialize(ctypes.cast(c_key, ctypes.c_void_p),
+                                   c_key_len, key_type)
+            value = util.deserialize(ctypes.cast(c_value, ctypes.c_void_p),
+                                     c_value_len, value_type)
+            return proc(key, value, ctypes.cast(op, ctypes.c_char_p).value)
+
+        tc.mdb_foreach(self.db, tc.TCITER(proc_wraper), op)
+        return True
+
+    def has_key(self, key, raw_key=False):
+        """Return True if on-memory hash database object has the
+        key."""
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        return tc.mdb_vsiz(self.db, c_key, c_key_len) != -1
+
+    def contains_many(self, keys, raw_key=False):
+        """Return a bitmap with the bit i set if on-memory hash
+        database object has the i-th key."""
+        serialize, vsiz, db = util.serialize, tc.mdb_vsiz, self.db
+        return util.bitmap(vsiz(db, *serialize(key, raw_key)) != -1
+                           for key in keys)
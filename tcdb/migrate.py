@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Conversion of the raw unicode strings stored as arrays of wchar_t (the
+layout used before util.ENCODING) into UTF-8.
+
+Records are converted in place.  A raw value is taken as wchar_t text
+if its size is a multiple of sizeof(wchar_t) and every character is a
+valid, non NUL, code point.  Raw 32 bit integers look like one
+character strings, so values shorter than min_chars characters are
+skipped, and select can restrict the conversion to some keys.
+
+The database object must be opened as a writer and not used by other
+threads or processes during the conversion.
+
+>>> from tcdb import hdb
+>>> from tcdb import migrate
+
+>>> db = hdb.HDB()
+>>> db.open('casket.tch')
+>>> converted = migrate.unicode_to_utf8(db, keys=True, values=True)
+>>> db.close()
+
+"""
+
+import array
+import ctypes
+import sys
+
+import bdb
+import fdb
+import hdb
+import tc
+import tdb
+import util
+
+
+WCHARSIZ = ctypes.sizeof(ctypes.c_wchar)
+WCHARCODEC = 'utf-%d-%s' % (WCHARSIZ * 8, sys.byteorder[0] + 'e')
+WCHARARRAY = [code for code in 'HIL'
+              if array.array(code).itemsize == WCHARSIZ][0]
+
+
+def is_wchar(data, min_chars=2):
+    """Return True if a raw string looks like an array of wchar_t."""
+    if len(data) < min_chars * WCHARSIZ or len(data) % WCHARSIZ:
+        return False
+    for unit in array.array(WCHARARRAY, data):
+        if not unit or unit > 0x10ffff or \
+                (WCHARSIZ == 4 and 0xd800 <= unit <= 0xdfff):
+            return False
+    return True
+
+
+def wchar_to_utf8(data):
+    """Convert an array of wchar_t into an UTF-8 string."""
+    return data.decode(WCHARCODEC).encode('utf-8')
+
+
+def _convert(data, min_chars):
+    """Convert a raw string if it looks like wchar_t text.  Return
+    None if not."""
+    if is_wchar(data, min_chars):
+        return wchar_to_utf8(data)
+    return None
+
+
+def _raw(func, *args):
+    """Call a function returning a region and its size, and get it as
+    a string."""
+    (c_obj, c_obj_len) = func(*args)
+    if not c_obj:
+        return None
+    return ctypes.string_at(c_obj, c_obj_len)
+
+
+def _hdb(db, keys, values, min_chars, select):
+    """Convert the records of a hash database object."""
+    changes = []
+    tc.hdb_iterinit(db.db)
+    while True:
+        key = _raw(tc.hdb_iternext, db.db)
+        if key is None:
+            break
+        if select and not select(key):
+            continue
+        value = _raw(tc.hdb_get, db.db, key, len(key))
+        new_key = _convert(key, min_chars) if keys else None
+        new_value = _convert(value, min_chars) if values else None
+        if new_key is not None or new_value is not None:
+            changes.append((key, new_key, new_value))
+
+    for key, new_key, new_value in changes:
+        if new_value is None:
+            new_value = _raw(tc.hdb_get, db.db, key, len(key))
+        if new_key is not None:
+            tc.hdb_out(db.db, key, len(key))
+            key = new_key
+        if not tc.hdb_put(db.db, key, len(key), new_value, len(new_value)):
+            raise tc.TCException(tc.hdb_errmsg(tc.hdb_ecode(db.db)))
+    return len(changes)
+
+
+def _bdb(db, keys, values, min_chars, select):
+    """Convert the records of a B+ tree database object, with their
+    duplicated values."""
+    count = 0
+    renames = []
+    cur = tc.bdb_curnew(db.db)
+    try:
+        moved = tc.bdb_curfirst(cur)
+        while moved:
+            key = _raw(tc.bdb_curkey, cur)
+            if select and not select(key):
+                moved = tc.bdb_curnext(cur)
+                continue
+            new_value = None
+            if values:
+                new_value = _convert(_raw(tc.bdb_curval, cur), min_chars)
+            if new_value is not None:
+                # Overwrite in place, the cursor stays in the record.
+                if not tc.bdb_curput(cur, new_value, len(new_value),
+                                     bdb.CPCURRENT):
+                    raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(db.db)))
+                count += 1
+            if keys and (not renames or renames[-1][0] != key):
+                new_key = _convert(key, min_chars)
+                if new_key is not None:
+                    renames.append((key, new_key))
+            moved = tc.bdb_curnext(cur)
+    finally:
+        tc.bdb_curdel(cur)
+
+    for key, new_key in renames:
+        tclist_values = tc.bdb_get4(db.db, key, len(key))
+        tc.bdb_out3(db.db, key, len(key))
+        if not tc.bdb_putdup3(db.db, new_key, len(new_key), tclist_values):
+            raise tc.TCException(tc.bdb_errmsg(tc.bdb_ecode(db.db)))
+        count += 1
+    return count
+
+
+def _fdb(db, keys, values, min_chars, select):
+    """Convert the records of a fixed-length database object.  Keys
+    are integers and are never converted."""
+    changes = []
+    tc.fdb_iterinit(db.db)
+    while True:
+        id_ = tc.fdb_iternext(db.db)
+        if not id_:
+            break
+        if select and not select(id_):
+            continue
+        value = _raw(tc.fdb_get, db.db, id_)
+        new_value = _convert(value, min_chars) if values else None
+        if new_value is not None:
+            changes.append((id_, new_value))
+
+    for id_, new_value in changes:
+        if not tc.fdb_put(db.db, id_, new_value, len(new_value)):
+            raise tc.TCException(tc.fdb_errmsg(tc.fdb_ecode(db.db)))
+    return len(changes)
+
+
+def _columns(tcmap):
+    """Get the raw columns of a TCMAP object as a list of pairs."""
+    cols = []
+    tc.tcmapiterinit(tcmap)
+    while True:
+        c_name, c_name_len = tc.tcmapiternext(tcmap)
+        if not c_name_len:
+            break
+        c_value, c_value_len = tc.tcmapiterval(c_name)
+        cols.append((ctypes.string_at(c_name, c_name_len),
+                     ctypes.string_at(c_value, c_value_len)))
+    return cols
+
+
+def _tdb(db, keys, values, min_chars, select, columns):
+    """Convert the primary keys and the columns of a table database
+    object."""
+    changes = []
+    tc.tdb_iterinit(db.db)
+    while True:
+        pkey = _raw(tc.tdb_iternext, db.db)
+        if pkey is None:
+            break
+        if select and not select(pkey):
+            continue
+        new_pkey = _convert(pkey, min_chars) if keys else None
+        changed = False
+        if values:
+            for name, value in _columns(tc.tdb_get(db.db, pkey, len(pkey))):
+                if (columns is None or name in columns) and \
+                        is_wchar(value, min_chars):
+                    changed = True
+                    break
+        if new_pkey is not None or changed:
+            changes.append((pkey, new_pkey))
+
+    for pkey, new_pkey in changes:
+        cols = {}
+        for name, value in _columns(tc.tdb_get(db.db, pkey, len(pkey))):
+            if values and (columns is None or name in columns):
+                new_value = _convert(value, min_chars)
+                if new_value is not None:
+                    value = new_value
+            cols[name] = value
+        if new_pkey is not None:
+            tc.tdb_out(db.db, pkey, len(pkey))
+            pkey = new_pkey
+        tcmap = util.serialize_tcmap(cols, as_raw=True)
+        if not tc.tdb_put(db.db, pkey, len(pkey), tcmap):
+            raise tc.TCException(tc.tdb_errmsg(tc.tdb_ecode(db.db)))
+    return len(changes)
+
+
+def unicode_to_utf8(db, keys=False, values=True, min_chars=2, select=None,
+                    columns=None):
+    """Convert the raw unicode keys and/or values of a database object
+    from wchar_t to UTF-8.  select is an optional function that gets a
+    raw key (an integer in FDB) and returns True if the record must be
+    converted; columns limits the conversion of a TDB object to some
+    columns.  Return the number of records converted."""
+    if isinstance(db, hdb.HDBSimple):
+        return _hdb(db, keys, values, min_chars, select)
+    elif isinstance(db, bdb.BDBSimple):
+        return _bdb(db, keys, values, min_chars, select)
+    elif isinstance(db, fdb.FDBSimple):
+        return _fdb(db, keys, values, min_chars, select)
+    elif isinstance(db, tdb.TDB):
+        return _tdb(db, keys, values, min_chars, select, columns)
+    raise tc.TCException('Migration only supports HDB, BDB, FDB and TDB '
+                         'objects.')
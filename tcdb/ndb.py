@@ -0,0 +1,585 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+NDB is an implementation of bsddb-like API for Tokyo Cabinet on-memory
+tree database.
+
+An on-memory tree database lives in the process, is thread safe, and
+keeps the records in key order.  The tree is a splay tree, so recently
+accessed records are near the root.  With capnum or capsiz it can be
+used as a bounded cache: when a limit is exceeded, the fringe records
+(the leaves of the tree, rarely accessed) are removed.
+
+>>> from tcdb.ndb import NDB
+
+>>> db = NDB(capnum=1000)  # Keep up to 1000 records
+
+>>> db.put("foo", "hop")
+True
+>>> db.put("bar", "step")
+True
+>>> db.put("baz", "jump")
+True
+
+>>> db.get("foo")
+'hop'
+
+"""
+
+import ctypes
+
+import tc
+import util
+
+
+class NDBSimple(object):
+    def __init__(self, cmp_=None, cmpop=None, capnum=0, capsiz=0):
+        """Create an on-memory tree database object.  cmp_ is a
+        comparison function or the name of a native one (see
+        BDB.setcmpfunc).  If capnum or capsiz are greater than 0, they
+        limit the number of records and the memory usage; the fringe
+        records are removed when they are exceeded."""
+        self.db = self._new(cmp_, cmpop)
+        self.capnum = capnum
+        self.capsiz = capsiz
+
+    def _new(self, cmp_, cmpop):
+        """Create the native object with a comparison function."""
+        def cmp_wraper(c_keya, c_keya_len, c_keyb, c_keyb_len, op):
+            keya = util.deserialize(ctypes.cast(c_keya, ctypes.c_void_p),
+                                    c_keya_len, str)
+            keyb = util.deserialize(ctypes.cast(c_keyb, ctypes.c_void_p),
+                                    c_keyb_len, str)
+            return cmp_(keya, keyb, ctypes.cast(op, ctypes.c_char_p).value)
+
+        # If cmp_ is a string, it indicate a native tccmpxxx funcion.
+        native = {
+            'tccmpdecimal': tc.tccmpdecimal,
+            'tccmpint32': tc.tccmpint32,
+            'tccmpint64': tc.tccmpint64
+            }
+        self._cmp = None
+        self._cmpop = cmpop
+        if cmp_ in (None, 'default', 'tccmplexical'):
+            return tc.ndb_new()
+        if cmp_ in native:
+            self._cmp = native[cmp_]
+        else:
+            # Keep a reference, the callback lives as long as the tree.
+            self._cmp = tc.TCCMP(cmp_wraper)
+        return tc.ndb_new2(self._cmp, cmpop)
+
+    def _compare(self, keya, keyb):
+        """Compare two raw keys in the order of the tree."""
+        if self._cmp is None:
+            return cmp(keya, keyb)
+        return self._cmp(keya, len(keya), keyb, len(keyb), self._cmpop)
+
+    def __del__(self):
+        """Delete an on-memory tree database object."""
+        tc.ndb_del(self.db)
+
+    def _limit(self):
+        """Remove fringe records while the limits are exceeded."""
+        if self.capnum > 0:
+            excess = tc.ndb_rnum(self.db) - self.capnum
+            if excess > 0:
+                tc.ndb_cutfringe(self.db, excess)
+        if self.capsiz > 0:
+            # As the ADB does, cut a fraction of the records at a time.
+            while tc.ndb_msiz(self.db) > self.capsiz:
+                rnum = tc.ndb_rnum(self.db)
+                if not rnum:
+                    break
+                tc.ndb_cutfringe(self.db, rnum // 256 + 1)
+
+    def __setitem__(self, key, value):
+        """Store any Python object into an on-memory tree database
+        object."""
+        return self.put(key, value)
+
+    def put(self, key, value):
+        """Store a string record into an on-memory tree database
+        object."""
+        tc.ndb_put2(self.db, key, value)
+        self._limit()
+        return True
+
+    def putkeep(self, key, value):
+        """Store a new string record into an on-memory tree database
+        object."""
+        result = tc.ndb_putkeep2(self.db, key, value)
+        if result:
+            self._limit()
+        return result
+
+    def putcat(self, key, value):
+        """Concatenate a string value at the end of the existing
+        record in an on-memory tree database object."""
+        tc.ndb_putcat2(self.db, key, value)
+        self._limit()
+        return True
+
+    def __delitem__(self, key):
+        """Remove a string record of an on-memory tree database
+        object."""
+        return self.out(key)
+
+    def out(self, key):
+        """Remove a string record of an on-memory tree database
+        object."""
+        result = tc.ndb_out2(self.db, key)
+        if not result:
+            raise KeyError(key)
+        return result
+
+    def __getitem__(self, key):
+        """Retrieve a Python object in an on-memory tree database
+        object."""
+        return self._getitem(key)
+
+    def _getitem(self, key):
+        """Retrieve a Python object in an on-memory tree database
+        object."""
+        value = tc.ndb_get2(self.db, key)
+        if not value:
+            raise KeyError(key)
+        return value.value
+
+    def get(self, key, default=None):
+        """Retrieve a Python object in an on-memory tree database
+        object."""
+        try:
+            value = self._getitem(key)
+        except KeyError:
+            value = default
+        return value
+
+    def vsiz(self, key):
+        """Get the size of the value of a Python object in an
+        on-memory tree database object."""
+        result = tc.ndb_vsiz2(self.db, key)
+        if result == -1:
+            raise KeyError(key)
+        return result
+
+    def keys(self):
+        """Get all the keys of an on-memory tree database object."""
+        return list(self.iterkeys())
+
+    def iterkeys(self):
+        """Iterate for every key in an on-memory tree database
+        object."""
+        tc.ndb_iterinit(self.db)
+        while True:
+            key = tc.ndb_iternext2(self.db)
+            if not key:
+                break
+            yield key.value
+
+    def values(self):
+        """Get all the values of an on-memory tree database object."""
+        return list(self.itervalues())
+
+    def itervalues(self):
+        """Iterate for every value in an on-memory tree database
+        object."""
+        for _, value in self.iteritems():
+            yield value
+
+    def items(self):
+        """Get all the items of an on-memory tree database object."""
+        return list(self.iteritems())
+
+    def iteritems(self):
+        """Iterate for every key / value in an on-memory tree database
+        object."""
+        tc.ndb_iterinit(self.db)
+        while True:
+            key = tc.ndb_iternext2(self.db)
+            if not key:
+                break
+            value = tc.ndb_get2(self.db, key)
+            # The record can be removed by another thread.
+            if value:
+                yield key.value, value.value
+
+    def __iter__(self):
+        """Iterate for every key in an on-memory tree database
+        object."""
+        return self.iterkeys()
+
+    def fwmkeys(self, prefix, max_=-1):
+        """Get forward matching string keys in an on-memory tree
+        database object."""
+        tclist_objs = tc.ndb_fwmkeys2(self.db, prefix, max_)
+        return util.deserialize_tclist(tclist_objs, str)
+
+    def range(self, keya=None, inca=True, keyb=None, incb=True, max_=-1):
+        """Get keys of ranged records in an on-memory tree database
+        object."""
+        return list(self.iterrange(keya, inca, keyb, incb, max_))
+
+    def iterrange(self, keya=None, inca=True, keyb=None, incb=True,
+                  max_=-1):
+        """Iterate for the keys of ranged records in an on-memory tree
+        database object.  The limits are compared with the comparison
+        function of the tree."""
+        if keya is None:
+            tc.ndb_iterinit(self.db)
+        else:
+            tc.ndb_iterinit2(self.db, keya, len(keya))
+        while max_ != 0:
+            key = tc.ndb_iternext2(self.db)
+            if not key:
+                break
+            key = key.value
+            if keyb is not None:
+                order = self._compare(key, keyb)
+                if order > 0 or (order == 0 and not incb):
+                    break
+            if keya is not None and not inca and \
+                    self._compare(key, keya) == 0:
+                continue
+            yield key
+            max_ -= 1
+
+    def vanish(self):
+        """Remove all records of an on-memory tree database object."""
+        tc.ndb_vanish(self.db)
+        return True
+
+    def cutfringe(self, num):
+        """Remove num fringe records of an on-memory tree database
+        object."""
+        tc.ndb_cutfringe(self.db, num)
+        return True
+
+    def __len__(self):
+        """Get the number of records of an on-memory tree database
+        object."""
+        return tc.ndb_rnum(self.db)
+
+    def msiz(self):
+        """Get the total size of memory used in an on-memory tree
+        database object."""
+        return tc.ndb_msiz(self.db)
+
+    def foreach(self, proc, op):
+        """Process each record atomically of an on-memory tree
+        database object.  The database object can not be used inside
+        proc."""
+        def proc_wraper(c_key, c_key_len, c_value, c_value_len, op):
+            key = util.deserialize(ctypes.cast(c_key, ctypes.c_void_p),
+                                   c_key_len, str)
+            value = util.deserialize(ctypes.cast(c_value, ctypes.c_void_p),
+                                     c_value_len, str)
+            return proc(key, value, ctypes.cast(op, ctypes.c_char_p).value)
+
+        tc.ndb_foreach(self.db, tc.TCITER(proc_wraper), op)
+        return True
+
+    def __contains__(self, key):
+        """Return True if on-memory tree database object has the
+        key."""
+        return self.has_key(key)
+
+    def has_key(self, key):
+        """Return True if on-memory tree database object has the
+        key."""
+        return tc.ndb_vsiz2(self.db, key) != -1
+
+    def contains_many(self, keys):
+        """Return a bitmap with the bit i set if on-memory tree
+        database object has the i-th key."""
+        vsiz2, db = tc.ndb_vsiz2, self.db
+        return util.bitmap(vsiz2(db, key) != -1 for key in keys)
+
+
+class NDB(NDBSimple):
+    def __init__(self, cmp_=None, cmpop=None, capnum=0, capsiz=0):
+        """Create an on-memory tree database object."""
+        NDBSimple.__init__(self, cmp_, cmpop, capnum, capsiz)
+
+    def put(self, key, value, raw_key=False, raw_value=False):
+        """Store any Python object into an on-memory tree database
+        object."""
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        (c_value, c_value_len) = util.serialize(value, raw_value)
+        tc.ndb_put(self.db, c_key, c_key_len, c_value, c_value_len)
+        self._limit()
+        return True
+
+    def put_str(self, key, value, as_raw=False):
+        """Store a string record into an on-memory tree database
+        object."""
+        assert isinstance(value, str), 'Value is not a string'
+        return self.put(key, value, as_raw, True)
+
+    def put_unicode(self, key, value, as_raw=False):
+        """Store an unicode string record into an on-memory tree
+        database object."""
+        assert isinstance(value, unicode), 'Value is not an unicode string'
+        return self.put(key, value, as_raw, True)
+
+    def put_int(self, key, value, as_raw=False):
+        """Store an integer record into an on-memory tree database
+        object."""
+        assert isinstance(value, int), 'Value is not an integer'
+        return self.put(key, value, as_raw, True)
+
+    def put_float(self, key, value, as_raw=False):
+        """Store a double precision record into an on-memory tree
+        database object."""
+        assert isinstance(value, float), 'Value is not a float'
+        return self.put(key, value, as_raw, True)
+
+    def putkeep(self, key, value, raw_key=False, raw_value=False):
+        """Store a new Python object into an on-memory tree database
+        object."""
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        (c_value, c_value_len) = util.serialize(value, raw_value)
+        result = tc.ndb_putkeep(self.db, c_key, c_key_len, c_value,
+                                c_value_len)
+        if result:
+            self._limit()
+        return result
+
+    def putkeep_str(self, key, value, as_raw=False):
+        """Store a new string record into an on-memory tree database
+        object."""
+        assert isinstance(value, str), 'Value is not a string'
+        return self.putkeep(key, value, as_raw, True)
+
+    def putkeep_unicode(self, key, value, as_raw=False):
+        """Store a new unicode string record into an on-memory tree
+        database object."""
+        assert isinstance(value, unicode), 'Value is not an unicode string'
+        return self.putkeep(key, value, as_raw, True)
+
+    def putkeep_int(self, key, value, as_raw=False):
+        """Store a new integer record into an on-memory tree database
+        object."""
+        assert isinstance(value, int), 'Value is not an integer'
+        return self.putkeep(key, value, as_raw, True)
+
+    def putkeep_float(self, key, value, as_raw=False):
+        """Store a new double precision record into an on-memory tree
+        database object."""
+        assert isinstance(value, float), 'Value is not a float'
+        return self.putkeep(key, value, as_raw, True)
+
+    def putcat(self, key, value, raw_key=False, raw_value=False):
+        """Concatenate an object value at the end of the existing
+        record in an on-memory tree database object."""
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        (c_value, c_value_len) = util.serialize(value, raw_value)
+        tc.ndb_putcat(self.db, c_key, c_key_len, c_value, c_value_len)
+        self._limit()
+        return True
+
+    def putcat_str(self, key, value, as_raw=False):
+        """Concatenate a string value at the end of the existing
+        record in an on-memory tree database object."""
+        assert isinstance(value, str), 'Value is not a string'
+        return self.putcat(key, value, as_raw, True)
+
+    def putcat_unicode(self, key, value, as_raw=False):
+        """Concatenate an unicode string value at the end of the
+        existing record in an on-memory tree database object."""
+        assert isinstance(value, unicode), 'Value is not an unicode string'
+        return self.putcat(key, value, as_raw, True)
+
+    def out(self, key, as_raw=False):
+        """Remove a Python object of an on-memory tree database
+        object."""
+        (c_key, c_key_len) = util.serialize(key, as_raw)
+        result = tc.ndb_out(self.db, c_key, c_key_len)
+        if not result:
+            raise KeyError(key)
+        return result
+
+    def _getitem(self, key, raw_key=False, value_type=None):
+        """Retrieve a Python object in an on-memory tree database
+        object."""
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        (c_value, c_value_len) = tc.ndb_get(self.db, c_key, c_key_len)
+        if not c_value:
+            raise KeyError(key)
+        return util.deserialize(c_value, c_value_len, value_type)
+
+    def get(self, key, default=None, raw_key=False, value_type=None):
+        """Retrieve a Python object in an on-memory tree database
+        object."""
+        try:
+            value = self._getitem(key, raw_key, value_type)
+        except KeyError:
+            value = default
+        return value
+
+    def get_str(self, key, default=None, as_raw=False):
+        """Retrieve a string record in an on-memory tree database
+        object."""
+        return self.get(key, default, as_raw, str)
+
+    def get_unicode(self, key, default=None, as_raw=False):
+        """Retrieve an unicode string record in an on-memory tree
+        database object."""
+        return self.get(key, default, as_raw, unicode)
+
+    def get_int(self, key, default=None, as_raw=False):
+        """Retrieve an integer record in an on-memory tree database
+        object."""
+        return self.get(key, default, as_raw, int)
+
+    def get_float(self, key, default=None, as_raw=False):
+        """Retrieve a double precision record in an on-memory tree
+        database object."""
+        return self.get(key, default, as_raw, float)
+
+    def vsiz(self, key, as_raw=False):
+        """Get the size of the value of a Python object in an
+        on-memory tree database object."""
+        (c_key, c_key_len) = util.serialize(key, as_raw)
+        result = tc.ndb_vsiz(self.db, c_key, c_key_len)
+        if result == -1:
+            raise KeyError(key)
+        return result
+
+    def keys(self, as_type=None):
+        """Get all the keys of an on-memory tree database object."""
+        return list(self.iterkeys(as_type))
+
+    def iterkeys(self, as_type=None):
+        """Iterate for every key in an on-memory tree database
+        object."""
+        tc.ndb_iterinit(self.db)
+        while True:
+            c_key, c_key_len = tc.ndb_iternext(self.db)
+            if not c_key:
+                break
+            key = util.deserialize(c_key, c_key_len, as_type)
+            yield key
+
+    def values(self, as_type=None):
+        """Get all the values of an on-memory tree database object."""
+        return list(self.itervalues(as_type))
+
+    def itervalues(self, as_type=None):
+        """Iterate for every value in an on-memory tree database
+        object."""
+        for _, value in self.iteritems(str, as_type):
+            yield value
+
+    def items(self, key_type=None, value_type=None):
+        """Get all the items of an on-memory tree database object."""
+        return list(self.iteritems(key_type, value_type))
+
+    def iteritems(self, key_type=None, value_type=None):
+        """Iterate for every key / value in an on-memory tree database
+        object."""
+        tc.ndb_iterinit(self.db)
+        while True:
+            c_key, c_key_len = tc.ndb_iternext(self.db)
+            if not c_key:
+                break
+            (c_value, c_value_len) = tc.ndb_get(self.db, c_key, c_key_len)
+            # The record can be removed by another thread.
+            if not c_value:
+                continue
+            key = util.deserialize(c_key, c_key_len, key_type)
+            value = util.deserialize(c_value, c_value_len, value_type)
+            yield (key, value)
+
+    def fwmkeys(self, prefix, max_=-1, as_raw=True):
+        """Get forward matching string keys in an on-memory tree
+        database object."""
+        (c_prefix, c_prefix_len) = util.serialize(prefix, as_raw)
+        tclist_objs = tc.ndb_fwmkeys(self.db, c_prefix, c_prefix_len, max_)
+        as_type = util.get_type(prefix, as_raw)
+        return util.deserialize_tclist(tclist_objs, as_type)
+
+    def range(self, keya=None, inca=True, keyb=None, incb=True, max_=-1,
+              as_raw=True):
+        """Get keys of ranged records in an on-memory tree database
+        object."""
+        return list(self.iterrange(keya, inca, keyb, incb, max_, as_raw))
+
+    def iterrange(self, keya=None, inca=True, keyb=None, incb=True,
+                  max_=-1, as_raw=True):
+        """Iterate for the keys of ranged records in an on-memory tree
+        database object.  The limits are compared with the comparison
+        function of the tree, on the serialized keys."""
+        raw_keya = raw_keyb = None
+        if keya is None:
+            tc.ndb_iterinit(self.db)
+        else:
+            (c_keya, c_keya_len) = util.serialize(keya, as_raw)
+            raw_keya = ctypes.string_at(c_keya, c_keya_len)
+            tc.ndb_iterinit2(self.db, c_keya, c_keya_len)
+        if keyb is not None:
+            (c_keyb, c_keyb_len) = util.serialize(keyb, as_raw)
+            raw_keyb = ctypes.string_at(c_keyb, c_keyb_len)
+        as_type = util.get_type(keya if keya is not None else keyb, as_raw)
+        while max_ != 0:
+            c_key, c_key_len = tc.ndb_iternext(self.db)
+            if not c_key:
+                break
+            raw_key = ctypes.string_at(c_key, c_key_len)
+            if raw_keyb is not None:
+                order = self._compare(raw_key, raw_keyb)
+                if order > 0 or (order == 0 and not incb):
+                    break
+            if raw_keya is not None and not inca and \
+                    self._compare(raw_key, raw_keya) == 0:
+                continue
+            yield util.deserialize(c_key, c_key_len, as_type)
+            max_ -= 1
+
+    def add_int(self, key, num, as_raw=False):
+        """Add an integer to a record in an on-memory tree database
+        object."""
+        assert isinstance(num, int), 'Value is not an integer'
+        (c_key, c_key_len) = util.serialize(key, as_raw)
+        result = tc.ndb_addint(self.db, c_key, c_key_len, num)
+        if result == tc.INT_MIN:
+            raise tc.TCException('The record is not an integer')
+        self._limit()
+        return result
+
+    def add_float(self, key, num, as_raw=False):
+        """Add a real number to a record in an on-memory tree database
+        object."""
+        assert isinstance(num, float), 'Value is not a float'
+        (c_key, c_key_len) = util.serialize(key, as_raw)
+        result = tc.ndb_adddouble(self.db, c_key, c_key_len, num)
+        self._limit()
+        return result
+
+    def foreach(self, proc, op, key_type=None, value_type=None):
+        """Process each record atomically of an on-memory tree
+        database object.  The database object can not be used inside
+        proc."""
+        def proc_wraper(c_key, c_key_len, c_value, c_value_len, op):
+            key = util.deserialize(ctypes.cast(c_key, ctypes.c_void_p),
+                                   c_key_len, key_type)
+            value = util.deserialize(ctypes.cast(c_value, ctypes.c_void_p),
+                                     c_value_len, value_type)
+            return proc(key, value, ctypes.cast(op, ctypes.c_char_p).value)
+
+        tc.ndb_foreach(self.db, tc.TCITER(proc_wraper), op)
+        return True
+
+    def has_key(self, key, raw_key=False):
+        """Return True if on-memory tree database object has the
+        key."""
+        (c_key, c_key_len) = util.serialize(key, raw_key)
+        return tc.ndb_vsiz(self.db, c_key, c_key_len) != -1
+
+    def contains_many(self, keys, raw_key=False):
+        """Return a bitmap with the bit i set if on-memory tree
+        database object has the i-th key."""
+        serialize, vsiz, db = util.serialize, tc.ndb_vsiz, self.db
+        return util.bitmap(vsiz(db, *serialize(key, raw_key)) != -1
+                           for key in keys)
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Parallel scan of fixed-length and B+ tree database files with worker
+processes.
+
+The ID space of a fixed-length database, or the key space of a B+ tree
+database, is split into disjoint ranges.  Every worker process opens
+the file as a reader without locking and scans the ranges it is
+handed, several per worker, so a slow range does not keep the other
+workers idle.  The partial results of the ranges are combined in the
+parent process.
+
+The B+ tree database must use the default lexical comparison, and the
+file must not be written during the scan.
+
+>>> import operator
+>>> from tcdb import parallel
+
+>>> def size(records):
+...     return sum(len(value) for key, value in records)
+>>> parallel.parallel_scan('casket.tcb', size, operator.add, 0)
+1024
+
+"""
+
+import ctypes
+import multiprocessing
+import os
+import struct
+
+import bdb
+import fdb
+import tc
+
+
+# Parameters of the scan of the worker process.
+_worker = {}
+
+
+def dbtype(path):
+    """Get the database type (tc.THASH, tc.TBTREE, tc.TFIXED or
+    tc.TTABLE) of a database file, from its header."""
+    with open(path, 'rb') as fileobj:
+        header = fileobj.read(33)
+    if len(header) < 33 or not header.startswith('ToKyO CaBiNeT'):
+        raise tc.TCException('Not a database file: %s' % path)
+    return ord(header[32])
+
+
+def _key_int(key, width=4):
+    """Get the first width bytes of a key as a big-endian integer."""
+    return struct.unpack('>I', key[:width].ljust(width, '\x00'))[0]
+
+
+def split_keys(first, last, num):
+    """Split the lexical key space between two keys into at most num
+    ranges.  Return the list of (lower, upper) ranges, where lower is
+    included and upper is not, and None is unlimited."""
+    prefix = os.path.commonprefix([first, last])
+    lo = _key_int(first[len(prefix):])
+    hi = _key_int(last[len(prefix):])
+    bounds = []
+    for i in xrange(1, num):
+        bound = prefix + struct.pack('>I', lo + (hi - lo) * i // num)
+        if bound > first and (not bounds or bound > bounds[-1]):
+            bounds.append(bound)
+    bounds = [None] + bounds + [None]
+    return zip(bounds[:-1], bounds[1:])
+
+
+def split_ids(lower, upper, num):
+    """Split the ID space between two IDs into at most num ranges.
+    Return the list of (lower, upper) ranges, both included."""
+    bounds = sorted(set(lower + (upper - lower + 1) * i // num
+                        for i in xrange(num + 1)))
+    return [(bounds[i], bounds[i + 1] - 1) for i in xrange(len(bounds) - 1)]
+
+
+def _ranges(path, dbtype_, num):
+    """Split a database file into num ranges."""
+    if dbtype_ == tc.TFIXED:
+        db = fdb.FDBSimple()
+        db.open(path, fdb.OREADER | fdb.ONOLCK)
+        try:
+            lower, upper = tc.fdb_min(db.db), tc.fdb_max(db.db)
+        finally:
+            db.close()
+        if not upper:
+            return [(1, 0)]
+        return split_ids(lower, upper, num)
+
+    db = bdb.BDBSimple()
+    db.open(path, bdb.OREADER | bdb.ONOLCK)
+    cur = tc.bdb_curnew(db.db)
+    try:
+        if not tc.bdb_curfirst(cur):
+            return [(None, None)]
+        first = ctypes.string_at(*tc.bdb_curkey(cur))
+        tc.bdb_curlast(cur)
+        last = ctypes.string_at(*tc.bdb_curkey(cur))
+    finally:
+        tc.bdb_curdel(cur)
+        db.close()
+    return split_keys(first, last, num)
+
+
+def _fdb_records(db, lower, upper, batch=4096):
+    """Iterate for every record of a range of IDs of a fixed-length
+    database object."""
+    while lower <= upper:
+        ids = tc.fdb_range(db.db, lower, upper, batch)
+        for id_ in ids:
+            (c_value, c_value_len) = tc.fdb_get(db.db, id_)
+            if c_value:
+                yield (id_, ctypes.string_at(c_value, c_value_len))
+        if len(ids) < batch:
+            break
+        lower = ids[-1] + 1
+
+
+def _bdb_records(db, lower, upper):
+    """Iterate for every record of a range of keys of a B+ tree
+    database object."""
+    cur = tc.bdb_curnew(db.db)
+    try:
+        xstr_key = tc.tcxstrnew()
+        xstr_value = tc.tcxstrnew()
+        if lower is None:
+            moved = tc.bdb_curfirst(cur)
+        else:
+            moved = tc.bdb_curjump(cur, lower, len(lower))
+        while moved and tc.bdb_currec(cur, xstr_key, xstr_value):
+            key = ctypes.string_at(tc.tcxstrptr(xstr_key),
+                                   tc.tcxstrsize(xstr_key))
+            if upper is not None and key >= upper:
+                break
+            yield (key, ctypes.string_at(tc.tcxstrptr(xstr_value),
+                                         tc.tcxstrsize(xstr_value)))
+            moved = tc.bdb_curnext(cur)
+    finally:
+        tc.bdb_curdel(cur)
+
+
+def _init(path, dbtype_, func):
+    """Open the database file in a worker process."""
+    if dbtype_ == tc.TFIXED:
+        db = fdb.FDBSimple()
+        db.open(path, fdb.OREADER | fdb.ONOLCK)
+        records = _fdb_records
+    else:
+        db = bdb.BDBSimple()
+        db.open(path, bdb.OREADER | bdb.ONOLCK)
+        records = _bdb_records
+    _worker.update(db=db, records=records, func=func)
+
+
+def _scan(range_):
+    """Scan a range in a worker process."""
+    (lower, upper) = range_
+    records = _worker['records'](_worker['db'], lower, upper)
+    return _worker['func'](records)
+
+
+def parallel_scan(path, func, reduce_=None, initial=None, workers=None,
+                  chunks=4):
+    """Scan a fixed-length or B+ tree database file in workers
+    processes (the number of CPUs by default), each range of the
+    workers * chunks ranges in one of them.  func gets an iterator of
+    the raw (key, value) records of a range, the keys are IDs in a
+    fixed-length database, and returns a partial result.  The partial
+    results, in the order of the ranges, are combined with reduce_,
+    starting with initial if it is not None, or returned as a list if
+    reduce_ is None."""
+    dbtype_ = dbtype(path)
+    if dbtype_ not in (tc.TFIXED, tc.TBTREE):
+        raise tc.TCException('Parallel scan only supports fixed-length '
+                             'and B+ tree database files')
+    workers = workers or multiprocessing.cpu_count()
+    ranges = _ranges(path, dbtype_, workers * chunks)
+
+    # Workers are forked, so func is not pickled and can be a lambda.
+    pool = multiprocessing.Pool(workers, _init, (path, dbtype_, func))
+    try:
+        partials = pool.imap(_scan, ranges)
+        if reduce_ is None:
+            result = list(partials)
+        elif initial is None:
+            result = reduce(reduce_, partials)
+        else:
+            result = reduce(reduce_, partials, initial)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return result
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+# Tokyo Cabinet Python ctypes binding.
+
+"""
+Opt-in instrumentation for HDB, BDB, FDB, TDB and ADB objects.
+
+For every operation type we record the number of calls, the number of
+errors and misses, the bytes sent to and received from Tokyo Cabinet,
+and a latency histogram.  The time is split between the Python
+serialization (util.serialize / util.deserialize) and the rest of the
+call, that is mostly the C call.
+
+>>> from tcdb import hdb
+>>> from tcdb import stats
+
+>>> db = hdb.HDB()
+>>> st = stats.instrument(db)
+>>> db.open('casket.tch')
+
+>>> db.put("foo", "hop")
+True
+>>> db.stats()['put']['calls']
+1
+>>> db.stats()['put']['latency']['p99'] > 0
+True
+
+>>> stats.uninstrument(db)
+>>> db.close()
+
+"""
+
+import threading
+import time
+import weakref
+
+import tc
+import util
+
+
+# Operations recorded, if the database object implements them.  The
+# second element is the name used in the report.
+OPERATIONS = (
+    ('put', 'put'), ('putkeep', 'putkeep'), ('putcat', 'putcat'),
+    ('putasync', 'putasync'), ('putdup', 'putdup'),
+    ('putdup_iter', 'putdup_iter'), ('putdup_many', 'putdup_many'),
+    ('putdupback', 'putdupback'),
+    ('out', 'out'), ('outdup', 'outdup'), ('_getitem', 'get'),
+    ('getdup', 'getdup'), ('get_col', 'get_col'), ('vsiz', 'vsiz'),
+    ('vnum', 'vnum'), ('has_key', 'has_key'),
+    ('contains_many', 'contains_many'), ('fwmkeys', 'fwmkeys'),
+    ('range', 'range'), ('add_int', 'add_int'), ('add_float', 'add_float'),
+    ('iterkeys', 'iterkeys'), ('itervalues', 'itervalues'),
+    ('iteritems', 'iteritems'), ('sync', 'sync'), ('optimize', 'optimize'),
+    ('vanish', 'vanish'), ('copy', 'copy'), ('tranbegin', 'tranbegin'),
+    ('trancommit', 'trancommit'), ('tranabort', 'tranabort'),
+    ('defrag', 'defrag'),
+    )
+
+# Number of linear sub-buckets for every power of two in a histogram
+# (2 ** SUBBITS).  With 3 bits the relative error is under 12.5%.
+SUBBITS = 3
+
+_local = threading.local()
+# util.serialize and util.deserialize, while they are wrapped.
+_originals = None
+# Weak references to the instrumented objects.
+_instrumented = set()
+_hook_lock = threading.Lock()
+
+
+class Histogram(object):
+    """HDR-style latency histogram, in microseconds.  Values under 2
+    ** SUBBITS have its own bucket; greater values are grouped in
+    buckets of logarithmic magnitude subdivided linearly."""
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.max = 0
+
+    @staticmethod
+    def index(value):
+        """Get the bucket index of a value."""
+        if value < 1 << SUBBITS:
+            return value
+        shift = value.bit_length() - SUBBITS - 1
+        return ((shift + 1) << SUBBITS) + (value >> shift) - (1 << SUBBITS)
+
+    @staticmethod
+    def lower(index):
+        """Get the lower bound of a bucket."""
+        if index < 1 << SUBBITS:
+            return index
+        shift = (index >> SUBBITS) - 1
+        return ((index & ((1 << SUBBITS) - 1)) + (1 << SUBBITS)) << shift
+
+    def record(self, value):
+        """Record a value in the histogram."""
+        value = int(value)
+        index = Histogram.index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """Get the value at a percentile of the histogram."""
+        if not self.count:
+            return 0
+        rank = max(1, int(round(self.count * percent / 100.0)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(Histogram.lower(index + 1) - 1, self.max)
+        return self.max
+
+    def buckets(self):
+        """Get a list of (lower bound, count) pairs."""
+        return [(Histogram.lower(index), self.counts[index])
+                for index in sorted(self.counts)]
+
+
+class OpStats(object):
+    """Counters of an operation type."""
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.misses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.time = 0.0
+        self.serialize_time = 0.0
+        self.latency = Histogram()
+
+    def report(self):
+        """Get a dictionary with the counters."""
+        latency = self.latency
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'misses': self.misses,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'time': self.time,
+            'serialize_time': self.serialize_time,
+            'call_time': self.time - self.serialize_time,
+            'latency': {
+                'p50': latency.percentile(50),
+                'p90': latency.percentile(90),
+                'p99': latency.percentile(99),
+                'p999': latency.percentile(99.9),
+                'max': latency.max,
+                'buckets': latency.buckets(),
+                },
+            }
+
+
+class Frame(object):
+    """Accumulator of the serialization work of the running
+    operation."""
+    __slots__ = ('serialize_time', 'bytes_in', 'bytes_out')
+
+    def __init__(self):
+        self.serialize_time = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+
+def _hook():
+    """Wrap util.serialize and util.deserialize to measure the
+    serialization work of instrumented operations."""
+    global _originals
+    if _originals:
+        return
+    _originals = serialize, deserialize = util.serialize, util.deserialize
+
+    def serialize_hook(obj, as_raw=False):
+        stack = getattr(_local, 'stack', None)
+        if not stack:
+            return serialize(obj, as_raw)
+        start = time.time()
+        result = serialize(obj, as_raw)
+        frame = stack[-1]
+        frame.serialize_time += time.time() - start
+        frame.bytes_in += result[1]
+        return result
+
+    def deserialize_hook(c_obj, c_obj_len, as_type=None):
+        stack = getattr(_local, 'stack', None)
+        if not stack:
+            return deserialize(c_obj, c_obj_len, as_type)
+        start = time.time()
+        result = deserialize(c_obj, c_obj_len, as_type)
+        frame = stack[-1]
+        frame.serialize_time += time.time() - start
+        frame.bytes_out += getattr(c_obj_len, 'value', c_obj_len)
+        return result
+
+    util.serialize = serialize_hook
+    util.deserialize = deserialize_hook
+
+
+def _unhook():
+    """Restore util.serialize and util.deserialize, so the objects
+    that are not instrumented do not pay for the wrappers."""
+    global _originals
+    if _originals:
+        util.serialize, util.deserialize = _originals
+        _originals = None
+
+
+def _release(ref):
+    """Forget an instrumented object, and restore the serialization
+    functions when it was the last one."""
+    with _hook_lock:
+        _instrumented.discard(ref)
+        if not _instrumented:
+            _unhook()
+
+
+class Stats(object):
+    """Instrumentation of a database object."""
+    def __init__(self, exporter=None, interval=None):
+        self.ops = {}
+        self.exporters = [exporter] if exporter else []
+        self.interval = interval
+        self.exported = time.time()
+        self.lock = threading.Lock()
+
+    def add_exporter(self, exporter):
+        """Add a callback that receives the report dictionary."""
+        self.exporters.append(exporter)
+
+    def _begin(self):
+        """Start the accounting of an operation."""
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        frame = Frame()
+        stack.append(frame)
+        return frame
+
+    def _end(self, name, frame, start, args, result, error):
+        """Finish the accounting of an operation."""
+        elapsed = time.time() - start
+        _local.stack.pop()
+        bytes_in, bytes_out = frame.bytes_in, frame.bytes_out
+        if not bytes_in:
+            bytes_in = sum(len(arg) for arg in args if isinstance(arg, str))
+        if not bytes_out and isinstance(result, str):
+            bytes_out = len(result)
+        with self.lock:
+            op = self.ops.get(name)
+            if op is None:
+                op = self.ops[name] = OpStats()
+            op.calls += 1
+            if error is KeyError:
+                op.misses += 1
+            elif error:
+                op.errors += 1
+            op.bytes_in += bytes_in
+            op.bytes_out += bytes_out
+            op.time += elapsed
+            op.serialize_time += frame.serialize_time
+            op.latency.record(elapsed * 1000000)
+        if self.interval and start - self.exported >= self.interval:
+            self.export()
+
+    def wrap(self, name, method, ref):
+        """Instrument a method of the database object referenced by
+        ref (a weak reference, so the instance can be released)."""
+        def call(*args, **kwargs):
+            frame = self._begin()
+            start = time.time()
+            result, error = None, None
+            try:
+                result = method(ref(), *args, **kwargs)
+            except KeyError:
+                error = KeyError
+                raise
+            except tc.TCException:
+                error = tc.TCException
+                raise
+            finally:
+                self._end(name, frame, start, args, result, error)
+            return result
+        call.__name__ = method.__name__
+        call.__doc__ = method.__doc__
+        return call
+
+    def wrap_iter(self, name, method, ref):
+        """Instrument a method that returns an iterator.  Every step
+        of the iteration is a call."""
+        def call(*args, **kwargs):
+            iterator = method(ref(), *args, **kwargs)
+            while True:
+                frame = self._begin()
+                start = time.time()
+                result, error = None, None
+                try:
+                    result = next(iterator)
+                except StopIteration:
+                    _local.stack.pop()
+                    return
+                except tc.TCException:
+                    error = tc.TCException
+                    self._end(name, frame, start, (), result, error)
+                    raise
+                self._end(name, frame, start, (), result, error)
+                yield result
+        call.__name__ = method.__name__
+        call.__doc__ = method.__doc__
+        return call
+
+    def report(self):
+        """Get a dictionary with the counters of every operation."""
+        with self.lock:
+            return dict((name, op.report()) for name, op in self.ops.items())
+
+    def reset(self):
+        """Reset all the counters."""
+        with self.lock:
+            self.ops = {}
+
+    def export(self):
+        """Send the report to every exporter."""
+        self.exported = time.time()
+        if self.exporters:
+            report = self.report()
+            for exporter in self.exporters:
+                exporter(report)
+
+
+def instrument(db, exporter=None, interval=None):
+    """Instrument a database object.  The counters are available in
+    db.stats().  If exporter is a callable, it is called with the
+    report every interval seconds (checked at the end of every
+    operation) and when db.export_stats() is called."""
+    if getattr(db, '_stats', None):
+        return db._stats
+    # The object is forgotten when it is uninstrumented or released.
+    ref = weakref.ref(db, _release)
+    with _hook_lock:
+        _instrumented.add(ref)
+        _hook()
+    stats = Stats(exporter, interval)
+    stats.ref = ref
+    for method, name in OPERATIONS:
+        func = getattr(type(db), method, None)
+        if func is None:
+            continue
+        if method.startswith('iter'):
+            setattr(db, method, stats.wrap_iter(name, func, ref))
+        else:
+            setattr(db, method, stats.wrap(name, func, ref))
+    db._stats = stats
+    db.stats = stats.report
+    db.export_stats = stats.export
+    return stats
+
+
+def uninstrument(db):
+    """Remove the instrumentation of a database object."""
+    if not getattr(db, '_stats', None):
+        return
+    for method, _ in OPERATIONS:
+        db.__dict__.pop(method, None)
+    ref = db._stats.ref
+    for attr in ('_stats', 'stats', 'export_stats'):
+        db.__dict__.pop(attr, None)
+    _release(ref)
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 # Tokyo Cabinet Python ctypes binding.
 
+import os
+
 from ctypes import CDLL, CFUNCTYPE, POINTER
 from ctypes import c_int, c_int8, c_int32, c_int64
 from ctypes import c_uint, c_uint8, c_uint32, c_uint64
@@ -40,9 +42,81 @@ class TCException(Exception):
     pass
 
 
+# Result of the XXX_addint() functions when they fail.
+INT_MIN = -2 ** 31
+
+
+# The bindings are built on first use to reduce the import time.  Set
+# the environment variable TCDB_LAZY=0 to build all of them at import.
+LAZY = os.environ.get('TCDB_LAZY', '1') != '0'
+
+
+class LazyFunc(object):
+    """Placeholder of a ctypes function prototype.  The prototype is
+    built on the first call or attribute access, and then replaces
+    the placeholder in the module namespace."""
+    def __init__(self, build, args):
+        self.__dict__['_build'] = (build, args)
+        self.__dict__['_func'] = None
+        self.__dict__['_attrs'] = {}
+        self.__dict__['_name'] = None
+
+    def _resolve(self):
+        """Build the prototype, if it was not built before."""
+        func = self._func
+        if func is None:
+            build, args = self._build
+            func = build(*args)
+            for attr, value in self._attrs.iteritems():
+                setattr(func, attr, value)
+            self.__dict__['_func'] = func
+            if self._name:
+                globals()[self._name] = func
+        return func
+
+    def __call__(self, *args):
+        return (self._func or self._resolve())(*args)
+
+    @property
+    def _as_parameter_(self):
+        """The prototype, when the placeholder is given as a function
+        pointer argument (e.g. tccmplexical to bdb_setcmpfunc)."""
+        return self._func or self._resolve()
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __setattr__(self, attr, value):
+        if attr == '__doc__':
+            self.__dict__['__doc__'] = value
+        if self._func is None:
+            self._attrs[attr] = value
+        else:
+            setattr(self._func, attr, value)
+
+
+def lazy(build):
+    """Make a prototype builder return a LazyFunc placeholder."""
+    def call(*args):
+        if LAZY:
+            return LazyFunc(build, args)
+        return build(*args)
+    call.__name__ = build.__name__
+    call.__doc__ = build.__doc__
+    return call
+
+
+def resolve_all():
+    """Build every pending prototype, e.g. before forking workers."""
+    for value in globals().values():
+        if isinstance(value, LazyFunc):
+            value._resolve()
+
+
 # Extracted from 'cxcore.py' file
 # ctypes-opencv - A Python wrapper for OpenCV using ctypes
 # Copyright (c) 2008, Minh-Tri Pham
+@lazy
 def cfunc(name, dll, result, *args):
     """Build and apply a ctypes prototype complete with parameter
     flags.
@@ -81,6 +155,7 @@ def _ctypes(type_):
     return types[type_]
 
 
+@lazy
 def cfunc_va(name, dll, result, *args):
     """Build and apply a ctypes prototype complete with variable
     arguments.
@@ -101,6 +176,7 @@ def cfunc_va(name, dll, result, *args):
     return create_closure(func, fix_args)
 
 
+@lazy
 def cfunc_fast(name, dll, result, *args):
     """Build and apply a ctypes prototype complete without parameter
     flags.
@@ -1408,7 +1484,7 @@ tcmapadddouble = cfunc('tcmapadddouble', libtc, c_double,
                        ('map', TCMAP_P, 1),
                        ('kbuf', c_void_p, 1),
                        ('ksiz', c_int, 1),
-                       ('num', c_int, 1))
+                       ('num', c_double, 1))
 tcmapadddouble.__doc__ =\
 """Add a real number to a record in a map object.
 
@@ -1596,7 +1672,866 @@ tcmapget3.errcheck = lambda result, func, arguments: (result, arguments[3])
 tcmapget3.__doc__ =\
 """Retrieve a semivolatile record in a map object.
 
-map  -- specifies the map object.
+map  -- specifies the map object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+sp   -- specifies the pointer to the variable into which the size of
+        the region of the return value is assigned.
+
+If successful, the return value is the pointer to the region of the
+value of the corresponding record.  'NULL' is returned when no record
+corresponds.
+
+Because an additional zero code is appended at the end of the region
+of the return value, the return value can be treated as a character
+string.  The internal region of the returned record is moved to the
+tail so that the record will survive for a time under LRU cache
+algorithm removing records from the head.
+
+"""
+
+tcmapget4 = cfunc('tcmapget4', libtc, c_char_p,
+                  ('map', TCMAP_P, 1),
+                  ('kstr', c_char_p, 1),
+                  ('dstr', c_char_p, 1))
+tcmapget4.__doc__ =\
+"""Retrieve a string record in a map object with specifying the
+default value string.
+
+map  -- specifies the map object.
+kstr -- specifies the string of the key.
+dstr -- specifies the string of the default value.
+
+The return value is the string of the value of the corresponding
+record or the default value string.
+
+"""
+
+tcmapiterinit2 = cfunc('tcmapiterinit2', libtc, None,
+                       ('map', TCMAP_P, 1),
+                       ('kbuf', c_void_p, 1),
+                       ('ksiz', c_int, 1))
+tcmapiterinit2.__doc__ =\
+"""Initialize the iterator of a map object at the record corresponding
+a key.
+
+map  -- specifies the map object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+
+If there is no record corresponding the condition, the iterator is not
+modified.
+
+"""
+
+tcmapiterinit3 = cfunc('tcmapiterinit3', libtc, None,
+                       ('map', TCMAP_P, 1),
+                       ('kstr', c_char_p, 1))
+tcmapiterinit3.__doc__ =\
+"""Initialize the iterator of a map object at the record corresponding
+a key string.
+
+map  -- specifies the map object.
+kstr -- specifies the string of the key.
+
+If there is no record corresponding the condition, the iterator is not
+modified.
+
+"""
+
+tcmapiterval = cfunc('tcmapiterval', libtc, c_void_p,
+                     ('kbuf', c_void_p, 1),
+                     ('sp', c_int_p, 2))
+tcmapiterval.errcheck = lambda result, func, arguments : (result, arguments[1])
+tcmapiterval.__doc__ =\
+"""Get the value bound to the key fetched from the iterator of a map object.
+
+kbuf -- specifies the pointer to the region of the iteration key.
+sp   -- specifies the pointer to the variable into which the size of
+        the region of the return value is assigned.
+
+The return value is the pointer to the region of the value of the
+corresponding record.
+
+Because an additional zero code is appended at the end of the region
+of the return value, the return value can be treated as a character
+string.
+
+"""
+
+tcmapiterval2 = cfunc('tcmapiterval2', libtc, c_char_p,
+                      ('kstr', c_char_p, 1))
+tcmapiterval2.__doc__ =\
+"""Get the value string bound to the key fetched from the iterator of
+a map object.
+
+kstr -- specifies the string of the iteration key.
+
+The return value is the pointer to the region of the value of the
+corresponding record.
+
+"""
+
+tcmapkeys2 = cfunc('tcmapkeys2', libtc, tc_void_p,
+                   ('map', TCMAP_P, 1),
+                   ('np', c_int_p, 2))
+tcmapkeys2.errcheck = lambda result, func, arguments :\
+    py_list(result, arguments[1], c_char_p)
+tcmapkeys2.__doc__ =\
+"""Create an array of strings of all keys in a map object.
+
+map -- specifies the map object.
+np  -- specifies the pointer to a variable into which the number of
+       elements of the return value is assigned.
+
+The return value is the pointer to the array of all string keys in the
+map object.
+
+Because the region of the return value is allocated with the 'malloc'
+call, it should be released with the 'free' call if when is no longer
+in use.  Note that elements of the array point to the inner objects,
+whose life duration is synchronous with the map object.
+
+"""
+
+tcmapvals2 = cfunc('tcmapvals2', libtc, tc_void_p,
+                   ('map', TCMAP_P, 1),
+                   ('np', c_int_p, 2))
+tcmapvals2.errcheck = lambda result, func, arguments :\
+    py_list(result, arguments[1], c_char_p)
+tcmapvals2.__doc__ =\
+"""Create an array of strings of all values in a map object.
+
+map -- specifies the map object.
+np  -- specifies the pointer to a variable into which the number of
+       elements of the return value is assigned.
+
+The return value is the pointer to the array of all string values in
+the map object.
+
+Because the region of the return value is allocated with the 'malloc'
+call, it should be released with the 'free' call if when is no longer
+in use.  Note that elements of the array point to the inner objects,
+whose life duration is synchronous with the map object.
+
+"""
+
+tcmaploadone = cfunc('tcmaploadone', libtc, c_void_p,
+                     ('ptr', c_void_p, 1),
+                     ('size', c_int, 1),
+                     ('kbuf', c_void_p, 1),
+                     ('ksiz', c_int, 1),
+                     ('sp', c_int_p, 2))
+tcmaploadone.errcheck = lambda result, func, arguments : (result, arguments[4])
+tcmaploadone.__doc__ =\
+"""Extract a map record from a serialized byte array.
+
+ptr  -- specifies the pointer to the region of serialized byte array.
+size -- specifies the size of the region.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+sp   -- specifies the pointer to the variable into which the size of
+        the region of the return value is assigned.
+
+If successful, the return value is the pointer to the region of the
+value of the corresponding record.  'NULL' is returned when no record
+corresponds.
+
+Because an additional zero code is appended at the end of the region
+of the return value, the return value can be treated as a character
+string.
+
+"""
+
+tcmapprintf = cfunc_va('tcmapprintf', libtc, None,
+                       ('map', TCMAP_P, 1),
+                       ('format', c_char_p, 1))
+tcmapprintf.__doc__ =\
+"""Perform formatted output into a map object.
+
+map    -- specifies the map object.
+kstr   -- specifies the string of the key.
+format -- specifies the printf-like format string.  The conversion
+          character '%' can be used with such flag characters as 's',
+          'd', 'o', 'u', 'x', 'X', 'c', 'e', 'E', 'f', 'g', 'G', '@',
+          '?', 'b', and '%'.  '@' works as with 's' but escapes meta
+          characters of XML.  '?' works as with 's' but escapes meta
+          characters of URL.  'b' converts an integer to the string as
+          binary numbers.  The other conversion character work as with
+          each original.
+
+The other arguments are used according to the format string.
+
+"""
+
+
+# on-memory hash database
+
+mdb_new = cfunc('tcmdbnew', libtc, c_void_p)
+mdb_new.__doc__ =\
+"""Create an on-memory hash database object.
+
+The return value is the new on-memory hash database object.
+
+The object can be shared by plural threads because of the internal
+mutex.
+
+"""
+
+mdb_new2 = cfunc('tcmdbnew2', libtc, c_void_p,
+                 ('bnum', c_uint32, 1))
+mdb_new2.__doc__ =\
+"""Create an on-memory hash database object with specifying the number of
+the buckets.
+
+bnum -- specifies the number of the buckets.
+
+The return value is the new on-memory hash database object.
+
+The object can be shared by plural threads because of the internal
+mutex.
+
+"""
+
+mdb_del = cfunc('tcmdbdel', libtc, None,
+                ('mdb', c_void_p, 1))
+mdb_del.__doc__ =\
+"""Delete an on-memory hash database object.
+
+mdb -- specifies the on-memory hash database object.
+
+"""
+
+mdb_put = cfunc('tcmdbput', libtc, None,
+                ('mdb', c_void_p, 1),
+                ('kbuf', c_void_p, 1),
+                ('ksiz', c_int, 1),
+                ('vbuf', c_void_p, 1),
+                ('vsiz', c_int, 1))
+mdb_put.__doc__ =\
+"""Store a record into an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+vbuf -- specifies the pointer to the region of the value.
+vsiz -- specifies the size of the region of the value.
+
+If a record with the same key exists in the database, it is
+overwritten.
+
+"""
+
+mdb_put2 = cfunc_fast('tcmdbput2', libtc, None,
+                      ('mdb', c_void_p, 1),
+                      ('kstr', c_char_p, 1),
+                      ('vstr', c_char_p, 1))
+mdb_put2.__doc__ =\
+"""Store a string record into an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kstr -- specifies the string of the key.
+vstr -- specifies the string of the value.
+
+If a record with the same key exists in the database, it is
+overwritten.
+
+"""
+
+mdb_putkeep = cfunc('tcmdbputkeep', libtc, c_bool,
+                    ('mdb', c_void_p, 1),
+                    ('kbuf', c_void_p, 1),
+                    ('ksiz', c_int, 1),
+                    ('vbuf', c_void_p, 1),
+                    ('vsiz', c_int, 1))
+mdb_putkeep.__doc__ =\
+"""Store a new record into an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+vbuf -- specifies the pointer to the region of the value.
+vsiz -- specifies the size of the region of the value.
+
+If successful, the return value is true, else, it is false.
+
+If a record with the same key exists in the database, this function
+has no effect.
+
+"""
+
+mdb_putkeep2 = cfunc_fast('tcmdbputkeep2', libtc, c_bool,
+                          ('mdb', c_void_p, 1),
+                          ('kstr', c_char_p, 1),
+                          ('vstr', c_char_p, 1))
+mdb_putkeep2.__doc__ =\
+"""Store a new string record into an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kstr -- specifies the string of the key.
+vstr -- specifies the string of the value.
+
+If successful, the return value is true, else, it is false.
+
+If a record with the same key exists in the database, this function
+has no effect.
+
+"""
+
+mdb_putcat = cfunc('tcmdbputcat', libtc, None,
+                   ('mdb', c_void_p, 1),
+                   ('kbuf', c_void_p, 1),
+                   ('ksiz', c_int, 1),
+                   ('vbuf', c_void_p, 1),
+                   ('vsiz', c_int, 1))
+mdb_putcat.__doc__ =\
+"""Concatenate a value at the end of the existing record in an
+on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+vbuf -- specifies the pointer to the region of the value.
+vsiz -- specifies the size of the region of the value.
+
+If there is no corresponding record, a new record is created.
+
+"""
+
+mdb_putcat2 = cfunc_fast('tcmdbputcat2', libtc, None,
+                         ('mdb', c_void_p, 1),
+                         ('kstr', c_char_p, 1),
+                         ('vstr', c_char_p, 1))
+mdb_putcat2.__doc__ =\
+"""Concatenate a string at the end of the existing record in an
+on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kstr -- specifies the string of the key.
+vstr -- specifies the string of the value.
+
+If there is no corresponding record, a new record is created.
+
+"""
+
+mdb_out = cfunc('tcmdbout', libtc, c_bool,
+                ('mdb', c_void_p, 1),
+                ('kbuf', c_void_p, 1),
+                ('ksiz', c_int, 1))
+mdb_out.__doc__ =\
+"""Remove a record of an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+
+If successful, the return value is true.  False is returned when no
+record corresponds to the specified key.
+
+"""
+
+mdb_out2 = cfunc_fast('tcmdbout2', libtc, c_bool,
+                      ('mdb', c_void_p, 1),
+                      ('kstr', c_char_p, 1))
+mdb_out2.__doc__ =\
+"""Remove a string record of an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kstr -- specifies the string of the key.
+
+If successful, the return value is true.  False is returned when no
+record corresponds to the specified key.
+
+"""
+
+mdb_get = cfunc('tcmdbget', libtc, tc_void_p,
+                ('mdb', c_void_p, 1),
+                ('kbuf', c_void_p, 1),
+                ('ksiz', c_int, 1),
+                ('sp', c_int_p, 2))
+mdb_get.errcheck = lambda result, func, arguments : (result, arguments[3])
+mdb_get.__doc__ =\
+"""Retrieve a record in an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+sp   -- specifies the pointer to the variable into which the size of
+        the region of the return value is assigned.
+
+If successful, the return value is the pointer to the region of the
+value of the corresponding record.  'NULL' is returned when no record
+corresponds.
+
+Because an additional zero code is appended at the end of the region
+of the return value, the return value can be treated as a character
+string.  Because the region of the return value is allocated with the
+'malloc' call, it should be released with the 'free' call when it is
+no longer in use.
+
+"""
+
+mdb_get2 = cfunc_fast('tcmdbget2', libtc, tc_char_p,
+                      ('mdb', c_void_p, 1),
+                      ('kstr', c_char_p, 1))
+mdb_get2.__doc__ =\
+"""Retrieve a string record in an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kstr -- specifies the string of the key.
+
+If successful, the return value is the string of the value of the
+corresponding record.  'NULL' is returned when no record corresponds.
+
+Because the region of the return value is allocated with the 'malloc'
+call, it should be released with the 'free' call when it is no longer
+in use.
+
+"""
+
+mdb_vsiz = cfunc('tcmdbvsiz', libtc, c_int,
+                 ('mdb', c_void_p, 1),
+                 ('kbuf', c_void_p, 1),
+                 ('ksiz', c_int, 1))
+mdb_vsiz.__doc__ =\
+"""Get the size of the value of a record in an on-memory hash database
+object.
+
+mdb  -- specifies the on-memory hash database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+
+If successful, the return value is the size of the value of the
+corresponding record, else, it is -1.
+
+"""
+
+mdb_vsiz2 = cfunc_fast('tcmdbvsiz2', libtc, c_int,
+                       ('mdb', c_void_p, 1),
+                       ('kstr', c_char_p, 1))
+mdb_vsiz2.__doc__ =\
+"""Get the size of the value of a string record in an on-memory hash
+database object.
+
+mdb  -- specifies the on-memory hash database object.
+kstr -- specifies the string of the key.
+
+If successful, the return value is the size of the value of the
+corresponding record, else, it is -1.
+
+"""
+
+mdb_iterinit = cfunc('tcmdbiterinit', libtc, None,
+                     ('mdb', c_void_p, 1))
+mdb_iterinit.__doc__ =\
+"""Initialize the iterator of an on-memory hash database object.
+
+mdb -- specifies the on-memory hash database object.
+
+The iterator is used in order to access the key of every record
+stored in the database.
+
+"""
+
+mdb_iternext = cfunc('tcmdbiternext', libtc, tc_void_p,
+                     ('mdb', c_void_p, 1),
+                     ('sp', c_int_p, 2))
+mdb_iternext.errcheck = lambda result, func, arguments : (result, arguments[1])
+mdb_iternext.__doc__ =\
+"""Get the next key of the iterator of an on-memory hash database object.
+
+mdb -- specifies the on-memory hash database object.
+sp  -- specifies the pointer to the variable into which the size of
+       the region of the return value is assigned.
+
+If successful, the return value is the pointer to the region of the
+next key, else, it is 'NULL'.  'NULL' is returned when no record can
+be fetched from the iterator.
+
+Because the region of the return value is allocated with the 'malloc'
+call, it should be released with the 'free' call when it is no longer
+in use.  The order of iteration is assured to be the same as the
+stored order.
+
+"""
+
+mdb_iternext2 = cfunc_fast('tcmdbiternext2', libtc, tc_char_p,
+                           ('mdb', c_void_p, 1))
+mdb_iternext2.__doc__ =\
+"""Get the next key string of the iterator of an on-memory hash database
+object.
+
+mdb -- specifies the on-memory hash database object.
+
+If successful, the return value is the pointer to the region of the
+next key, else, it is 'NULL'.  'NULL' is returned when no record can
+be fetched from the iterator.
+
+Because the region of the return value is allocated with the 'malloc'
+call, it should be released with the 'free' call when it is no longer
+in use.
+
+"""
+
+mdb_fwmkeys = cfunc('tcmdbfwmkeys', libtc, TCLIST_P,
+                    ('mdb', c_void_p, 1),
+                    ('pbuf', c_void_p, 1),
+                    ('psiz', c_int, 1),
+                    ('max', c_int, 1, -1))
+mdb_fwmkeys.__doc__ =\
+"""Get forward matching keys in an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+pbuf -- specifies the pointer to the region of the prefix.
+psiz -- specifies the size of the region of the prefix.
+max  -- specifies the maximum number of keys to be fetched.  If it is
+        negative, no limit is specified.
+
+The return value is a list object of the corresponding keys.  This
+function does never fail.  It returns an empty list even if no key
+corresponds.
+
+"""
+
+mdb_fwmkeys2 = cfunc_fast('tcmdbfwmkeys2', libtc, TCLIST_P,
+                          ('mdb', c_void_p, 1),
+                          ('pstr', c_char_p, 1),
+                          ('max', c_int, 1, -1))
+mdb_fwmkeys2.__doc__ =\
+"""Get forward matching string keys in an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+pstr -- specifies the string of the prefix.
+max  -- specifies the maximum number of keys to be fetched.  If it is
+        negative, no limit is specified.
+
+The return value is a list object of the corresponding keys.  This
+function does never fail.  It returns an empty list even if no key
+corresponds.
+
+"""
+
+mdb_rnum = cfunc('tcmdbrnum', libtc, c_uint64,
+                 ('mdb', c_void_p, 1))
+mdb_rnum.__doc__ =\
+"""Get the number of records stored in an on-memory hash database object.
+
+mdb -- specifies the on-memory hash database object.
+
+The return value is the number of the records stored in the database.
+
+"""
+
+mdb_msiz = cfunc('tcmdbmsiz', libtc, c_uint64,
+                 ('mdb', c_void_p, 1))
+mdb_msiz.__doc__ =\
+"""Get the total size of memory used in an on-memory hash database object.
+
+mdb -- specifies the on-memory hash database object.
+
+The return value is the total size of memory used in the database.
+
+"""
+
+mdb_addint = cfunc('tcmdbaddint', libtc, c_int,
+                   ('mdb', c_void_p, 1),
+                   ('kbuf', c_void_p, 1),
+                   ('ksiz', c_int, 1),
+                   ('num', c_int, 1))
+mdb_addint.__doc__ =\
+"""Add an integer to a record in an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+num  -- specifies the additional value.
+
+The return value is the summation value.
+
+If the corresponding record exists, the value is treated as an integer
+and is added to.  If no record corresponds, a new record of the
+additional value is stored.
+
+"""
+
+mdb_adddouble = cfunc('tcmdbadddouble', libtc, c_double,
+                      ('mdb', c_void_p, 1),
+                      ('kbuf', c_void_p, 1),
+                      ('ksiz', c_int, 1),
+                      ('num', c_double, 1))
+mdb_adddouble.__doc__ =\
+"""Add a real number to a record in an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+num  -- specifies the additional value.
+
+The return value is the summation value.
+
+If the corresponding record exists, the value is treated as a real
+number and is added to.  If no record corresponds, a new record of the
+additional value is stored.
+
+"""
+
+mdb_vanish = cfunc('tcmdbvanish', libtc, None,
+                   ('mdb', c_void_p, 1))
+mdb_vanish.__doc__ =\
+"""Clear an on-memory hash database object.
+
+mdb -- specifies the on-memory hash database object.
+
+All records are removed.
+
+"""
+
+mdb_cutfront = cfunc('tcmdbcutfront', libtc, None,
+                     ('mdb', c_void_p, 1),
+                     ('num', c_int, 1))
+mdb_cutfront.__doc__ =\
+"""Remove front records of an on-memory hash database object.
+
+mdb -- specifies the on-memory hash database object.
+num -- specifies the number of records to be removed.
+
+The front records are the oldest stored ones.
+
+"""
+
+mdb_iterinit2 = cfunc('tcmdbiterinit2', libtc, None,
+                      ('mdb', c_void_p, 1),
+                      ('kbuf', c_void_p, 1),
+                      ('ksiz', c_int, 1))
+mdb_iterinit2.__doc__ =\
+"""Initialize the iterator of an on-memory hash database object in front
+of a key.
+
+mdb  -- specifies the on-memory hash database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+
+If there is no record corresponding the condition, the iterator is
+not modified.
+
+"""
+
+mdb_foreach = cfunc('tcmdbforeach', libtc, None,
+                    ('mdb', c_void_p, 1),
+                    ('iter', TCITER, 1),
+                    ('op', c_char_p, 1))
+mdb_foreach.__doc__ =\
+"""Process each record atomically of an on-memory hash database object.
+
+mdb  -- specifies the on-memory hash database object.
+iter -- specifies the pointer to the iterator function called for each
+        record.  It receives five parameters.  The first parameter is
+        the pointer to the region of the key.  The second parameter is
+        the size of the region of the key.  The third parameter is the
+        pointer to the region of the value.  The fourth parameter is
+        the size of the region of the value.  The fifth parameter is
+        the pointer to the optional opaque object.  It returns true to
+        continue iteration or false to stop iteration.
+op   -- specifies an arbitrary pointer to be given as a parameter of
+        the iterator function.  If it is not needed, 'NULL' can be
+        specified.
+
+"""
+
+
+# on-memory tree database
+
+ndb_new = cfunc('tcndbnew', libtc, c_void_p)
+ndb_new.__doc__ =\
+"""Create an on-memory tree database object.
+
+The return value is the new on-memory tree database object.
+
+The object can be shared by plural threads because of the internal
+mutex.
+
+"""
+
+ndb_new2 = cfunc('tcndbnew2', libtc, c_void_p,
+                 ('cmp', TCCMP, 1),
+                 ('cmpop', c_void_p, 1))
+ndb_new2.__doc__ =\
+"""Create an on-memory tree database object with specifying the custom
+comparison function.
+
+cmp   -- specifies the pointer to the custom comparison function.
+cmpop -- specifies an arbitrary pointer to be given as a parameter of
+         the comparison function.
+
+The return value is the new on-memory tree database object.
+
+The default comparison function compares keys of two records by
+lexical order.  The functions tccmplexical (default), tccmpdecimal,
+tccmpint32, and tccmpint64 are built-in.
+
+"""
+
+ndb_del = cfunc('tcndbdel', libtc, None,
+                ('ndb', c_void_p, 1))
+ndb_del.__doc__ =\
+"""Delete an on-memory tree database object.
+
+ndb -- specifies the on-memory tree database object.
+
+"""
+
+ndb_put = cfunc('tcndbput', libtc, None,
+                ('ndb', c_void_p, 1),
+                ('kbuf', c_void_p, 1),
+                ('ksiz', c_int, 1),
+                ('vbuf', c_void_p, 1),
+                ('vsiz', c_int, 1))
+ndb_put.__doc__ =\
+"""Store a record into an on-memory tree database object.
+
+ndb  -- specifies the on-memory tree database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+vbuf -- specifies the pointer to the region of the value.
+vsiz -- specifies the size of the region of the value.
+
+If a record with the same key exists in the database, it is
+overwritten.
+
+"""
+
+ndb_put2 = cfunc_fast('tcndbput2', libtc, None,
+                      ('ndb', c_void_p, 1),
+                      ('kstr', c_char_p, 1),
+                      ('vstr', c_char_p, 1))
+ndb_put2.__doc__ =\
+"""Store a string record into an on-memory tree database object.
+
+ndb  -- specifies the on-memory tree database object.
+kstr -- specifies the string of the key.
+vstr -- specifies the string of the value.
+
+If a record with the same key exists in the database, it is
+overwritten.
+
+"""
+
+ndb_putkeep = cfunc('tcndbputkeep', libtc, c_bool,
+                    ('ndb', c_void_p, 1),
+                    ('kbuf', c_void_p, 1),
+                    ('ksiz', c_int, 1),
+                    ('vbuf', c_void_p, 1),
+                    ('vsiz', c_int, 1))
+ndb_putkeep.__doc__ =\
+"""Store a new record into an on-memory tree database object.
+
+ndb  -- specifies the on-memory tree database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+vbuf -- specifies the pointer to the region of the value.
+vsiz -- specifies the size of the region of the value.
+
+If successful, the return value is true, else, it is false.
+
+If a record with the same key exists in the database, this function
+has no effect.
+
+"""
+
+ndb_putkeep2 = cfunc_fast('tcndbputkeep2', libtc, c_bool,
+                          ('ndb', c_void_p, 1),
+                          ('kstr', c_char_p, 1),
+                          ('vstr', c_char_p, 1))
+ndb_putkeep2.__doc__ =\
+"""Store a new string record into an on-memory tree database object.
+
+ndb  -- specifies the on-memory tree database object.
+kstr -- specifies the string of the key.
+vstr -- specifies the string of the value.
+
+If successful, the return value is true, else, it is false.
+
+If a record with the same key exists in the database, this function
+has no effect.
+
+"""
+
+ndb_putcat = cfunc('tcndbputcat', libtc, None,
+                   ('ndb', c_void_p, 1),
+                   ('kbuf', c_void_p, 1),
+                   ('ksiz', c_int, 1),
+                   ('vbuf', c_void_p, 1),
+                   ('vsiz', c_int, 1))
+ndb_putcat.__doc__ =\
+"""Concatenate a value at the end of the existing record in an
+on-memory tree database object.
+
+ndb  -- specifies the on-memory tree database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+vbuf -- specifies the pointer to the region of the value.
+vsiz -- specifies the size of the region of the value.
+
+If there is no corresponding record, a new record is created.
+
+"""
+
+ndb_putcat2 = cfunc_fast('tcndbputcat2', libtc, None,
+                         ('ndb', c_void_p, 1),
+                         ('kstr', c_char_p, 1),
+                         ('vstr', c_char_p, 1))
+ndb_putcat2.__doc__ =\
+"""Concatenate a string at the end of the existing record in an
+on-memory tree database object.
+
+ndb  -- specifies the on-memory tree database object.
+kstr -- specifies the string of the key.
+vstr -- specifies the string of the value.
+
+If there is no corresponding record, a new record is created.
+
+"""
+
+ndb_out = cfunc('tcndbout', libtc, c_bool,
+                ('ndb', c_void_p, 1),
+                ('kbuf', c_void_p, 1),
+                ('ksiz', c_int, 1))
+ndb_out.__doc__ =\
+"""Remove a record of an on-memory tree database object.
+
+ndb  -- specifies the on-memory tree database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+
+If successful, the return value is true.  False is returned when no
+record corresponds to the specified key.
+
+"""
+
+ndb_out2 = cfunc_fast('tcndbout2', libtc, c_bool,
+                      ('ndb', c_void_p, 1),
+                      ('kstr', c_char_p, 1))
+ndb_out2.__doc__ =\
+"""Remove a string record of an on-memory tree database object.
+
+ndb  -- specifies the on-memory tree database object.
+kstr -- specifies the string of the key.
+
+If successful, the return value is true.  False is returned when no
+record corresponds to the specified key.
+
+"""
+
+ndb_get = cfunc('tcndbget', libtc, tc_void_p,
+                ('ndb', c_void_p, 1),
+                ('kbuf', c_void_p, 1),
+                ('ksiz', c_int, 1),
+                ('sp', c_int_p, 2))
+ndb_get.errcheck = lambda result, func, arguments : (result, arguments[3])
+ndb_get.__doc__ =\
+"""Retrieve a record in an on-memory tree database object.
+
+ndb  -- specifies the on-memory tree database object.
 kbuf -- specifies the pointer to the region of the key.
 ksiz -- specifies the size of the region of the key.
 sp   -- specifies the pointer to the variable into which the size of
@@ -1608,183 +2543,276 @@ corresponds.
 
 Because an additional zero code is appended at the end of the region
 of the return value, the return value can be treated as a character
-string.  The internal region of the returned record is moved to the
-tail so that the record will survive for a time under LRU cache
-algorithm removing records from the head.
+string.  Because the region of the return value is allocated with the
+'malloc' call, it should be released with the 'free' call when it is
+no longer in use.
 
 """
 
-tcmapget4 = cfunc('tcmapget4', libtc, c_char_p,
-                  ('map', TCMAP_P, 1),
-                  ('kstr', c_char_p, 1),
-                  ('dstr', c_char_p, 1))
-tcmapget4.__doc__ =\
-"""Retrieve a string record in a map object with specifying the
-default value string.
+ndb_get2 = cfunc_fast('tcndbget2', libtc, tc_char_p,
+                      ('ndb', c_void_p, 1),
+                      ('kstr', c_char_p, 1))
+ndb_get2.__doc__ =\
+"""Retrieve a string record in an on-memory tree database object.
 
-map  -- specifies the map object.
+ndb  -- specifies the on-memory tree database object.
 kstr -- specifies the string of the key.
-dstr -- specifies the string of the default value.
 
-The return value is the string of the value of the corresponding
-record or the default value string.
+If successful, the return value is the string of the value of the
+corresponding record.  'NULL' is returned when no record corresponds.
+
+Because the region of the return value is allocated with the 'malloc'
+call, it should be released with the 'free' call when it is no longer
+in use.
 
 """
 
-tcmapiterinit2 = cfunc('tcmapiterinit2', libtc, None,
-                       ('map', TCMAP_P, 1),
-                       ('kbuf', c_void_p, 1),
-                       ('ksiz', c_int, 1))
-tcmapiterinit2.__doc__ =\
-"""Initialize the iterator of a map object at the record corresponding
-a key.
+ndb_vsiz = cfunc('tcndbvsiz', libtc, c_int,
+                 ('ndb', c_void_p, 1),
+                 ('kbuf', c_void_p, 1),
+                 ('ksiz', c_int, 1))
+ndb_vsiz.__doc__ =\
+"""Get the size of the value of a record in an on-memory tree database
+object.
 
-map  -- specifies the map object.
+ndb  -- specifies the on-memory tree database object.
 kbuf -- specifies the pointer to the region of the key.
 ksiz -- specifies the size of the region of the key.
 
-If there is no record corresponding the condition, the iterator is not
-modified.
+If successful, the return value is the size of the value of the
+corresponding record, else, it is -1.
 
 """
 
-tcmapiterinit3 = cfunc('tcmapiterinit3', libtc, None,
-                       ('map', TCMAP_P, 1),
+ndb_vsiz2 = cfunc_fast('tcndbvsiz2', libtc, c_int,
+                       ('ndb', c_void_p, 1),
                        ('kstr', c_char_p, 1))
-tcmapiterinit3.__doc__ =\
-"""Initialize the iterator of a map object at the record corresponding
-a key string.
+ndb_vsiz2.__doc__ =\
+"""Get the size of the value of a string record in an on-memory tree
+database object.
 
-map  -- specifies the map object.
+ndb  -- specifies the on-memory tree database object.
 kstr -- specifies the string of the key.
 
-If there is no record corresponding the condition, the iterator is not
-modified.
+If successful, the return value is the size of the value of the
+corresponding record, else, it is -1.
 
 """
 
-tcmapiterval = cfunc('tcmapiterval', libtc, c_void_p,
-                     ('kbuf', c_void_p, 1),
+ndb_iterinit = cfunc('tcndbiterinit', libtc, None,
+                     ('ndb', c_void_p, 1))
+ndb_iterinit.__doc__ =\
+"""Initialize the iterator of an on-memory tree database object.
+
+ndb -- specifies the on-memory tree database object.
+
+The iterator is used in order to access the key of every record
+stored in the database.
+
+"""
+
+ndb_iternext = cfunc('tcndbiternext', libtc, tc_void_p,
+                     ('ndb', c_void_p, 1),
                      ('sp', c_int_p, 2))
-tcmapiterval.errcheck = lambda result, func, arguments : (result, arguments[1])
-tcmapiterval.__doc__ =\
-"""Get the value bound to the key fetched from the iterator of a map object.
+ndb_iternext.errcheck = lambda result, func, arguments : (result, arguments[1])
+ndb_iternext.__doc__ =\
+"""Get the next key of the iterator of an on-memory tree database object.
 
-kbuf -- specifies the pointer to the region of the iteration key.
-sp   -- specifies the pointer to the variable into which the size of
-        the region of the return value is assigned.
+ndb -- specifies the on-memory tree database object.
+sp  -- specifies the pointer to the variable into which the size of
+       the region of the return value is assigned.
 
-The return value is the pointer to the region of the value of the
-corresponding record.
+If successful, the return value is the pointer to the region of the
+next key, else, it is 'NULL'.  'NULL' is returned when no record can
+be fetched from the iterator.
 
-Because an additional zero code is appended at the end of the region
-of the return value, the return value can be treated as a character
-string.
+Because the region of the return value is allocated with the 'malloc'
+call, it should be released with the 'free' call when it is no longer
+in use.  The order of iteration is ascending order of the keys.
 
 """
 
-tcmapiterval2 = cfunc('tcmapiterval2', libtc, c_char_p,
-                      ('kstr', c_char_p, 1))
-tcmapiterval2.__doc__ =\
-"""Get the value string bound to the key fetched from the iterator of
-a map object.
+ndb_iternext2 = cfunc_fast('tcndbiternext2', libtc, tc_char_p,
+                           ('ndb', c_void_p, 1))
+ndb_iternext2.__doc__ =\
+"""Get the next key string of the iterator of an on-memory tree database
+object.
 
-kstr -- specifies the string of the iteration key.
+ndb -- specifies the on-memory tree database object.
 
-The return value is the pointer to the region of the value of the
-corresponding record.
+If successful, the return value is the pointer to the region of the
+next key, else, it is 'NULL'.  'NULL' is returned when no record can
+be fetched from the iterator.
+
+Because the region of the return value is allocated with the 'malloc'
+call, it should be released with the 'free' call when it is no longer
+in use.
 
 """
 
-tcmapkeys2 = cfunc('tcmapkeys2', libtc, tc_void_p,
-                   ('map', TCMAP_P, 1),
-                   ('np', c_int_p, 2))
-tcmapkeys2.errcheck = lambda result, func, arguments :\
-    py_list(result, arguments[1], c_char_p)
-tcmapkeys2.__doc__ =\
-"""Create an array of strings of all keys in a map object.
+ndb_fwmkeys = cfunc('tcndbfwmkeys', libtc, TCLIST_P,
+                    ('ndb', c_void_p, 1),
+                    ('pbuf', c_void_p, 1),
+                    ('psiz', c_int, 1),
+                    ('max', c_int, 1, -1))
+ndb_fwmkeys.__doc__ =\
+"""Get forward matching keys in an on-memory tree database object.
 
-map -- specifies the map object.
-np  -- specifies the pointer to a variable into which the number of
-       elements of the return value is assigned.
+ndb  -- specifies the on-memory tree database object.
+pbuf -- specifies the pointer to the region of the prefix.
+psiz -- specifies the size of the region of the prefix.
+max  -- specifies the maximum number of keys to be fetched.  If it is
+        negative, no limit is specified.
 
-The return value is the pointer to the array of all string keys in the
-map object.
+The return value is a list object of the corresponding keys.  This
+function does never fail.  It returns an empty list even if no key
+corresponds.
 
-Because the region of the return value is allocated with the 'malloc'
-call, it should be released with the 'free' call if when is no longer
-in use.  Note that elements of the array point to the inner objects,
-whose life duration is synchronous with the map object.
+"""
+
+ndb_fwmkeys2 = cfunc_fast('tcndbfwmkeys2', libtc, TCLIST_P,
+                          ('ndb', c_void_p, 1),
+                          ('pstr', c_char_p, 1),
+                          ('max', c_int, 1, -1))
+ndb_fwmkeys2.__doc__ =\
+"""Get forward matching string keys in an on-memory tree database object.
+
+ndb  -- specifies the on-memory tree database object.
+pstr -- specifies the string of the prefix.
+max  -- specifies the maximum number of keys to be fetched.  If it is
+        negative, no limit is specified.
+
+The return value is a list object of the corresponding keys.  This
+function does never fail.  It returns an empty list even if no key
+corresponds.
 
 """
 
-tcmapvals2 = cfunc('tcmapvals2', libtc, tc_void_p,
-                   ('map', TCMAP_P, 1),
-                   ('np', c_int_p, 2))
-tcmapvals2.errcheck = lambda result, func, arguments :\
-    py_list(result, arguments[1], c_char_p)
-tcmapvals2.__doc__ =\
-"""Create an array of strings of all values in a map object.
+ndb_rnum = cfunc('tcndbrnum', libtc, c_uint64,
+                 ('ndb', c_void_p, 1))
+ndb_rnum.__doc__ =\
+"""Get the number of records stored in an on-memory tree database object.
 
-map -- specifies the map object.
-np  -- specifies the pointer to a variable into which the number of
-       elements of the return value is assigned.
+ndb -- specifies the on-memory tree database object.
 
-The return value is the pointer to the array of all string values in
-the map object.
+The return value is the number of the records stored in the database.
 
-Because the region of the return value is allocated with the 'malloc'
-call, it should be released with the 'free' call if when is no longer
-in use.  Note that elements of the array point to the inner objects,
-whose life duration is synchronous with the map object.
+"""
+
+ndb_msiz = cfunc('tcndbmsiz', libtc, c_uint64,
+                 ('ndb', c_void_p, 1))
+ndb_msiz.__doc__ =\
+"""Get the total size of memory used in an on-memory tree database object.
+
+ndb -- specifies the on-memory tree database object.
+
+The return value is the total size of memory used in the database.
 
 """
 
-tcmaploadone = cfunc('tcmaploadone', libtc, c_void_p,
-                     ('ptr', c_void_p, 1),
-                     ('size', c_int, 1),
-                     ('kbuf', c_void_p, 1),
-                     ('ksiz', c_int, 1),
-                     ('sp', c_int_p, 2))
-tcmaploadone.errcheck = lambda result, func, arguments : (result, arguments[4])
-tcmaploadone.__doc__ =\
-"""Extract a map record from a serialized byte array.
+ndb_addint = cfunc('tcndbaddint', libtc, c_int,
+                   ('ndb', c_void_p, 1),
+                   ('kbuf', c_void_p, 1),
+                   ('ksiz', c_int, 1),
+                   ('num', c_int, 1))
+ndb_addint.__doc__ =\
+"""Add an integer to a record in an on-memory tree database object.
 
-ptr  -- specifies the pointer to the region of serialized byte array.
-size -- specifies the size of the region.
+ndb  -- specifies the on-memory tree database object.
 kbuf -- specifies the pointer to the region of the key.
 ksiz -- specifies the size of the region of the key.
-sp   -- specifies the pointer to the variable into which the size of
-        the region of the return value is assigned.
+num  -- specifies the additional value.
 
-If successful, the return value is the pointer to the region of the
-value of the corresponding record.  'NULL' is returned when no record
-corresponds.
+The return value is the summation value.
 
-Because an additional zero code is appended at the end of the region
-of the return value, the return value can be treated as a character
-string.
+If the corresponding record exists, the value is treated as an integer
+and is added to.  If no record corresponds, a new record of the
+additional value is stored.
 
 """
 
-tcmapprintf = cfunc_va('tcmapprintf', libtc, None,
-                       ('map', TCMAP_P, 1),
-                       ('format', c_char_p, 1))
-tcmapprintf.__doc__ =\
-"""Perform formatted output into a map object.
+ndb_adddouble = cfunc('tcndbadddouble', libtc, c_double,
+                      ('ndb', c_void_p, 1),
+                      ('kbuf', c_void_p, 1),
+                      ('ksiz', c_int, 1),
+                      ('num', c_double, 1))
+ndb_adddouble.__doc__ =\
+"""Add a real number to a record in an on-memory tree database object.
 
-map    -- specifies the map object.
-kstr   -- specifies the string of the key.
-format -- specifies the printf-like format string.  The conversion
-          character '%' can be used with such flag characters as 's',
-          'd', 'o', 'u', 'x', 'X', 'c', 'e', 'E', 'f', 'g', 'G', '@',
-          '?', 'b', and '%'.  '@' works as with 's' but escapes meta
-          characters of XML.  '?' works as with 's' but escapes meta
-          characters of URL.  'b' converts an integer to the string as
-          binary numbers.  The other conversion character work as with
-          each original.
+ndb  -- specifies the on-memory tree database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+num  -- specifies the additional value.
 
-The other arguments are used according to the format string.
+The return value is the summation value.
+
+If the corresponding record exists, the value is treated as a real
+number and is added to.  If no record corresponds, a new record of the
+additional value is stored.
+
+"""
+
+ndb_vanish = cfunc('tcndbvanish', libtc, None,
+                   ('ndb', c_void_p, 1))
+ndb_vanish.__doc__ =\
+"""Clear an on-memory tree database object.
+
+ndb -- specifies the on-memory tree database object.
+
+All records are removed.
+
+"""
+
+ndb_cutfringe = cfunc('tcndbcutfringe', libtc, None,
+                      ('ndb', c_void_p, 1),
+                      ('num', c_int, 1))
+ndb_cutfringe.__doc__ =\
+"""Remove fringe records of an on-memory tree database object.
+
+ndb -- specifies the on-memory tree database object.
+num -- specifies the number of records to be removed.
+
+The fringe records are the leaves of the splay tree, that is, the ones
+not accessed recently.
+
+"""
+
+ndb_iterinit2 = cfunc('tcndbiterinit2', libtc, None,
+                      ('ndb', c_void_p, 1),
+                      ('kbuf', c_void_p, 1),
+                      ('ksiz', c_int, 1))
+ndb_iterinit2.__doc__ =\
+"""Initialize the iterator of an on-memory tree database object in front
+of a key.
+
+ndb  -- specifies the on-memory tree database object.
+kbuf -- specifies the pointer to the region of the key.
+ksiz -- specifies the size of the region of the key.
+
+If there is no record corresponding the condition, the iterator is
+not modified.
+
+"""
+
+ndb_foreach = cfunc('tcndbforeach', libtc, None,
+                    ('ndb', c_void_p, 1),
+                    ('iter', TCITER, 1),
+                    ('op', c_char_p, 1))
+ndb_foreach.__doc__ =\
+"""Process each record atomically of an on-memory tree database object.
+
+ndb  -- specifies the on-memory tree database object.
+iter -- specifies the pointer to the iterator function called for each
+        record.  It receives five parameters.  The first parameter is
+        the pointer to the region of the key.  The second parameter is
+        the size of the region of the key.  The third parameter is the
+        pointer to the region of the value.  The fourth parameter is
+        the size of the region of the value.  The fifth parameter is
+        the pointer to the optional opaque object.  It returns true to
+        continue iteration or false to stop iteration.
+op   -- specifies an arbitrary pointer to be given as a parameter of
+        the iterator function.  If it is not needed, 'NULL' can be
+        specified.
 
 """
 
@@ -5392,6 +6420,18 @@ The return value is the maximum number of cached leaf nodes.
 
 """
 
+bdb_nmemb = cfunc('tcbdbnmemb', libtc, c_uint32,
+                  ('bdb', c_void_p, 1))
+bdb_nmemb.__doc__ =\
+"""Get the maximum number of cached non-leaf nodes of a B+ tree
+database object.
+
+bdb -- specifies the B+ tree database object.
+
+The return value is the maximum number of cached non-leaf nodes.
+
+"""
+
 bdb_lnum = cfunc('tcbdblnum', libtc, c_uint64,
                  ('bdb', c_void_p, 1))
 bdb_lnum.__doc__ =\
@@ -8874,3 +9914,10 @@ str -- specifies a string.
 The return value is the set operation type or -1 on failure.
 
 """
+
+
+# Name the placeholders, so they are replaced when resolved.
+for _name, _value in globals().items():
+    if isinstance(_value, LazyFunc):
+        _value.__dict__['_name'] = _name
+del _name, _value
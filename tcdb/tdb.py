@@ -25,6 +25,9 @@ True
 import ctypes
 import datetime
 
+import codec
+import forksafe
+import layout
 import tc
 import util
 
@@ -54,8 +57,8 @@ ITLEXICAL = 0                 # lexical string
 ITDECIMAL = 1                 # decimal string
 ITTOKEN   = 2                 # token inverted index
 ITQGRAM   = 3                 # q-gram inverted index
-ITOPT     = 9998,             # optimize
-ITVOID    = 9999,             # void
+ITOPT     = 9998              # optimize
+ITVOID    = 9999              # void
 ITKEEP    = 1 << 24           # keep existing index
 
 # enumeration for query conditions
@@ -97,6 +100,13 @@ QPPUT     = 1 << 0            # modify the record
 QPOUT     = 1 << 1            # remove the record
 QPSTOP    = 1 << 24           # stop the iteration
 
+# enumeration for KWIC options
+KWMUTAB   = 1 << 0            # mark up by tabs
+KWMUCTRL  = 1 << 1            # mark up by control characters
+KWMUBRCT  = 1 << 2            # mark up by square brackets
+KWNOOVER  = 1 << 24           # no overlap
+KWPULEAD  = 1 << 25           # pick up the lead string
+
 
 class Query(object):
     def __init__(self, db):
@@ -115,7 +125,10 @@ class Query(object):
         self.qry = None
 
     def addcond(self, name, op, expr):
-        """Add a narrowing condition to a query object."""
+        """Add a narrowing condition to a query object.  An unicode
+        expression matches the columns stored as raw unicode."""
+        if isinstance(expr, unicode):
+            expr = expr.encode(util.ENCODING or 'utf-8')
         tc.tdb_qryaddcond(self.qry, name, op, expr)
 
     def setorder(self, name, type_):
@@ -175,6 +188,60 @@ class Query(object):
             raise tc.TCException(tc.tdb_errmsg(tc.tdb_ecode(self.db)))
         return result
 
+    def _kwic(self, c_pkey, c_pkey_len, columns, width, opts, schema):
+        """Get the columns and the keyword-in-context strings of a
+        record, or None if it is missing."""
+        cols_tcmap = tc.tdb_get(self.db, c_pkey, c_pkey_len)
+        if not cols_tcmap:
+            return None
+        kwic = []
+        for name in columns:
+            tclist_kwic = tc.tdb_qrykwic(self.qry, cols_tcmap, name, width,
+                                         opts)
+            kwic.extend(util.deserialize_tclist(tclist_kwic, as_type=str))
+        return (util.deserialize_tcmap(cols_tcmap, schema), kwic)
+
+    @staticmethod
+    def _columns(columns):
+        """Get the list of the columns of the keyword-in-context
+        strings.  None is the column of the first condition."""
+        if columns is None or isinstance(columns, basestring):
+            return [columns]
+        return list(columns)
+
+    def iter_kwic(self, columns=None, width=32, opts=KWMUCTRL, as_type=None,
+                  schema=None):
+        """Execute the search of a query object and iterate for the
+        (primary key, columns, keyword-in-context strings) of each
+        record.  The strings show width characters around every
+        keyword of the full-text conditions found in columns (a name,
+        a list of names, or None for the column of the first
+        condition), marked up as opts says."""
+        columns = self._columns(columns)
+        tclist_pkeys = tc.tdb_qrysearch(self.qry)
+        for index in xrange(tc.tclistnum(tclist_pkeys)):
+            (c_pkey, c_pkey_len) = tc.tclistval(tclist_pkeys, index)
+            row = self._kwic(c_pkey, c_pkey_len, columns, width, opts,
+                             schema)
+            # A record may be removed after the search.
+            if row is not None:
+                pkey = util.deserialize(c_pkey, c_pkey_len, as_type)
+                yield (pkey,) + row
+
+    def kwic(self, pkeys, columns=None, width=32, opts=KWMUCTRL,
+             raw_key=False, schema=None):
+        """Get the (primary key, columns, keyword-in-context strings) of
+        a page of records found by a query object, like iter_kwic."""
+        columns = self._columns(columns)
+        rows = []
+        for pkey in pkeys:
+            (c_pkey, c_pkey_len) = util.serialize(pkey, raw_key)
+            row = self._kwic(c_pkey, c_pkey_len, columns, width, opts,
+                             schema)
+            if row is not None:
+                rows.append((pkey,) + row)
+        return rows
+
     def hint(self):
         """Get the hint string of a query object."""
         return tc.tdb_qryhint(self.qry)
@@ -201,11 +268,13 @@ class TDB(object):
 
     def __del__(self):
         """Delete a table database object."""
-        tc.tdb_del(self.db)
+        if not forksafe.is_stale(self):
+            tc.tdb_del(self.db)
 
     def setmutex(self):
         """Set mutual exclusion control of a table database object for
         threading."""
+        self._mutex = True
         return tc.tdb_setmutex(self.db)
 
     def tune(self, bnum=0, apow=-1, fpow=-1, opts=0):
@@ -228,6 +297,7 @@ class TDB(object):
         result = tc.tdb_setxmsiz(self.db, xmsiz)
         if not result:
             raise tc.TCException(tc.tdb_errmsg(tc.tdb_ecode(self.db)))
+        self._xmsiz = xmsiz
         return result
 
     def setdfunit(self, dfunit=0):
@@ -248,14 +318,32 @@ class TDB(object):
 
         if not tc.tdb_open(self.db, path, omode):
             raise tc.TCException(tc.tdb_errmsg(tc.tdb_ecode(self.db)))
+        self._open_args = (path, omode & ~OTRUNC, bnum, apow, fpow, opts,
+                           rcnum, lcnum, ncnum, xmsiz, dfunit)
+        forksafe.register(self)
 
     def close(self):
         """Close a table database object."""
+        if forksafe.forget(self):
+            # Opened before a fork, the parent process owns it.
+            self.db = tc.tdb_new()
+            return True
         result = tc.tdb_close(self.db)
         if not result:
             raise tc.TCException(tc.tdb_errmsg(tc.tdb_ecode(self.db)))
         return result
 
+    def _reopen(self):
+        """Open a table database object again in a forked child
+        process, with the parameters of its open() call and a
+        non-blocking lock."""
+        self.db = tc.tdb_new()
+        if getattr(self, '_mutex', False):
+            tc.tdb_setmutex(self.db)
+        if getattr(self, '_codecfunc', None):
+            tc.tdb_setcodecfunc(self.db, *self._codecfunc)
+        self.open(*forksafe.child_args(self))
+
     def __setitem__(self, key, value):
         """Store any Python object into a table database object."""
         return self.put(key, value)
@@ -607,6 +695,14 @@ class TDB(object):
         table database object."""
         return tc.tdb_bnumused(self.db)
 
+    def metrics(self, sample=64):
+        """Get a snapshot of the layout metrics of a table database
+        object.  The average record size is estimated from the first
+        sample records."""
+        if hasattr(self, '_xmsiz'):
+            return layout.tdb_metrics(self.db, sample, self._xmsiz)
+        return layout.tdb_metrics(self.db, sample)
+
     def inum(self):
         """Get the number of column indices of a table database
         object."""
@@ -633,14 +729,23 @@ class TDB(object):
             raise tc.TCException(tc.tdb_errmsg(tc.tdb_ecode(self.db)))
         return result
 
-    # def setcodecfunc(self, enc, encop, dec, decop):
-    #     """Set the custom codec functions of a table database
-    #     object."""
-    #     result = tc.tdb_setcodecfunc(self.db, TCCODEC(enc), encop,
-    #                                  TCCODEC(dec), decop)
-    #     if not result:
-    #         raise tc.TCException(tc.tdb_errmsg(tc.tdb_ecode(self.db)))
-    #     return result
+    def setcodecfunc(self, enc, encop, dec, decop):
+        """Set the custom codec functions of a table database object.
+        enc and dec get a string and encop or decop, and return a
+        string."""
+        self._codecfunc = (codec.tccodec(enc), encop, codec.tccodec(dec),
+                           decop)
+        result = tc.tdb_setcodecfunc(self.db, *self._codecfunc)
+        if not result:
+            raise tc.TCException(tc.tdb_errmsg(tc.tdb_ecode(self.db)))
+        return result
+
+    def setcodec(self, codec_='zlib', **kwargs):
+        """Set a codec object, or the name of a registered codec, as
+        the custom codec of a table database object.  The default is
+        zlib at level 1, the fastest."""
+        codec_ = codec.get(codec_, **kwargs)
+        return self.setcodecfunc(codec_.encode, None, codec_.decode, None)
 
     def dfunit(self):
         """Get the unit step number of auto defragmentation of a table
@@ -705,6 +810,13 @@ class TDB(object):
         (c_key, c_key_len) = util.serialize(key, raw_key)
         return tc.tdb_iterinit2(self.db, c_key, c_key_len)
 
+    def contains_many(self, keys, raw_key=False):
+        """Return a bitmap with the bit i set if table database object
+        has the i-th key."""
+        serialize, iterinit2, db = util.serialize, tc.tdb_iterinit2, self.db
+        return util.bitmap(iterinit2(db, *serialize(key, raw_key))
+                           for key in keys)
+
     def query(self):
         """Return a Query object associated with the table database
         object."""
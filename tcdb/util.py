@@ -4,6 +4,11 @@ import ctypes
 import tc
 
 
+# Encoding of raw unicode strings.  None selects the old layout, an
+# array of wchar_t, to read files not converted with migrate.
+ENCODING = 'utf-8'
+
+
 def get_type(obj, as_raw):
     """Get the type of an object if as_raw is True."""
     type_ = None
@@ -32,8 +37,13 @@ def serialize(obj, as_raw=False):
         c_obj = ctypes.c_char_p(obj)
         c_obj_len = len(obj)       # We don't need to store the last \x00
     elif isinstance(obj, unicode) and as_raw:
-        c_obj = ctypes.c_wchar_p(obj)
-        c_obj_len = len(obj) << 2  # We don't need to store the last \x00
+        if ENCODING:
+            obj = obj.encode(ENCODING)
+            c_obj = ctypes.c_char_p(obj)
+            c_obj_len = len(obj)   # We don't need to store the last \x00
+        else:
+            c_obj = ctypes.c_wchar_p(obj)
+            c_obj_len = len(obj) * ctypes.sizeof(ctypes.c_wchar)
     else:
         obj = cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL)
         c_obj = ctypes.c_char_p(obj)
@@ -47,7 +57,12 @@ def deserialize(c_obj, c_obj_len, as_type=None):
     if as_type is str:
         obj = ctypes.string_at(c_obj, c_obj_len)
     elif as_type is unicode:
-        obj = ctypes.wstring_at(c_obj, c_obj_len.value >> 2)
+        if ENCODING:
+            obj = ctypes.string_at(c_obj, c_obj_len).decode(ENCODING)
+        else:
+            c_obj_len = getattr(c_obj_len, 'value', c_obj_len)
+            obj = ctypes.wstring_at(c_obj,
+                                    c_obj_len // ctypes.sizeof(ctypes.c_wchar))
     elif as_type is int:
         obj = ctypes.cast(c_obj, tc.c_int_p).contents.value
     elif as_type is float:
@@ -57,8 +72,33 @@ def deserialize(c_obj, c_obj_len, as_type=None):
     return obj
 
 
+def _vnum(num):
+    """Encode a size as a variable length number (TCSETVNUMBUF)."""
+    buf = []
+    while True:
+        (num, rem) = (num >> 7, num & 0x7f)
+        if not num:
+            buf.append(chr(rem))
+            return ''.join(buf)
+        buf.append(chr(0xff - rem))
+
+
+def dump_tclist(objs):
+    """Serialize an array of strings in the layout of tclistdump."""
+    data = []
+    for obj in objs:
+        size = len(obj)
+        data.append(chr(size) if size < 0x80 else _vnum(size))
+        data.append(obj)
+    return ''.join(data)
+
+
 def serialize_tclist(objs, as_raw=False):
     """Serialize an array of objects, ready to be used in putdup."""
+    if as_raw and all(isinstance(obj, str) for obj in objs):
+        # A single call for the whole array instead of one per object.
+        data = dump_tclist(objs)
+        return tc.tclistload(data, len(data))
     tclist_objs = tc.tclistnew2(len(objs))
     for obj in objs:
         (c_obj, c_obj_len) = serialize(obj, as_raw)
@@ -108,3 +148,21 @@ def deserialize_xstr(xstr, as_type=None):
     (c_obj, c_obj_len) = (tc.tcxstrptr(xstr), tc.tcxstrsize(xstr))
     obj = deserialize(c_obj, c_obj_len, as_type)
     return obj
+
+
+def bitmap(flags):
+    """Pack an iterable of booleans into a bitmap, used in
+    contains_many.  The i-th flag is the bit (i & 7) of the byte
+    (i >> 3)."""
+    bits = bytearray()
+    for index, flag in enumerate(flags):
+        if not index & 7:
+            bits.append(0)
+        if flag:
+            bits[-1] |= 1 << (index & 7)
+    return bits
+
+
+def bitmap_get(bits, index):
+    """Return True if the bit index of a bitmap is set."""
+    return bool(bits[index >> 3] & (1 << (index & 7)))
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import os
 import unittest
 import warnings
 
 from tcdb import adb
+from tcdb import tc
+from tcdb import tdb
+from tcdb import util
 
 
 class TestADBSimple(unittest.TestCase):
@@ -120,6 +124,50 @@ class TestADBSimple(unittest.TestCase):
             self.adb.put(key, key)
         self.adb.foreach(proc, 'test')
 
+    def test_contains_many(self):
+        self.adb.put('key1', 'some text')
+        self.adb.put('key3', 'some text')
+        bits = self.adb.contains_many(['key1', 'key2', 'key3'])
+        self.assertEqual([util.bitmap_get(bits, i) for i in range(3)],
+                         [True, False, True])
+
+    def test_metrics(self):
+        self.adb.put('key', 'some text')
+        metrics = self.adb.metrics()
+        self.assertEqual(metrics['rnum'], 1)
+        self.assert_(metrics['size'] > 0)
+
+    def test_lists(self):
+        self.adb.putlist([('key1', 'hop'), ('key2', 'step')])
+        self.adb.putlist({'key3': 'jump'})
+        self.assertEqual(len(self.adb), 3)
+        self.assertEqual(self.adb.misc('get', ['key1']), ['hop'])
+        self.assertEqual(self.adb.getlist(['key1', 'key3', 'missing']),
+                         {'key1': 'hop', 'key3': 'jump'})
+        self.adb.outlist(['key1', 'key2', 'missing'])
+        self.assertEqual(self.adb.keys(), ['key3'])
+        self.assertRaises(tc.TCException, self.adb.setindex, 'name',
+                          tdb.ITLEXICAL)
+
+    def test_table(self):
+        db = adb.ADBSimple()
+        db.open('test.tct')
+        db.putlist([('pk1', 'name\x00alice\x00age\x0030'),
+                    ('pk2', 'name\x00bob\x00age\x0025'),
+                    ('pk3', 'name\x00carol\x00age\x0041')])
+        db.setindex('age', tdb.ITDECIMAL)
+        self.assertEqual(db.search([('age', tdb.QCNUMGT, '26')],
+                                   order=('age', tdb.QONUMASC)),
+                         ['pk1', 'pk3'])
+        self.assertEqual(db.search(order=('name', tdb.QOSTRDESC), limit=1,
+                                   columns=['name']),
+                         [('pk3', {'name': 'carol'})])
+        self.assertEqual(db.searchcount([('name', tdb.QCSTRBW, 'b')]), 1)
+        db.searchout([('name', tdb.QCSTREQ, 'bob')])
+        self.assertEqual(len(db), 2)
+        db.close()
+        os.remove('test.tct')
+
 
 class TestADB(unittest.TestCase):
     def setUp(self):
@@ -421,6 +469,26 @@ class TestADB(unittest.TestCase):
             self.adb.put(obj, obj)
         self.adb.foreach(proc, 'test')
 
+    def test_contains_many(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        for obj in objs[::2]:
+            self.adb.put(obj, obj)
+        bits = self.adb.contains_many(objs)
+        self.assertEqual([util.bitmap_get(bits, i) for i in range(len(objs))],
+                         [True, False, True, False, True])
+
+    def test_lists(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        self.adb.putlist((obj, obj) for obj in objs)
+        self.assertEqual(self.adb.getlist(objs + ['missing']),
+                         dict((obj, obj) for obj in objs))
+        self.adb.putlist({'key': 'value'}, raw_key=True, raw_value=True)
+        self.assertEqual(self.adb.getlist(['key'], raw_key=True,
+                                          value_type=str),
+                         {'key': 'value'})
+        self.adb.outlist(objs[:2])
+        self.assertEqual(len(self.adb), 4)
+
 
 if __name__ == '__main__':
     unittest.main()
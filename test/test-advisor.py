@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+from tcdb import advisor
+from tcdb import bdb
+from tcdb import hdb
+
+
+class TestAdvisorHDB(unittest.TestCase):
+    def setUp(self):
+        self.hdb = hdb.HDB()
+        self.hdb.open('test.hdb')
+        for i in range(1000):
+            self.hdb.put(i, 'some text %d' % i)
+
+    def tearDown(self):
+        self.hdb.close()
+        self.hdb = None
+        os.remove('test.hdb')
+
+    def test_sample(self):
+        keys, distribution = advisor.sample(self.hdb, 100)
+        self.assertEqual(len(keys), 100)
+        self.assertEqual(distribution['count'], 100)
+        self.assert_(distribution['value']['max'] >=
+                     distribution['value']['p50'] > 0)
+
+    def test_advise(self):
+        params = advisor.advise(self.hdb, growth=10,
+                                memory_budget=64 * advisor.MEGA)
+        self.assert_(params['bnum'] >= 20000)
+        self.assert_(params['xmsiz'] <= 32 * advisor.MEGA)
+        params = advisor.advise(self.hdb, growth=1000,
+                                memory_budget=3 * advisor.MEGA)
+        self.assertEqual(params['xmsiz'], 3 * advisor.MEGA // 2)
+        self.assert_('lmemb' not in params)
+        kwargs = advisor.open_params(params)
+        self.assert_(not [name for name in kwargs if name.startswith('_')])
+
+    def test_apply_params(self):
+        params = advisor.advise(self.hdb)
+        report = advisor.apply_params(self.hdb, params, num=100)
+        self.assertEqual(report['params']['bnum'], params['bnum'])
+        self.assertEqual(report['before']['gets'], 100)
+        self.assert_(report['after']['gets_per_sec'] > 0)
+        self.assertEqual(len(self.hdb), 1000)
+        self.assertEqual(self.hdb[999], 'some text 999')
+
+        self.hdb.close()
+        self.hdb.open('test.hdb', **advisor.open_params(params))
+        self.assertEqual(self.hdb.xmsiz(), params['xmsiz'])
+
+
+class TestAdvisorBDB(unittest.TestCase):
+    def setUp(self):
+        self.bdb = bdb.BDB()
+        self.bdb.open('test.bdb')
+        for i in range(1000):
+            self.bdb.put(i, 'some text %d' % i)
+
+    def tearDown(self):
+        self.bdb.close()
+        self.bdb = None
+        os.remove('test.bdb')
+
+    def test_apply_params(self):
+        params = advisor.advise(self.bdb)
+        self.assert_(32 <= params['lmemb'] <= 1024)
+        report = advisor.apply_params(self.bdb, params, num=100)
+        self.assertEqual(report['params']['lmemb'], params['lmemb'])
+        self.assertEqual(len(self.bdb), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
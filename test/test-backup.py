@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import unittest
+
+from tcdb import backup
+from tcdb import bdb
+from tcdb import changelog
+from tcdb import hdb
+from tcdb import tc
+from tcdb import tdb
+
+
+class TestBackup(unittest.TestCase):
+    def tearDown(self):
+        for path in ('test.hdb', 'test.bdb', 'test.tdb', 'test.log',
+                     'backup.hdb', 'backup.bdb', 'backup.tdb'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_hdb(self):
+        db = hdb.HDB()
+        db.setmutex()
+        db.open('test.hdb', bnum=1000)
+        for i in range(2000):
+            db.put(i, 'value%d' % i)
+
+        stop = threading.Event()
+        written = []
+
+        def writer():
+            i = 0
+            while not stop.is_set():
+                db.put('new%d' % i, 'value')
+                db.out(i % 2000)
+                written.append(i)
+                i += 1
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        progress = []
+        try:
+            report = backup.backup(db, 'backup.hdb', chunk=1024,
+                                   progress=lambda *args:
+                                   progress.append(args))
+        finally:
+            stop.set()
+            thread.join()
+        self.assert_(not os.path.exists('backup.hdb.journal'))
+        self.assert_(len(progress) > 1)
+        self.assertEqual(progress[-1][0], progress[-1][1])
+        self.assert_(report['elapsed'] > 0)
+
+        copy = hdb.HDB()
+        copy.open('backup.hdb', hdb.OREADER)
+        self.assertEqual(backup.checksum(copy),
+                         (report['records'], report['checksum']))
+        self.assertEqual(len(copy), report['records'])
+        copy.close()
+
+        # No write of the writer was lost by the snapshot.
+        for i in written:
+            self.assertEqual(db.get('new%d' % i), 'value')
+            if i < 2000:
+                self.assert_(i not in db)
+        db.close()
+
+    def test_bdb_changelog(self):
+        db = bdb.BDB()
+        db.open('test.bdb')
+        log = changelog.ChangeLog('test.log')
+        changelog.attach(db, log)
+        for i in range(100):
+            db.putdup('key%d' % (i % 10), i)
+        report = backup.backup(db, 'backup.bdb', rate=1 << 20)
+        self.assertEqual(report['records'], 100)
+        self.assertEqual(report['seq'], 100)
+        self.assertEqual(backup.checksum(db),
+                         (report['records'], report['checksum']))
+        self.assert_(db._changelog)
+
+        copy = bdb.BDB()
+        copy.open('backup.bdb', bdb.OREADER)
+        self.assertEqual(copy.getdup('key3'), range(3, 100, 10))
+        copy.close()
+        db.close()
+        log.close()
+
+    def test_tdb(self):
+        db = tdb.TDB()
+        db.open('test.tdb')
+        db.put('a', {'name': 'hop'})
+        db.put('b', {'name': 'step', 'size': 4})
+        report = backup.backup(db, 'backup.tdb')
+        self.assertEqual(report['records'], 2)
+        copy = tdb.TDB()
+        copy.open('backup.tdb', tdb.OREADER)
+        self.assertEqual(copy.get('b'), {'name': 'step', 'size': 4})
+        copy.close()
+        db.close()
+        self.assertRaises(tc.TCException, backup.backup, tdb.TDB(),
+                          'backup.tdb')
+
+
+if __name__ == '__main__':
+    unittest.main()
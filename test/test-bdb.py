@@ -2,10 +2,13 @@
 
 import datetime
 import os
+import struct
 import unittest
 import warnings
 
 from tcdb import bdb
+from tcdb import tc
+from tcdb import util
 
 
 class TestBDBSimple(unittest.TestCase):
@@ -179,6 +182,73 @@ class TestBDBSimple(unittest.TestCase):
             self.bdb.put(key, key)
         self.bdb.foreach(proc, 'test')
 
+    def test_contains_many(self):
+        self.bdb.put('key', 'some text')
+        self.bdb.putdup('dup', 'text1')
+        self.bdb.putdup('dup', 'text2')
+        bits = self.bdb.contains_many(['key', 'KEY', 'k', 'dup'])
+        self.assertEqual([util.bitmap_get(bits, i) for i in range(4)],
+                         [True, False, False, True])
+
+    def test_metrics(self):
+        for i in range(1000):
+            self.bdb.put('%04d' % i, 'x' * 10)
+        metrics = self.bdb.metrics()
+        self.assertEqual(metrics['rnum'], 1000)
+        self.assertEqual(metrics['lmemb'], 128)
+        self.assertEqual(metrics['record_size'], 14.0)
+        self.assertEqual(metrics['xmsiz'], 100)
+        self.assert_(metrics['lnum'] > 1)
+        self.assert_(0 < metrics['leaf_fill'] <= 1)
+        self.assert_(metrics['fanout'] >= 1)
+
+    def test_iterdup(self):
+        values = ['text%03d' % i for i in range(300)]
+        self.bdb.putdup_iter('key', values)
+        self.bdb.put('key2', 'other')
+        self.assertEqual(list(self.bdb.iterdup('key')), values)
+        self.assertEqual(list(self.bdb.iterdup('nonexistent key')), [])
+        self.assertEqual(self.bdb.getdup('key', offset=290), values[290:])
+        self.assertEqual(self.bdb.getdup('key', offset=10, limit=5),
+                         values[10:15])
+        self.assertEqual(self.bdb.getdup('key', offset=300, limit=5), [])
+        self.assertEqual(self.bdb.getdup('key', limit=0), [])
+        self.assertEqual(self.bdb.getdup('nonexistent key', 'def',
+                                         limit=5), 'def')
+
+    def test_putdup_many(self):
+        items = {'b': ['text1', 'text2'], 'a': ['text3']}
+        self.assertEqual(self.bdb.putdup_many(items), 2)
+        self.assertEqual(self.bdb.putdup_many([('a', ['text4'])]), 1)
+        self.assertEqual(self.bdb.getdup('a'), ['text3', 'text4'])
+        self.assertEqual(self.bdb.getdup('b'), ['text1', 'text2'])
+        self.assertEqual(self.bdb.vnum('a'), 2)
+
+    def test_dump_tclist(self):
+        values = ['', 'a' * 0x7f, 'b' * 0x80, 'c' * 0x4000]
+        data = util.dump_tclist(values)
+        self.assertEqual(data[0], '\x00')
+        self.assertEqual(data[1], '\x7f')
+        self.assertEqual(data[0x81:0x83], '\xff\x01')
+        self.assertEqual(util.dump_tclist([]), '')
+        self.bdb.putdup_iter('key', values)
+        self.assertEqual(self.bdb.getdup('key'), values)
+
+    def test_native_cmpfunc(self):
+        # With lazy loading the native functions are placeholders until
+        # they are given to Tokyo Cabinet.
+        db = bdb.BDBSimple()
+        self.assert_(db.setcmpfunc('tccmpint32', 0))
+        db.open('test-cmp.bdb')
+        try:
+            for i in (300, 1, 20):
+                db.put(struct.pack('i', i), str(i))
+            self.assertEqual(db.values(), ['1', '20', '300'])
+        finally:
+            db.close()
+            os.remove('test-cmp.bdb')
+        self.assert_(not isinstance(tc.tccmpint32, tc.LazyFunc))
+
 
 class TestBDB(unittest.TestCase):
     def setUp(self):
@@ -669,6 +739,37 @@ class TestBDB(unittest.TestCase):
             self.bdb.put(obj, obj)
         self.bdb.foreach(proc, 'test')
 
+    def test_contains_many(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        for obj in objs[::2]:
+            self.bdb.put(obj, obj)
+        bits = self.bdb.contains_many(objs)
+        self.assertEqual([util.bitmap_get(bits, i) for i in range(len(objs))],
+                         [True, False, True, False, True])
+
+    def test_iterdup(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        self.bdb.putdup_iter('key', objs)
+        self.assertEqual(list(self.bdb.iterdup('key')), objs)
+        self.assertEqual(self.bdb.getdup('key', offset=1, limit=2), objs[1:3])
+        self.assertEqual(self.bdb.getdup('nonexistent key', limit=2), None)
+
+        self.bdb.putdup_iter_int(1, range(100))
+        self.assertEqual(list(self.bdb.iterdup(1, value_type=int)),
+                         range(100))
+        self.assertEqual(self.bdb.getdup(1, value_type=int, offset=95),
+                         range(95, 100))
+
+    def test_putdup_many(self):
+        items = [(10, [1, 2]), ('key', ['text', 1.0])]
+        self.assertEqual(self.bdb.putdup_many(items), 2)
+        self.assertEqual(self.bdb.getdup(10), [1, 2])
+        self.assertEqual(self.bdb.getdup('key'), ['text', 1.0])
+        self.bdb.putdup_many({'raw': ['a', 'b']}, raw_key=True,
+                             raw_value=True)
+        self.assertEqual(self.bdb.getdup('raw', raw_key=True,
+                                         value_type=str), ['a', 'b'])
+
 
 if __name__ == '__main__':
     unittest.main()
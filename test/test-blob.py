@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+from tcdb import blob
+from tcdb import tc
+
+
+DATA = ''.join(chr(i % 251) for i in xrange(100000))
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.store = blob.BlobStore('test.bdb', chunk=4096)
+
+    def tearDown(self):
+        self.store.close()
+        if os.path.exists('test.bdb'):
+            os.remove('test.bdb')
+
+    def write(self, name, data, step=1000):
+        with self.store.open(name, 'w') as fileobj:
+            for pos in xrange(0, len(data), step):
+                fileobj.write(data[pos:pos + step])
+
+    def test_write_read(self):
+        self.write('a', DATA)
+        self.assertEqual(self.store.size('a'), len(DATA))
+        self.assert_('a' in self.store)
+        self.assertEqual(self.store.names(), ['a'])
+        fileobj = self.store.open('a')
+        self.assertEqual(fileobj.read(), DATA)
+        self.assertEqual(fileobj.read(), '')
+        fileobj.close()
+
+        with self.store.open('a') as fileobj:
+            self.assertEqual(''.join(fileobj), DATA)
+            self.assertEqual(fileobj.tell(), len(DATA))
+
+    def test_seek(self):
+        self.write('a', DATA, step=50000)
+        with self.store.open('a') as fileobj:
+            fileobj.seek(12345)
+            self.assertEqual(fileobj.read(10000), DATA[12345:22345])
+            fileobj.seek(-100, os.SEEK_CUR)
+            self.assertEqual(fileobj.read(3), DATA[22245:22248])
+            fileobj.seek(-10, os.SEEK_END)
+            self.assertEqual(fileobj.read(100), DATA[-10:])
+            fileobj.seek(4096)
+            self.assertEqual(fileobj.read(1), DATA[4096])
+            self.assertRaises(IOError, fileobj.seek, -1)
+
+    def test_replace_remove(self):
+        self.write('a', DATA)
+        chunks = len(DATA) // 4096 + 1
+        self.assertEqual(len(self.store.db), chunks + 2)
+        self.write('a', 'small')
+        self.assertEqual(self.store.open('a').read(), 'small')
+        self.assertEqual(len(self.store.db), 3)
+        self.write('', '')
+        self.assertEqual(self.store.open('').read(), '')
+        self.store.remove('a')
+        self.assert_('a' not in self.store)
+        self.assertRaises(KeyError, self.store.open, 'a')
+        self.assertRaises(KeyError, self.store.remove, 'a')
+
+    def test_gc(self):
+        self.write('a', DATA)
+        writer = self.store.open('b', 'w')
+        writer.write(DATA)
+        # The chunks of a running write are kept.
+        self.assertEqual(self.store.gc(), 0)
+        # An interrupted write leaves orphans.
+        self.store.writing.clear()
+        self.assertEqual(self.store.gc(), len(DATA) // 4096)
+        self.assert_('b' not in self.store)
+        self.assertEqual(self.store.open('a').read(), DATA)
+
+        try:
+            with self.store.open('a', 'w') as fileobj:
+                fileobj.write('lost' * 5000)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(self.store.open('a').read(), DATA)
+        self.assertEqual(self.store.gc(), 0)
+
+    def test_missing_chunk(self):
+        self.write('a', DATA)
+        fileobj = self.store.open('a')
+        key = blob._chunk_key('a', fileobj.gen, 3)
+        tc.bdb_out(self.store.db.db, key, len(key))
+        self.assertEqual(fileobj.read(4096 * 3), DATA[:4096 * 3])
+        self.assertRaises(tc.TCException, fileobj.read, 1)
+        fileobj.close()
+
+    def test_moved_cursor(self):
+        self.write('a', DATA)
+        fileobj = self.store.open('a')
+        self.assertEqual(fileobj.read(4096), DATA[:4096])
+        # Records inserted after the cursor, splitting its leaf.
+        key = blob._chunk_key('a', fileobj.gen, 0)
+        for i in xrange(1000):
+            other = key + '%04d' % i
+            tc.bdb_put(self.store.db.db, other, len(other), 'x', 1)
+        self.assertEqual(fileobj.read(), DATA[4096:])
+        fileobj.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import unittest
+
+from tcdb import bdb
+from tcdb import buffer
+from tcdb import hdb
+from tcdb import tdb
+
+
+class TestWriteBuffer(unittest.TestCase):
+    def setUp(self):
+        self.hdb = hdb.HDB()
+        self.hdb.open('test.hdb')
+        self.buf = buffer.WriteBuffer(self.hdb, max_records=10, max_delay=60)
+
+    def tearDown(self):
+        self.buf.close()
+        self.buf = None
+        self.hdb.close()
+        self.hdb = None
+        os.remove('test.hdb')
+
+    def test_put_get(self):
+        self.buf.put('key', 'some text')
+        self.assertEqual(self.buf.get('key'), 'some text')
+        self.assertEqual(self.buf['key'], 'some text')
+        self.assert_('key' in self.buf)
+        self.assert_('key' not in self.hdb)
+        self.assertEqual(self.buf.flush(), 1)
+        self.assertEqual(self.hdb.get('key'), 'some text')
+        self.assertEqual(self.buf.get('key'), 'some text')
+
+    def test_coalesce(self):
+        for i in range(5):
+            self.buf['key'] = i
+        self.assertEqual(len(self.buf), 1)
+        self.assertEqual(self.buf['key'], 4)
+        del self.buf['key']
+        self.assertEqual(self.buf.get('key', 'def'), 'def')
+        self.assertRaises(KeyError, self.buf.__getitem__, 'key')
+        self.assertEqual(self.buf.flush(), 1)
+        self.assert_('key' not in self.hdb)
+
+    def test_out(self):
+        self.hdb.put('key', 'some text')
+        self.buf.out('key')
+        self.assert_('key' not in self.buf)
+        self.assert_('key' in self.hdb)
+        self.buf.flush()
+        self.assert_('key' not in self.hdb)
+
+    def test_raw(self):
+        self.buf.put('key', 10, raw_key=True, raw_value=True)
+        self.buf.flush()
+        self.assertEqual(self.hdb.get_int('key', as_raw=True), 10)
+
+    def test_thresholds(self):
+        for i in range(10):
+            self.buf[i] = i
+        self.assertEqual(len(self.buf), 0)
+        self.assertEqual(len(self.hdb), 10)
+
+        self.buf.max_delay = 0.01
+        self.buf['key'] = 'value'
+        time.sleep(0.02)
+        self.buf['other key'] = 'value'
+        self.assertEqual(len(self.buf), 0)
+        self.assertEqual(len(self.hdb), 12)
+
+    def test_autoflush(self):
+        buf = buffer.WriteBuffer(self.hdb, max_delay=0.01, autoflush=True)
+        buf['key'] = 'value'
+        time.sleep(0.1)
+        self.assertEqual(self.hdb['key'], 'value')
+        buf.close()
+
+    def test_with(self):
+        with self.buf:
+            self.buf['key'] = 'value'
+        self.assertEqual(self.hdb['key'], 'value')
+
+    def test_stats(self):
+        self.buf['key'] = 'value'
+        stats = self.buf.stats()
+        self.assertEqual(stats['pending'], 1)
+        self.assertEqual(stats['flushes'], 0)
+        self.buf.flush()
+        stats = self.buf.stats()
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['flushes'], 1)
+        self.assertEqual(stats['flushed_records'], 1)
+        self.assert_(stats['max_latency'] >= stats['avg_latency'] >= 0)
+
+    def test_keys(self):
+        # Pending writes are keyed as the database stores the keys.
+        self.buf.put(1, 'int')
+        self.buf.put(1.0, 'float')
+        self.buf.put('a', 'str')
+        self.buf.put(u'a', 'unicode')
+        self.assertEqual(len(self.buf), 4)
+        self.assertEqual(self.buf.get(1), 'int')
+        self.assertEqual(self.buf.get(1.0), 'float')
+        self.buf.put('raw', 'hop', raw_key=True, raw_value=True)
+        self.assertEqual(self.buf.get('raw'), None)
+        self.assertEqual(self.buf.get('raw', raw_key=True), 'hop')
+        self.buf.out('raw', as_raw=True)
+        self.assertEqual(len(self.buf), 5)
+        self.buf.flush()
+        self.assertEqual(self.hdb.get(1), 'int')
+        self.assertEqual(self.hdb.get(1.0), 'float')
+        self.assertEqual(self.hdb.get(u'a'), 'unicode')
+        self.assert_(not self.hdb.has_key('raw', raw_key=True))
+
+
+class TestWriteBufferBDB(unittest.TestCase):
+    def setUp(self):
+        self.bdb = bdb.BDB()
+        self.bdb.open('test.bdb')
+
+    def tearDown(self):
+        self.bdb.close()
+        self.bdb = None
+        os.remove('test.bdb')
+
+    def test_put_out(self):
+        with buffer.WriteBuffer(self.bdb) as buf:
+            buf['key1'] = 'value'
+            buf['key2'] = 'value'
+            buf.out('key2')
+        self.assertEqual(self.bdb.keys(), ['key1'])
+
+
+class TestWriteBufferTDB(unittest.TestCase):
+    def setUp(self):
+        self.tdb = tdb.TDB()
+        self.tdb.open('test.tdb')
+
+    def tearDown(self):
+        self.tdb.close()
+        self.tdb = None
+        os.remove('test.tdb')
+
+    def test_put(self):
+        alice = {'user': 'alice', 'age': 23}
+        with buffer.WriteBuffer(self.tdb) as buf:
+            buf['pk'] = alice
+            self.assertEqual(buf['pk'], alice)
+        self.assertEqual(self.tdb['pk'], alice)
+
+
+if __name__ == '__main__':
+    unittest.main()
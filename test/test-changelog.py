@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+from tcdb import bdb
+from tcdb import changelog
+from tcdb import fdb
+from tcdb import hdb
+from tcdb import tc
+from tcdb import tdb
+
+
+class TestChangeLog(unittest.TestCase):
+    def setUp(self):
+        self.log = changelog.ChangeLog('test.log')
+
+    def tearDown(self):
+        self.log.close()
+        for path in ('test.log', 'test.hdb', 'test.bdb', 'test.fdb',
+                     'test.tdb', 'replica.hdb', 'replica.hdb.seq',
+                     'replica.bdb', 'replica.bdb.seq', 'replica.fdb',
+                     'replica.fdb.seq', 'replica.tdb', 'replica.tdb.seq'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_log(self):
+        db = hdb.HDB()
+        db.open('test.hdb')
+        changelog.attach(db, self.log)
+        db.put('a', 'hop')
+        db['b'] = 'step'
+        db.putcat('a', 'jump', raw_value=True)
+        self.assert_(not db.putkeep('a', 'skip'))
+        db.out('b')
+        db.add_int('c', 2)
+        changes = list(self.log.changes_since(0))
+        self.assertEqual([change[0] for change in changes], [1, 2, 3, 4, 5])
+        self.assertEqual(changes[3][1], changelog.OPOUT)
+        self.assertEqual([change[0] for change in
+                          self.log.changes_since(3)], [4, 5])
+
+        db.tranbegin()
+        db.put('d', 'lost')
+        db.tranabort()
+        with db:
+            db.put('e', 'kept')
+        self.assertEqual(self.log.seq, 6)
+
+        changelog.detach(db)
+        db.put('f', 'unlogged')
+        self.assertEqual(self.log.seq, 6)
+        db.close()
+
+        log = changelog.ChangeLog('test.log')
+        self.assertEqual(log.seq, 6)
+        log.close()
+
+        # A reader leaves alone an entry being written.
+        with open('test.log', 'ab') as fileobj:
+            fileobj.write('torn')
+        size = os.path.getsize('test.log')
+        log = changelog.ChangeLog('test.log', readonly=True)
+        self.assertEqual(log.seq, 6)
+        self.assertEqual(os.path.getsize('test.log'), size)
+        self.assertRaises(tc.TCException, log.append,
+                          [(changelog.OPOUT, changelog.KRAW, 'a', '')])
+        log.close()
+
+    def test_replica_hdb(self):
+        db = hdb.HDB()
+        db.open('test.hdb')
+        changelog.attach(db, self.log)
+        for i in range(10):
+            db.put(i, 'value%d' % i, raw_value=True)
+        db.putcat(1, 'more', raw_value=True)
+        db.out(2)
+        db.add_int('count', 5)
+
+        replica = hdb.HDB()
+        replica.open('replica.hdb')
+        applier = changelog.Replica(self.log, replica, batch=4)
+        self.assertEqual(applier.apply(), 13)
+        self.assertEqual(applier.apply(), 0)
+        self.assertEqual(replica.get(1, value_type=str), 'value1more')
+        self.assert_(2 not in replica)
+        self.assertEqual(replica.get('count', value_type=int), 5)
+
+        db.vanish()
+        db.put('x', 'y')
+        self.assertEqual(applier.apply(), 2)
+        self.assertEqual(replica.keys(), ['x'])
+
+        # The state survives, and replaying is harmless.
+        self.assertEqual(changelog.Replica(self.log, replica).apply(), 0)
+        os.remove('replica.hdb.seq')
+        changelog.Replica('test.log', replica).apply()
+        self.assertEqual(replica.keys(), ['x'])
+        db.close()
+        replica.close()
+
+    def test_replica_bdb(self):
+        db = bdb.BDB()
+        db.open('test.bdb')
+        changelog.attach(db, self.log)
+        db.putdup('a', 'one')
+        db.putdup('a', 'two')
+        db.putdup_iter('b', ['three', 'four'])
+        db.outdup('b')
+        db.putdup('c', 'five')
+        db.putdup_many({'d': ['six', 'seven'], 'e': ['eight']})
+
+        replica = bdb.BDB()
+        replica.open('replica.bdb')
+        changelog.Replica(self.log, replica).apply()
+        self.assertEqual(replica.getdup('a'), ['one', 'two'])
+        self.assert_('b' not in replica)
+        self.assertEqual(replica.getdup('c'), ['five'])
+        self.assertEqual(replica.getdup('d'), ['six', 'seven'])
+        self.assertEqual(replica.getdup('e'), ['eight'])
+        db.close()
+        replica.close()
+
+    def test_replica_fdb_tdb(self):
+        db = fdb.FDB()
+        db.open('test.fdb')
+        changelog.attach(db, self.log)
+        db.put(1, 'one')
+        db.put(fdb.IDNEXT, 'two')
+        db.out(1)
+        db.put(3, 'three')
+        # The maximum ID is the one before the removal.
+        db.out(fdb.IDMAX)
+        replica = fdb.FDB()
+        replica.open('replica.fdb')
+        changelog.Replica(self.log, replica).apply()
+        self.assertEqual(replica.keys(), [2])
+        db.close()
+        replica.close()
+
+        log = changelog.ChangeLog('test.tdb.log')
+        try:
+            db = tdb.TDB()
+            db.open('test.tdb')
+            changelog.attach(db, log)
+            db.put('a', {'name': 'hop', 'size': 3})
+            db.putcat('a', {'more': 'step'})
+            replica = tdb.TDB()
+            replica.open('replica.tdb')
+            changelog.Replica(log, replica).apply()
+            self.assertEqual(replica.get('a'),
+                             {'name': 'hop', 'size': 3, 'more': 'step'})
+            db.close()
+            replica.close()
+        finally:
+            log.close()
+            os.remove('test.tdb.log')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import unittest
+
+from tcdb import bdb
+from tcdb import codec
+from tcdb import hdb
+from tcdb import tc
+from tcdb import tdb
+
+
+class Reverse(codec.Codec):
+    name = 'reverse'
+
+    def encode(self, data, op=None):
+        return data[::-1]
+
+    def decode(self, data, op=None):
+        return data[::-1]
+
+
+class TestCodec(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(0)
+        words = ['foo', 'bar', 'hop', 'step', 'jump', 'tokyo', 'cabinet']
+        self.text = ' '.join(rnd.choice(words) for _ in range(2000))
+        self.binary = ''.join(chr(rnd.randint(0, 255)) for _ in range(2000))
+
+    def tearDown(self):
+        codec.CODECS.pop(Reverse.name, None)
+        for path in ('test.hdb', 'test.bdb', 'test.tdb', 'copy.hdb'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_lz4(self):
+        lz4 = codec.LZ4Codec()
+        for data in ('', 'a', 'ab', 'aaaaaaaaaa', 'abc' * 1000, self.text,
+                     self.binary):
+            self.assertEqual(lz4.decode(lz4.encode(data)), data)
+        self.assert_(len(lz4.encode('abc' * 1000)) < 100)
+        self.assert_(len(lz4.encode(self.text)) < len(self.text) * 2 // 3)
+        self.assertRaises(ValueError, lz4.decode, '\x00\x00\x00\x10\xff')
+        self.assertRaises(ValueError, lz4.decode, '\x00')
+
+    def test_abstract(self):
+        self.assertRaises(TypeError, codec.Codec)
+
+    def test_zlib(self):
+        for level in (1, 6, 9):
+            zlib_ = codec.ZlibCodec(level=level)
+            self.assertEqual(zlib_.decode(zlib_.encode(self.text)),
+                             self.text)
+
+    def test_get(self):
+        self.assert_(isinstance(codec.get('lz4'), codec.LZ4Codec))
+        self.assertEqual(codec.get('zlib', level=6).level, 6)
+        self.assertEqual(codec.get('zlib').level, 1)
+        reverse = Reverse()
+        self.assert_(codec.get(reverse) is reverse)
+        self.assertRaises(tc.TCException, codec.get, 'reverse')
+        codec.register(Reverse.name, Reverse)
+        self.assert_(isinstance(codec.get('reverse'), Reverse))
+
+    def test_hdb(self):
+        db = hdb.HDB()
+        db.setcodec('lz4')
+        db.open('test.hdb', opts=hdb.TEXCODEC)
+        db.put('text', self.text, raw_key=True, raw_value=True)
+        db.put('binary', self.binary, raw_key=True, raw_value=True)
+        db.close()
+
+        db = hdb.HDB()
+        db.setcodec('lz4')
+        db.open('test.hdb', opts=hdb.TEXCODEC)
+        self.assertEqual(db.get_str('text', as_raw=True), self.text)
+        self.assertEqual(db.get_str('binary', as_raw=True), self.binary)
+        db.close()
+        self.assert_(os.path.getsize('test.hdb') < len(self.text))
+
+    def test_bdb(self):
+        db = bdb.BDB()
+        db.setcodec(codec.ZlibCodec(level=1))
+        db.open('test.bdb', opts=bdb.TEXCODEC)
+        for i in range(100):
+            db.put(i, self.text[i:i + 200])
+        for i in range(100):
+            self.assertEqual(db.get(i), self.text[i:i + 200])
+        db.close()
+
+    def test_tdb(self):
+        db = tdb.TDB()
+        db.setcodec(Reverse())
+        db.open('test.tdb', opts=tdb.TEXCODEC)
+        db.put('pk', {'text': self.text})
+        self.assertEqual(db.get('pk'), {'text': self.text})
+        db.close()
+
+    def test_train(self):
+        samples = ['{"name": "user%d", "email": "user%d@example.com"}'
+                   % (i, i) for i in range(200)]
+        dictionary = codec.train(samples, size=512)
+        self.assert_(0 < len(dictionary) <= 512)
+        self.assert_('@example.com' in dictionary)
+        plain, trained = codec.LZ4Codec(), codec.LZ4Codec(dictionary)
+        for sample in samples:
+            self.assertEqual(trained.decode(trained.encode(sample)), sample)
+            self.assert_(len(trained.encode(sample)) <
+                         len(plain.encode(sample)))
+
+    def test_dict(self):
+        dict_ = codec.DictCodec()
+        data = dict_.encode(self.text)
+        self.assertEqual(dict_.add(self.text[:1000]), 1)
+        self.assertEqual(dict_.add(self.text[1000:]), 2)
+        self.assertEqual(dict_.decode(data), self.text)
+        self.assertEqual(dict_.decode(dict_.encode(self.text)), self.text)
+        dump = dict_.dump()
+        self.assertEqual(dict_.encode(dump)[0], '\x00')
+
+        other = codec.DictCodec()
+        other.load(dump)
+        self.assertEqual(other.version, 2)
+        self.assertEqual(other.decode(dict_.encode(self.text)), self.text)
+        dict_.drop()
+        self.assertEqual(sorted(dict_.codecs), [0, 2])
+        self.assertRaises(ValueError, dict_.decode, '\x01')
+
+    def test_hdb_dict(self):
+        db = hdb.HDB()
+        db.setcodec('dict')
+        db.open('test.hdb', opts=hdb.TEXCODEC)
+        values = dict(('key%d' % i, '{"id": %d, "name": "user%d"}' % (i, i))
+                      for i in range(1000))
+        for key, value in values.iteritems():
+            db.put(key, value, raw_key=True, raw_value=True)
+        self.assertEqual(db.train(sample=100), 1)
+        db.put('new', values['key0'], raw_key=True, raw_value=True)
+        self.assertEqual(db.retrain(sample=100, batch=300), 1001)
+        db.close()
+
+        db = hdb.HDB()
+        db.setcodec('dict')
+        db.open('test.hdb', opts=hdb.TEXCODEC)
+        self.assertEqual(sorted(db._codec.codecs), [0, 2])
+        for key, value in values.iteritems():
+            self.assertEqual(db.get_str(key, as_raw=True), value)
+        self.assertEqual(db.get_str('new', as_raw=True), values['key0'])
+
+        # The record of the dictionaries is hidden.
+        self.assertEqual(len(db), 1001)
+        self.assertEqual(len(list(db.iterkeys())), 1001)
+        self.assertEqual(len(db.fwmkeys('')), 1001)
+        db.copy('copy.hdb')
+        db.vanish()
+        db.put('after', values['key1'], raw_key=True, raw_value=True)
+        db.close()
+
+        for path in ('test.hdb', 'copy.hdb'):
+            db = hdb.HDB()
+            db.setcodec('dict')
+            db.open(path, opts=hdb.TEXCODEC)
+            self.assertEqual(sorted(db._codec.codecs), [0, 2])
+            db.close()
+        db.open('test.hdb', opts=hdb.TEXCODEC)
+        self.assertEqual(db.get_str('after', as_raw=True), values['key1'])
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import unittest
+
+from tcdb import compactor
+from tcdb import hdb
+from tcdb import stats
+
+
+class TestCompactor(unittest.TestCase):
+    def setUp(self):
+        self.hdb = hdb.HDB()
+        self.hdb.setmutex()
+        self.hdb.open('test.hdb')
+        for i in range(1000):
+            self.hdb.put(i, 'some text %d' % i)
+        for i in range(0, 1000, 2):
+            self.hdb.out(i)
+
+    def tearDown(self):
+        self.hdb.close()
+        self.hdb = None
+        os.remove('test.hdb')
+
+    def test_run_once(self):
+        comp = compactor.Compactor(self.hdb, write_budget=None,
+                                   threshold=None)
+        self.assert_(comp.run_once())
+        report = comp.stats()
+        self.assertEqual(report['steps'], 1)
+        self.assertEqual(report['optimizes'], 0)
+        self.assert_(report['pause_max'] >= report['pause_p50'])
+        self.assertEqual(len(self.hdb), 500)
+
+    def test_budget(self):
+        comp = compactor.Compactor(self.hdb, write_budget=0, threshold=None)
+        self.assert_(not comp.run_once())
+        self.assertEqual(comp.stats()['skipped'], 1)
+
+    def test_write_rate(self):
+        stats.instrument(self.hdb)
+        comp = compactor.Compactor(self.hdb)
+        for i in range(100):
+            self.hdb.put(i, i)
+        self.assert_(comp.write_rate() > 0)
+        self.assertEqual(comp.write_rate(), 0)
+        stats.uninstrument(self.hdb)
+
+    def test_optimize(self):
+        # The baseline is taken from a compact file, and no defrag step
+        # runs (write_budget=0) to lower the fragmentation.
+        self.hdb.optimize()
+        fsiz = self.hdb.fsiz()
+        comp = compactor.Compactor(self.hdb, write_budget=0,
+                                   threshold=1.5, check_every=1)
+        comp.run_once()
+        report = comp.stats()
+        self.assertEqual(report['steps'], 0)
+        self.assertEqual(report['optimizes'], 0)
+        self.assertEqual(report['baseline'], report['fragmentation'])
+
+        for i in range(1, 1000, 4):
+            self.hdb.out(i)
+        fragmentation = self.hdb.metrics()['fragmentation']
+        self.assert_(fragmentation > report['baseline'] * 1.5)
+        comp.run_once()
+        report = comp.stats()
+        self.assertEqual(report['optimizes'], 1)
+        self.assertEqual(report['baseline'], report['fragmentation'])
+        self.assert_(self.hdb.fsiz() <= fsiz)
+
+        # A compact file is not optimized again and again.
+        for i in range(3):
+            comp.run_once()
+        self.assertEqual(comp.stats()['optimizes'], 1)
+
+    def test_thread(self):
+        with compactor.Compactor(self.hdb, interval=0.01,
+                                 write_budget=None) as comp:
+            time.sleep(0.1)
+        self.assert_(comp.stats()['steps'] > 0)
+        self.assertEqual(self.hdb[1], 'some text 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import cPickle
+import unittest
+
+from tcdb import containers
+
+
+class TestMap(unittest.TestCase):
+    def setUp(self):
+        self.map = containers.Map()
+
+    def tearDown(self):
+        self.map = None
+
+    def test_setgetitem(self):
+        self.map['key'] = 'some string'
+        self.assertEqual(self.map['key'], 'some string')
+        self.assertEqual(self.map.get('nonexistent key', 'def'), 'def')
+        self.assertRaises(KeyError, self.map.__getitem__, 'nonexistent key')
+        self.map['binary'] = '\x00\x01\x02'
+        self.assertEqual(self.map['binary'], '\x00\x01\x02')
+        self.assertRaises(TypeError, self.map.__setitem__, 10, 'value')
+        self.assertRaises(TypeError, self.map.__getitem__, u'key')
+
+    def test_putkeep_putcat(self):
+        self.assert_(self.map.putkeep('key', 'some'))
+        self.assert_(not self.map.putkeep('key', 'Never stored'))
+        self.map.putcat('key', ' text')
+        self.assertEqual(self.map['key'], 'some text')
+        self.assertEqual(self.map.setdefault('key', 'other'), 'some text')
+        self.assertEqual(self.map.setdefault('new', 'other'), 'other')
+
+    def test_out_and_contains(self):
+        self.assert_('key' not in self.map)
+        self.map['key'] = 'some text'
+        self.assert_('key' in self.map)
+        del self.map['key']
+        self.assert_('key' not in self.map)
+        self.assertRaises(KeyError, self.map.__delitem__, 'key')
+        self.map['key'] = 'some text'
+        self.assertEqual(self.map.pop('key'), 'some text')
+        self.assertEqual(self.map.pop('key', 'def'), 'def')
+
+    def test_iters(self):
+        keys = ['key%d' % i for i in range(100)]
+        self.map.update((key, key.upper()) for key in keys)
+        self.assertEqual(len(self.map), 100)
+        self.assertEqual(self.map.keys(), keys)
+        self.assertEqual(list(self.map), keys)
+        self.assertEqual(self.map.values(), [key.upper() for key in keys])
+        self.assertEqual(self.map.items(), [(key, key.upper())
+                                            for key in keys])
+
+    def test_lru(self):
+        for key in ('a', 'b', 'c', 'd'):
+            self.map[key] = key
+        self.map.move('a')
+        self.map.cutfront(2)
+        self.assertEqual(self.map.keys(), ['d', 'a'])
+        self.assertRaises(KeyError, self.map.move, 'b')
+
+    def test_add(self):
+        self.assertEqual(self.map.add_int('int', 3), 3)
+        self.assertEqual(self.map.add_int('int', 2), 5)
+        self.assertEqual(self.map.add_float('float', 1.5), 1.5)
+        self.assertEqual(self.map.add_float('float', 1.5), 3.0)
+
+    def test_dump_load(self):
+        self.map.update({'a': '1', 'b': '2'})
+        self.assertEqual(containers.Map.load(self.map.dump()), self.map)
+        self.assertEqual(cPickle.loads(cPickle.dumps(self.map)), self.map)
+        self.assertEqual(self.map, {'a': '1', 'b': '2'})
+        self.map.clear()
+        self.assertEqual(len(self.map), 0)
+
+
+class TestList(unittest.TestCase):
+    def setUp(self):
+        self.list = containers.List()
+
+    def tearDown(self):
+        self.list = None
+
+    def test_sequence(self):
+        self.list.extend(['a', 'b', 'c'])
+        self.assertEqual(len(self.list), 3)
+        self.assertEqual(self.list[0], 'a')
+        self.assertEqual(self.list[-1], 'c')
+        self.assertEqual(self.list[1:], ['b', 'c'])
+        self.assertRaises(IndexError, self.list.__getitem__, 3)
+        self.list[1] = 'x'
+        self.assertEqual(list(self.list), ['a', 'x', 'c'])
+        del self.list[1]
+        self.assertEqual(self.list, ['a', 'c'])
+        self.assertRaises(TypeError, self.list.append, 10)
+
+    def test_push_pop(self):
+        self.list.append('b')
+        self.list.appendleft('a')
+        self.list.insert(1, 'x')
+        self.list.insert(100, 'z')
+        self.assertEqual(self.list, ['a', 'x', 'b', 'z'])
+        self.assertEqual(self.list.pop(), 'z')
+        self.assertEqual(self.list.popleft(), 'a')
+        self.assertEqual(self.list.pop(0), 'x')
+        self.assertEqual(self.list, ['b'])
+
+    def test_search(self):
+        self.list.extend(['c', 'a', 'b'])
+        self.assert_('a' in self.list)
+        self.assert_('x' not in self.list)
+        self.assertEqual(self.list.index('b'), 2)
+        self.assertRaises(ValueError, self.list.index, 'x')
+        self.list.sort()
+        self.assertEqual(self.list, ['a', 'b', 'c'])
+
+    def test_cutfront(self):
+        self.list.extend(str(i) for i in range(10))
+        self.list.cutfront(8)
+        self.assertEqual(self.list, ['8', '9'])
+        self.list.cutfront(8)
+        self.assertEqual(len(self.list), 0)
+
+    def test_dump_load(self):
+        self.list.extend(['a', '\x00b', ''])
+        self.assertEqual(containers.List.load(self.list.dump()), self.list)
+        self.assertEqual(cPickle.loads(cPickle.dumps(self.list)), self.list)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+import os
+import StringIO
+import unittest
+
+import tcdb
+from tcdb import bdb
+from tcdb import fdb
+from tcdb import hdb
+from tcdb import tc
+from tcdb import tdb
+
+
+class TestDumper(unittest.TestCase):
+    def tearDown(self):
+        for path in ('test.hdb', 'test.bdb', 'test.fdb', 'test.tdb',
+                     'copy.hdb', 'copy.bdb', 'copy.fdb', 'copy.tdb'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _dump(self, db, **kwargs):
+        fileobj = StringIO.StringIO()
+        tcdb.dump(db, fileobj, **kwargs)
+        fileobj.seek(0)
+        return fileobj
+
+    def test_hdb_to_bdb(self):
+        db = hdb.HDBSimple()
+        db.open('test.hdb')
+        for i in range(1000):
+            db.put('key%d' % i, 'value%d' % i * 10)
+        for compress in (False, True):
+            fileobj = self._dump(db, compress=compress, chunk=1024)
+            copy = bdb.BDBSimple()
+            copy.open('copy.bdb', omode=bdb.OWRITER | bdb.OCREAT | bdb.OTRUNC)
+            self.assertEqual(tcdb.restore(fileobj, copy, batch=300), 1000)
+            self.assertEqual(len(copy), 1000)
+            self.assertEqual(copy.get('key999'), 'value999' * 10)
+            copy.close()
+        db.close()
+
+    def test_bdb_dups(self):
+        db = bdb.BDBSimple()
+        db.open('test.bdb')
+        db.putdup('foo', 'a')
+        db.putdup('foo', 'b')
+        db.putdup('foo', 'c')
+        db.put('bar', 'd')
+        fileobj = self._dump(db)
+        db.close()
+
+        copy = bdb.BDBSimple()
+        copy.open('copy.bdb')
+        self.assertEqual(tcdb.restore(fileobj, copy, batch=2), 4)
+        self.assertEqual(copy.getdup('foo'), ['a', 'b', 'c'])
+        self.assertEqual(copy.get('bar'), 'd')
+        copy.close()
+
+    def test_fdb(self):
+        db = fdb.FDBSimple()
+        db.open('test.fdb')
+        db.put(1, 'one')
+        db.put(100, 'one hundred')
+        fileobj = self._dump(db)
+        db.close()
+
+        copy = fdb.FDBSimple()
+        copy.open('copy.fdb')
+        self.assertEqual(tcdb.restore(fileobj, copy), 2)
+        self.assertEqual(copy.get(100), 'one hundred')
+        copy.close()
+
+        copy = hdb.HDBSimple()
+        copy.open('copy.hdb')
+        fileobj.seek(0)
+        self.assertEqual(tcdb.restore(fileobj, copy), 2)
+        self.assertEqual(copy.get('1'), 'one')
+        copy.close()
+
+    def test_tdb(self):
+        db = tdb.TDB()
+        db.open('test.tdb')
+        db.put('pk1', {'name': 'alice', 'age': '30'}, raw_key=True,
+               raw_cols=True)
+        db.put('pk2', {'name': 'bob'}, raw_key=True, raw_cols=True)
+        fileobj = self._dump(db, compress=True)
+        db.close()
+
+        copy = tdb.TDB()
+        copy.open('copy.tdb')
+        self.assertEqual(tcdb.restore(fileobj, copy), 2)
+        self.assertEqual(copy.get_col_str('pk1', 'age', raw_key=True), '30')
+        self.assertEqual(copy.get_col_str('pk2', 'name', raw_key=True), 'bob')
+        copy.close()
+
+        copy = hdb.HDBSimple()
+        copy.open('copy.hdb')
+        fileobj.seek(0)
+        self.assertEqual(tcdb.restore(fileobj, copy), 2)
+        copy.close()
+
+    def test_errors(self):
+        db = hdb.HDBSimple()
+        db.open('test.hdb')
+        db.put('foo', 'hop')
+        data = self._dump(db).getvalue()
+
+        copy = fdb.FDBSimple()
+        copy.open('copy.fdb')
+        self.assertRaises(tc.TCException, tcdb.restore,
+                          StringIO.StringIO(data), copy)
+        copy.close()
+
+        corrupted = data[:-20] + chr(ord(data[-20]) ^ 1) + data[-19:]
+        self.assertRaises(tc.TCException, tcdb.restore,
+                          StringIO.StringIO(corrupted), db)
+        self.assertRaises(tc.TCException, tcdb.restore,
+                          StringIO.StringIO(data[:-4]), db)
+        self.assertRaises(tc.TCException, tcdb.restore,
+                          StringIO.StringIO('invalid'), db)
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+from tcdb import bdb
+from tcdb import expiry
+from tcdb import hdb
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestExpiringStore(unittest.TestCase):
+    def setUp(self):
+        self.db = hdb.HDB()
+        self.db.open('test.hdb')
+        self.clock = Clock()
+        self.store = expiry.ExpiringStore(self.db, 'test.bdb', ttl=10,
+                                          clock=self.clock)
+
+    def tearDown(self):
+        self.store.close()
+        self.db.close()
+        for path in ('test.hdb', 'test.bdb', 'test2.bdb'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_put_get(self):
+        self.store.put('a', 'hop')
+        self.store.put('b', 'step', ttl=20)
+        self.store['c'] = 'jump'
+        self.store.put('d', 'forever', ttl=None)
+        self.store.ttl = None
+        self.store.put('e', 'forever')
+        self.assertEqual(self.store['a'], 'hop')
+        self.assertEqual(self.store.ttl_of('b'), 20.0)
+        self.assertEqual(self.store.ttl_of('d'), None)
+
+        self.clock.now += 10
+        self.assertEqual(self.store.get('a'), None)
+        self.assertEqual(self.store.get('a', 'gone'), 'gone')
+        self.assertRaises(KeyError, lambda: self.store['c'])
+        self.assert_('a' not in self.store)
+        self.assert_('b' in self.store)
+        self.assertEqual(self.store.ttl_of('b'), 10.0)
+        self.assertRaises(KeyError, self.store.ttl_of, 'a')
+        # The records are still in the database until they expire.
+        self.assertEqual(self.db['a'], 'hop')
+
+        self.assertEqual(self.store.expire(), 2)
+        self.assert_('a' not in self.db)
+        self.assert_('c' not in self.db)
+        self.assertEqual(self.store.expire(), 0)
+        self.clock.now += 10
+        self.assertEqual(self.store.expire(), 1)
+        self.assertEqual(sorted(self.db.keys()), ['d', 'e'])
+
+    def test_update(self):
+        self.store.put('a', 'hop')
+        self.clock.now += 5
+        self.store.put('a', 'step')
+        self.clock.now += 6
+        self.assertEqual(self.store.expire(), 0)
+        self.assertEqual(self.store['a'], 'step')
+        self.assert_(self.store.touch('a', 100))
+        self.assert_(not self.store.touch('b'))
+        self.clock.now += 50
+        self.assertEqual(self.store.expire(), 0)
+        self.assert_(self.store.touch('a', None))
+        self.assertEqual(self.store.ttl_of('a'), None)
+        self.store.out('a')
+        self.assertEqual(len(self.store.index), 0)
+
+    def test_incremental(self):
+        for i in range(100):
+            self.store.put(i, 'value', ttl=i + 1)
+        self.clock.now += 50
+        self.assertEqual(self.store.expire(limit=20), 20)
+        self.assertEqual(self.store.expire(), 30)
+        self.assertEqual(len(self.db), 50)
+        self.assertEqual(self.store.expire(), 0)
+
+    def test_bdb(self):
+        db = bdb.BDBSimple()
+        db.open('test2.bdb')
+        index = bdb.BDBSimple()
+        index.open('test.bdb.2')
+        try:
+            store = expiry.ExpiringStore(db, index, clock=self.clock)
+            store.put('a', 'hop', ttl=1)
+            db.putdup('a', 'step')
+            self.clock.now += 1
+            self.assertEqual(store.expire(), 1)
+            self.assert_('a' not in db)
+            store.close()
+            self.assert_(index.path())
+        finally:
+            index.close()
+            db.close()
+            os.remove('test.bdb.2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,7 @@ import warnings
 
 from tcdb import fdb
 from tcdb import tc
+from tcdb import util
 
 
 class TestFDBSimple(unittest.TestCase):
@@ -144,6 +145,23 @@ class TestFDBSimple(unittest.TestCase):
             self.fdb.put('next', value)
         self.fdb.foreach(proc, 'test')
 
+    def test_contains_many(self):
+        self.fdb.put('1', 'some text')
+        self.fdb.put('3', 'some text')
+        bits = self.fdb.contains_many(['1', '2', '3'])
+        self.assertEqual([util.bitmap_get(bits, i) for i in range(3)],
+                         [True, False, True])
+
+    def test_metrics(self):
+        for i in range(1, 11):
+            self.fdb.put(i * 2, 'x' * 10)
+        metrics = self.fdb.metrics()
+        self.assertEqual(metrics['rnum'], 10)
+        self.assertEqual(metrics['width'], 255)
+        self.assertEqual(metrics['record_size'], 10.0)
+        self.assertEqual(metrics['id_usage'], 0.5)
+        self.assertEqual(metrics['map_coverage'], 1.0)
+
 
 class TestFDB(unittest.TestCase):
     def setUp(self):
@@ -429,6 +447,13 @@ class TestFDB(unittest.TestCase):
             self.fdb.put(key+1, obj)
         self.fdb.foreach(proc, 'test')
 
+    def test_contains_many(self):
+        self.fdb.put(1, 'some text')
+        self.fdb.put(3, 'some text')
+        bits = self.fdb.contains_many([1, 2, 3])
+        self.assertEqual([util.bitmap_get(bits, i) for i in range(3)],
+                         [True, False, True])
+
 
 if __name__ == '__main__':
     unittest.main()
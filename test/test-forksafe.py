@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import os
+import signal
+import unittest
+
+from tcdb import adb
+from tcdb import bdb
+from tcdb import forksafe
+from tcdb import hdb
+
+
+def in_child(func):
+    """Run func in a forked child process, and return its exit status."""
+    pid = os.fork()
+    if not pid:
+        try:
+            # A child blocked on a lock is killed.
+            signal.alarm(10)
+            os._exit(func())
+        except:
+            os._exit(2)
+    (_, status) = os.waitpid(pid, 0)
+    return os.WEXITSTATUS(status)
+
+
+class TestForkSafe(unittest.TestCase):
+    def tearDown(self):
+        for path in ('test.hdb', 'test.bdb', 'test.tch'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_reopen(self):
+        db = hdb.HDB()
+        db.open('test.hdb', hdb.OWRITER | hdb.OCREAT | hdb.OTRUNC)
+        self.assertEqual(db._open_args[1] & hdb.OTRUNC, 0)
+        db.put('foo', 'hop')
+        db.close()
+        # The parent reads without locking, the children may write.
+        db.open('test.hdb', hdb.OREADER | hdb.ONOLCK)
+        forksafe.set_child_mode(db, hdb.OWRITER)
+
+        def child():
+            if not forksafe.is_stale(db):
+                return 1
+            # The first call opens the file again.
+            if db.get('foo') != 'hop' or forksafe.is_stale(db):
+                return 1
+            if not db._open_args[1] & hdb.OLCKNB:
+                return 1
+            db.put('bar', 'step')
+            db.close()
+            return 0
+
+        self.assertEqual(in_child(child), 0)
+        self.assert_(not forksafe.is_stale(db))
+        db.close()
+        db.open('test.hdb', hdb.OREADER)
+        self.assertEqual(db.get('bar'), 'step')
+
+        # Readers share the file.
+        self.assertEqual(in_child(lambda: int(db.get('foo') != 'hop')), 0)
+        db.close()
+
+    def test_locked(self):
+        db = hdb.HDB()
+        db.open('test.hdb')
+        db.put('foo', 'hop')
+        db.sync()
+
+        def child():
+            # The parent holds the file as a writer: no waiting.
+            try:
+                db.get('foo')
+            except Exception, e:
+                return int('child process' not in str(e))
+            return 1
+
+        self.assertEqual(in_child(child), 0)
+        self.assertEqual(db.get('foo'), 'hop')
+        db.close()
+
+    def test_close_stale(self):
+        db = bdb.BDB()
+        db.open('test.bdb')
+        db.put('foo', 'hop')
+
+        def child():
+            # Closing a stale handle must not touch the parent's one.
+            db.close()
+            return 0
+
+        self.assertEqual(in_child(child), 0)
+        self.assertEqual(db.get('foo'), 'hop')
+        db.close()
+
+    def test_after_fork(self):
+        db = hdb.HDB()
+        db.open('test.hdb')
+        db.put('foo', 'hop')
+        db.close()
+        db.open('test.hdb', hdb.OREADER)
+        handle = db.db
+        forksafe.after_fork()
+        self.assert_(forksafe.is_stale(db))
+        self.assertEqual(db.get('foo'), 'hop')
+        self.assert_(db.db is not handle)
+        db.close()
+        self.assert_(not forksafe.is_stale(db))
+
+    def test_adb(self):
+        self.assertEqual(adb._notrunc('test.tch#mode=wct#bnum=10'),
+                         'test.tch#mode=wc#bnum=10')
+        self.assertEqual(adb._child_name('test.tch#mode=wc#bnum=10'),
+                         'test.tch#bnum=10#mode=wcf')
+        self.assertEqual(adb._child_name('test.tch', 'r'),
+                         'test.tch#mode=rf')
+        self.assertEqual(adb._child_name('test.tch#mode=re'),
+                         'test.tch#mode=re')
+        db = adb.ADB()
+        db.open('test.tch#mode=wct')
+        db.put('foo', 'hop')
+        db.close()
+        db.open('test.tch#mode=r')
+        self.assertEqual(in_child(lambda: int(db.get('foo') != 'hop')), 0)
+        db.close()
+        db = adb.ADB()
+        db.open('*')
+        self.assert_(db not in forksafe._objects)
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
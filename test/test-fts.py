@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+from tcdb import bdb
+from tcdb import fts
+from tcdb import hdb
+from tcdb import tdb
+
+
+class TestFullTextIndex(unittest.TestCase):
+    def setUp(self):
+        self.db = hdb.HDB()
+        self.db.open('test.hdb')
+        self.index = fts.FullTextIndex(self.db, 'test.bdb', buffer=3)
+
+    def tearDown(self):
+        self.index.close()
+        self.db.close()
+        for path in ('test.hdb', 'test.bdb', 'test.tdb', 'index.bdb'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_search(self):
+        self.index.put('a', u'Tokyo Cabinet is a library')
+        self.index.put('b', 'Kyoto Cabinet is the successor')
+        self.index.put(10, u'Ünïcode Tokyo')
+        self.assertEqual(self.db['a'], u'Tokyo Cabinet is a library')
+        self.assertEqual(self.index.search('cabinet'), ['a', 'b'])
+        self.assertEqual(self.index.search('CABINET library'), ['a'])
+        self.assertEqual(self.index.search('"tokyo cabinet"'), ['a'])
+        self.assertEqual(self.index.search('"cabinet tokyo"'), [])
+        self.assertEqual(self.index.search(u'kyoto OR ünïcode'), ['b', 10])
+        self.assertEqual(self.index.search('cabinet', limit=1), ['a'])
+        self.assertEqual(self.index.search('missing'), [])
+        self.assertEqual(self.index.search(''), [])
+
+    def test_update(self):
+        self.index.put('a', 'Tokyo Cabinet')
+        self.index.put('b', 'Tokyo Tyrant')
+        self.index.put('a', 'Kyoto Cabinet')
+        self.assertEqual(self.index.search('tokyo'), ['b'])
+        self.assertEqual(self.index.search('kyoto'), ['a'])
+        self.index.out('b')
+        self.assert_('b' not in self.db)
+        self.assertEqual(self.index.search('tokyo'), [])
+        self.assert_(not self.index.remove('b'))
+        self.assertEqual(self.index.optimize(), 4)
+        self.assertEqual(self.index.optimize(), 0)
+        self.assertEqual(self.index.search('cabinet'), ['a'])
+
+    def test_many(self):
+        for i in range(1000):
+            self.index.put('key%d' % i, 'word%d common' % (i % 10),
+                           raw_key=True)
+        self.assertEqual(len(self.index.search('common')), 1000)
+        self.assertEqual(self.index.search('word3 common', limit=2),
+                         ['key3', 'key13'])
+
+    def test_tdb(self):
+        db = tdb.TDB()
+        db.open('test.tdb')
+        try:
+            index = fts.FullTextIndex(db, self.index.index)
+            index.put('a', {'title': 'Tokyo Cabinet', 'size': 4})
+            self.assertEqual(index.search('"tokyo cabinet"'), ['a'])
+            index.close()
+        finally:
+            db.close()
+
+    def test_postings(self):
+        ids = range(1, 100000, 3)
+        decoded = []
+        for chunk in fts._chunks(ids):
+            fts._decode(chunk, decoded)
+        self.assertEqual(decoded, ids)
+        other = range(1, 100000, 7)
+        self.assertEqual(fts.intersect([ids, other]),
+                         sorted(set(ids) & set(other)))
+        self.assertEqual(fts.intersect([ids, []]), [])
+        self.assertEqual(fts.union([[1, 5], [2, 5]]), [1, 2, 5])
+
+    def test_bdb_index(self):
+        index_db = bdb.BDB()
+        index_db.open('index.bdb')
+        try:
+            index = fts.FullTextIndex(self.db, index_db, buffer=1)
+            index.put('a', 'Tokyo Cabinet')
+            index.put('b', 'Tokyo Tyrant')
+            index.out('b')
+            self.assertEqual(index.search('tokyo'), ['a'])
+            self.assert_(index_db.fwmkeys(fts.PTERM, as_raw=True))
+            self.assertEqual(index.optimize(), 2)
+            self.assertEqual(index.search('tyrant'), [])
+            index.close()
+        finally:
+            index_db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,7 @@ import warnings
 
 from tcdb import hdb
 from tcdb import tc
+from tcdb import util
 
 
 class TestHDBSimple(unittest.TestCase):
@@ -151,6 +152,27 @@ class TestHDBSimple(unittest.TestCase):
             self.hdb.put(key, key)
         self.hdb.foreach(proc, 'test')
 
+    def test_contains_many(self):
+        self.hdb.put('key1', 'some text')
+        self.hdb.put('key3', 'some text')
+        keys = ['key%d' % i for i in range(10)]
+        bits = self.hdb.contains_many(keys)
+        self.assertEqual(len(bits), 2)
+        self.assertEqual([util.bitmap_get(bits, i) for i in range(10)],
+                         [k in ('key1', 'key3') for k in keys])
+
+    def test_metrics(self):
+        for i in range(100):
+            self.hdb.put(str(i), 'x' * 10)
+        metrics = self.hdb.metrics()
+        self.assertEqual(metrics['rnum'], 100)
+        self.assertEqual(metrics['bnum'], self.hdb.bnum())
+        self.assertEqual(metrics['xmsiz'], 67108864)
+        self.assert_(11 <= metrics['record_size'] <= 12)
+        self.assertEqual(metrics['map_coverage'], 1.0)
+        self.assert_(0 < metrics['load_factor'] < 1)
+        self.assert_(metrics['fragmentation'] >= 1)
+
 
 class TestHDB(unittest.TestCase):
     def setUp(self):
@@ -526,6 +548,23 @@ class TestHDB(unittest.TestCase):
             self.hdb.put(obj, obj)
         self.hdb.foreach(proc, 'test')
 
+    def test_contains_many(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        for obj in objs[::2]:
+            self.hdb.put(obj, obj)
+        bits = self.hdb.contains_many(objs)
+        self.assertEqual([util.bitmap_get(bits, i) for i in range(len(objs))],
+                         [True, False, True, False, True])
+
+    def test_unicode_utf8(self):
+        text = u'unicode text [áéíóú]'
+        self.hdb.put_unicode('key', text, as_raw=True)
+        self.assertEqual(self.hdb.vsiz('key', as_raw=True),
+                         len(text.encode('utf-8')))
+        self.assertEqual(self.hdb.get_str('key', as_raw=True),
+                         text.encode('utf-8'))
+        self.assertEqual(self.hdb.get_unicode('key', as_raw=True), text)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from tcdb import mdb
+from tcdb import tc
+from tcdb import util
+
+
+class TestMDBSimple(unittest.TestCase):
+    def setUp(self):
+        self.mdb = mdb.MDBSimple()
+
+    def tearDown(self):
+        self.mdb = None
+
+    def test_setgetitem(self):
+        self.mdb['key'] = 'some string'
+        self.assertEqual(self.mdb['key'], 'some string')
+        self.assertRaises(KeyError, self.mdb.__getitem__, 'nonexistent key')
+
+    def test_put(self):
+        self.mdb.put('key', 'some string')
+        self.assertEqual(self.mdb.get('key'), 'some string')
+        self.assertEqual(self.mdb.get('nonexistent key'), None)
+        self.assertEqual(self.mdb.get('nonexistent key', 'def'), 'def')
+
+    def test_putkeep(self):
+        self.assert_(self.mdb.putkeep('key', 'some string'))
+        self.assertEqual(self.mdb.get('key'), 'some string')
+        self.assert_(not self.mdb.putkeep('key', 'Never stored'))
+        self.assertEqual(self.mdb.get('key'), 'some string')
+
+    def test_putcat(self):
+        self.mdb.putcat('key', 'some')
+        self.mdb.putcat('key', ' text')
+        self.assertEquals(self.mdb.get('key'), 'some text')
+
+    def test_out_and_contains(self):
+        self.assert_('key' not in self.mdb)
+        self.mdb.put('key', 'some text')
+        self.assert_('key' in self.mdb)
+        self.mdb.out('key')
+        self.assert_('key' not in self.mdb)
+        self.mdb.put('key', 'some text')
+        del self.mdb['key']
+        self.assert_('key' not in self.mdb)
+        self.assertRaises(KeyError, self.mdb.out, 'key')
+
+    def test_vsiz(self):
+        self.mdb.put('key', 'some text')
+        self.assertEqual(self.mdb.vsiz('key'), len('some text'))
+        self.assertRaises(KeyError, self.mdb.vsiz, 'nonexistent key')
+
+    def test_iters(self):
+        keys = ['key1', 'key2', 'key3', 'key4', 'key5']
+        for key in keys:
+            self.mdb.put(key, key)
+
+        self.assertEqual(self.mdb.keys(), keys)
+        self.assertEqual(self.mdb.values(), keys)
+        self.assertEqual(zip(keys, keys), self.mdb.items())
+        self.assertEqual(list(self.mdb), keys)
+
+    def test_fwmkeys(self):
+        objs = ['aa', 'ab', 'ac', 'xx', 'ad']
+        for obj in objs:
+            self.mdb.put(obj, 'some text')
+        self.assertEqual(sorted(self.mdb.fwmkeys('a')),
+                         ['aa', 'ab', 'ac', 'ad'])
+        self.assertEqual(self.mdb.fwmkeys('x'), ['xx'])
+        self.assertEqual(self.mdb.fwmkeys('nonexistent key'), [])
+
+    def test_admin_functions(self):
+        keys = ['key1', 'key2', 'key3', 'key4', 'key5']
+        for key in keys:
+            self.mdb.put(key, key)
+        self.assertEquals(len(self.mdb), 5)
+        self.assert_(self.mdb.msiz() > 0)
+        self.mdb.cutfront(2)
+        self.assertEquals(self.mdb.keys(), keys[2:])
+        self.mdb.vanish()
+        self.assertEquals(len(self.mdb), 0)
+
+    def test_capnum(self):
+        db = mdb.MDBSimple(bnum=1024, capnum=3)
+        for i in range(10):
+            db.put('key%d' % i, 'value')
+        self.assertEquals(db.keys(), ['key7', 'key8', 'key9'])
+
+    def test_capsiz(self):
+        db = mdb.MDBSimple(capsiz=64 * 1024)
+        for i in range(10000):
+            db.put('key%d' % i, 'x' * 100)
+        self.assert_(db.msiz() <= 64 * 1024)
+        self.assert_(0 < len(db) < 10000)
+        self.assert_('key9999' in db)
+        self.assert_('key0' not in db)
+
+    def test_foreach(self):
+        keys = ['key1', 'key2', 'key3', 'key4', 'key5']
+
+        def proc(key, value, op):
+            self.assertEquals(key, value)
+            self.assert_(key in keys)
+            self.assertEquals(op, 'test')
+            return True
+
+        for key in keys:
+            self.mdb.put(key, key)
+        self.mdb.foreach(proc, 'test')
+
+    def test_contains_many(self):
+        self.mdb.put('key1', 'some text')
+        self.mdb.put('key3', 'some text')
+        keys = ['key%d' % i for i in range(10)]
+        bits = self.mdb.contains_many(keys)
+        self.assertEqual([util.bitmap_get(bits, i) for i in range(10)],
+                         [k in ('key1', 'key3') for k in keys])
+
+
+class TestMDB(unittest.TestCase):
+    def setUp(self):
+        self.mdb = mdb.MDB()
+
+    def tearDown(self):
+        self.mdb = None
+
+    def test_setgetitem(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        for obj1 in objs:
+            self.mdb['obj'] = obj1
+            obj2 = self.mdb['obj']
+            self.assertEqual(obj1, obj2)
+
+            self.mdb[obj1] = obj1
+            obj2 = self.mdb[obj1]
+            self.assertEqual(obj1, obj2)
+        self.assertRaises(KeyError, self.mdb.__getitem__, 'nonexistent key')
+
+    def test_put(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        for obj1 in objs:
+            self.mdb.put(obj1, obj1)
+            obj2 = self.mdb.get(obj1)
+            self.assertEqual(obj1, obj2)
+            self.mdb.put(obj1, obj1, raw_key=True)
+            obj2 = self.mdb.get(obj1, raw_key=True)
+            self.assertEqual(obj1, obj2)
+        self.assertEqual(self.mdb.get('nonexistent key'), None)
+        self.assertEqual(self.mdb.get('nonexistent key', 'def'), 'def')
+
+    def test_put_typed(self):
+        self.mdb.put_str('str', 'some text', as_raw=True)
+        self.assertEqual(self.mdb.get_str('str', as_raw=True), 'some text')
+        self.mdb.put_unicode('unicode', u'text [áéíóú]')
+        self.assertEqual(self.mdb.get_unicode('unicode'), u'text [áéíóú]')
+        self.mdb.put_int('int', 10)
+        self.assertEqual(self.mdb.get_int('int'), 10)
+        self.mdb.put_float('float', 10.10)
+        self.assertEqual(self.mdb.get_float('float'), 10.10)
+        self.assertRaises(AssertionError, self.mdb.put_int, 'key', '10')
+
+    def test_putkeep(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        for obj1 in objs:
+            self.mdb.putkeep(obj1, obj1)
+            self.mdb.putkeep(obj1, 'Never stored')
+            self.assertEqual(self.mdb.get(obj1), obj1)
+
+    def test_putcat(self):
+        self.mdb.putcat_str('key', 'some')
+        self.mdb.putcat_str('key', ' text')
+        self.assertEquals(self.mdb.get_str('key'), 'some text')
+
+    def test_out_and_contains(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        for obj in objs:
+            self.mdb.put(obj, obj, raw_key=True)
+            self.assert_(self.mdb.has_key(obj, raw_key=True))
+            self.mdb.out(obj, as_raw=True)
+            self.assert_(not self.mdb.has_key(obj, raw_key=True))
+        self.assertRaises(KeyError, self.mdb.out, 'key')
+
+    def test_iters(self):
+        keys = [1, 2, 3, 4, 5]
+        for key in keys:
+            self.mdb.put(key, key * 10, raw_key=True, raw_value=True)
+
+        self.assertEqual(self.mdb.keys(as_type=int), keys)
+        self.assertEqual(self.mdb.values(as_type=int),
+                         [key * 10 for key in keys])
+        self.assertEqual(self.mdb.items(int, int),
+                         [(key, key * 10) for key in keys])
+
+    def test_fwmkeys(self):
+        objs = ['aa', 'ab', 'ac', 'xx', 'ad']
+        for obj in objs:
+            self.mdb.put(obj, 'some text', raw_key=True)
+        self.assertEqual(sorted(self.mdb.fwmkeys('a')),
+                         ['aa', 'ab', 'ac', 'ad'])
+
+    def test_add(self):
+        self.assertEqual(self.mdb.add_int('int', 1), 1)
+        self.assertEqual(self.mdb.add_int('int', 2), 3)
+        self.assertEqual(self.mdb.get_int('int'), 3)
+        self.assertEqual(self.mdb.add_float('float', 1.5), 1.5)
+        self.assertEqual(self.mdb.add_float('float', 1.5), 3.0)
+        self.assertEqual(self.mdb.get_float('float'), 3.0)
+        self.assertRaises(tc.TCException, self.mdb.add_int, 'float', 1)
+
+    def test_capnum(self):
+        db = mdb.MDB(capnum=3)
+        for i in range(10):
+            db.put(i, i)
+        self.assertEquals(db.keys(), [7, 8, 9])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+from tcdb import bdb
+from tcdb import hdb
+from tcdb import migrate
+from tcdb import tdb
+from tcdb import util
+
+
+class TestMigrate(unittest.TestCase):
+    def setUp(self):
+        self.text = u'unicode text [áéíóú]'
+        util.ENCODING = None
+
+    def tearDown(self):
+        util.ENCODING = 'utf-8'
+        for path in ('test.hdb', 'test.bdb', 'test.tdb'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_is_wchar(self):
+        (c_obj, c_obj_len) = util.serialize(self.text, as_raw=True)
+        wchar = util.deserialize(c_obj, c_obj_len, str)
+        self.assert_(migrate.is_wchar(wchar))
+        self.assertEqual(migrate.wchar_to_utf8(wchar),
+                         self.text.encode('utf-8'))
+        self.assert_(not migrate.is_wchar(self.text.encode('utf-8')))
+        self.assert_(not migrate.is_wchar('\x41\x00\x00\x00'))
+
+    def test_hdb(self):
+        db = hdb.HDB()
+        db.open('test.hdb')
+        db.put(self.text, self.text, raw_key=True, raw_value=True)
+        db.put('int', 65, raw_key=True, raw_value=True)
+        db.put('str', 'some text', raw_key=True, raw_value=True)
+        self.assertEqual(migrate.unicode_to_utf8(db, keys=True), 1)
+        util.ENCODING = 'utf-8'
+        self.assertEqual(db.get_unicode(self.text, as_raw=True), self.text)
+        self.assertEqual(db.get_int('int', as_raw=True), 65)
+        self.assertEqual(db.get_str('str', as_raw=True), 'some text')
+        self.assertEqual(migrate.unicode_to_utf8(db, keys=True), 0)
+        db.close()
+
+    def test_bdb(self):
+        db = bdb.BDB()
+        db.open('test.bdb')
+        db.putdup_iter(self.text, [self.text, u'other text'], raw_key=True,
+                       raw_value=True)
+        self.assertEqual(migrate.unicode_to_utf8(db, keys=True), 3)
+        util.ENCODING = 'utf-8'
+        self.assertEqual(db.getdup(self.text, raw_key=True,
+                                   value_type=unicode),
+                         [self.text, u'other text'])
+        db.close()
+
+    def test_tdb(self):
+        db = tdb.TDB()
+        db.open('test.tdb')
+        db.put('pk', {'name': self.text, 'code': 'abc'}, raw_key=True,
+               raw_cols=True)
+        self.assertEqual(migrate.unicode_to_utf8(db, columns=['name']), 1)
+        util.ENCODING = 'utf-8'
+        self.assertEqual(db.get_col_unicode('pk', 'name', raw_key=True),
+                         self.text)
+        self.assertEqual(db.get_col_str('pk', 'code', raw_key=True), 'abc')
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from tcdb import ndb
+from tcdb import tc
+from tcdb import util
+
+
+class TestNDBSimple(unittest.TestCase):
+    def setUp(self):
+        self.ndb = ndb.NDBSimple()
+
+    def tearDown(self):
+        self.ndb = None
+
+    def test_setgetitem(self):
+        self.ndb['key'] = 'some string'
+        self.assertEqual(self.ndb['key'], 'some string')
+        self.assertRaises(KeyError, self.ndb.__getitem__, 'nonexistent key')
+
+    def test_put(self):
+        self.ndb.put('key', 'some string')
+        self.assertEqual(self.ndb.get('key'), 'some string')
+        self.assertEqual(self.ndb.get('nonexistent key'), None)
+        self.assertEqual(self.ndb.get('nonexistent key', 'def'), 'def')
+
+    def test_putkeep(self):
+        self.assert_(self.ndb.putkeep('key', 'some string'))
+        self.assertEqual(self.ndb.get('key'), 'some string')
+        self.assert_(not self.ndb.putkeep('key', 'Never stored'))
+        self.assertEqual(self.ndb.get('key'), 'some string')
+
+    def test_putcat(self):
+        self.ndb.putcat('key', 'some')
+        self.ndb.putcat('key', ' text')
+        self.assertEquals(self.ndb.get('key'), 'some text')
+
+    def test_out_and_contains(self):
+        self.assert_('key' not in self.ndb)
+        self.ndb.put('key', 'some text')
+        self.assert_('key' in self.ndb)
+        self.ndb.out('key')
+        self.assert_('key' not in self.ndb)
+        self.ndb.put('key', 'some text')
+        del self.ndb['key']
+        self.assert_('key' not in self.ndb)
+        self.assertRaises(KeyError, self.ndb.out, 'key')
+
+    def test_vsiz(self):
+        self.ndb.put('key', 'some text')
+        self.assertEqual(self.ndb.vsiz('key'), len('some text'))
+        self.assertRaises(KeyError, self.ndb.vsiz, 'nonexistent key')
+
+    def test_iters(self):
+        keys = ['key1', 'key2', 'key3', 'key4', 'key5']
+        for key in keys:
+            self.ndb.put(key, key)
+
+        self.assertEqual(self.ndb.keys(), keys)
+        self.assertEqual(self.ndb.values(), keys)
+        self.assertEqual(zip(keys, keys), self.ndb.items())
+        self.assertEqual(list(self.ndb), keys)
+
+    def test_fwmkeys(self):
+        objs = ['aa', 'ab', 'ac', 'xx', 'ad']
+        for obj in objs:
+            self.ndb.put(obj, 'some text')
+        self.assertEqual(self.ndb.fwmkeys('a'), ['aa', 'ab', 'ac', 'ad'])
+        self.assertEqual(self.ndb.fwmkeys('x'), ['xx'])
+        self.assertEqual(self.ndb.fwmkeys('nonexistent key'), [])
+
+    def test_admin_functions(self):
+        keys = ['key1', 'key2', 'key3', 'key4', 'key5']
+        for key in keys:
+            self.ndb.put(key, key)
+        self.assertEquals(len(self.ndb), 5)
+        self.assert_(self.ndb.msiz() > 0)
+        self.ndb.cutfringe(2)
+        self.assertEquals(len(self.ndb), 3)
+        self.ndb.vanish()
+        self.assertEquals(len(self.ndb), 0)
+
+    def test_capnum(self):
+        db = ndb.NDBSimple('tccmpdecimal', None, capnum=3)
+        for i in range(10):
+            db.put(str(i), 'value')
+            self.assert_(str(i) in db)
+        self.assertEquals(len(db), 3)
+
+    def test_range(self):
+        for key in ('a', 'b', 'c', 'd', 'e'):
+            self.ndb.put(key, key.upper())
+        self.assertEqual(self.ndb.range('b', True, 'd', True), ['b', 'c', 'd'])
+        self.assertEqual(self.ndb.range('b', False, 'd', False), ['c'])
+        self.assertEqual(self.ndb.range('bb', True, None, True, 2), ['c', 'd'])
+        self.assertEqual(self.ndb.range(), ['a', 'b', 'c', 'd', 'e'])
+
+    def test_cmpfunc(self):
+        db = ndb.NDBSimple(lambda a, b, op: cmp(b, a), None)
+        for key in ('a', 'b', 'c'):
+            db.put(key, key)
+        self.assertEqual(db.keys(), ['c', 'b', 'a'])
+        self.assertEqual(db.range('c', False, 'a', True), ['b', 'a'])
+
+    def test_range_cmpfunc(self):
+        db = ndb.NDBSimple('tccmpdecimal', None)
+        for key in ('1', '2', '10', '20'):
+            db.put(key, key)
+        self.assertEqual(db.range('2', True, '10', True), ['2', '10'])
+        self.assertEqual(db.range('2', False, '20', False), ['10'])
+
+    def test_capsiz(self):
+        db = ndb.NDBSimple(capsiz=64 * 1024)
+        for i in range(10000):
+            db.put('key%d' % i, 'x' * 100)
+        self.assert_(db.msiz() <= 64 * 1024)
+        self.assert_(0 < len(db) < 10000)
+
+    def test_foreach(self):
+        keys = ['key1', 'key2', 'key3', 'key4', 'key5']
+
+        def proc(key, value, op):
+            self.assertEquals(key, value)
+            self.assert_(key in keys)
+            self.assertEquals(op, 'test')
+            return True
+
+        for key in keys:
+            self.ndb.put(key, key)
+        self.ndb.foreach(proc, 'test')
+
+    def test_contains_many(self):
+        self.ndb.put('key1', 'some text')
+        self.ndb.put('key3', 'some text')
+        keys = ['key%d' % i for i in range(10)]
+        bits = self.ndb.contains_many(keys)
+        self.assertEqual([util.bitmap_get(bits, i) for i in range(10)],
+                         [k in ('key1', 'key3') for k in keys])
+
+
+class TestNDB(unittest.TestCase):
+    def setUp(self):
+        self.ndb = ndb.NDB()
+
+    def tearDown(self):
+        self.ndb = None
+
+    def test_setgetitem(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        for obj1 in objs:
+            self.ndb['obj'] = obj1
+            obj2 = self.ndb['obj']
+            self.assertEqual(obj1, obj2)
+
+            self.ndb[obj1] = obj1
+            obj2 = self.ndb[obj1]
+            self.assertEqual(obj1, obj2)
+        self.assertRaises(KeyError, self.ndb.__getitem__, 'nonexistent key')
+
+    def test_put(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        for obj1 in objs:
+            self.ndb.put(obj1, obj1)
+            obj2 = self.ndb.get(obj1)
+            self.assertEqual(obj1, obj2)
+            self.ndb.put(obj1, obj1, raw_key=True)
+            obj2 = self.ndb.get(obj1, raw_key=True)
+            self.assertEqual(obj1, obj2)
+        self.assertEqual(self.ndb.get('nonexistent key'), None)
+        self.assertEqual(self.ndb.get('nonexistent key', 'def'), 'def')
+
+    def test_put_typed(self):
+        self.ndb.put_str('str', 'some text', as_raw=True)
+        self.assertEqual(self.ndb.get_str('str', as_raw=True), 'some text')
+        self.ndb.put_unicode('unicode', u'text [áéíóú]')
+        self.assertEqual(self.ndb.get_unicode('unicode'), u'text [áéíóú]')
+        self.ndb.put_int('int', 10)
+        self.assertEqual(self.ndb.get_int('int'), 10)
+        self.ndb.put_float('float', 10.10)
+        self.assertEqual(self.ndb.get_float('float'), 10.10)
+        self.assertRaises(AssertionError, self.ndb.put_int, 'key', '10')
+
+    def test_putkeep(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        for obj1 in objs:
+            self.ndb.putkeep(obj1, obj1)
+            self.ndb.putkeep(obj1, 'Never stored')
+            self.assertEqual(self.ndb.get(obj1), obj1)
+
+    def test_putcat(self):
+        self.ndb.putcat_str('key', 'some')
+        self.ndb.putcat_str('key', ' text')
+        self.assertEquals(self.ndb.get_str('key'), 'some text')
+
+    def test_out_and_contains(self):
+        objs = [1+1j, 'some text [áéíóú]', u'unicode text [áéíóú]', 10, 10.0]
+        for obj in objs:
+            self.ndb.put(obj, obj, raw_key=True)
+            self.assert_(self.ndb.has_key(obj, raw_key=True))
+            self.ndb.out(obj, as_raw=True)
+            self.assert_(not self.ndb.has_key(obj, raw_key=True))
+        self.assertRaises(KeyError, self.ndb.out, 'key')
+
+    def test_iters(self):
+        keys = [1, 2, 3, 4, 5]
+        for key in keys:
+            self.ndb.put(key, key * 10, raw_key=True, raw_value=True)
+
+        self.assertEqual(self.ndb.keys(as_type=int), keys)
+        self.assertEqual(self.ndb.values(as_type=int),
+                         [key * 10 for key in keys])
+        self.assertEqual(self.ndb.items(int, int),
+                         [(key, key * 10) for key in keys])
+
+    def test_fwmkeys(self):
+        objs = ['aa', 'ab', 'ac', 'xx', 'ad']
+        for obj in objs:
+            self.ndb.put(obj, 'some text', raw_key=True)
+        self.assertEqual(sorted(self.ndb.fwmkeys('a')),
+                         ['aa', 'ab', 'ac', 'ad'])
+
+    def test_add(self):
+        self.assertEqual(self.ndb.add_int('int', 1), 1)
+        self.assertEqual(self.ndb.add_int('int', 2), 3)
+        self.assertEqual(self.ndb.get_int('int'), 3)
+        self.assertEqual(self.ndb.add_float('float', 1.5), 1.5)
+        self.assertEqual(self.ndb.add_float('float', 1.5), 3.0)
+        self.assertEqual(self.ndb.get_float('float'), 3.0)
+        self.assertRaises(tc.TCException, self.ndb.add_int, 'float', 1)
+
+    def test_capnum(self):
+        db = ndb.NDB(capnum=3)
+        for i in range(10):
+            db.put(i, i)
+        self.assertEquals(len(db), 3)
+
+    def test_range(self):
+        for key in ('a', 'b', 'c', 'd', 'e'):
+            self.ndb.put(key, key, raw_key=True)
+        self.assertEqual(self.ndb.range('b', True, 'd', False), ['b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import operator
+import os
+import unittest
+
+from tcdb import bdb
+from tcdb import fdb
+from tcdb import hdb
+from tcdb import parallel
+from tcdb import tc
+
+
+def keys(records):
+    return [key for key, _ in records]
+
+
+class TestParallel(unittest.TestCase):
+    def tearDown(self):
+        for path in ('test.fdb', 'test.bdb', 'test.hdb'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_split(self):
+        self.assertEqual(parallel.split_ids(1, 100, 4),
+                         [(1, 25), (26, 50), (51, 75), (76, 100)])
+        self.assertEqual(parallel.split_ids(5, 6, 4), [(5, 5), (6, 6)])
+        ranges = parallel.split_keys('a', 'b', 4)
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(ranges[0][0], None)
+        self.assertEqual(ranges[-1][1], None)
+        for (_, upper), (lower, _) in zip(ranges[:-1], ranges[1:]):
+            self.assertEqual(upper, lower)
+
+    def test_fdb(self):
+        db = fdb.FDBSimple()
+        db.open('test.fdb')
+        for i in range(1, 1001, 3):
+            db.put(str(i), 'x' * (i % 10))
+        db.close()
+        self.assertEqual(parallel.dbtype('test.fdb'), tc.TFIXED)
+        self.assertEqual(parallel.parallel_scan('test.fdb', keys, operator.add,
+                                                workers=3),
+                         range(1, 1001, 3))
+        size = lambda records: sum(len(value) for _, value in records)
+        self.assertEqual(parallel.parallel_scan('test.fdb', size,
+                                                operator.add, 0, workers=2),
+                         sum(i % 10 for i in range(1, 1001, 3)))
+
+    def test_bdb(self):
+        db = bdb.BDBSimple()
+        db.open('test.bdb')
+        for i in range(2000):
+            db.put('key%05d' % (i * 7 % 2000), 'value')
+        db.close()
+        result = parallel.parallel_scan('test.bdb', keys, workers=4, chunks=2)
+        self.assertEqual(len(result), 8)
+        self.assertEqual(reduce(operator.add, result),
+                         ['key%05d' % i for i in range(2000)])
+
+    def test_empty_and_hdb(self):
+        db = bdb.BDBSimple()
+        db.open('test.bdb')
+        db.close()
+        self.assertEqual(parallel.parallel_scan('test.bdb', keys), [[]])
+        db = hdb.HDBSimple()
+        db.open('test.hdb')
+        db.close()
+        self.assertRaises(tc.TCException, parallel.parallel_scan, 'test.hdb',
+                          keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+
+from tcdb import bdb
+from tcdb import hdb
+from tcdb import stats
+from tcdb import util
+
+
+class TestHistogram(unittest.TestCase):
+    def test_index(self):
+        for value in (0, 7, 8, 15, 16, 100, 1000, 123456):
+            index = stats.Histogram.index(value)
+            self.assert_(stats.Histogram.lower(index) <= value)
+            self.assert_(value < stats.Histogram.lower(index + 1))
+
+    def test_percentile(self):
+        histogram = stats.Histogram()
+        self.assertEqual(histogram.percentile(50), 0)
+        for value in range(1, 101):
+            histogram.record(value)
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.max, 100)
+        self.assert_(44 <= histogram.percentile(50) <= 56)
+        self.assertEqual(histogram.percentile(100), 100)
+        self.assertEqual(sum(c for _, c in histogram.buckets()), 100)
+
+
+class TestStatsHDB(unittest.TestCase):
+    def setUp(self):
+        self.hdb = hdb.HDB()
+        self.hdb.open('test.hdb')
+        self.reports = []
+        stats.instrument(self.hdb, exporter=self.reports.append)
+
+    def tearDown(self):
+        stats.uninstrument(self.hdb)
+        self.hdb.close()
+        self.hdb = None
+        os.remove('test.hdb')
+
+    def test_counters(self):
+        for i in range(10):
+            self.hdb.put(i, 'some text %d' % i)
+        self.assertEqual(self.hdb.get(1), 'some text 1')
+        self.assertEqual(self.hdb.get('missing'), None)
+        self.assertRaises(KeyError, self.hdb.__getitem__, 'missing')
+
+        report = self.hdb.stats()
+        self.assertEqual(report['put']['calls'], 10)
+        self.assertEqual(report['put']['errors'], 0)
+        self.assert_(report['put']['bytes_in'] > 0)
+        self.assertEqual(report['get']['calls'], 3)
+        self.assertEqual(report['get']['misses'], 2)
+        self.assert_(report['get']['bytes_out'] > 0)
+        self.assert_(report['put']['time'] >= report['put']['call_time'])
+        latency = report['put']['latency']
+        self.assert_(latency['max'] >= latency['p99'] >= latency['p50'])
+
+    def test_iter(self):
+        for i in range(10):
+            self.hdb.put(i, i)
+        self.assertEqual(len(list(self.hdb.iteritems())), 10)
+        self.assertEqual(self.hdb.stats()['iteritems']['calls'], 10)
+
+    def test_export(self):
+        self.hdb.put('key', 'some text')
+        self.hdb.export_stats()
+        self.assertEqual(len(self.reports), 1)
+        self.assertEqual(self.reports[0]['put']['calls'], 1)
+        self.hdb._stats.reset()
+        self.assertEqual(self.hdb.stats(), {})
+
+    def test_uninstrument(self):
+        stats.uninstrument(self.hdb)
+        self.hdb.put('key', 'some text')
+        self.assert_(not hasattr(self.hdb, 'stats'))
+        stats.instrument(self.hdb)
+        self.assertEqual(self.hdb.stats(), {})
+
+    def test_unhook(self):
+        stats.uninstrument(self.hdb)
+        serialize = util.serialize
+        stats.instrument(self.hdb)
+        self.assert_(util.serialize is not serialize)
+        other = hdb.HDB()
+        stats.instrument(other)
+        del other
+        self.assert_(util.serialize is not serialize)
+        stats.uninstrument(self.hdb)
+        self.assert_(util.serialize is serialize)
+
+
+class TestStatsBDB(unittest.TestCase):
+    def setUp(self):
+        self.bdb = bdb.BDB()
+        self.bdb.open('test.bdb')
+        stats.instrument(self.bdb)
+
+    def tearDown(self):
+        stats.uninstrument(self.bdb)
+        self.bdb.close()
+        self.bdb = None
+        os.remove('test.bdb')
+
+    def test_counters(self):
+        self.bdb.putdup('key', 'value 1')
+        self.bdb.putdup('key', 'value 2')
+        self.assertEqual(self.bdb.getdup('key'), ['value 1', 'value 2'])
+        self.assertEqual(self.bdb.range('a', True, 'z', True), ['key'])
+        report = self.bdb.stats()
+        self.assertEqual(report['putdup']['calls'], 2)
+        self.assertEqual(report['getdup']['calls'], 1)
+        self.assertEqual(report['range']['calls'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
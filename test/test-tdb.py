@@ -340,5 +340,60 @@ class TestTDB(unittest.TestCase):
             'object': None
             }
 
+    def test_contains_many(self):
+        self.tdb.put('pk1', {'user': 'alice'})
+        self.tdb.put('pk3', {'user': 'bob'})
+        bits = self.tdb.contains_many(['pk1', 'pk2', 'pk3'])
+        self.assertEqual([util.bitmap_get(bits, i) for i in range(3)],
+                         [True, False, True])
+
+    def test_metrics(self):
+        for i in range(100):
+            self.tdb.put(str(i), {'name': 'alice', 'age': i})
+        metrics = self.tdb.metrics()
+        self.assertEqual(metrics['rnum'], 100)
+        self.assertEqual(metrics['inum'], 0)
+        self.assertEqual(metrics['xmsiz'], 67108864)
+        self.assert_(metrics['record_size'] > 0)
+        self.assert_(0 < metrics['bucket_usage'] < 1)
+
+    def test_unicode_qry(self):
+        self.tdb.put('pk', {'name': u'José'}, raw_key=True, raw_cols=True)
+        self.assertEqual(self.tdb.get_col_str('pk', 'name', raw_key=True),
+                         u'José'.encode('utf-8'))
+        qry = self.tdb.query()
+        qry.addcond('name', tdb.QCSTREQ, u'José')
+        self.assertEqual(qry.search(), ['pk'])
+        qry.close()
+
+    def test_kwic(self):
+        self.tdb.put('a', {'title': 'Tokyo Cabinet',
+                           'text': 'A library of routines: Tokyo Cabinet'},
+                     raw_cols=True)
+        self.tdb.put('b', {'title': 'Kyoto', 'text': 'Kyoto Cabinet'},
+                     raw_cols=True)
+        self.tdb.put('c', {'title': 'Other', 'text': 'Nothing here'},
+                     raw_cols=True)
+
+        qry = self.tdb.query()
+        qry.addcond('text', tdb.QCFTSPH, 'cabinet')
+        qry.setorder('title', tdb.QOSTRDESC)
+        rows = list(qry.iter_kwic(width=16, opts=tdb.KWMUBRCT,
+                                  schema={'title': str, 'text': str}))
+        self.assertEqual([pkey for pkey, _, _ in rows], ['a', 'b'])
+        (pkey, cols, kwic) = rows[0]
+        self.assertEqual(cols['title'], 'Tokyo Cabinet')
+        self.assertEqual(len(kwic), 1)
+        self.assert_('[Cabinet]' in kwic[0])
+
+        rows = qry.kwic(['b', 'c', 'missing'], ['title', 'text'],
+                        opts=tdb.KWMUCTRL)
+        self.assertEqual([pkey for pkey, _, _ in rows], ['b', 'c'])
+        self.assertEqual(len(rows[0][2]), 1)
+        self.assert_('\x02Cabinet\x03' in rows[0][2][0])
+        self.assertEqual(rows[1][2], [])
+        qry.close()
+
+
 if __name__ == '__main__':
     unittest.main()